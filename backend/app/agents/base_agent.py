@@ -1,41 +1,347 @@
 from abc import ABC, abstractmethod
 from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain.memory import ConversationBufferMemory
-from langchain.schema import BaseMessage
-from typing import List, Dict, Any
+from langchain.schema import AIMessage, BaseMessage, HumanMessage
+from typing import AsyncIterator, List, Dict, Any, Optional, Union
+import asyncio
+import logging
 import os
 import re
+import time
+
+from app.services.llm_pool import AgentOverloadedError, LLMWorkerPool, get_llm_pool
+from app.services.metrics import record_agent_request
+from app.services.response_cache import ResponseCache, context_fingerprint, get_response_cache, normalize_query
+from app.services.session_store import SessionStore, get_session_store
+from app.services.stage_timings import StageTimer, StageTimings, get_stage_timings
+
+logger = logging.getLogger(__name__)
+
+def format_markdown(response: str) -> str:
+    """Convert the markdown emphasis Gemini emits into HTML tags"""
+    # Convert **text** to <strong>text</strong>
+    response = re.sub(r'\*\*(.*?)\*\*', r'<strong>\1</strong>', response)
+    
+    # Convert *text* to <em>text</em> (italics)
+    response = re.sub(r'\*(.*?)\*', r'<em>\1</em>', response)
+    
+    return response
+
+class StreamingFormatter:
+    """Applies format_markdown to text that arrives in chunks.
+    
+    The bold/italic patterns never match across a newline and every match starts
+    with an asterisk, so anything before the first asterisk of the current line
+    can be emitted as-is, and a line can be formatted once its newline arrives.
+    Only a line containing an asterisk is held back, so the concatenated output
+    is identical to formatting the whole message at once.
+    """
+    
+    def __init__(self):
+        self._pending = ""
+    
+    def feed(self, chunk: str) -> str:
+        """Add raw text and return whatever can safely be emitted now"""
+        self._pending += chunk
+        out = []
+        
+        # Complete lines can be formatted on their own
+        last_newline = self._pending.rfind("\n")
+        if last_newline != -1:
+            out.append(format_markdown(self._pending[:last_newline + 1]))
+            self._pending = self._pending[last_newline + 1:]
+        
+        # Text before the first asterisk of the open line cannot be part of a match
+        star = self._pending.find("*")
+        safe = len(self._pending) if star == -1 else star
+        if safe:
+            out.append(self._pending[:safe])
+            self._pending = self._pending[safe:]
+        
+        return "".join(out)
+    
+    def flush(self) -> str:
+        """Format and return everything still held back"""
+        text = format_markdown(self._pending)
+        self._pending = ""
+        return text
 
 class BaseAgent(ABC):
     """Base class for all AI agents using Gemini"""
     
-    def __init__(self, model_name: str = "gemini-pro", temperature: float = 0.3):
+    # Returned to the caller when building the prompt or calling the LLM fails
+    error_message = "I apologize, but I encountered an error: {error}"
+    # Namespace for cached responses
+    agent_type = "base"
+    # Subclasses backed by KnowledgeBaseService set this; its version keys the response cache
+    knowledge_base = None
+    
+    def __init__(self, model_name: str = "gemini-pro", temperature: float = 0.3,
+                 llm_pool: Optional[LLMWorkerPool] = None,
+                 response_cache: Optional[ResponseCache] = None,
+                 session_store: Optional[SessionStore] = None,
+                 stage_timings: Optional[StageTimings] = None):
         self.llm = ChatGoogleGenerativeAI(
             model=model_name,
             temperature=temperature,
             google_api_key=os.getenv("GOOGLE_API_KEY")
         )
-        self.memory = ConversationBufferMemory()
+        # Conversation memory is per client session and shared by all agents
+        self.sessions = session_store or get_session_store()
+        self.llm_pool = llm_pool or get_llm_pool()
+        self.response_cache = response_cache or get_response_cache()
+        self.timings = stage_timings or get_stage_timings()
     
     @abstractmethod
-    def process_query(self, query: str, context: Dict[str, Any] = None) -> str:
-        """Process a user query and return a response"""
+    def _build_prompt(self, query: str, context: Dict[str, Any] = None, timer: Optional[StageTimer] = None) -> str:
+        """Assemble the full LLM prompt for a query, timing its stages on ``timer``"""
         pass
     
-    def get_conversation_history(self) -> List[BaseMessage]:
-        """Get the conversation history"""
-        return self.memory.chat_memory.messages
+    def process_query(self, query: str, context: Dict[str, Any] = None, session_id: Optional[str] = None) -> str:
+        """Process a user query and return a response (blocking)"""
+        timer = StageTimer()
+        outcome, prompt, formatted_response = "error", None, None
+        try:
+            with timer.stage("cache"):
+                kb_version, cached = self._cached_response(query, context, session_id)
+            if cached is not None:
+                outcome = "cached"
+                return cached
+            prompt = self._build_prompt(query, context, timer)
+            with timer.stage("llm"):
+                response = self.llm.invoke(prompt)
+            formatted_response = self._finish_response(query, response.content, session_id, timer)
+            self.response_cache.put(self.agent_type, query, formatted_response, kb_version, context)
+            outcome = "answered"
+            return formatted_response
+        except Exception as e:
+            logger.exception("%s agent failed to answer", self.agent_type)
+            return self.error_message.format(error=str(e))
+        finally:
+            self._observe(timer, outcome, prompt, formatted_response)
     
-    def clear_memory(self):
-        """Clear the conversation memory"""
-        self.memory.clear()
+    async def aprocess_query(self, query: str, context: Dict[str, Any] = None,
+                             session_id: Optional[str] = None) -> str:
+        """Process a user query without blocking the event loop.
+
+        The LLM call goes through the shared worker pool, so it raises
+        AgentOverloadedError when the pool's wait queue is full.
+        """
+        timer = StageTimer()
+        outcome, prompt, formatted_response = "error", None, None
+        try:
+            with timer.stage("cache"):
+                kb_version, cached = self._cached_response(query, context, session_id)
+            if cached is not None:
+                outcome = "cached"
+                return cached
+            prompt = self._build_prompt(query, context, timer)
+            # Includes any wait for a pool slot
+            with timer.stage("llm"):
+                async with self.llm_pool.slot():
+                    response = await self.llm.ainvoke(prompt)
+            formatted_response = self._finish_response(query, response.content, session_id, timer)
+            self.response_cache.put(self.agent_type, query, formatted_response, kb_version, context)
+            outcome = "answered"
+            return formatted_response
+        except AgentOverloadedError:
+            outcome = "overloaded"
+            raise
+        except Exception as e:
+            logger.exception("%s agent failed to answer", self.agent_type)
+            return self.error_message.format(error=str(e))
+        finally:
+            self._observe(timer, outcome, prompt, formatted_response)
     
-    def _format_response(self, response: str) -> str:
-        """Post-process response to fix formatting"""
-        # Convert **text** to <strong>text</strong>
-        response = re.sub(r'\*\*(.*?)\*\*', r'<strong>\1</strong>', response)
+    async def astream_query(self, query: str, context: Dict[str, Any] = None,
+                            session_id: Optional[str] = None) -> AsyncIterator[str]:
+        """Stream the formatted response as the LLM generates it.
         
-        # Convert *text* to <em>text</em> (italics)
-        response = re.sub(r'\*(.*?)\*', r'<em>\1</em>', response)
+        Chunks are formatted incrementally with StreamingFormatter, so their
+        concatenation equals what process_query would have returned. The
+        assembled message is stored in memory once the stream completes.
+        A cached response is sent as a single chunk. The llm stage counts only
+        time spent waiting on the model, not time the client takes to read.
+        """
+        formatter = StreamingFormatter()
+        parts = []
+        timer = StageTimer()
+        outcome, prompt, formatted_response = "error", None, None
+        try:
+            try:
+                with timer.stage("cache"):
+                    kb_version, cached = self._cached_response(query, context, session_id)
+                if cached is not None:
+                    outcome = "cached"
+                    yield cached
+                    return
+                prompt = self._build_prompt(query, context, timer)
+                waiting_since = time.perf_counter()
+                async with self.llm_pool.slot():
+                    async for chunk in self.llm.astream(prompt):
+                        received = time.perf_counter()
+                        timer.add("llm", received - waiting_since)
+                        text = formatter.feed(chunk.content)
+                        timer.add("format", time.perf_counter() - received)
+                        if text:
+                            parts.append(text)
+                            yield text
+                        waiting_since = time.perf_counter()
+                timer.add("llm", time.perf_counter() - waiting_since)
+                with timer.stage("format"):
+                    text = formatter.flush()
+                if text:
+                    parts.append(text)
+                    yield text
+            except AgentOverloadedError:
+                outcome = "overloaded"
+                raise
+            except Exception as e:
+                logger.exception("%s agent failed while streaming", self.agent_type)
+                yield self.error_message.format(error=str(e))
+                return
+            
+            formatted_response = "".join(parts)
+            self._remember(query, formatted_response, session_id)
+            self.response_cache.put(self.agent_type, query, formatted_response, kb_version, context)
+            outcome = "answered"
+        finally:
+            self._observe(timer, outcome, prompt, formatted_response)
+    
+    async def aprocess_batch(self, items: List[Union[str, Dict[str, Any]]],
+                             max_concurrency: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Answer many queries in one call.
+        
+        Each item is a query string or a dict with ``query`` and optional
+        ``context`` / ``session_id``. Identical prompts (same normalized query
+        and context) are answered once, the knowledge-base version is resolved
+        once for the whole batch, and at most ``max_concurrency`` LLM calls
+        from this batch run at a time (still inside the shared LLM pool).
+        Results come back in input order with per-item timing; a failing item
+        carries its error instead of failing the batch.
+        """
+        batch_start = time.perf_counter()
+        limit = max_concurrency or int(os.getenv("BATCH_MAX_CONCURRENCY", "8"))
+        requests = [{"query": item} if isinstance(item, str) else item for item in items]
+        kb_version = self.knowledge_base.current_version() if self.knowledge_base is not None else ""
+        
+        # Group identical prompts; the first item of each group is the one answered
+        groups: Dict[Any, List[int]] = {}
+        for index, request in enumerate(requests):
+            key = (normalize_query(request.get("query", "")), context_fingerprint(request.get("context")))
+            groups.setdefault(key, []).append(index)
+        
+        outcomes: Dict[Any, Dict[str, Any]] = {}
+        semaphore = asyncio.Semaphore(limit)
+        
+        async def answer(key, request: Dict[str, Any]):
+            query, context = request.get("query", ""), request.get("context")
+            start = time.perf_counter()
+            timer = StageTimer()
+            outcome = {"response": None, "error": None, "cached": False}
+            result, prompt = "error", None
+            try:
+                if not query.strip():
+                    raise ValueError("Empty query")
+                with timer.stage("cache"):
+                    cached = self.response_cache.get(self.agent_type, query, kb_version, context)
+                if cached is not None:
+                    outcome.update(response=cached, cached=True)
+                    result = "cached"
+                else:
+                    prompt = self._build_prompt(query, context, timer)
+                    with timer.stage("llm"):
+                        async with semaphore:
+                            async with self.llm_pool.slot():
+                                response = await self.llm.ainvoke(prompt)
+                    with timer.stage("format"):
+                        formatted_response = self._format_response(response.content)
+                    self.response_cache.put(self.agent_type, query, formatted_response, kb_version, context)
+                    outcome["response"] = formatted_response
+                    result = "answered"
+            except AgentOverloadedError as e:
+                outcome["error"] = f"overloaded: {e}"
+                result = "overloaded"
+            except Exception as e:
+                outcome["error"] = str(e)
+            self._observe(timer, result, prompt, outcome["response"])
+            outcome["stages_ms"] = timer.as_ms()
+            outcome["elapsed_ms"] = round((time.perf_counter() - start) * 1000, 2)
+            outcome["completed_ms"] = round((time.perf_counter() - batch_start) * 1000, 2)
+            outcomes[key] = outcome
         
-        return response
+        await asyncio.gather(*(answer(key, requests[indices[0]]) for key, indices in groups.items()))
+        
+        results: List[Dict[str, Any]] = [None] * len(requests)
+        for key, indices in groups.items():
+            outcome = outcomes[key]
+            for position, index in enumerate(indices):
+                request = requests[index]
+                if outcome["response"] is not None:
+                    self._remember(request.get("query", ""), outcome["response"], request.get("session_id"))
+                results[index] = {
+                    "index": index,
+                    "query": request.get("query", ""),
+                    "response": outcome["response"],
+                    "status": "success" if outcome["error"] is None else "error",
+                    "error": outcome["error"],
+                    "cached": outcome["cached"],
+                    "duplicate_of": indices[0] if position else None,
+                    "elapsed_ms": outcome["elapsed_ms"],
+                    "stages_ms": outcome["stages_ms"],
+                    "completed_ms": outcome["completed_ms"]
+                }
+        return results
+    
+    def process_batch(self, items: List[Union[str, Dict[str, Any]]],
+                      max_concurrency: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Blocking wrapper around aprocess_batch for scripts (not for use inside an event loop)"""
+        return asyncio.run(self.aprocess_batch(items, max_concurrency))
+    
+    def _observe(self, timer: StageTimer, outcome: str, prompt: Optional[str] = None,
+                 response: Optional[str] = None):
+        """Publish a finished query's stage timings, outcome and token counts"""
+        self.timings.observe(self.agent_type, timer)
+        record_agent_request(self.agent_type, timer.seconds, outcome, prompt, response)
+    
+    def _cached_response(self, query: str, context: Dict[str, Any] = None, session_id: Optional[str] = None):
+        """Current knowledge-base version and the cached answer for it, if any.
+        
+        A hit is still recorded in conversation memory. The version is returned
+        so a fresh answer is stored under the data it was generated from.
+        """
+        kb_version = self.knowledge_base.current_version() if self.knowledge_base is not None else ""
+        cached = self.response_cache.get(self.agent_type, query, kb_version, context)
+        if cached is not None:
+            self._remember(query, cached, session_id)
+        return kb_version, cached
+    
+    def _finish_response(self, query: str, content: str, session_id: Optional[str] = None,
+                         timer: Optional[StageTimer] = None) -> str:
+        """Format the raw LLM output and record the exchange in memory"""
+        # Format the response to fix asterisks
+        with (timer or StageTimer()).stage("format"):
+            formatted_response = self._format_response(content)
+        self._remember(query, formatted_response, session_id)
+        return formatted_response
+    
+    def _remember(self, query: str, formatted_response: str, session_id: Optional[str] = None):
+        """Store a completed exchange in the caller's session (anonymous requests are not kept)"""
+        if not session_id:
+            return
+        self.sessions.append(session_id, "user", query, self.agent_type)
+        self.sessions.append(session_id, "assistant", formatted_response, self.agent_type)
+    
+    def get_conversation_history(self, session_id: str) -> List[BaseMessage]:
+        """Get the conversation history of a session"""
+        return [
+            HumanMessage(content=m["content"]) if m["role"] == "user" else AIMessage(content=m["content"])
+            for m in self.sessions.get_messages(session_id)
+        ]
+    
+    def clear_memory(self, session_id: Optional[str] = None):
+        """Clear the conversation memory of one session, or of every session"""
+        self.sessions.clear(session_id)
+    
+    def _format_response(self, response: str) -> str:
+        """Post-process response to fix formatting"""
+        return format_markdown(response)
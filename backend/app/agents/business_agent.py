@@ -1,16 +1,21 @@
 from app.agents.base_agent import BaseAgent
 from langchain.prompts import ChatPromptTemplate
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 import json
-from app.services.knowledge_base import KnowledgeBaseService
+from app.services.knowledge_base import get_knowledge_base
+from app.services.prompt_renderer import PrecompiledPrompt
+from app.services.stage_timings import StageTimer
 
 class BusinessIntelligenceAgent(BaseAgent):
     """AI agent specialized in business insights and marketing recommendations using RAG"""
     
+    error_message = "I apologize, but I encountered an error processing your business query: {error}"
+    agent_type = "business"
+    
     def __init__(self):
         super().__init__(model_name="gemini-2.0-flash", temperature=0.3)
-        self.knowledge_base = KnowledgeBaseService()
-        self.knowledge_base.load_frontend_data()
+        # Shared by every agent; the data itself loads on the first query
+        self.knowledge_base = get_knowledge_base()
         
         self.business_prompt = ChatPromptTemplate.from_messages([
             ("system", """You are a business intelligence expert specializing in beauty and cosmetics industry analytics. 
@@ -74,38 +79,28 @@ class BusinessIntelligenceAgent(BaseAgent):
             Always provide actionable, data-driven insights with specific recommendations based on REAL DATA."""),
             ("user", "{query}\n\nDashboard Context: {context}\n\nKnowledge Base: {knowledge_base}")
         ])
+        # The system prompt is rendered once; requests only format the user message
+        self.compiled_prompt = PrecompiledPrompt(self.business_prompt)
     
-    def process_query(self, query: str, context: Dict[str, Any] = None) -> str:
-        """Process business-related queries using RAG"""
-        try:
-            # Get relevant context from knowledge base
-            rag_context = self.knowledge_base.get_context_for_query(query, context)
-            
-            # Format context for the prompt
+    def _build_prompt(self, query: str, context: Dict[str, Any] = None, timer: Optional[StageTimer] = None) -> str:
+        """Build the business prompt using RAG"""
+        timer = timer or StageTimer()
+        # Get the most relevant knowledge that fits the token budget
+        with timer.stage("context"):
+            rag_context = self.knowledge_base.build_context(query)
+        
+        # Format context for the prompt
+        with timer.stage("serialize"):
             context_str = self._format_context(context) if context else "No specific dashboard context available"
-            knowledge_str = json.dumps(rag_context, indent=2)
-            
-            # Create the prompt
-            prompt = self.business_prompt.format(
-                query=query, 
+        knowledge_str = rag_context.text
+        
+        # Create the prompt
+        with timer.stage("render"):
+            return self.compiled_prompt.render(
+                query=query,
                 context=context_str,
                 knowledge_base=knowledge_str
             )
-            
-            # Get response from LLM
-            response = self.llm.invoke(prompt)
-            
-            # Format the response to fix asterisks
-            formatted_response = self._format_response(response.content)
-            
-            # Store in memory
-            self.memory.chat_memory.add_user_message(query)
-            self.memory.chat_memory.add_ai_message(formatted_response)
-            
-            return formatted_response
-            
-        except Exception as e:
-            return f"I apologize, but I encountered an error processing your business query: {str(e)}"
     
     def _format_context(self, context: Dict[str, Any]) -> str:
         """Format dashboard context for the prompt"""
@@ -143,11 +138,22 @@ class BusinessIntelligenceAgent(BaseAgent):
         query = "Analyze the comment data to identify potential business opportunities and areas for growth, considering our data shows makeup, hair, and beauty content performs best."
         return self.process_query(query, comment_analysis)
     
-    def analyze_user_engagement_claim(self, user_claim: str, current_metrics: Dict[str, Any] = None) -> str:
+    def analyze_user_engagement_claim(self, user_claim: str, current_metrics: Dict[str, Any] = None,
+                                      session_id: Optional[str] = None) -> str:
         """Analyze user's engagement claims against real data benchmarks"""
+        return self.process_query(self._engagement_claim_query(user_claim, current_metrics), current_metrics, session_id)
+    
+    async def aanalyze_user_engagement_claim(self, user_claim: str, current_metrics: Dict[str, Any] = None,
+                                             session_id: Optional[str] = None) -> str:
+        """Async variant of analyze_user_engagement_claim for request handlers"""
+        return await self.aprocess_query(self._engagement_claim_query(user_claim, current_metrics),
+                                         current_metrics, session_id)
+    
+    def _engagement_claim_query(self, user_claim: str, current_metrics: Dict[str, Any] = None) -> str:
+        """Build the benchmark-comparison query for an engagement claim"""
         analysis = self.knowledge_base.analyze_engagement_performance(user_claim, current_metrics)
         
-        query = f"""A user claims: "{user_claim}"
+        return f"""A user claims: "{user_claim}"
         
         Please analyze this claim against our real data benchmarks and provide insights on:
         1. How their performance compares to industry benchmarks
@@ -161,5 +167,3 @@ class BusinessIntelligenceAgent(BaseAgent):
         - Best publishing times: Saturday/Friday for engagement, 15:00 UTC for views
         
         Provide a detailed analysis with actionable recommendations."""
-        
-        return self.process_query(query, current_metrics)
@@ -1,16 +1,21 @@
 from app.agents.base_agent import BaseAgent
 from langchain.prompts import ChatPromptTemplate
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 import json
-from app.services.knowledge_base import KnowledgeBaseService
+from app.services.knowledge_base import get_knowledge_base
+from app.services.prompt_renderer import PrecompiledPrompt
+from app.services.stage_timings import StageTimer
 
 class DashboardExplanationAgent(BaseAgent):
     """AI agent specialized in explaining dashboard components and data using RAG"""
     
+    error_message = "I apologize, but I encountered an error explaining the dashboard: {error}"
+    agent_type = "dashboard"
+    
     def __init__(self):
         super().__init__(model_name="gemini-2.0-flash", temperature=0.1)
-        self.knowledge_base = KnowledgeBaseService()
-        self.knowledge_base.load_frontend_data()
+        # Shared by every agent; the data itself loads on the first query
+        self.knowledge_base = get_knowledge_base()
         self.dashboard_knowledge = self._load_dashboard_knowledge()
         
         self.dashboard_prompt = ChatPromptTemplate.from_messages([
@@ -64,38 +69,28 @@ class DashboardExplanationAgent(BaseAgent):
             Always provide clear, accurate explanations with practical examples from REAL DATA."""),
             ("user", "{query}\n\nDashboard Context: {context}\n\nKnowledge Base: {knowledge_base}")
         ])
+        # The system prompt is rendered once; requests only format the user message
+        self.compiled_prompt = PrecompiledPrompt(self.dashboard_prompt)
     
-    def process_query(self, query: str, context: Dict[str, Any] = None) -> str:
-        """Process dashboard-related queries using RAG"""
-        try:
-            # Get relevant context from knowledge base
-            rag_context = self.knowledge_base.get_context_for_query(query, context)
-            
-            # Format context for the prompt
+    def _build_prompt(self, query: str, context: Dict[str, Any] = None, timer: Optional[StageTimer] = None) -> str:
+        """Build the dashboard prompt using RAG"""
+        timer = timer or StageTimer()
+        # Get the most relevant knowledge that fits the token budget
+        with timer.stage("context"):
+            rag_context = self.knowledge_base.build_context(query)
+        
+        # Format context for the prompt
+        with timer.stage("serialize"):
             context_str = self._format_context(context) if context else "No specific dashboard context available"
-            knowledge_str = json.dumps(rag_context, indent=2)
-            
-            # Create the prompt
-            prompt = self.dashboard_prompt.format(
-                query=query, 
+        knowledge_str = rag_context.text
+        
+        # Create the prompt
+        with timer.stage("render"):
+            return self.compiled_prompt.render(
+                query=query,
                 context=context_str,
                 knowledge_base=knowledge_str
             )
-            
-            # Get response from LLM
-            response = self.llm.invoke(prompt)
-            
-            # Format the response to fix asterisks
-            formatted_response = self._format_response(response.content)
-            
-            # Store in memory
-            self.memory.chat_memory.add_user_message(query)
-            self.memory.chat_memory.add_ai_message(formatted_response)
-            
-            return formatted_response
-            
-        except Exception as e:
-            return f"I apologize, but I encountered an error explaining the dashboard: {str(e)}"
     
     def _load_dashboard_knowledge(self) -> Dict[str, Any]:
         """Load dashboard knowledge base"""
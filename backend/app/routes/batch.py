@@ -0,0 +1,67 @@
+import asyncio
+import os
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+from fastapi import HTTPException
+
+BatchItem = Union[str, Dict[str, Any]]
+
+def validate_batch(items: List[BatchItem], max_concurrency: Any = None) -> Optional[int]:
+    """Reject malformed, empty or oversized batches before any work is done; returns the
+    requested concurrency capped at BATCH_MAX_CONCURRENCY (None for the default)"""
+    max_items = int(os.getenv("BATCH_MAX_ITEMS", "500"))
+    if not isinstance(items, list) or not items:
+        raise HTTPException(status_code=400, detail="Provide a non-empty list of items")
+    if len(items) > max_items:
+        raise HTTPException(status_code=413, detail=f"Batch has {len(items)} items; the limit is {max_items}")
+    for index, item in enumerate(items):
+        if not isinstance(item, str) and not (isinstance(item, dict) and isinstance(item.get("query"), str)):
+            raise HTTPException(status_code=400, detail=f"Item {index} must be a query string or an object with a query")
+    if max_concurrency is None:
+        return None
+    if not isinstance(max_concurrency, int) or isinstance(max_concurrency, bool) or max_concurrency < 1:
+        raise HTTPException(status_code=400, detail="max_concurrency must be a positive integer")
+    return min(max_concurrency, int(os.getenv("BATCH_MAX_CONCURRENCY", "8")))
+
+async def run_batch(items: List[BatchItem], route: Callable[[str], Tuple[Any, str]],
+                    max_concurrency: Optional[int] = None) -> Dict[str, Any]:
+    """Split a batch by agent (``route`` maps a query to ``(agent, agent_type)``), run the
+    per-agent batches concurrently and merge the results back into input order"""
+    start = time.perf_counter()
+    per_agent: Dict[str, Dict[str, Any]] = {}
+    for index, item in enumerate(items):
+        query = item if isinstance(item, str) else item.get("query", "")
+        agent, agent_type = route(query)
+        group = per_agent.setdefault(agent_type, {"agent": agent, "indices": [], "items": []})
+        group["indices"].append(index)
+        group["items"].append(item)
+    
+    groups = list(per_agent.items())
+    answers = await asyncio.gather(*(
+        group["agent"].aprocess_batch(group["items"], max_concurrency) for _, group in groups
+    ))
+    
+    results: List[Dict[str, Any]] = [None] * len(items)
+    for (agent_type, group), group_results in zip(groups, answers):
+        for index, result in zip(group["indices"], group_results):
+            duplicate_of = result["duplicate_of"]
+            results[index] = {
+                **result,
+                "index": index,
+                "agent_type": agent_type,
+                "duplicate_of": group["indices"][duplicate_of] if duplicate_of is not None else None
+            }
+    
+    return {
+        "results": results,
+        "summary": {
+            "items": len(results),
+            "unique": sum(1 for r in results if r["duplicate_of"] is None),
+            "deduplicated": sum(1 for r in results if r["duplicate_of"] is not None),
+            "cached": sum(1 for r in results if r["cached"] and r["duplicate_of"] is None),
+            "errors": sum(1 for r in results if r["status"] == "error"),
+            "elapsed_ms": round((time.perf_counter() - start) * 1000, 2)
+        },
+        "status": "success"
+    }
@@ -1,10 +1,19 @@
 from fastapi import APIRouter, HTTPException
+import logging
 from pydantic import BaseModel
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
 from app.agents.business_agent import BusinessIntelligenceAgent
 from app.agents.dashboard_agent import DashboardExplanationAgent
+from app.services.llm_pool import AgentOverloadedError, get_llm_pool
+from app.services.response_cache import get_response_cache
+from app.services.knowledge_base import get_knowledge_base
+from app.services.session_store import get_session_store
+from app.services.stage_timings import get_stage_timings
+from app.routes.sse import stream_agent_response
+from app.routes.batch import validate_batch, run_batch
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
 
 # Initialize agents
 business_agent = BusinessIntelligenceAgent()
@@ -14,72 +23,114 @@ class ChatRequest(BaseModel):
     query: str
     agent_type: str = "general"  # business, dashboard, general
     context: Optional[Dict[str, Any]] = None
+    session_id: Optional[str] = None  # conversation memory is kept per session
+
+class BatchItem(BaseModel):
+    query: str
+    context: Optional[Dict[str, Any]] = None
+    session_id: Optional[str] = None
+
+class BatchRequest(BaseModel):
+    items: List[BatchItem]
+    agent_type: str = "general"  # business, dashboard, general (routed per item)
+    max_concurrency: Optional[int] = None
 
 class ChatResponse(BaseModel):
     response: str
     agent_type: str
     context_used: bool
 
+def overloaded(e: AgentOverloadedError) -> HTTPException:
+    """503 telling the client to back off when the LLM queue is saturated"""
+    return HTTPException(
+        status_code=503,
+        detail=str(e),
+        headers={"Retry-After": str(int(max(1, e.retry_after)))}
+    )
+
 @router.post("/business")
 async def chat_business(request: ChatRequest):
     """Get business insights and marketing recommendations"""
     try:
-        response = business_agent.process_query(request.query, request.context)
+        response = await business_agent.aprocess_query(request.query, request.context, request.session_id)
         return ChatResponse(
             response=response,
             agent_type="business",
             context_used=request.context is not None
         )
+    except AgentOverloadedError as e:
+        raise overloaded(e)
     except Exception as e:
+        logger.exception("Chat request failed")
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/dashboard")
 async def chat_dashboard(request: ChatRequest):
     """Get explanations about dashboard components"""
     try:
-        response = dashboard_agent.process_query(request.query, request.context)
+        response = await dashboard_agent.aprocess_query(request.query, request.context, request.session_id)
         return ChatResponse(
             response=response,
             agent_type="dashboard",
             context_used=request.context is not None
         )
+    except AgentOverloadedError as e:
+        raise overloaded(e)
     except Exception as e:
+        logger.exception("Chat request failed")
         raise HTTPException(status_code=500, detail=str(e))
 
+def route_general_query(query: str):
+    """Pick the agent for a general query based on its keywords"""
+    if any(keyword in query.lower() for keyword in ['business', 'marketing', 'strategy', 'insights', 'trends']):
+        return business_agent, "business"
+    elif any(keyword in query.lower() for keyword in ['dashboard', 'chart', 'metric', 'data', 'explain', 'how', 'what']):
+        return dashboard_agent, "dashboard"
+    # Default to business agent for general queries
+    return business_agent, "business"
+
 @router.post("/general")
 async def chat_general(request: ChatRequest):
     """General conversation with AI assistant"""
     try:
         # Route to appropriate agent based on query content
-        if any(keyword in request.query.lower() for keyword in ['business', 'marketing', 'strategy', 'insights', 'trends']):
-            response = business_agent.process_query(request.query, request.context)
-            agent_type = "business"
-        elif any(keyword in request.query.lower() for keyword in ['dashboard', 'chart', 'metric', 'data', 'explain', 'how', 'what']):
-            response = dashboard_agent.process_query(request.query, request.context)
-            agent_type = "dashboard"
-        else:
-            # Default to business agent for general queries
-            response = business_agent.process_query(request.query, request.context)
-            agent_type = "business"
+        agent, agent_type = route_general_query(request.query)
+        response = await agent.aprocess_query(request.query, request.context, request.session_id)
         
         return ChatResponse(
             response=response,
             agent_type=agent_type,
             context_used=request.context is not None
         )
+    except AgentOverloadedError as e:
+        raise overloaded(e)
     except Exception as e:
+        logger.exception("Chat request failed")
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/batch")
+async def chat_batch(request: BatchRequest):
+    """Answer many queries in one call, deduplicated and with bounded LLM concurrency"""
+    items = [item.dict() for item in request.items]
+    max_concurrency = validate_batch(items, request.max_concurrency)
+    if request.agent_type == "business":
+        route = lambda query: (business_agent, "business")
+    elif request.agent_type == "dashboard":
+        route = lambda query: (dashboard_agent, "dashboard")
+    else:
+        route = route_general_query
+    return await run_batch(items, route, max_concurrency)
+
 @router.post("/contextual")
 async def chat_contextual(request: ChatRequest):
     """AI response with current dashboard data context"""
     try:
         # Determine best agent based on context and query
         if request.context and "dashboard_state" in request.context:
-            response = dashboard_agent.process_query(request.query, request.context)
+            response = await dashboard_agent.aprocess_query(request.query, request.context, request.session_id)
             agent_type = "dashboard"
         else:
-            response = business_agent.process_query(request.query, request.context)
+            response = await business_agent.aprocess_query(request.query, request.context, request.session_id)
             agent_type = "business"
         
         return ChatResponse(
@@ -87,18 +138,67 @@ async def chat_contextual(request: ChatRequest):
             agent_type=agent_type,
             context_used=True
         )
+    except AgentOverloadedError as e:
+        raise overloaded(e)
     except Exception as e:
+        logger.exception("Chat request failed")
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/business/stream")
+async def chat_business_stream(request: ChatRequest):
+    """Stream business insights as Server-Sent Events"""
+    try:
+        return await stream_agent_response(business_agent, request.query, request.context, "business", request.session_id)
+    except AgentOverloadedError as e:
+        raise overloaded(e)
+
+@router.post("/dashboard/stream")
+async def chat_dashboard_stream(request: ChatRequest):
+    """Stream dashboard explanations as Server-Sent Events"""
+    try:
+        return await stream_agent_response(dashboard_agent, request.query, request.context, "dashboard", request.session_id)
+    except AgentOverloadedError as e:
+        raise overloaded(e)
+
+@router.post("/general/stream")
+async def chat_general_stream(request: ChatRequest):
+    """Stream a general conversation answer as Server-Sent Events"""
+    try:
+        agent, agent_type = route_general_query(request.query)
+        return await stream_agent_response(agent, request.query, request.context, agent_type, request.session_id)
+    except AgentOverloadedError as e:
+        raise overloaded(e)
+
 @router.get("/agents/status")
 async def get_agents_status():
     """Get status of AI agents"""
+    sessions = get_session_store().stats()
     return {
         "business_agent": "active",
         "dashboard_agent": "active",
-        "total_conversations": len(business_agent.get_conversation_history()) + len(dashboard_agent.get_conversation_history())
+        "total_conversations": sessions["sessions"],
+        "sessions": sessions,
+        "llm_pool": get_llm_pool().stats(),
+        "response_cache": get_response_cache().stats(),
+        "knowledge_base": get_knowledge_base().metrics(),
+        "stage_timings": get_stage_timings().stats()
     }
 
+@router.get("/knowledge/stats")
+async def get_knowledge_stats():
+    """Version, load time and memory footprint of the shared knowledge base"""
+    return get_knowledge_base().metrics()
+
+@router.get("/agents/timings")
+async def get_agent_timings():
+    """Per-stage latency of agent requests (cache, context, serialize, render, llm, format)"""
+    return get_stage_timings().stats()
+
+@router.get("/cache/stats")
+async def get_cache_stats():
+    """Hit/miss counters of the shared agent response cache"""
+    return get_response_cache().stats()
+
 @router.post("/agents/clear-memory")
 async def clear_agents_memory():
     """Clear conversation memory for all agents"""
@@ -106,17 +206,31 @@ async def clear_agents_memory():
     dashboard_agent.clear_memory()
     return {"message": "Memory cleared for all agents"}
 
+@router.get("/sessions/{session_id}")
+async def get_session_history(session_id: str):
+    """Conversation memory of one session"""
+    return {"session_id": session_id, "messages": get_session_store().get_messages(session_id)}
+
+@router.delete("/sessions/{session_id}")
+async def clear_session(session_id: str):
+    """Forget one session's conversation memory"""
+    get_session_store().clear(session_id)
+    return {"message": f"Memory cleared for session {session_id}"}
+
 @router.post("/analyze-engagement")
 async def analyze_engagement_claim(request: ChatRequest):
     """Analyze user's engagement claims against real data benchmarks"""
     try:
-        response = business_agent.analyze_user_engagement_claim(request.query, request.context)
+        response = await business_agent.aanalyze_user_engagement_claim(request.query, request.context, request.session_id)
         return ChatResponse(
             response=response,
             agent_type="business",
             context_used=request.context is not None
         )
+    except AgentOverloadedError as e:
+        raise overloaded(e)
     except Exception as e:
+        logger.exception("Chat request failed")
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/benchmarks")
@@ -126,4 +240,5 @@ async def get_benchmarks():
         benchmarks = business_agent.knowledge_base.get_benchmark_data()
         return {"benchmarks": benchmarks}
     except Exception as e:
+        logger.exception("Chat request failed")
         raise HTTPException(status_code=500, detail=str(e))
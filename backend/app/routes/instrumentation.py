@@ -0,0 +1,93 @@
+import logging
+import os
+import re
+import time
+import uuid
+
+from fastapi import FastAPI, Request
+from fastapi.responses import PlainTextResponse
+
+from app.services.knowledge_base import get_knowledge_base
+from app.services.llm_pool import get_llm_pool
+from app.services.metrics import HTTP_LATENCY, HTTP_REQUESTS, REGISTRY, request_id_var
+from app.services.response_cache import get_response_cache
+from app.services.session_store import get_session_store
+
+logger = logging.getLogger("loreai")
+
+# Client-supplied trace ids are echoed only if they look like ids
+REQUEST_ID_PATTERN = re.compile(r"[\w.:-]{1,128}")
+
+class RequestIdFilter(logging.Filter):
+    """Adds the current request's trace id to every log record"""
+    
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get()
+        return True
+
+def configure_logging():
+    """Log to stderr with the trace id of the request being served (LOG_LEVEL sets the level)"""
+    handler = logging.StreamHandler()
+    handler.addFilter(RequestIdFilter())
+    handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s [%(request_id)s] %(name)s: %(message)s"))
+    root = logging.getLogger("app")
+    for target in (root, logger):
+        if not target.handlers:
+            target.addHandler(handler)
+        target.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+        target.propagate = False
+
+def register_component_metrics():
+    """Gauges and counters read from the shared services at scrape time"""
+    REGISTRY.callback("llm_pool_active", "LLM calls currently running", lambda: get_llm_pool().stats()["active"])
+    REGISTRY.callback("llm_pool_waiting", "Callers queued for an LLM slot", lambda: get_llm_pool().stats()["waiting"])
+    REGISTRY.callback("llm_pool_shed_total", "LLM calls rejected by the pool (queue full or wait timed out)",
+                      lambda: {("queue_full",): get_llm_pool().stats()["rejected"],
+                               ("timeout",): get_llm_pool().stats()["timed_out"]},
+                      ("reason",), kind="counter")
+    REGISTRY.callback("response_cache_entries", "Responses held in the cache",
+                      lambda: get_response_cache().stats()["entries"])
+    REGISTRY.callback("sessions_active", "Live conversation sessions", lambda: get_session_store().stats()["sessions"])
+    REGISTRY.callback("knowledge_base_memory_bytes", "Approximate memory of the loaded knowledge base",
+                      lambda: get_knowledge_base().metrics().get("memory_bytes", 0))
+    REGISTRY.callback("knowledge_base_index_chunks", "Chunks in the vector retrieval index",
+                      lambda: get_knowledge_base().metrics().get("index_chunks", 0))
+
+async def metrics_endpoint():
+    """Prometheus scrape target"""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+def instrument_app(app: FastAPI, header: str = None):
+    """Add request tracing/metrics middleware and a /metrics route to an app.
+
+    Every response carries a trace id header (REQUEST_ID_HEADER, default
+    X-Request-ID): the caller's own id if it sent a valid one, otherwise a new
+    one. The same id is attached to log lines written while serving it.
+    """
+    header = header or os.getenv("REQUEST_ID_HEADER", "X-Request-ID")
+    configure_logging()
+    register_component_metrics()
+    
+    @app.middleware("http")
+    async def trace_requests(request: Request, call_next):
+        incoming = request.headers.get(header, "")
+        request_id = incoming if REQUEST_ID_PATTERN.fullmatch(incoming) else uuid.uuid4().hex[:16]
+        token = request_id_var.set(request_id)
+        start = time.perf_counter()
+        status = 500
+        try:
+            response = await call_next(request)
+            status = response.status_code
+            response.headers[header] = request_id
+            return response
+        except Exception:
+            logger.exception("Unhandled error on %s %s", request.method, request.url.path)
+            raise
+        finally:
+            # Label by route template, not raw path, to keep cardinality bounded
+            route = getattr(request.scope.get("route"), "path", "unmatched")
+            HTTP_REQUESTS.inc(method=request.method, route=route, status=str(status))
+            HTTP_LATENCY.observe(time.perf_counter() - start, method=request.method, route=route)
+            request_id_var.reset(token)
+    
+    app.add_api_route("/metrics", metrics_endpoint, methods=["GET"], include_in_schema=False)
@@ -0,0 +1,63 @@
+import os
+import time
+from collections import Counter
+from typing import Any, Dict, List
+
+from fastapi import HTTPException
+
+from app.services.spam_scorer import SPAM_SCORING_AVAILABLE, get_spam_scorer
+
+def validate_comment(comment: Any, index: int = None):
+    where = "Comment" if index is None else f"Comment {index}"
+    if isinstance(comment, str):
+        return
+    if isinstance(comment, dict) and isinstance(comment.get("textOriginal", comment.get("text")), str):
+        return
+    raise HTTPException(status_code=400, detail=f"{where} must be a string or an object with textOriginal")
+
+def validate_comments(comments: List[Any]):
+    """Reject malformed, empty or oversized batches before any work is done"""
+    max_items = int(os.getenv("SPAM_MAX_BATCH", "10000"))
+    if not isinstance(comments, list) or not comments:
+        raise HTTPException(status_code=400, detail="Provide a non-empty list of comments")
+    if len(comments) > max_items:
+        raise HTTPException(status_code=413, detail=f"Batch has {len(comments)} comments; the limit is {max_items}")
+    for index, comment in enumerate(comments):
+        validate_comment(comment, index)
+
+def load_scorer():
+    """The shared scorer, or 503 if the model or its dependencies are missing"""
+    if not SPAM_SCORING_AVAILABLE:
+        raise HTTPException(status_code=503, detail="Spam scoring dependencies are not installed")
+    try:
+        return get_spam_scorer()
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=f"Spam model is not available: {e}")
+
+async def score_request(request: Dict[str, Any]) -> Dict[str, Any]:
+    """``{"comment": ...}`` or ``{"comments": [...]}``; comments are strings or objects with
+    textOriginal and optionally likeCount, parentCommentId and publishedAt"""
+    scorer = load_scorer()
+    include_features = bool(request.get("include_features", False))
+    
+    if "comments" in request:
+        comments = request["comments"]
+        validate_comments(comments)
+        start = time.perf_counter()
+        results = await scorer.ascore(comments, include_features)
+        labels = Counter(result["label"] for result in results)
+        return {
+            "results": results,
+            "summary": {
+                "comments": len(results),
+                "spam": labels["spam"],
+                "quality": labels["quality"],
+                "uncertain": labels["uncertain"],
+                "elapsed_ms": round((time.perf_counter() - start) * 1000, 2)
+            },
+            "status": "success"
+        }
+    
+    comment = request.get("comment", request.get("text"))
+    validate_comment(comment)
+    return {"result": await scorer.score_one(comment, include_features), "status": "success"}
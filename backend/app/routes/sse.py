@@ -0,0 +1,50 @@
+import json
+from typing import Any, AsyncIterator, Dict, Optional
+from fastapi.responses import StreamingResponse
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "X-Accel-Buffering": "no"  # stop nginx-style proxies from buffering the stream
+}
+
+def sse_event(event: str, data: Dict[str, Any]) -> str:
+    """Encode one Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+async def stream_agent_response(agent, query: str, context: Optional[Dict[str, Any]] = None,
+                                agent_type: Optional[str] = None,
+                                session_id: Optional[str] = None) -> StreamingResponse:
+    """Stream an agent answer as SSE ``delta`` events followed by a ``done`` event.
+
+    The first chunk is awaited before the response starts, so an
+    AgentOverloadedError still reaches the caller as a normal exception
+    (and can become a 503) instead of breaking an already-open stream.
+    """
+    chunks = agent.astream_query(query, context, session_id)
+    try:
+        first = await chunks.__anext__()
+    except StopAsyncIteration:
+        first = ""
+    
+    async def events() -> AsyncIterator[str]:
+        parts = [first]
+        if first:
+            yield sse_event("delta", {"delta": first})
+        async for chunk in chunks:
+            parts.append(chunk)
+            yield sse_event("delta", {"delta": chunk})
+        done = {"response": "".join(parts), "status": "success"}
+        if agent_type:
+            done["agent_type"] = agent_type
+        yield sse_event("done", done)
+    
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+def stream_static_response(payload: Dict[str, Any]) -> StreamingResponse:
+    """Send an already-complete response over the same SSE protocol"""
+    async def events() -> AsyncIterator[str]:
+        if payload.get("response"):
+            yield sse_event("delta", {"delta": payload["response"]})
+        yield sse_event("done", payload)
+    
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
@@ -0,0 +1,78 @@
+import os
+import time
+from collections import Counter
+from typing import Any, Dict, List
+
+from fastapi import HTTPException
+
+from app.services.topic_inference import TOPIC_INFERENCE_AVAILABLE, get_topic_inference
+
+def validate_document(document: Any, index: int = None):
+    where = "Document" if index is None else f"Document {index}"
+    if isinstance(document, str):
+        return
+    if isinstance(document, dict):
+        comments = document.get("comments", [])
+        if isinstance(comments, list) and all(c is None or isinstance(c, str) for c in comments):
+            return
+        raise HTTPException(status_code=400, detail=f"{where}: comments must be a list of strings")
+    raise HTTPException(status_code=400, detail=f"{where} must be a string or an object with title, "
+                                                "description and/or comments")
+
+def validate_documents(documents: List[Any]):
+    """Reject malformed, empty or oversized batches before any work is done"""
+    max_items = int(os.getenv("TOPIC_MAX_BATCH", "10000"))
+    if not isinstance(documents, list) or not documents:
+        raise HTTPException(status_code=400, detail="Provide a non-empty list of documents")
+    if len(documents) > max_items:
+        raise HTTPException(status_code=413, detail=f"Batch has {len(documents)} documents; the limit is {max_items}")
+    for index, document in enumerate(documents):
+        validate_document(document, index)
+
+def load_topic_inference():
+    """The shared topic model, or 503 if the model or its dependencies are missing"""
+    if not TOPIC_INFERENCE_AVAILABLE:
+        raise HTTPException(status_code=503, detail="Topic inference dependencies are not installed")
+    try:
+        return get_topic_inference()
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=f"Topic model is not available: {e}")
+
+def _top_keywords(request: Dict[str, Any]):
+    value = request.get("top_keywords")
+    if value is None:
+        return None
+    if not isinstance(value, int) or isinstance(value, bool) or value < 0:
+        raise HTTPException(status_code=400, detail="top_keywords must be a non-negative integer")
+    return value
+
+async def infer_request(request: Dict[str, Any]) -> Dict[str, Any]:
+    """``{"document": ...}`` or ``{"documents": [...]}``; documents are pooled texts, or videos as objects with
+    videoId, title, description and comments (a list of comment texts)"""
+    service = load_topic_inference()
+    top_keywords = _top_keywords(request)
+    include_distribution = bool(request.get("include_distribution", False))
+    
+    if "documents" in request:
+        documents = request["documents"]
+        validate_documents(documents)
+        start = time.perf_counter()
+        results = await service.ainfer(documents, top_keywords, include_distribution)
+        elapsed = time.perf_counter() - start
+        topics = Counter(result["dominant_topic"] for result in results)
+        return {
+            "results": results,
+            "summary": {
+                "documents": len(results),
+                "topics": {str(topic): count for topic, count in sorted(topics.items())},
+                "unassigned": topics[-1],
+                "elapsed_ms": round(elapsed * 1000, 2),
+                "ms_per_document": round(elapsed * 1000 / len(results), 4)
+            },
+            "status": "success"
+        }
+    
+    document = request.get("document", request.get("text"))
+    validate_document(document)
+    results = await service.ainfer([document], top_keywords, include_distribution)
+    return {"result": results[0], "status": "success"}
@@ -0,0 +1,195 @@
+import json
+import math
+import os
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+# Words that carry no signal when matching a query against knowledge sections
+STOPWORDS = {
+    "a", "about", "an", "and", "are", "as", "at", "be", "by", "can", "do", "does", "for", "from",
+    "give", "how", "i", "in", "is", "it", "me", "my", "of", "on", "or", "our", "show", "tell",
+    "that", "the", "this", "to", "us", "we", "what", "which", "who", "why", "with", "you", "your"
+}
+
+WORD_PATTERN = re.compile(r"[a-z0-9]+")
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token for English/JSON)"""
+    return math.ceil(len(text) / 4)
+
+def compact_json(content: Any) -> str:
+    """Serialize without indentation or padding to keep prompts small"""
+    return json.dumps(content, separators=(",", ":"), ensure_ascii=False, default=str)
+
+def query_terms(text: str) -> List[str]:
+    """Lowercased content words of a query, with naive plural folding"""
+    terms = []
+    for word in WORD_PATTERN.findall(text.lower()):
+        if word in STOPWORDS or len(word) < 2:
+            continue
+        if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        terms.append(word)
+    return terms
+
+@dataclass
+class KnowledgeSection:
+    """One named block of knowledge that can be placed in a prompt"""
+    name: str
+    content: Any
+    keywords: List[str] = field(default_factory=list)
+    pinned: bool = False  # always included first, regardless of the query
+    priority: int = 100   # tie-breaker when scores are equal (lower wins)
+    # Compact JSON of the content, one fragment per item for lists. Filled on first
+    # use, so sections shared across queries serialize once per knowledge-base version
+    fragments: Optional[List[str]] = field(default=None, repr=False, compare=False)
+    
+    def serialized(self) -> List[str]:
+        """JSON fragments of the content (computed once per section)"""
+        if self.fragments is None:
+            if isinstance(self.content, list):
+                self.fragments = [compact_json(item) for item in self.content]
+            else:
+                self.fragments = [compact_json(self.content)]
+        return self.fragments
+    
+    def to_json(self, keep: Optional[int] = None) -> str:
+        """compact_json of the content, or of its first ``keep`` items for a list"""
+        fragments = self.serialized()
+        if not isinstance(self.content, list):
+            return fragments[0]
+        return "[" + ",".join(fragments[:keep]) + "]"
+
+@dataclass
+class AssembledContext:
+    """Prompt-ready knowledge plus a per-section account of the token budget"""
+    text: str
+    tokens_used: int
+    budget: int
+    sections: List[Dict[str, Any]]
+    
+    @property
+    def section_tokens(self) -> Dict[str, int]:
+        """Tokens spent on each included section"""
+        return {s["name"]: s["tokens"] for s in self.sections if s["included"]}
+
+class ContextBuilder:
+    """Ranks knowledge sections against a query and packs them into a token budget"""
+    
+    def __init__(self, token_budget: Optional[int] = None, default_sections: int = 3,
+                 min_relative_score: float = 0.25):
+        self.token_budget = token_budget or int(os.getenv("KB_CONTEXT_TOKEN_BUDGET", "1200"))
+        self.default_sections = default_sections
+        # Sections scoring below this fraction of the best match are treated as noise
+        self.min_relative_score = min_relative_score
+        self._vocabulary_cache: Dict[str, Any] = {}
+    
+    def score_sections(self, query: str, sections: List[KnowledgeSection]) -> Dict[str, float]:
+        """TF-IDF style relevance of each section to the query terms.
+
+        Matches against a section's curated keywords count three times as much
+        as matches in its serialized content.
+        """
+        terms = set(query_terms(query))
+        if not terms:
+            return {section.name: 0.0 for section in sections}
+        
+        vocabularies = {section.name: self._vocabulary(section) for section in sections}
+        
+        scores = {}
+        n = len(sections)
+        for section in sections:
+            keyword_words, content_words = vocabularies[section.name]
+            score = 0.0
+            for term in terms:
+                df = sum(1 for kw, cw in vocabularies.values() if term in kw or term in cw)
+                if not df:
+                    continue
+                idf = math.log(1 + n / df)
+                if term in keyword_words:
+                    score += 3 * idf
+                elif term in content_words:
+                    score += idf
+            scores[section.name] = score
+        return scores
+    
+    def _vocabulary(self, section: KnowledgeSection):
+        """Keyword and content term sets of a section, cached while its content object is unchanged"""
+        cached = self._vocabulary_cache.get(section.name)
+        if cached is not None and cached[0] is section.content:
+            return cached[1]
+        content_words = set(query_terms(section.to_json()))
+        keyword_words = set(query_terms(" ".join(section.keywords + [section.name.replace("_", " ")])))
+        # Holding the content reference keeps the identity check above sound
+        self._vocabulary_cache[section.name] = (section.content, (keyword_words, content_words))
+        return keyword_words, content_words
+    
+    def build(self, query: str, sections: List[KnowledgeSection]) -> AssembledContext:
+        """Select the most relevant sections that fit in the budget"""
+        scores = self.score_sections(query, sections)
+        pinned = [s for s in sections if s.pinned]
+        ranked = sorted(
+            (s for s in sections if not s.pinned),
+            key=lambda s: (-scores[s.name], s.priority)
+        )
+        
+        # Nothing matched: fall back to the highest-priority general sections
+        if not any(scores[s.name] > 0 for s in ranked):
+            ranked = sorted(ranked, key=lambda s: s.priority)[:self.default_sections]
+        else:
+            cutoff = max(scores[s.name] for s in ranked) * self.min_relative_score
+            ranked = [s for s in ranked if scores[s.name] > 0 and scores[s.name] >= cutoff]
+        
+        chosen_ids = {id(s) for s in pinned + ranked}
+        blocks: List[str] = []
+        report: List[Dict[str, Any]] = []
+        used = 0
+        
+        for section in pinned + ranked:
+            block, truncated = self._fit_section(section, self.token_budget - used)
+            tokens = estimate_tokens(block) if block else 0
+            included = bool(block)
+            if included:
+                blocks.append(block)
+                used += tokens
+            report.append({
+                "name": section.name,
+                "score": round(scores.get(section.name, 0.0), 3),
+                "tokens": tokens,
+                "included": included,
+                "truncated": truncated
+            })
+        
+        for section in sections:
+            if id(section) not in chosen_ids:
+                report.append({
+                    "name": section.name,
+                    "score": round(scores.get(section.name, 0.0), 3),
+                    "tokens": 0,
+                    "included": False,
+                    "truncated": False
+                })
+        
+        return AssembledContext(text="\n".join(blocks), tokens_used=used,
+                                budget=self.token_budget, sections=report)
+    
+    def _fit_section(self, section: KnowledgeSection, remaining: int):
+        """Render a section within ``remaining`` tokens, trimming list items if needed"""
+        block = self._render(section)
+        if estimate_tokens(block) <= remaining:
+            return block, False
+        
+        # Long lists (samples, trends, leaderboards) degrade gracefully to their head;
+        # the longest head that fits is found from fragment lengths without re-serializing
+        if isinstance(section.content, list):
+            lengths = [len(fragment) for fragment in section.serialized()]
+            size = len(block)
+            for keep in range(len(lengths) - 1, 0, -1):
+                size -= lengths[keep] + 1  # the item and its separating comma
+                if math.ceil(size / 4) <= remaining:  # estimate_tokens of the trimmed block
+                    return self._render(section, keep), True
+        return "", False
+    
+    def _render(self, section: KnowledgeSection, keep: Optional[int] = None) -> str:
+        return f"[{section.name}] {section.to_json(keep)}"
@@ -1,8 +1,29 @@
+import hashlib
 import json
+import logging
 import os
-from typing import Dict, List, Any
+import sys
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, List, Any, Optional, Tuple
 from pathlib import Path
 
+from app.services.context_builder import AssembledContext, ContextBuilder, KnowledgeSection, compact_json
+from app.services.metrics import KB_LOAD_LATENCY, KB_LOADS
+
+# Vector retrieval needs numpy; without it the service falls back to section ranking only
+try:
+    from app.services.vector_index import KnowledgeChunk, VectorIndex
+    VECTOR_INDEX_AVAILABLE = True
+except ImportError:
+    VECTOR_INDEX_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_INDEX_DIR = Path(__file__).resolve().parent.parent.parent / "cache" / "kb_index"
+
 # Temporarily disable pandas for deployment
 try:
     import pandas as pd
@@ -10,14 +31,161 @@ try:
 except ImportError:
     PANDAS_AVAILABLE = False
 
+# Curated relevance hints for each knowledge section, on top of its own content
+SECTION_KEYWORDS = {
+    "key_metrics": ["overview", "summary", "total", "metrics", "dashboard"],
+    "topic_distribution": ["topic", "topics", "keyword", "keywords", "probability", "category", "content", "theme", "lda",
+                           "hair", "makeup", "skincare", "leaderboard"],
+    "top_videos": ["video", "videos", "views", "viral", "performing", "popular", "comments"],
+    "spam_comment_samples": ["spam", "caps", "emoji", "repetition", "fake", "bot", "detection", "examples"],
+    "quality_comment_samples": ["quality", "genuine", "authentic", "examples", "feedback", "sample"],
+    "comment_samples": ["spam", "quality", "uncertain", "examples", "sample", "confidence", "classification"],
+    "engagement_trends": ["trend", "trends", "monthly", "month", "growth", "2024", "over time", "timeline"],
+    "model_performance": ["model", "coherence", "accuracy", "gmm", "lda", "clustering", "optimization", "performance"],
+    "technical_architecture": ["tech", "stack", "architecture", "react", "fastapi", "langchain", "gemini", "built", "rag"],
+    "video_performance_analysis": ["duration", "length", "tags", "tag", "engagement", "views", "content", "topic"],
+    "engagement_correlations": ["engagement", "correlation", "likes", "views", "comments", "relationship"],
+    "median_views_by_duration": ["duration", "length", "median", "shorts", "time", "long"],
+    "like_to_view_ratio_by_day": ["publish", "day", "weekday", "schedule", "timing", "when", "ratio", "saturday"],
+    "top_channels": ["channel", "channels", "creator", "creators", "competitor"],
+    "view_distribution_by_language": ["language", "languages", "english", "hindi", "audience", "region"],
+    "view_distribution_by_topic": ["topic", "category", "content", "fashion", "lifestyle"],
+    "high_performing_title_words": ["title", "titles", "word", "words", "seo", "keyword", "naming"],
+    "optimal_publishing_hours": ["publish", "hour", "hours", "time", "timing", "schedule", "when", "utc", "post"],
+    "viral_videos": ["viral", "virality", "video", "videos", "top"]
+}
+
+def deep_sizeof(obj: Any) -> int:
+    """Approximate memory held by a parsed JSON structure"""
+    seen = set()
+    stack = [obj]
+    total = 0
+    while stack:
+        item = stack.pop()
+        if id(item) in seen:
+            continue
+        seen.add(id(item))
+        total += sys.getsizeof(item)
+        if isinstance(item, dict):
+            stack.extend(item.keys())
+            stack.extend(item.values())
+        elif isinstance(item, (list, tuple)):
+            stack.extend(item)
+    return total
+
+@dataclass(frozen=True)
+class KnowledgeSnapshot:
+    """One loaded version of the knowledge base.
+
+    Snapshots are never modified after they are built; a reload builds a new
+    one and swaps the reference, so a request that grabbed a snapshot keeps a
+    consistent view even while the file is being reloaded.
+    """
+    version: str = ""
+    path: Optional[str] = None
+    stamp: Optional[Tuple[int, int]] = None
+    frontend_data: Dict[str, Any] = field(default_factory=dict)
+    knowledge_base: Dict[str, Any] = field(default_factory=dict)
+    vector_index: Any = None
+    loaded_at: float = 0.0
+    load_seconds: float = 0.0
+    file_bytes: int = 0
+    memory_bytes: int = 0
+    # Structures derived from the data, memoized once per snapshot
+    derived: Dict[str, Any] = field(default_factory=dict, compare=False, repr=False)
+
 class KnowledgeBaseService:
     """Service to manage the RAG knowledge base with frontend data and analysis documentation"""
     
-    def __init__(self):
-        self.knowledge_base = {}
+    def __init__(self, frontend_data_path: str = None):
         self.analysis_documentation = self._load_analysis_documentation()
-        self.frontend_data = {}
+        self.context_builder = ContextBuilder()
+        self.retrieval_k = int(os.getenv("KB_RETRIEVAL_K", "6"))
+        self.reload_check_interval = float(os.getenv("KB_RELOAD_CHECK_SECONDS", "2"))
+        self.data_path = frontend_data_path
+        self._snapshot: Optional[KnowledgeSnapshot] = None
+        self._lock = threading.Lock()
+        self._last_checked = 0.0
+        self._failed_stamp = None
+        self._loads = 0
+        self._failed_loads = 0
+    
+    @property
+    def snapshot(self) -> KnowledgeSnapshot:
+        """Current snapshot, loaded on first use and reloaded when the file changes on disk"""
+        snapshot = self._snapshot
+        if snapshot is None:
+            with self._lock:
+                if self._snapshot is None:
+                    self._swap(self._load_snapshot(self._resolve_data_path(), "initial"))
+            return self._snapshot
         
+        now = time.monotonic()
+        if snapshot.path and now - self._last_checked >= self.reload_check_interval:
+            self._last_checked = now
+            try:
+                stamp = self._file_stamp(snapshot.path)
+            except OSError:
+                stamp = snapshot.stamp
+            # A file that failed to parse is retried only once it changes again
+            if stamp != snapshot.stamp and stamp != self._failed_stamp:
+                with self._lock:
+                    # Another request may have reloaded while we waited for the lock
+                    if self._snapshot is snapshot:
+                        print(f"🔄 {snapshot.path} changed, reloading knowledge base")
+                        reloaded = self._load_snapshot(snapshot.path, "file_change")
+                        self._failed_stamp = None if reloaded else stamp
+                        self._swap(reloaded)
+        return self._snapshot
+    
+    @property
+    def frontend_data(self) -> Dict[str, Any]:
+        return self.snapshot.frontend_data
+    
+    @property
+    def knowledge_base(self) -> Dict[str, Any]:
+        return self.snapshot.knowledge_base
+    
+    @property
+    def vector_index(self):
+        return self.snapshot.vector_index
+    
+    @property
+    def version(self) -> str:
+        return self.snapshot.version
+    
+    def current_version(self) -> str:
+        """Content hash of the loaded comprehensive_analysis.json (reloads it first if it changed)"""
+        return self.snapshot.version
+    
+    def _swap(self, snapshot: Optional[KnowledgeSnapshot]):
+        """Publish a freshly built snapshot; a failed load keeps serving the previous one"""
+        if snapshot is not None:
+            self._snapshot = snapshot
+        elif self._snapshot is None:
+            self._snapshot = KnowledgeSnapshot(knowledge_base=self._extract_knowledge_base({}))
+        self._last_checked = time.monotonic()
+    
+    def metrics(self) -> Dict[str, Any]:
+        """Load-time, size and version metrics of the current snapshot"""
+        snapshot = self._snapshot
+        if snapshot is None:
+            return {"loaded": False, "path": self.data_path, "loads": self._loads, "failed_loads": self._failed_loads}
+        index = snapshot.vector_index
+        return {
+            "loaded": True,
+            "version": snapshot.version,
+            "path": snapshot.path,
+            "loaded_at": snapshot.loaded_at,
+            "load_seconds": round(snapshot.load_seconds, 4),
+            "file_bytes": snapshot.file_bytes,
+            "memory_bytes": snapshot.memory_bytes,
+            "index_chunks": len(index) if index is not None else 0,
+            "index_bytes": int(index.vectors.nbytes) if index is not None else 0,
+            "loads": self._loads,
+            "failed_loads": self._failed_loads
+        }
+    
     def _load_analysis_documentation(self) -> Dict[str, Any]:
         """Load the analysis documentation provided by the user"""
         return {
@@ -109,64 +277,105 @@ class KnowledgeBaseService:
             ]
         }
     
+    def _resolve_data_path(self) -> Optional[str]:
+        """Locate comprehensive_analysis.json once; later loads reuse the path"""
+        if self.data_path:
+            return self.data_path
+        
+        # Try to find the frontend data folder (where it actually is)
+        current_dir = Path(__file__).parent
+        possible_paths = [
+            current_dir / "../../frontend/src/data/comprehensive_analysis.json",
+            current_dir / "../../../frontend/src/data/comprehensive_analysis.json",
+            Path("./frontend/src/data/comprehensive_analysis.json"),
+            Path("../frontend/src/data/comprehensive_analysis.json"),
+            # Fallback to old path
+            current_dir / "../../frontend_data/comprehensive_analysis.json",
+            current_dir / "../../../frontend_data/comprehensive_analysis.json"
+        ]
+        
+        for path in possible_paths:
+            if path.exists():
+                self.data_path = str(path.resolve())
+                print(f"✅ Found frontend data at: {self.data_path}")
+                break
+        return self.data_path
+    
     def load_frontend_data(self, frontend_data_path: str = None) -> Dict[str, Any]:
         """Load frontend data from the comprehensive_analysis.json file - EXACT same data as frontend"""
-        if frontend_data_path is None:
-            # Try to find the frontend data folder (where it actually is)
-            current_dir = Path(__file__).parent
-            possible_paths = [
-                current_dir / "../../frontend/src/data/comprehensive_analysis.json",
-                current_dir / "../../../frontend/src/data/comprehensive_analysis.json",
-                Path("./frontend/src/data/comprehensive_analysis.json"),
-                Path("../frontend/src/data/comprehensive_analysis.json"),
-                # Fallback to old path
-                current_dir / "../../frontend_data/comprehensive_analysis.json",
-                current_dir / "../../../frontend_data/comprehensive_analysis.json"
-            ]
-            
-            for path in possible_paths:
-                if path.exists():
-                    frontend_data_path = str(path)
-                    print(f"✅ Found frontend data at: {path}")
-                    break
-        
+        if frontend_data_path is not None:
+            self.data_path = frontend_data_path
+        with self._lock:
+            self._swap(self._load_snapshot(self._resolve_data_path(), "manual"))
+        return self._snapshot.frontend_data
+    
+    def _load_snapshot(self, frontend_data_path: Optional[str], trigger: str = "manual") -> Optional[KnowledgeSnapshot]:
+        """Parse the file and build everything derived from it; None if it cannot be loaded"""
         if not frontend_data_path or not os.path.exists(frontend_data_path):
-            print(f"Warning: Frontend data file not found at {frontend_data_path}")
-            return {}
+            logger.warning("Frontend data file not found at %s", frontend_data_path)
+            self._failed_loads += 1
+            KB_LOADS.inc(trigger=trigger, result="failed")
+            return None
         
+        start = time.perf_counter()
         try:
-            with open(frontend_data_path, 'r', encoding='utf-8') as f:
-                self.frontend_data = json.load(f)
-            
-            # Extract key metrics for easy access - EXACT same data as frontend
-            self.knowledge_base = {
-                "total_comments": self.frontend_data.get("comment_statistics", {}).get("total_comments", 0),
-                "total_videos": self.frontend_data.get("video_statistics", {}).get("total_videos", 0),
-                "quality_comments": self.frontend_data.get("comment_statistics", {}).get("quality_comments", 0),
-                "spam_comments": self.frontend_data.get("comment_statistics", {}).get("spam_comments", 0),
-                "uncertain_comments": self.frontend_data.get("comment_statistics", {}).get("uncertain_comments", 0),
-                "coherence_score": self.frontend_data.get("topic_modeling", {}).get("coherence_score", 0),
-                "optimal_topics": self.frontend_data.get("topic_modeling", {}).get("optimal_topics", 0),
-                "top_topics": self.frontend_data.get("topic_statistics", {}).get("top_topics", []),
-                "top_videos": self.frontend_data.get("video_statistics", {}).get("top_by_comments", []),
-                "comment_samples": self.frontend_data.get("comment_samples", {}),
-                "topic_distribution": self.frontend_data.get("topic_statistics", {}).get("distribution", []),
-                # Add ALL frontend component data
-                "frontend_topic_distribution": self._get_frontend_topic_data(),
-                "quality_metrics": self._get_quality_metrics(),
-                "top_videos_by_comments": self._get_top_videos_data(),
-                "spam_comments_detailed": self._get_spam_comments_data(),
-                "quality_comments_detailed": self._get_quality_comments_data(),
-                "engagement_trends": self._get_engagement_trends(),
-                "model_performance_data": self._get_model_performance_data(),
-                "technical_architecture": self._get_technical_architecture()
-            }
-            
-            return self.frontend_data
-            
-        except Exception as e:
-            print(f"Error loading frontend data: {e}")
-            return {}
+            stamp = self._file_stamp(frontend_data_path)
+            with open(frontend_data_path, 'rb') as f:
+                raw = f.read()
+            frontend_data = json.loads(raw.decode('utf-8'))
+            knowledge_base = self._extract_knowledge_base(frontend_data)
+            vector_index = self._build_vector_index(frontend_data, knowledge_base)
+        except Exception:
+            logger.exception("Error loading frontend data from %s", frontend_data_path)
+            self._failed_loads += 1
+            KB_LOADS.inc(trigger=trigger, result="failed")
+            return None
+        
+        self._loads += 1
+        KB_LOADS.inc(trigger=trigger, result="success")
+        KB_LOAD_LATENCY.observe(time.perf_counter() - start)
+        return KnowledgeSnapshot(
+            version=hashlib.sha1(raw).hexdigest()[:12],
+            path=frontend_data_path,
+            stamp=stamp,
+            frontend_data=frontend_data,
+            knowledge_base=knowledge_base,
+            vector_index=vector_index,
+            loaded_at=time.time(),
+            load_seconds=time.perf_counter() - start,
+            file_bytes=len(raw),
+            memory_bytes=deep_sizeof(frontend_data) + deep_sizeof(knowledge_base)
+        )
+    
+    def _extract_knowledge_base(self, frontend_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Extract key metrics for easy access - EXACT same data as frontend"""
+        return {
+            "total_comments": frontend_data.get("comment_statistics", {}).get("total_comments", 0),
+            "total_videos": frontend_data.get("video_statistics", {}).get("total_videos", 0),
+            "quality_comments": frontend_data.get("comment_statistics", {}).get("quality_comments", 0),
+            "spam_comments": frontend_data.get("comment_statistics", {}).get("spam_comments", 0),
+            "uncertain_comments": frontend_data.get("comment_statistics", {}).get("uncertain_comments", 0),
+            "coherence_score": frontend_data.get("topic_modeling", {}).get("coherence_score", 0),
+            "optimal_topics": frontend_data.get("topic_modeling", {}).get("optimal_topics", 0),
+            "top_topics": frontend_data.get("topic_statistics", {}).get("top_topics", []),
+            "top_videos": frontend_data.get("video_statistics", {}).get("top_by_comments", []),
+            "comment_samples": frontend_data.get("comment_samples", {}),
+            "topic_distribution": frontend_data.get("topic_statistics", {}).get("distribution", []),
+            # Add ALL frontend component data
+            "frontend_topic_distribution": self._get_frontend_topic_data(),
+            "quality_metrics": self._get_quality_metrics(),
+            "top_videos_by_comments": self._get_top_videos_data(),
+            "spam_comments_detailed": self._get_spam_comments_data(),
+            "quality_comments_detailed": self._get_quality_comments_data(),
+            "engagement_trends": self._get_engagement_trends(),
+            "model_performance_data": self._get_model_performance_data(),
+            "technical_architecture": self._get_technical_architecture()
+        }
+    
+    @staticmethod
+    def _file_stamp(path: str) -> Tuple[int, int]:
+        stat = os.stat(path)
+        return stat.st_mtime_ns, stat.st_size
     
     def _get_frontend_topic_data(self) -> List[Dict]:
         """Get the EXACT topic distribution data with detailed keywords that frontend displays"""
@@ -398,6 +607,201 @@ class KnowledgeBaseService:
         
         return context
     
+    def get_knowledge_sections(self, current_dashboard_state: Dict[str, Any] = None,
+                               snapshot: KnowledgeSnapshot = None) -> List[KnowledgeSection]:
+        """Split the knowledge base into named sections for relevance-ranked assembly"""
+        snapshot = snapshot or self.snapshot
+        # The data sections only change with the snapshot, so every query shares one list
+        base_sections = snapshot.derived.get("sections")
+        if base_sections is None:
+            base_sections = self._build_sections(snapshot.knowledge_base)
+            snapshot.derived["sections"] = base_sections
+        
+        sections = list(base_sections)
+        if current_dashboard_state:
+            sections.append(KnowledgeSection("current_state", current_dashboard_state, pinned=True, priority=0))
+        return sections
+    
+    def _build_sections(self, kb: Dict[str, Any]) -> List[KnowledgeSection]:
+        """Knowledge sections that depend only on the loaded data"""
+        sections = [
+            KnowledgeSection("key_metrics", {
+                **self._get_quality_metrics(),
+                **{key: kb[key] for key in (
+                    "total_comments", "total_videos", "quality_comments", "spam_comments",
+                    "uncertain_comments", "coherence_score", "optimal_topics"
+                ) if kb.get(key)}
+            }, SECTION_KEYWORDS["key_metrics"], pinned=True, priority=0),
+            KnowledgeSection("topic_distribution", kb.get("frontend_topic_distribution", []),
+                             SECTION_KEYWORDS["topic_distribution"], priority=1),
+            KnowledgeSection("top_videos", kb.get("top_videos") or kb.get("top_videos_by_comments", []),
+                             SECTION_KEYWORDS["top_videos"], priority=2),
+            KnowledgeSection("comment_samples", kb.get("comment_samples", {}),
+                             SECTION_KEYWORDS["comment_samples"], priority=23),
+            KnowledgeSection("model_performance", kb.get("model_performance_data", {}),
+                             SECTION_KEYWORDS["model_performance"], priority=3),
+            KnowledgeSection("spam_comment_samples", kb.get("spam_comments_detailed", []),
+                             SECTION_KEYWORDS["spam_comment_samples"], priority=20),
+            KnowledgeSection("quality_comment_samples", kb.get("quality_comments_detailed", []),
+                             SECTION_KEYWORDS["quality_comment_samples"], priority=21),
+            KnowledgeSection("engagement_trends", kb.get("engagement_trends", []),
+                             SECTION_KEYWORDS["engagement_trends"], priority=22),
+            KnowledgeSection("technical_architecture", kb.get("technical_architecture", {}),
+                             SECTION_KEYWORDS["technical_architecture"], priority=40)
+        ]
+        
+        for priority, (name, content) in enumerate(self.analysis_documentation.items(), start=10):
+            sections.append(KnowledgeSection(name, content, SECTION_KEYWORDS.get(name, []), priority=priority))
+        
+        # Sections whose source data failed to load carry no information
+        return [section for section in sections if section.content]
+    
+    def get_knowledge_chunks(self, frontend_data: Dict[str, Any] = None,
+                             knowledge_base: Dict[str, Any] = None) -> List[Any]:
+        """Split the knowledge base into small retrievable chunks for the vector index"""
+        if frontend_data is None or knowledge_base is None:
+            snapshot = self.snapshot
+            frontend_data, knowledge_base = snapshot.frontend_data, snapshot.knowledge_base
+        chunks = []
+        
+        def add(chunk_id: str, title: str, data: Any, source: str, keywords: List[str] = None):
+            text = f"{title}. {' '.join(keywords or [])} {compact_json(data)}"
+            chunks.append(KnowledgeChunk(chunk_id, text, {"source": source, "title": title, "data": data}))
+        
+        # Topic keyword tables, with leaderboard stats and top videos per topic
+        topic_analysis = frontend_data.get("topic_analysis", {})
+        topic_names = {t["topic_id"]: t["name"] for t in self._get_frontend_topic_data()}
+        # The bundled frontend/src/data copy spells the key "dominullt_topic"; regenerated files use "dominant_topic"
+        leaderboard = {row.get("dominant_topic", row.get("dominullt_topic")): row
+                       for row in topic_analysis.get("leaderboard", [])}
+        for topic_id, keywords in topic_analysis.get("keywords", {}).items():
+            name = topic_names.get(int(topic_id), f"Topic {topic_id}")
+            words = [str(k["keyword"]) for k in keywords]
+            add(f"topic:{topic_id}", f"Topic {topic_id} {name} keywords: {', '.join(words)}", {
+                "topic_id": int(topic_id),
+                "name": name,
+                "keywords": [{"keyword": k["keyword"], "probability": round(k["probability"], 4)} for k in keywords],
+                "stats": leaderboard.get(int(topic_id), {})
+            }, "topic_keywords", ["topic", "keywords", "lda", "content", "theme"])
+        for topic_id, videos in topic_analysis.get("top_videos", {}).items():
+            name = topic_names.get(int(topic_id), f"Topic {topic_id}")
+            for video in videos:
+                add(f"topic_video:{topic_id}:{video.get('videoId')}",
+                    f"Top video for topic {topic_id} {name}: {video.get('video_title', '')}",
+                    video, "topic_videos", ["video", "views", "comments", "topic"])
+        
+        # Per-video stats for the leaderboards
+        for board, videos in frontend_data.get("video_statistics", {}).items():
+            if isinstance(videos, list):
+                label = board.replace("_", " ")
+                for video in videos:
+                    add(f"video:{board}:{video.get('videoId')}",
+                        f"Video {label}: {video.get('video_title', '')}",
+                        video, "video_stats", ["video", "views", "comments", "engagement", "performing"])
+        
+        # Comment samples from the spam model, real and curated
+        for label, samples in frontend_data.get("comment_samples", {}).items():
+            for sample in samples:
+                add(f"comment:{label}:{sample.get('commentId')}",
+                    f"{label.capitalize()} comment example: {sample.get('textOriginal', '')}",
+                    sample, "comment_samples", ["comment", label, "example", "classification"])
+        for name in ("spam_comments_detailed", "quality_comments_detailed"):
+            label = name.split("_")[0]
+            for sample in knowledge_base.get(name, []):
+                add(f"comment:{label}:{sample.get('commentId')}",
+                    f"{label.capitalize()} comment example: {sample.get('text', '')}",
+                    sample, "comment_samples", ["comment", label, "example"])
+        
+        # Benchmark sections from the analysis documentation
+        for name, content in self.analysis_documentation.items():
+            parts = content.items() if isinstance(content, dict) and name == "video_performance_analysis" else [(name, content)]
+            for part, data in parts:
+                add(f"benchmark:{part}", f"Benchmark {part.replace('_', ' ')}", data,
+                    "benchmarks", SECTION_KEYWORDS.get(name, []))
+        
+        # Dashboard-level summaries
+        for topic in self._get_frontend_topic_data():
+            add(f"dashboard_topic:{topic['topic_id']}", f"Dashboard topic {topic['name']}", topic,
+                "topic_distribution", SECTION_KEYWORDS["topic_distribution"])
+        for trend in self._get_engagement_trends():
+            month = datetime.strptime(trend["month"], "%b %Y").strftime("%B %Y")
+            add(f"trend:{trend['month']}", f"Comment quality and spam trend for {month}", trend,
+                "engagement_trends", SECTION_KEYWORDS["engagement_trends"])
+        for name, keywords in (("model_performance_data", "model_performance"),
+                               ("technical_architecture", "technical_architecture")):
+            if knowledge_base.get(name):
+                add(f"summary:{keywords}", keywords.replace("_", " ").capitalize(),
+                    knowledge_base[name], keywords, SECTION_KEYWORDS[keywords])
+        if frontend_data.get("coherence_optimization"):
+            add("summary:coherence_optimization", "LDA coherence score by number of topics",
+                frontend_data["coherence_optimization"], "model_performance",
+                ["coherence", "optimization", "topics", "lda", "model"])
+        
+        return chunks
+    
+    def _build_vector_index(self, frontend_data: Dict[str, Any], knowledge_base: Dict[str, Any]):
+        """Load the persisted index and upsert the current chunks (only changed chunks are re-embedded)"""
+        if not VECTOR_INDEX_AVAILABLE:
+            return None
+        try:
+            index_dir = os.getenv("KB_INDEX_DIR", str(DEFAULT_INDEX_DIR))
+            index = VectorIndex(index_dir=index_dir)
+            index.load()
+            chunks = self.get_knowledge_chunks(frontend_data, knowledge_base)
+            counts = index.upsert(chunks)
+            current = {chunk.chunk_id for chunk in chunks}
+            removed = index.delete([cid for cid in index.ids if cid not in current])
+            if counts["added"] or counts["updated"] or removed:
+                try:
+                    index.save()
+                except OSError as e:
+                    print(f"⚠️ Could not persist vector index: {e}")
+            print(f"✅ Vector index ready: {len(index)} chunks "
+                  f"({counts['added']} added, {counts['updated']} updated, {removed} removed)")
+            return index
+        except Exception:
+            logger.exception("Error building vector index")
+            return None
+    
+    def retrieve(self, query: str, k: int = None, snapshot: KnowledgeSnapshot = None) -> List[Dict[str, Any]]:
+        """Top-k knowledge chunks for a query from the vector index"""
+        index = (snapshot or self.snapshot).vector_index
+        if index is None or not query.strip():
+            return []
+        hits = index.search(query, k or self.retrieval_k)
+        if not hits or hits[0][1] <= 0:
+            return []
+        # Weak matches far below the best one are mostly hash collisions
+        cutoff = hits[0][1] * 0.5
+        return [
+            {"id": chunk.chunk_id, "score": round(score, 3), **chunk.metadata}
+            for chunk, score in hits if score >= cutoff
+        ]
+    
+    def build_context(self, query: str, current_dashboard_state: Dict[str, Any] = None,
+                      token_budget: int = None) -> AssembledContext:
+        """Assemble the most relevant knowledge for a query within a token budget"""
+        builder = ContextBuilder(token_budget) if token_budget else self.context_builder
+        # One snapshot for the whole assembly, even if a reload lands meanwhile
+        snapshot = self.snapshot
+        sections = self.get_knowledge_sections(current_dashboard_state, snapshot)
+        
+        # Retrieved chunks go right after the pinned metrics, best match first
+        hits = self.retrieve(query, snapshot=snapshot)
+        if hits:
+            # Chunks are immutable within a snapshot, so each one is serialized once per version
+            chunk_json = snapshot.derived.setdefault("chunk_json", {})
+            retrieved, fragments = [], []
+            for hit in hits:
+                item = {"source": hit["source"], "data": hit["data"]}
+                if hit["id"] not in chunk_json:
+                    chunk_json[hit["id"]] = compact_json(item)
+                retrieved.append(item)
+                fragments.append(chunk_json[hit["id"]])
+            sections.insert(1, KnowledgeSection("retrieved_knowledge", retrieved, pinned=True, priority=1,
+                                                fragments=fragments))
+        return builder.build(query, sections)
+    
     def analyze_engagement_performance(self, user_engagement_claim: str, current_metrics: Dict[str, Any] = None) -> Dict[str, Any]:
         """Analyze user's engagement claims against real data benchmarks"""
         analysis = {
@@ -448,3 +852,15 @@ class KnowledgeBaseService:
                 "top_words": self.analysis_documentation["high_performing_title_words"]
             }
         }
+
+_shared_knowledge_base: Optional[KnowledgeBaseService] = None
+_shared_lock = threading.Lock()
+
+def get_knowledge_base() -> KnowledgeBaseService:
+    """Process-wide knowledge base shared by every agent (data loads lazily on first use)"""
+    global _shared_knowledge_base
+    if _shared_knowledge_base is None:
+        with _shared_lock:
+            if _shared_knowledge_base is None:
+                _shared_knowledge_base = KnowledgeBaseService(os.getenv("KB_DATA_PATH") or None)
+    return _shared_knowledge_base
@@ -0,0 +1,100 @@
+import asyncio
+import os
+from contextlib import asynccontextmanager
+from typing import Any, Dict, Optional
+
+class AgentOverloadedError(Exception):
+    """Raised when the LLM wait queue is full or a caller waited too long for a slot"""
+    
+    def __init__(self, message: str, retry_after: float = 1.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class LLMWorkerPool:
+    """Bounded pool of concurrent LLM calls with a bounded wait queue.
+
+    At most ``max_concurrency`` calls run at once; up to ``max_queue`` more callers
+    may wait for a slot. Anything beyond that is rejected immediately with
+    ``AgentOverloadedError`` so the server sheds load instead of piling up requests.
+    """
+    
+    def __init__(self, max_concurrency: int = 8, max_queue: int = 64, queue_timeout: float = 30.0):
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1")
+        self.max_concurrency = max_concurrency
+        self.max_queue = max(0, max_queue)
+        self.queue_timeout = queue_timeout
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._active = 0
+        self._waiting = 0
+        self._completed = 0
+        self._rejected = 0
+        self._timed_out = 0
+    
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        # Created lazily so the semaphore binds to the running server loop (Python 3.9), and again for
+        # each new loop: a semaphore stays bound to the first loop that waits on it, and scripts calling
+        # asyncio.run more than once (process_batch) would otherwise fail on the second loop
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None or self._loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._loop = loop
+        return self._semaphore
+    
+    @asynccontextmanager
+    async def slot(self):
+        """Hold one LLM slot for the duration of the ``async with`` block"""
+        semaphore = self._get_semaphore()
+        
+        if semaphore.locked():
+            if self._waiting >= self.max_queue:
+                self._rejected += 1
+                raise AgentOverloadedError(
+                    f"LLM queue is full ({self._waiting} waiting, {self._active} running)"
+                )
+            self._waiting += 1
+            try:
+                await asyncio.wait_for(semaphore.acquire(), timeout=self.queue_timeout)
+            except asyncio.TimeoutError:
+                self._timed_out += 1
+                raise AgentOverloadedError(
+                    f"Timed out after {self.queue_timeout:.0f}s waiting for an LLM slot"
+                )
+            finally:
+                self._waiting -= 1
+        else:
+            await semaphore.acquire()
+        
+        self._active += 1
+        try:
+            yield
+        finally:
+            self._active -= 1
+            self._completed += 1
+            semaphore.release()
+    
+    def stats(self) -> Dict[str, Any]:
+        """Current occupancy and lifetime counters"""
+        return {
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "active": self._active,
+            "waiting": self._waiting,
+            "completed": self._completed,
+            "rejected": self._rejected,
+            "timed_out": self._timed_out
+        }
+
+_shared_pool: Optional[LLMWorkerPool] = None
+
+def get_llm_pool() -> LLMWorkerPool:
+    """Process-wide pool shared by every agent, configured from the environment"""
+    global _shared_pool
+    if _shared_pool is None:
+        _shared_pool = LLMWorkerPool(
+            max_concurrency=int(os.getenv("LLM_MAX_CONCURRENCY", "8")),
+            max_queue=int(os.getenv("LLM_MAX_QUEUE", "64")),
+            queue_timeout=float(os.getenv("LLM_QUEUE_TIMEOUT", "30"))
+        )
+    return _shared_pool
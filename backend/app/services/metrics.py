@@ -0,0 +1,218 @@
+import math
+import threading
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from app.services.context_builder import estimate_tokens
+
+# Trace id of the HTTP request being served; set by the instrumentation middleware
+request_id_var: ContextVar[str] = ContextVar("request_id", default="-")
+
+def current_request_id() -> str:
+    return request_id_var.get()
+
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+TOKEN_BUCKETS = (50, 100, 250, 500, 1000, 2000, 4000, 8000, 16000, 32000)
+SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1000, 2500, 5000, 10000)
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(names: Sequence[str], values: Sequence[Any]) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + "}"
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+class Metric:
+    """A named family of labelled samples in the Prometheus text exposition format"""
+    
+    kind = "untyped"
+    
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+    
+    def _key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+    
+    def samples(self) -> Iterable[Tuple[str, Sequence[str], Sequence[Any], float]]:
+        """(sample name, label names, label values, value) tuples"""
+        return []
+    
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for name, labelnames, values, value in self.samples():
+            lines.append(f"{name}{_format_labels(labelnames, values)} {_format_value(value)}")
+        return lines
+
+class Counter(Metric):
+    kind = "counter"
+    
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+    
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+    
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+    
+    def samples(self):
+        with self._lock:
+            return [(self.name, self.labelnames, key, value) for key, value in sorted(self._values.items())]
+
+class Histogram(Metric):
+    kind = "histogram"
+    
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Tuple[str, ...], Dict[str, Any]] = {}
+    
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+                self._series[key] = series
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series["counts"][i] += 1
+                    break
+            series["sum"] += value
+            series["count"] += 1
+    
+    def samples(self):
+        bucket_labels = self.labelnames + ("le",)
+        out = []
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, series["counts"]):
+                    cumulative += count
+                    out.append((f"{self.name}_bucket", bucket_labels, key + (_format_value(bound),), cumulative))
+                out.append((f"{self.name}_bucket", bucket_labels, key + ("+Inf",), series["count"]))
+                out.append((f"{self.name}_sum", self.labelnames, key, series["sum"]))
+                out.append((f"{self.name}_count", self.labelnames, key, series["count"]))
+        return out
+
+class CallbackMetric(Metric):
+    """Gauge or counter read from an existing component when /metrics is scraped.
+
+    ``callback`` returns a number, or a dict mapping label-value tuples to numbers.
+    """
+    
+    def __init__(self, name: str, documentation: str, callback: Callable[[], Any],
+                 labelnames: Sequence[str] = (), kind: str = "gauge"):
+        super().__init__(name, documentation, labelnames)
+        self.callback = callback
+        self.kind = kind
+    
+    def samples(self):
+        value = self.callback()
+        if isinstance(value, dict):
+            return [(self.name, self.labelnames, key, v) for key, v in sorted(value.items())]
+        return [(self.name, self.labelnames, (), value)]
+
+class MetricsRegistry:
+    """Metric families exposed together on /metrics"""
+    
+    def __init__(self, namespace: str = "loreai"):
+        self.namespace = namespace
+        self._metrics: Dict[str, Metric] = {}
+        self._lock = threading.Lock()
+    
+    def register(self, metric: Metric) -> Metric:
+        """Add a metric; re-registering a name returns the existing family"""
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+    
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(f"{self.namespace}_{name}", documentation, labelnames))
+    
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(f"{self.namespace}_{name}", documentation, labelnames, buckets))
+    
+    def callback(self, name: str, documentation: str, callback: Callable[[], Any],
+                 labelnames: Sequence[str] = (), kind: str = "gauge") -> CallbackMetric:
+        return self.register(CallbackMetric(f"{self.namespace}_{name}", documentation, callback, labelnames, kind))
+    
+    def render(self) -> str:
+        """All families in Prometheus text format (version 0.0.4)"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines: List[str] = []
+        for metric in metrics:
+            try:
+                lines.extend(metric.render())
+            except Exception as e:
+                # One failing callback must not take the whole scrape down
+                lines.append(f"# {metric.name} unavailable: {_escape(e)}")
+        return "\n".join(lines) + "\n"
+
+REGISTRY = MetricsRegistry()
+
+HTTP_REQUESTS = REGISTRY.counter("http_requests_total", "HTTP requests by route and status",
+                                 ("method", "route", "status"))
+HTTP_LATENCY = REGISTRY.histogram("http_request_duration_seconds",
+                                  "Time to the response headers (streams keep running afterwards)",
+                                  ("method", "route"))
+AGENT_REQUESTS = REGISTRY.counter("agent_requests_total",
+                                  "Agent queries by outcome (answered, cached, error, overloaded)",
+                                  ("agent", "outcome"))
+AGENT_LATENCY = REGISTRY.histogram("agent_request_duration_seconds", "Total agent time per query", ("agent",))
+AGENT_STAGE_LATENCY = REGISTRY.histogram("agent_stage_duration_seconds",
+                                         "Agent time per stage (cache, context, serialize, render, llm, format)",
+                                         ("agent", "stage"))
+PROMPT_TOKENS = REGISTRY.histogram("agent_prompt_tokens", "Estimated prompt tokens sent to the LLM",
+                                   ("agent",), TOKEN_BUCKETS)
+RESPONSE_TOKENS = REGISTRY.histogram("agent_response_tokens", "Estimated tokens of generated responses",
+                                     ("agent",), TOKEN_BUCKETS)
+CACHE_LOOKUPS = REGISTRY.counter("response_cache_lookups_total",
+                                 "Response cache lookups by result (hit, similar_hit, miss)", ("agent", "result"))
+KB_LOADS = REGISTRY.counter("knowledge_base_loads_total",
+                            "Knowledge base loads by trigger (initial, file_change, manual) and result",
+                            ("trigger", "result"))
+KB_LOAD_LATENCY = REGISTRY.histogram("knowledge_base_load_duration_seconds",
+                                     "Time to parse the data file and rebuild derived structures")
+SPAM_COMMENTS = REGISTRY.counter("spam_comments_scored_total", "Comments scored by the spam model, by label",
+                                 ("label",))
+SPAM_BATCH_SIZE = REGISTRY.histogram("spam_scoring_batch_size",
+                                     "Comments per scoring pass (batch requests, or micro-batched singles)",
+                                     ("mode",), SIZE_BUCKETS)
+SPAM_SCORE_LATENCY = REGISTRY.histogram("spam_scoring_duration_seconds", "Time per scoring pass", ("mode",))
+TOPIC_DOCUMENTS = REGISTRY.counter("topic_documents_inferred_total",
+                                   "Documents given a topic distribution by the LDA model")
+TOPIC_BATCH_SIZE = REGISTRY.histogram("topic_inference_batch_size", "Documents per inference pass", (),
+                                      SIZE_BUCKETS)
+TOPIC_INFER_LATENCY = REGISTRY.histogram("topic_inference_duration_seconds",
+                                         "Time per inference pass (tokenizing and the batched E-step)")
+
+def record_agent_request(agent_type: str, stage_seconds: Dict[str, float], outcome: str,
+                         prompt: Optional[str] = None, response: Optional[str] = None):
+    """Publish one finished agent query"""
+    AGENT_REQUESTS.inc(agent=agent_type, outcome=outcome)
+    AGENT_LATENCY.observe(sum(stage_seconds.values()), agent=agent_type)
+    for stage, seconds in stage_seconds.items():
+        AGENT_STAGE_LATENCY.observe(seconds, agent=agent_type, stage=stage)
+    if prompt:
+        PROMPT_TOKENS.observe(estimate_tokens(prompt), agent=agent_type)
+    if response and outcome == "answered":
+        RESPONSE_TOKENS.observe(estimate_tokens(response), agent=agent_type)
@@ -0,0 +1,63 @@
+import re
+from typing import Any, List
+
+from langchain.prompts import ChatPromptTemplate
+from langchain.schema import BaseMessage, get_buffer_string
+
+class PrecompiledPrompt:
+    """A ChatPromptTemplate split into a pre-rendered static prefix and a small dynamic suffix.
+
+    Leading messages without input variables (the long system prompts) are
+    rendered once. The remaining messages are compiled into a plain format
+    string, so each request costs one ``str.format`` on the suffix instead of
+    LangChain formatting the whole conversation. ``render`` returns exactly
+    what ``template.format`` would; templates that cannot be compiled that way
+    fall back to it.
+    """
+    
+    def __init__(self, template: ChatPromptTemplate):
+        self.template = template
+        self.input_variables: List[str] = list(template.input_variables)
+        messages = template.messages
+        split = 0
+        while split < len(messages) and not getattr(messages[split], "input_variables", None):
+            split += 1
+        
+        static = [m for message in messages[:split] for m in self._format_message(message)]
+        self.prefix = get_buffer_string(static)
+        self.dynamic = messages[split:]
+        self.suffix_format = self._compile_suffix()
+    
+    @staticmethod
+    def _format_message(message: Any, **kwargs) -> List[BaseMessage]:
+        return [message] if isinstance(message, BaseMessage) else message.format_messages(**kwargs)
+    
+    def _compile_suffix(self):
+        """Format string for the dynamic messages, or None if it cannot reproduce LangChain's output"""
+        if not self.dynamic:
+            return ""
+        try:
+            # Render with sentinels, then turn them back into format fields
+            sentinels = {name: f"\x00{name}\x00" for name in self.input_variables}
+            rendered = get_buffer_string([m for message in self.dynamic for m in self._format_message(message, **sentinels)])
+            escaped = rendered.replace("{", "{{").replace("}", "}}")
+            suffix_format = re.sub("\x00(\\w+)\x00", r"{\1}", escaped)
+            
+            # Only trust the compiled form if it matches the template on a probe
+            probe = {name: f"<{name} {{}}>" for name in self.input_variables}
+            if self._join(suffix_format.format(**probe)) != self.template.format(**probe):
+                return None
+            return suffix_format
+        except Exception:
+            return None
+    
+    def _join(self, suffix: str) -> str:
+        if not self.prefix:
+            return suffix
+        return f"{self.prefix}\n{suffix}" if suffix else self.prefix
+    
+    def render(self, **kwargs) -> str:
+        """Full prompt text for the given variables"""
+        if self.suffix_format is None:
+            return self.template.format(**kwargs)
+        return self._join(self.suffix_format.format(**{name: kwargs[name] for name in self.input_variables}))
@@ -0,0 +1,195 @@
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+
+from app.services.context_builder import compact_json
+from app.services.metrics import CACHE_LOOKUPS
+
+# The similarity tier needs numpy; exact-match caching works without it
+try:
+    import numpy as np
+    from app.services.vector_index import HashingEmbedder
+    SEMANTIC_CACHE_AVAILABLE = True
+except ImportError:
+    SEMANTIC_CACHE_AVAILABLE = False
+
+PUNCTUATION_PATTERN = re.compile(r"[^\w\s]")
+NUMBER_PATTERN = re.compile(r"\d+")
+
+def normalize_query(query: str) -> str:
+    """Case, punctuation and whitespace-insensitive form of a query"""
+    return " ".join(PUNCTUATION_PATTERN.sub(" ", query.lower()).split())
+
+def context_fingerprint(context: Optional[Dict[str, Any]]) -> str:
+    """Stable fingerprint of the request context (dashboard state etc.)"""
+    if not context:
+        return ""
+    return compact_json({key: context[key] for key in sorted(context)})
+
+@dataclass
+class CacheEntry:
+    response: str
+    created_at: float
+    numbers: Tuple[str, ...]
+    vector: Any = None
+
+class ResponseCache:
+    """TTL/LRU cache of finished agent responses.
+
+    Entries are keyed on (agent type, knowledge-base version, context
+    fingerprint, normalized query). On an exact miss, an optional similarity
+    tier embeds the query and serves the closest cached answer for the same
+    agent, version and context if its cosine similarity clears
+    ``similarity_threshold`` and it mentions the same numbers (so "top topics
+    in 2023" never answers "top topics in 2024").
+    """
+    
+    def __init__(self, max_entries: int = 512, ttl_seconds: float = 3600.0,
+                 similarity_threshold: float = 0.92, embedder=None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self.embedder = embedder
+        if self.embedder is None and similarity_threshold > 0 and SEMANTIC_CACHE_AVAILABLE:
+            self.embedder = HashingEmbedder()
+        self._entries: "OrderedDict[Tuple[str, str, str, str], CacheEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._kb_versions: Dict[str, str] = {}
+        self._hits = 0
+        self._similar_hits = 0
+        self._misses = 0
+        self._stores = 0
+        self._evictions = 0
+        self._expirations = 0
+        self._invalidations = 0
+    
+    @property
+    def semantic_enabled(self) -> bool:
+        return self.embedder is not None and self.similarity_threshold > 0
+    
+    def get(self, agent_type: str, query: str, kb_version: str = "",
+            context: Optional[Dict[str, Any]] = None) -> Optional[str]:
+        """Cached response for the query, or None on a miss"""
+        normalized = normalize_query(query)
+        fingerprint = context_fingerprint(context)
+        key = (agent_type, kb_version, fingerprint, normalized)
+        now = time.monotonic()
+        
+        with self._lock:
+            self._observe_version(agent_type, kb_version)
+            entry = self._entries.get(key)
+            if entry is not None:
+                if now - entry.created_at <= self.ttl_seconds:
+                    self._entries.move_to_end(key)
+                    self._hits += 1
+                    CACHE_LOOKUPS.inc(agent=agent_type, result="hit")
+                    return entry.response
+                del self._entries[key]
+                self._expirations += 1
+            
+            if self.semantic_enabled:
+                match = self._similar(key, now)
+                if match is not None:
+                    self._entries.move_to_end(match)
+                    self._similar_hits += 1
+                    CACHE_LOOKUPS.inc(agent=agent_type, result="similar_hit")
+                    return self._entries[match].response
+            
+            self._misses += 1
+            CACHE_LOOKUPS.inc(agent=agent_type, result="miss")
+            return None
+    
+    def put(self, agent_type: str, query: str, response: str, kb_version: str = "",
+            context: Optional[Dict[str, Any]] = None):
+        """Store a finished response"""
+        normalized = normalize_query(query)
+        key = (agent_type, kb_version, context_fingerprint(context), normalized)
+        vector = self.embedder.embed([normalized])[0] if self.semantic_enabled else None
+        
+        with self._lock:
+            self._observe_version(agent_type, kb_version)
+            self._entries[key] = CacheEntry(response, time.monotonic(),
+                                            tuple(NUMBER_PATTERN.findall(normalized)), vector)
+            self._entries.move_to_end(key)
+            self._stores += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+    
+    def _similar(self, key: Tuple[str, str, str, str], now: float) -> Optional[Tuple[str, str, str, str]]:
+        """Most similar live entry sharing agent type, version and context"""
+        agent_type, kb_version, fingerprint, normalized = key
+        candidates = [
+            (k, e) for k, e in self._entries.items()
+            if k[:3] == (agent_type, kb_version, fingerprint) and now - e.created_at <= self.ttl_seconds
+        ]
+        if not candidates:
+            return None
+        numbers = tuple(NUMBER_PATTERN.findall(normalized))
+        candidates = [(k, e) for k, e in candidates if e.numbers == numbers]
+        if not candidates:
+            return None
+        
+        vector = self.embedder.embed([normalized])[0]
+        similarities = np.stack([e.vector for _, e in candidates]) @ vector
+        best = int(np.argmax(similarities))
+        if similarities[best] >= self.similarity_threshold:
+            return candidates[best][0]
+        return None
+    
+    def _observe_version(self, agent_type: str, kb_version: str):
+        """Drop an agent's entries as soon as its knowledge base version changes"""
+        previous = self._kb_versions.get(agent_type)
+        if previous == kb_version:
+            return
+        self._kb_versions[agent_type] = kb_version
+        if previous is None:
+            return
+        stale = [k for k in self._entries if k[0] == agent_type and k[1] != kb_version]
+        for k in stale:
+            del self._entries[k]
+        self._invalidations += len(stale)
+    
+    def clear(self):
+        """Remove every entry (counters are kept)"""
+        with self._lock:
+            self._invalidations += len(self._entries)
+            self._entries.clear()
+    
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and current occupancy"""
+        with self._lock:
+            lookups = self._hits + self._similar_hits + self._misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "semantic_tier": self.semantic_enabled,
+                "similarity_threshold": self.similarity_threshold,
+                "hits": self._hits,
+                "similar_hits": self._similar_hits,
+                "misses": self._misses,
+                "hit_rate": round((self._hits + self._similar_hits) / lookups, 4) if lookups else 0.0,
+                "stores": self._stores,
+                "evictions": self._evictions,
+                "expirations": self._expirations,
+                "invalidations": self._invalidations,
+                "kb_versions": dict(self._kb_versions)
+            }
+
+_shared_cache: Optional[ResponseCache] = None
+
+def get_response_cache() -> ResponseCache:
+    """Process-wide response cache shared by every agent, configured from the environment"""
+    global _shared_cache
+    if _shared_cache is None:
+        _shared_cache = ResponseCache(
+            max_entries=int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "512")),
+            ttl_seconds=float(os.getenv("RESPONSE_CACHE_TTL", "3600")),
+            similarity_threshold=float(os.getenv("RESPONSE_CACHE_SIMILARITY", "0.92"))
+        )
+    return _shared_cache
@@ -0,0 +1,293 @@
+import os
+import sqlite3
+import sys
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict, deque
+from pathlib import Path
+from typing import Any, Deque, Dict, List, Optional
+
+from app.services.context_builder import estimate_tokens
+
+DEFAULT_SESSION_DB = Path(__file__).resolve().parent.parent.parent / "cache" / "sessions.db"
+
+class SessionStore(ABC):
+    """Conversation memory scoped to a client session id.
+
+    Each session keeps a sliding window of its most recent messages capped at
+    ``max_tokens``; idle sessions expire after ``ttl_seconds`` and the least
+    recently used ones are evicted beyond ``max_sessions``.
+    """
+    
+    def __init__(self, max_tokens: int = 2000, ttl_seconds: float = 1800.0, max_sessions: int = 1000):
+        self.max_tokens = max_tokens
+        self.ttl_seconds = ttl_seconds
+        self.max_sessions = max_sessions
+    
+    @abstractmethod
+    def append(self, session_id: str, role: str, content: str, agent_type: str = ""):
+        """Add one message and trim the session to its token window"""
+        pass
+    
+    @abstractmethod
+    def get_messages(self, session_id: str) -> List[Dict[str, Any]]:
+        """Messages of a session, oldest first (empty if unknown or expired)"""
+        pass
+    
+    @abstractmethod
+    def clear(self, session_id: Optional[str] = None):
+        """Forget one session, or every session when no id is given"""
+        pass
+    
+    @abstractmethod
+    def stats(self) -> Dict[str, Any]:
+        """Session counts and memory usage"""
+        pass
+    
+    def _window_start(self, token_counts: List[int]) -> int:
+        """Index of the oldest message that still fits the token window (newest always kept)"""
+        total = 0
+        for i in range(len(token_counts) - 1, -1, -1):
+            total += token_counts[i]
+            if total > self.max_tokens and i < len(token_counts) - 1:
+                return i + 1
+        return 0
+
+class InMemorySessionStore(SessionStore):
+    """Per-process store: an LRU-ordered dict of bounded message windows"""
+    
+    def __init__(self, max_tokens: int = 2000, ttl_seconds: float = 1800.0, max_sessions: int = 1000):
+        super().__init__(max_tokens, ttl_seconds, max_sessions)
+        self._sessions: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._evicted = 0
+        self._expired = 0
+        self._trimmed = 0
+    
+    def append(self, session_id: str, role: str, content: str, agent_type: str = ""):
+        now = time.time()
+        message = {"role": role, "content": content, "agent_type": agent_type, "created_at": now,
+                   "tokens": estimate_tokens(content), "bytes": sys.getsizeof(content)}
+        with self._lock:
+            self._expire(now)
+            session = self._sessions.get(session_id)
+            if session is None:
+                session = {"messages": deque(), "tokens": 0, "bytes": 0, "last_access": now}
+                self._sessions[session_id] = session
+            messages: Deque[Dict[str, Any]] = session["messages"]
+            messages.append(message)
+            session["tokens"] += message["tokens"]
+            session["bytes"] += message["bytes"]
+            session["last_access"] = now
+            self._sessions.move_to_end(session_id)
+            
+            drop = self._window_start([m["tokens"] for m in messages])
+            for _ in range(drop):
+                old = messages.popleft()
+                session["tokens"] -= old["tokens"]
+                session["bytes"] -= old["bytes"]
+            self._trimmed += drop
+            
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+                self._evicted += 1
+    
+    def get_messages(self, session_id: str) -> List[Dict[str, Any]]:
+        now = time.time()
+        with self._lock:
+            self._expire(now)
+            session = self._sessions.get(session_id)
+            if session is None:
+                return []
+            session["last_access"] = now
+            self._sessions.move_to_end(session_id)
+            return [{k: m[k] for k in ("role", "content", "agent_type", "created_at")} for m in session["messages"]]
+    
+    def clear(self, session_id: Optional[str] = None):
+        with self._lock:
+            if session_id is None:
+                self._sessions.clear()
+            else:
+                self._sessions.pop(session_id, None)
+    
+    def _expire(self, now: float):
+        # Sessions are in access order, so expired ones sit at the front
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            if now - session["last_access"] <= self.ttl_seconds:
+                break
+            del self._sessions[session_id]
+            self._expired += 1
+    
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            self._expire(time.time())
+            return {
+                "backend": "memory",
+                "sessions": len(self._sessions),
+                "messages": sum(len(s["messages"]) for s in self._sessions.values()),
+                "tokens": sum(s["tokens"] for s in self._sessions.values()),
+                "memory_bytes": sum(s["bytes"] for s in self._sessions.values()),
+                "max_tokens_per_session": self.max_tokens,
+                "max_sessions": self.max_sessions,
+                "ttl_seconds": self.ttl_seconds,
+                "evicted": self._evicted,
+                "expired": self._expired,
+                "trimmed_messages": self._trimmed
+            }
+
+class SQLiteSessionStore(SessionStore):
+    """Store in a local SQLite file (WAL mode) so several uvicorn workers share sessions.
+
+    Plays the role a Redis instance would in a multi-host deployment; the
+    interface is the same as the in-process store.
+    """
+    
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS sessions (
+            session_id TEXT PRIMARY KEY,
+            last_access REAL NOT NULL,
+            tokens INTEGER NOT NULL DEFAULT 0,
+            bytes INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE TABLE IF NOT EXISTS session_messages (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            session_id TEXT NOT NULL,
+            role TEXT NOT NULL,
+            agent_type TEXT NOT NULL DEFAULT '',
+            content TEXT NOT NULL,
+            tokens INTEGER NOT NULL,
+            bytes INTEGER NOT NULL,
+            created_at REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_session_messages_session ON session_messages (session_id, id);
+        CREATE INDEX IF NOT EXISTS idx_sessions_last_access ON sessions (last_access);
+    """
+    
+    def __init__(self, path: Optional[str] = None, max_tokens: int = 2000, ttl_seconds: float = 1800.0,
+                 max_sessions: int = 1000, sweep_interval: float = 30.0):
+        super().__init__(max_tokens, ttl_seconds, max_sessions)
+        self.path = str(path or DEFAULT_SESSION_DB)
+        self.sweep_interval = sweep_interval
+        self._local = threading.local()
+        self._last_sweep = 0.0
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        with self._connection() as conn:
+            conn.executescript(self.SCHEMA)
+    
+    def _connection(self) -> sqlite3.Connection:
+        # One connection per thread; WAL lets readers and one writer work concurrently across processes
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+    
+    def append(self, session_id: str, role: str, content: str, agent_type: str = ""):
+        now = time.time()
+        tokens = estimate_tokens(content)
+        size = len(content.encode("utf-8"))
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "INSERT INTO session_messages (session_id, role, agent_type, content, tokens, bytes, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (session_id, role, agent_type, content, tokens, size, now)
+            )
+            rows = conn.execute(
+                "SELECT id, tokens FROM session_messages WHERE session_id = ? ORDER BY id", (session_id,)
+            ).fetchall()
+            start = self._window_start([row[1] for row in rows])
+            if start:
+                conn.execute("DELETE FROM session_messages WHERE session_id = ? AND id < ?",
+                             (session_id, rows[start][0]))
+            conn.execute(
+                "INSERT INTO sessions (session_id, last_access, tokens, bytes) "
+                "SELECT ?, ?, COALESCE(SUM(tokens), 0), COALESCE(SUM(bytes), 0) "
+                "FROM session_messages WHERE session_id = ? "
+                "ON CONFLICT(session_id) DO UPDATE SET last_access = excluded.last_access, "
+                "tokens = excluded.tokens, bytes = excluded.bytes",
+                (session_id, now, session_id)
+            )
+            if now - self._last_sweep >= self.sweep_interval:
+                self._sweep(conn, now)
+                self._last_sweep = now
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+    
+    def _sweep(self, conn: sqlite3.Connection, now: float):
+        """Expire idle sessions and evict least recently used ones over the cap"""
+        conn.execute(
+            "DELETE FROM sessions WHERE last_access < ? OR session_id IN ("
+            "SELECT session_id FROM sessions ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+            (now - self.ttl_seconds, self.max_sessions)
+        )
+        conn.execute("DELETE FROM session_messages WHERE session_id NOT IN (SELECT session_id FROM sessions)")
+    
+    def get_messages(self, session_id: str) -> List[Dict[str, Any]]:
+        now = time.time()
+        conn = self._connection()
+        row = conn.execute("SELECT last_access FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+        if row is None or now - row[0] > self.ttl_seconds:
+            return []
+        conn.execute("UPDATE sessions SET last_access = ? WHERE session_id = ?", (now, session_id))
+        rows = conn.execute(
+            "SELECT role, content, agent_type, created_at FROM session_messages WHERE session_id = ? ORDER BY id",
+            (session_id,)
+        ).fetchall()
+        return [{"role": r[0], "content": r[1], "agent_type": r[2], "created_at": r[3]} for r in rows]
+    
+    def clear(self, session_id: Optional[str] = None):
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        if session_id is None:
+            conn.execute("DELETE FROM session_messages")
+            conn.execute("DELETE FROM sessions")
+        else:
+            conn.execute("DELETE FROM session_messages WHERE session_id = ?", (session_id,))
+            conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+        conn.execute("COMMIT")
+    
+    def stats(self) -> Dict[str, Any]:
+        conn = self._connection()
+        live_after = time.time() - self.ttl_seconds
+        sessions, tokens, size = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(tokens), 0), COALESCE(SUM(bytes), 0) FROM sessions WHERE last_access >= ?",
+            (live_after,)
+        ).fetchone()
+        messages = conn.execute("SELECT COUNT(*) FROM session_messages").fetchone()[0]
+        return {
+            "backend": "sqlite",
+            "path": self.path,
+            "sessions": sessions,
+            "messages": messages,
+            "tokens": tokens,
+            "memory_bytes": size,
+            "db_bytes": os.path.getsize(self.path) if os.path.exists(self.path) else 0,
+            "max_tokens_per_session": self.max_tokens,
+            "max_sessions": self.max_sessions,
+            "ttl_seconds": self.ttl_seconds
+        }
+
+_shared_store: Optional[SessionStore] = None
+
+def get_session_store() -> SessionStore:
+    """Process-wide session store selected by SESSION_STORE ("memory" or "sqlite")"""
+    global _shared_store
+    if _shared_store is None:
+        limits = dict(
+            max_tokens=int(os.getenv("SESSION_MAX_TOKENS", "2000")),
+            ttl_seconds=float(os.getenv("SESSION_TTL", "1800")),
+            max_sessions=int(os.getenv("SESSION_MAX_SESSIONS", "1000"))
+        )
+        if os.getenv("SESSION_STORE", "memory") == "sqlite":
+            _shared_store = SQLiteSessionStore(os.getenv("SESSION_DB_PATH") or None, **limits)
+        else:
+            _shared_store = InMemorySessionStore(**limits)
+    return _shared_store
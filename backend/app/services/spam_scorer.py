@@ -0,0 +1,197 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from app.services.metrics import SPAM_BATCH_SIZE, SPAM_COMMENTS, SPAM_SCORE_LATENCY
+
+# Feature code and model live next to backend/ in the repository (pipeline/, model/)
+REPO_DIR = Path(__file__).resolve().parents[3]
+if str(REPO_DIR) not in sys.path:
+    sys.path.append(str(REPO_DIR))
+
+try:
+    import numpy as np
+    import pandas as pd
+    from pipeline.spam_features import CLUSTERING_FEATURES, add_features, clustering_matrix, clustering_row
+    from pipeline.spam_model import assign_labels, load_model, predict_probabilities
+    SPAM_SCORING_AVAILABLE = True
+except ImportError as e:
+    print(f"Warning: Spam scoring unavailable: {e}")
+    SPAM_SCORING_AVAILABLE = False
+
+CommentInput = Union[str, Dict[str, Any]]
+
+# Columns the feature pipeline reads from a comment; anything else in the request is ignored
+COMMENT_FIELDS = ("textOriginal", "likeCount", "parentCommentId", "publishedAt")
+
+# Below this many comments the per-row feature path beats pandas' fixed per-call overhead
+ROW_PATH_MAX = 64
+
+def find_model_path() -> Optional[str]:
+    """SPAM_MODEL_PATH, else model/comment_spam_detection_model.pkl at the repository root or in backend/"""
+    configured = os.getenv("SPAM_MODEL_PATH")
+    if configured:
+        return configured
+    for path in (REPO_DIR / "model" / "comment_spam_detection_model.pkl",
+                 Path(__file__).resolve().parents[2] / "model" / "comment_spam_detection_model.pkl"):
+        if path.exists():
+            return str(path)
+    return None
+
+def comments_frame(comments: List[CommentInput]) -> "pd.DataFrame":
+    """Comments as the raw-CSV frame run.ipynb works on (strings are taken as textOriginal)"""
+    rows = []
+    for comment in comments:
+        if isinstance(comment, str):
+            rows.append((comment, None, None, None))
+        else:
+            text = comment.get("textOriginal", comment.get("text"))
+            rows.append((text,) + tuple(comment.get(field) for field in COMMENT_FIELDS[1:]))
+    return pd.DataFrame(rows, columns=list(COMMENT_FIELDS), dtype=object)
+
+class SpamScorer:
+    """The saved GMM spam model with the notebook's feature pipeline, loaded once per process.
+
+    ``score`` labels a list of comments in one vectorized pass. ``score_one``
+    is for single-comment requests: while a scoring pass is running, new
+    requests queue up and are scored together in the next pass (at most
+    ``micro_batch_size``), so under load the per-comment cost drops to the
+    batch cost while an idle server still answers immediately.
+    """
+    
+    def __init__(self, model_path: Optional[str] = None, micro_batch_size: int = 256):
+        self.model_path = model_path or find_model_path()
+        if not self.model_path:
+            raise FileNotFoundError("comment_spam_detection_model.pkl not found; set SPAM_MODEL_PATH")
+        self.model = load_model(self.model_path)
+        self.spam_cluster_id = int(self.model["spam_cluster_id"])
+        self.micro_batch_size = max(1, micro_batch_size)
+        self._pending: List[Tuple[CommentInput, bool, asyncio.Future]] = []
+        self._draining = False
+        self._lock = threading.Lock()
+        self._scored = 0
+        self._passes = 0
+        self._micro_batches = 0
+        self._micro_batched = 0
+        self._largest_micro_batch = 0
+    
+    def _features(self, comments: List[CommentInput]) -> "np.ndarray":
+        if len(comments) > ROW_PATH_MAX:
+            return clustering_matrix(add_features(comments_frame(comments)))
+        rows = []
+        for comment in comments:
+            if isinstance(comment, str):
+                rows.append(clustering_row(comment))
+            else:
+                rows.append(clustering_row(comment.get("textOriginal", comment.get("text")),
+                                           comment.get("likeCount"), comment.get("parentCommentId")))
+        return np.array(rows, dtype=np.float64)
+    
+    def _score_arrays(self, comments: List[CommentInput]):
+        X = self._features(comments)
+        probabilities = predict_probabilities(self.model, X)
+        return assign_labels(self.model, probabilities), probabilities, X
+    
+    def _result(self, label: str, probabilities: "np.ndarray", features: "np.ndarray",
+                include_features: bool) -> Dict[str, Any]:
+        spam_probability = float(probabilities[self.spam_cluster_id])
+        result = {
+            "label": label,
+            "confidence": round(float(probabilities.max()), 6),
+            "spam_probability": round(spam_probability, 6),
+            "quality_probability": round(1.0 - spam_probability, 6)
+        }
+        if include_features:
+            result["features"] = {name: float(value) for name, value in zip(CLUSTERING_FEATURES, features)}
+        return result
+    
+    def score(self, comments: List[CommentInput], include_features: Union[bool, List[bool]] = False,
+              mode: str = "batch") -> List[Dict[str, Any]]:
+        """Label every comment; CPU-bound, so async callers should use ``ascore``"""
+        if not comments:
+            return []
+        start = time.perf_counter()
+        labels, probabilities, X = self._score_arrays(comments)
+        if isinstance(include_features, bool):
+            include_features = [include_features] * len(comments)
+        results = [self._result(labels[i], probabilities[i], X[i], include_features[i]) for i in range(len(comments))]
+        
+        SPAM_SCORE_LATENCY.observe(time.perf_counter() - start, mode=mode)
+        SPAM_BATCH_SIZE.observe(len(comments), mode=mode)
+        for label, count in zip(*np.unique(labels.astype(str), return_counts=True)):
+            SPAM_COMMENTS.inc(int(count), label=label)
+        with self._lock:
+            self._scored += len(comments)
+            self._passes += 1
+        return results
+    
+    async def ascore(self, comments: List[CommentInput], include_features: bool = False) -> List[Dict[str, Any]]:
+        """``score`` on a worker thread so the event loop keeps serving other requests"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.score, comments, include_features)
+    
+    async def score_one(self, comment: CommentInput, include_features: bool = False) -> Dict[str, Any]:
+        """Score a single comment, sharing a scoring pass with concurrent requests"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((comment, include_features, future))
+        if not self._draining:
+            self._draining = True
+            loop.create_task(self._drain())
+        return await future
+    
+    async def _drain(self):
+        loop = asyncio.get_running_loop()
+        try:
+            while self._pending:
+                batch = self._pending[:self.micro_batch_size]
+                del self._pending[:len(batch)]
+                self._micro_batches += 1
+                self._micro_batched += len(batch)
+                self._largest_micro_batch = max(self._largest_micro_batch, len(batch))
+                try:
+                    results = await loop.run_in_executor(
+                        None, self.score, [item[0] for item in batch], [item[1] for item in batch], "micro"
+                    )
+                except Exception as e:
+                    for _, _, future in batch:
+                        if not future.done():
+                            future.set_exception(e)
+                    continue
+                for (_, _, future), result in zip(batch, results):
+                    if not future.done():
+                        future.set_result(result)
+        finally:
+            self._draining = False
+    
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "model_path": self.model_path,
+            "features": list(CLUSTERING_FEATURES),
+            "spam_cluster_id": self.spam_cluster_id,
+            "uncertainty_threshold": self.model["uncertainty_thresholds"]["difference_threshold"],
+            "comments_scored": self._scored,
+            "scoring_passes": self._passes,
+            "micro_batches": self._micro_batches,
+            "avg_micro_batch": round(self._micro_batched / self._micro_batches, 2) if self._micro_batches else 0.0,
+            "largest_micro_batch": self._largest_micro_batch,
+            "pending": len(self._pending)
+        }
+
+_shared_scorer: Optional[SpamScorer] = None
+_shared_lock = threading.Lock()
+
+def get_spam_scorer() -> SpamScorer:
+    """Process-wide scorer, configured from the environment (raises if the model cannot be loaded)"""
+    global _shared_scorer
+    if _shared_scorer is None:
+        with _shared_lock:
+            if _shared_scorer is None:
+                _shared_scorer = SpamScorer(
+                    micro_batch_size=int(os.getenv("SPAM_MICRO_BATCH_SIZE", "256"))
+                )
+    return _shared_scorer
@@ -0,0 +1,102 @@
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Deque, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Order in which the stages of one agent request happen
+STAGES = ("cache", "context", "serialize", "render", "llm", "format")
+
+class StageTimer:
+    """Wall-clock time spent in each stage of a single agent request"""
+    
+    def __init__(self):
+        self.seconds: Dict[str, float] = {}
+    
+    @contextmanager
+    def stage(self, name: str):
+        """Add the duration of the ``with`` block to stage ``name``"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+    
+    def add(self, name: str, seconds: float):
+        self.seconds[name] = self.seconds.get(name, 0.0) + seconds
+    
+    def as_ms(self) -> Dict[str, float]:
+        return {name: round(seconds * 1000, 3) for name, seconds in self.seconds.items()}
+
+class StageTimings:
+    """Per-agent, per-stage latency aggregates over recent requests.
+
+    Keeps lifetime counts and totals plus the last ``window`` samples of every
+    stage for percentiles, so the non-LLM share of latency is visible at a glance.
+    """
+    
+    def __init__(self, window: int = 500, log: bool = False):
+        self.window = window
+        self.log = log
+        self._lock = threading.Lock()
+        self._stages: Dict[str, Dict[str, Dict[str, Any]]] = {}
+    
+    def observe(self, agent_type: str, timer: StageTimer):
+        """Record one finished request"""
+        with self._lock:
+            stages = self._stages.setdefault(agent_type, {})
+            for name, seconds in timer.seconds.items():
+                stage = stages.get(name)
+                if stage is None:
+                    stage = {"count": 0, "total": 0.0, "max": 0.0, "recent": deque(maxlen=self.window)}
+                    stages[name] = stage
+                stage["count"] += 1
+                stage["total"] += seconds
+                stage["max"] = max(stage["max"], seconds)
+                stage["recent"].append(seconds)
+        if self.log:
+            parts = " ".join(f"{name}={ms:.1f}ms" for name, ms in timer.as_ms().items())
+            logger.info("⏱ %s %s", agent_type, parts)
+    
+    @staticmethod
+    def _percentile(samples: Deque[float], q: float) -> float:
+        ordered = sorted(samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+    
+    def stats(self) -> Dict[str, Any]:
+        """Count, mean, p50/p95 and max per stage (milliseconds)"""
+        order = {name: i for i, name in enumerate(STAGES)}
+        with self._lock:
+            result = {}
+            for agent_type, stages in self._stages.items():
+                result[agent_type] = {
+                    name: {
+                        "count": stage["count"],
+                        "mean_ms": round(stage["total"] / stage["count"] * 1000, 3),
+                        "p50_ms": round(self._percentile(stage["recent"], 0.5) * 1000, 3),
+                        "p95_ms": round(self._percentile(stage["recent"], 0.95) * 1000, 3),
+                        "max_ms": round(stage["max"] * 1000, 3)
+                    }
+                    for name, stage in sorted(stages.items(), key=lambda item: order.get(item[0], len(order)))
+                }
+            return result
+    
+    def clear(self):
+        with self._lock:
+            self._stages.clear()
+
+_shared_timings: Optional[StageTimings] = None
+
+def get_stage_timings() -> StageTimings:
+    """Process-wide stage timings; LOG_STAGE_TIMINGS=true also logs one line per request"""
+    global _shared_timings
+    if _shared_timings is None:
+        _shared_timings = StageTimings(
+            window=int(os.getenv("STAGE_TIMINGS_WINDOW", "500")),
+            log=os.getenv("LOG_STAGE_TIMINGS", "false").lower() in ("1", "true", "yes")
+        )
+    return _shared_timings
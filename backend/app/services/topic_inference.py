@@ -0,0 +1,106 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Union
+
+from app.services.metrics import TOPIC_BATCH_SIZE, TOPIC_DOCUMENTS, TOPIC_INFER_LATENCY
+
+# Inference code and model live next to backend/ in the repository (pipeline/, model/)
+REPO_DIR = Path(__file__).resolve().parents[3]
+if str(REPO_DIR) not in sys.path:
+    sys.path.append(str(REPO_DIR))
+
+try:
+    from pipeline.topic_inference import ARTIFACTS_FILE, GENSIM_MODEL, GENSIM_AVAILABLE, TopicInferencer
+    TOPIC_INFERENCE_AVAILABLE = GENSIM_AVAILABLE
+except ImportError as e:
+    print(f"Warning: Topic inference unavailable: {e}")
+    TOPIC_INFERENCE_AVAILABLE = False
+
+DocumentInput = Union[str, Dict[str, Any]]
+
+def find_model_path() -> Optional[str]:
+    """TOPIC_MODEL_PATH, else stm.ipynb's model/lda_model_gensim or model/lda_topic_model.pkl (repository root or backend/)"""
+    configured = os.getenv("TOPIC_MODEL_PATH")
+    if configured:
+        return configured
+    for model_dir in (REPO_DIR / "model", Path(__file__).resolve().parents[2] / "model"):
+        for name in (GENSIM_MODEL, ARTIFACTS_FILE):
+            if (model_dir / name).exists():
+                return str(model_dir / name)
+    return None
+
+class TopicInferenceService:
+    """The saved LDA model and dictionary, loaded once per process, assigning topics to batches of documents.
+
+    A request's documents share one batched E-step. Passes run one at a
+    time: the model's random state supplies each pass's starting point.
+    """
+    
+    def __init__(self, model_path: Optional[str] = None, top_keywords: int = 10):
+        self.model_path = model_path or find_model_path()
+        if not self.model_path:
+            raise FileNotFoundError("lda_model_gensim / lda_topic_model.pkl not found; set TOPIC_MODEL_PATH")
+        start = time.perf_counter()
+        self.inferencer = TopicInferencer.load(self.model_path, os.getenv("TOPIC_DICTIONARY_PATH") or None,
+                                               top_keywords)
+        self.load_seconds = time.perf_counter() - start
+        self.top_keywords = top_keywords
+        self._lock = threading.Lock()
+        self._documents = 0
+        self._passes = 0
+        self._seconds = 0.0
+    
+    def infer(self, documents: List[DocumentInput], top_keywords: Optional[int] = None,
+              include_distribution: bool = False) -> List[Dict[str, Any]]:
+        """Topics for every document; CPU-bound, so async callers should use ``ainfer``"""
+        if not documents:
+            return []
+        start = time.perf_counter()
+        results = self.inferencer.infer(documents, top_keywords, include_distribution)
+        elapsed = time.perf_counter() - start
+        
+        TOPIC_INFER_LATENCY.observe(elapsed)
+        TOPIC_BATCH_SIZE.observe(len(documents))
+        TOPIC_DOCUMENTS.inc(len(documents))
+        with self._lock:
+            self._documents += len(documents)
+            self._passes += 1
+            self._seconds += elapsed
+        return results
+    
+    async def ainfer(self, documents: List[DocumentInput], top_keywords: Optional[int] = None,
+                     include_distribution: bool = False) -> List[Dict[str, Any]]:
+        """``infer`` on a worker thread so the event loop keeps serving other requests"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.infer, documents, top_keywords, include_distribution)
+    
+    def topics(self, top_keywords: Optional[int] = None) -> List[Dict[str, Any]]:
+        return [{"topic_id": topic, "keywords": self.inferencer.keywords(topic, top_keywords)}
+                for topic in range(self.inferencer.num_topics)]
+    
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "model_path": self.model_path,
+            "num_topics": self.inferencer.num_topics,
+            "vocabulary": len(self.inferencer.word_index),
+            "load_seconds": round(self.load_seconds, 3),
+            "documents_inferred": self._documents,
+            "inference_passes": self._passes,
+            "avg_ms_per_document": round(self._seconds * 1000 / self._documents, 4) if self._documents else 0.0
+        }
+
+_shared_service: Optional[TopicInferenceService] = None
+_shared_lock = threading.Lock()
+
+def get_topic_inference() -> TopicInferenceService:
+    """Process-wide topic inference, configured from the environment (raises if the model cannot be loaded)"""
+    global _shared_service
+    if _shared_service is None:
+        with _shared_lock:
+            if _shared_service is None:
+                _shared_service = TopicInferenceService(top_keywords=int(os.getenv("TOPIC_KEYWORDS", "10")))
+    return _shared_service
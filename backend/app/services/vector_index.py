@@ -0,0 +1,307 @@
+import hashlib
+import json
+import math
+import os
+import zlib
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.services.context_builder import query_terms
+
+@dataclass
+class KnowledgeChunk:
+    """One retrievable unit of the knowledge base"""
+    chunk_id: str
+    text: str
+    metadata: Dict[str, Any] = field(default_factory=dict)
+    
+    @property
+    def content_hash(self) -> str:
+        payload = self.text + json.dumps(self.metadata, sort_keys=True, default=str)
+        return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+class HashingEmbedder:
+    """Dependency-free embedder using the hashing trick.
+
+    Words, word bigrams and character trigrams are hashed into a fixed-size
+    signed vector with sublinear term frequency, then L2-normalized. crc32 is
+    used instead of ``hash()`` so vectors are stable across processes and can
+    be persisted.
+    """
+    
+    def __init__(self, dim: int = 1024, char_ngram: int = 3, char_weight: float = 0.35):
+        self.dim = dim
+        self.char_ngram = char_ngram
+        self.char_weight = char_weight
+        self.name = f"hashing-{dim}-c{char_ngram}"
+    
+    def _features(self, text: str) -> Dict[str, float]:
+        words = query_terms(text)
+        features: Dict[str, float] = {}
+        for word in words:
+            features["w:" + word] = features.get("w:" + word, 0.0) + 1.0
+            padded = f"<{word}>"
+            for i in range(len(padded) - self.char_ngram + 1):
+                gram = "c:" + padded[i:i + self.char_ngram]
+                features[gram] = features.get(gram, 0.0) + self.char_weight
+        for first, second in zip(words, words[1:]):
+            bigram = f"b:{first}_{second}"
+            features[bigram] = features.get(bigram, 0.0) + 1.0
+        return features
+    
+    def embed(self, texts: List[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature, weight in self._features(text).items():
+                h = zlib.crc32(feature.encode("utf-8"))
+                sign = 1.0 if h & 0x80000000 else -1.0
+                vectors[row, h % self.dim] += sign * (1.0 + math.log(weight) if weight >= 1 else weight)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+class SentenceTransformerEmbedder:
+    """Small local sentence-transformers model (optional dependency)"""
+    
+    def __init__(self, model_name: str = "all-MiniLM-L6-v2"):
+        from sentence_transformers import SentenceTransformer
+        self.model = SentenceTransformer(model_name, device="cpu")
+        self.dim = self.model.get_sentence_embedding_dimension()
+        self.name = f"st-{model_name}"
+    
+    def embed(self, texts: List[str]) -> np.ndarray:
+        vectors = self.model.encode(texts, batch_size=64, normalize_embeddings=True, show_progress_bar=False)
+        return np.asarray(vectors, dtype=np.float32)
+
+def get_embedder():
+    """Embedder selected by KB_EMBEDDER ("hashing" or "sentence-transformers")"""
+    if os.getenv("KB_EMBEDDER", "hashing") == "sentence-transformers":
+        try:
+            return SentenceTransformerEmbedder(os.getenv("KB_EMBEDDER_MODEL", "all-MiniLM-L6-v2"))
+        except Exception as e:
+            print(f"⚠️ sentence-transformers unavailable ({e}), falling back to hashing embedder")
+    return HashingEmbedder()
+
+class VectorIndex:
+    """Cosine-similarity index over knowledge chunks with an optional IVF layer.
+
+    Small indexes are searched exactly with a single matrix-vector product.
+    Above ``ivf_threshold`` vectors, an inverted-file index (spherical k-means
+    centroids) restricts each search to the ``nprobe`` closest lists. Upserts
+    re-embed only chunks whose content changed, and new vectors are assigned
+    to the existing centroids until the index doubles in size.
+    """
+    
+    def __init__(self, embedder=None, index_dir: Optional[str] = None,
+                 ivf_threshold: int = 4096, nprobe: int = 8):
+        self.embedder = embedder or get_embedder()
+        self.index_dir = Path(index_dir) if index_dir else None
+        self.ivf_threshold = ivf_threshold
+        self.nprobe = nprobe
+        self.ids: List[str] = []
+        self.texts: List[str] = []
+        self.metadata: List[Dict[str, Any]] = []
+        self.hashes: List[str] = []
+        self.vectors = np.zeros((0, self.embedder.dim), dtype=np.float32)
+        self._positions: Dict[str, int] = {}
+        self._centroids: Optional[np.ndarray] = None
+        self._assignments: Optional[np.ndarray] = None
+        self._trained_size = 0
+        self._lists: Optional[Tuple[np.ndarray, np.ndarray]] = None
+    
+    def __len__(self) -> int:
+        return len(self.ids)
+    
+    def upsert(self, chunks: List[KnowledgeChunk]) -> Dict[str, int]:
+        """Insert new chunks and re-embed changed ones; unchanged chunks are skipped"""
+        counts = {"added": 0, "updated": 0, "unchanged": 0}
+        pending: Dict[str, KnowledgeChunk] = {}
+        for chunk in chunks:
+            position = self._positions.get(chunk.chunk_id)
+            if position is not None and self.hashes[position] == chunk.content_hash:
+                counts["unchanged"] += 1
+            else:
+                pending[chunk.chunk_id] = chunk
+        if not pending:
+            return counts
+        
+        to_embed = list(pending.values())
+        vectors = self.embedder.embed([chunk.text for chunk in to_embed])
+        new_rows = []
+        for chunk, vector in zip(to_embed, vectors):
+            position = self._positions.get(chunk.chunk_id)
+            if position is None:
+                self._positions[chunk.chunk_id] = len(self.ids)
+                self.ids.append(chunk.chunk_id)
+                self.texts.append(chunk.text)
+                self.metadata.append(chunk.metadata)
+                self.hashes.append(chunk.content_hash)
+                new_rows.append(vector)
+                counts["added"] += 1
+            else:
+                self.texts[position] = chunk.text
+                self.metadata[position] = chunk.metadata
+                self.hashes[position] = chunk.content_hash
+                self.vectors[position] = vector
+                if self._assignments is not None:
+                    self._assignments[position] = self._nearest_centroid(vector[None, :])[0]
+                counts["updated"] += 1
+        
+        if new_rows:
+            added = np.vstack(new_rows).astype(np.float32)
+            self.vectors = np.vstack([self.vectors, added])
+            if self._assignments is not None:
+                self._assignments = np.concatenate([self._assignments, self._nearest_centroid(added)])
+        self._lists = None
+        return counts
+    
+    def delete(self, chunk_ids: List[str]) -> int:
+        """Remove chunks by id, returning how many were present"""
+        doomed = {self._positions[cid] for cid in chunk_ids if cid in self._positions}
+        if not doomed:
+            return 0
+        keep = np.array([i for i in range(len(self.ids)) if i not in doomed], dtype=np.int64)
+        self.ids = [self.ids[i] for i in keep]
+        self.texts = [self.texts[i] for i in keep]
+        self.metadata = [self.metadata[i] for i in keep]
+        self.hashes = [self.hashes[i] for i in keep]
+        self.vectors = self.vectors[keep]
+        if self._assignments is not None:
+            self._assignments = self._assignments[keep]
+        self._positions = {cid: i for i, cid in enumerate(self.ids)}
+        self._lists = None
+        return len(doomed)
+    
+    def search(self, query: str, k: int = 5, exact: bool = False) -> List[Tuple[KnowledgeChunk, float]]:
+        """Top-k chunks by cosine similarity to the query"""
+        if not self.ids:
+            return []
+        return self.search_vector(self.embedder.embed([query])[0], k, exact)
+    
+    def search_vector(self, vector: np.ndarray, k: int = 5, exact: bool = False) -> List[Tuple[KnowledgeChunk, float]]:
+        k = min(k, len(self.ids))
+        if exact or len(self.ids) < self.ivf_threshold:
+            candidates = None
+            scores = self.vectors @ vector
+        else:
+            candidates = self._probe(vector)
+            scores = self.vectors[candidates] @ vector
+            k = min(k, len(candidates))
+        
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        rows = top if candidates is None else candidates[top]
+        return [
+            (KnowledgeChunk(self.ids[row], self.texts[row], self.metadata[row]), float(score))
+            for row, score in zip(rows, scores[top])
+        ]
+    
+    def _probe(self, vector: np.ndarray) -> np.ndarray:
+        """Row ids in the ``nprobe`` inverted lists closest to ``vector``"""
+        if self._centroids is None or len(self.ids) > 2 * self._trained_size:
+            self._train_ivf()
+        if self._lists is None:
+            order = np.argsort(self._assignments, kind="stable")
+            offsets = np.searchsorted(self._assignments[order], np.arange(len(self._centroids) + 1))
+            self._lists = (order, offsets)
+        order, offsets = self._lists
+        nprobe = min(self.nprobe, len(self._centroids))
+        closest = np.argpartition(-(self._centroids @ vector), nprobe - 1)[:nprobe]
+        return np.concatenate([order[offsets[c]:offsets[c + 1]] for c in closest])
+    
+    def _train_ivf(self, iterations: int = 10, sample_size: int = 20000, seed: int = 0):
+        """Spherical k-means over a sample of the vectors (~sqrt(n) lists)"""
+        rng = np.random.default_rng(seed)
+        n = len(self.ids)
+        nlist = max(1, int(np.sqrt(n)))
+        sample = self.vectors[rng.choice(n, size=min(n, sample_size), replace=False)]
+        centroids = sample[rng.choice(len(sample), size=nlist, replace=False)].copy()
+        for _ in range(iterations):
+            labels = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, sample)
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            empty = norms[:, 0] == 0
+            sums[empty] = centroids[empty]
+            norms[empty] = 1.0
+            centroids = sums / norms
+        self._centroids = centroids.astype(np.float32)
+        self._assignments = self._nearest_centroid(self.vectors)
+        self._trained_size = n
+        self._lists = None
+    
+    def _nearest_centroid(self, vectors: np.ndarray) -> np.ndarray:
+        if self._centroids is None:
+            return np.zeros(len(vectors), dtype=np.int32)
+        assignments = np.empty(len(vectors), dtype=np.int32)
+        for start in range(0, len(vectors), 8192):
+            block = vectors[start:start + 8192]
+            assignments[start:start + len(block)] = np.argmax(block @ self._centroids.T, axis=1)
+        return assignments
+    
+    def save(self, index_dir: Optional[str] = None):
+        """Persist vectors and chunk records; files are swapped in atomically"""
+        target = Path(index_dir) if index_dir else self.index_dir
+        if target is None:
+            raise ValueError("No index directory configured")
+        target.mkdir(parents=True, exist_ok=True)
+        
+        arrays = {"vectors": self.vectors}
+        if self._centroids is not None:
+            arrays["centroids"] = self._centroids
+            arrays["assignments"] = self._assignments
+        tmp_arrays = target / "arrays.tmp.npz"
+        with open(tmp_arrays, "wb") as f:
+            np.savez(f, **arrays)
+        
+        records = {
+            "embedder": self.embedder.name,
+            "dim": self.embedder.dim,
+            "trained_size": self._trained_size,
+            "chunks": [
+                {"id": cid, "text": text, "metadata": meta, "hash": h}
+                for cid, text, meta, h in zip(self.ids, self.texts, self.metadata, self.hashes)
+            ]
+        }
+        tmp_records = target / "chunks.tmp.json"
+        with open(tmp_records, "w", encoding="utf-8") as f:
+            json.dump(records, f, ensure_ascii=False)
+        
+        os.replace(tmp_arrays, target / "arrays.npz")
+        os.replace(tmp_records, target / "chunks.json")
+    
+    def load(self, index_dir: Optional[str] = None) -> bool:
+        """Load a persisted index; returns False if missing or built by another embedder"""
+        source = Path(index_dir) if index_dir else self.index_dir
+        if source is None or not (source / "chunks.json").exists() or not (source / "arrays.npz").exists():
+            return False
+        try:
+            with open(source / "chunks.json", "r", encoding="utf-8") as f:
+                records = json.load(f)
+            if records.get("embedder") != self.embedder.name:
+                return False
+            with np.load(source / "arrays.npz") as arrays:
+                vectors = arrays["vectors"]
+                centroids = arrays["centroids"] if "centroids" in arrays else None
+                assignments = arrays["assignments"] if "assignments" in arrays else None
+        except Exception as e:
+            print(f"⚠️ Could not load vector index from {source}: {e}")
+            return False
+        
+        chunks = records["chunks"]
+        if len(chunks) != len(vectors):
+            return False
+        self.ids = [c["id"] for c in chunks]
+        self.texts = [c["text"] for c in chunks]
+        self.metadata = [c["metadata"] for c in chunks]
+        self.hashes = [c["hash"] for c in chunks]
+        self.vectors = vectors.astype(np.float32)
+        self._positions = {cid: i for i, cid in enumerate(self.ids)}
+        self._centroids = centroids
+        self._assignments = assignments
+        self._trained_size = records.get("trained_size", 0)
+        self._lists = None
+        return True
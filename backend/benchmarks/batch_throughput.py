@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Batch chat throughput with a stubbed LLM
+
+For each batch size, compares looping one POST /api/chat/business per query
+(how regression runs and report generation worked before) against a single
+POST /api/chat/batch, optionally with a share of duplicate queries. The app
+runs in-process behind httpx's ASGI transport. Requires httpx.
+
+    python benchmarks/batch_throughput.py --sizes 1 10 50 200 --latency 0.05 --concurrency 8 --duplicates 0.25
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+from typing import List
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+os.environ.setdefault("GOOGLE_API_KEY", "stub-key")
+
+import httpx
+
+from benchmarks.stub_llm import StubLLM
+
+TEMPLATES = [
+    "What drives engagement for {} videos?",
+    "Which publishing time works best for {} content?",
+    "How should we position {} products in titles?",
+    "What do comments say about {}?"
+]
+SUBJECTS = ["makeup", "skincare", "hair care", "lipstick", "fragrance", "nail art", "haircolor", "sunscreen"]
+
+def make_queries(n: int, duplicate_share: float, run: str) -> List[str]:
+    """``n`` queries of which roughly ``duplicate_share`` repeat an earlier one"""
+    rng = random.Random(n)
+    queries: List[str] = []
+    for i in range(n):
+        if queries and rng.random() < duplicate_share:
+            queries.append(rng.choice(queries))
+        else:
+            template = TEMPLATES[i % len(TEMPLATES)]
+            queries.append(f"{template.format(SUBJECTS[i % len(SUBJECTS)])} [{run}-{i}]")
+    return queries
+
+async def run_loop(client: httpx.AsyncClient, queries: List[str]) -> float:
+    start = time.perf_counter()
+    for query in queries:
+        response = await client.post("/api/chat/business", json={"query": query})
+        response.raise_for_status()
+    return time.perf_counter() - start
+
+async def run_batch(client: httpx.AsyncClient, queries: List[str], concurrency: int):
+    start = time.perf_counter()
+    response = await client.post("/api/chat/batch", json={
+        "agent_type": "business",
+        "items": [{"query": q} for q in queries],
+        "max_concurrency": concurrency
+    })
+    response.raise_for_status()
+    return time.perf_counter() - start, response.json()["summary"]
+
+async def main_async(args):
+    import main as backend
+    
+    if not backend.AGENTS_AVAILABLE:
+        print("❌ Agents could not be initialized; check backend dependencies")
+        sys.exit(1)
+    
+    stub = StubLLM(latency=args.latency)
+    backend.business_agent.llm = stub
+    backend.dashboard_agent.llm = stub
+    cache = backend.get_response_cache()
+    
+    transport = httpx.ASGITransport(app=backend.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        # Warm the knowledge base so the first measurement does not pay the load
+        await client.post("/api/chat/business", json={"query": "warm up"})
+        
+        print(f"🚀 stub latency {args.latency * 1000:.0f}ms, batch concurrency {args.concurrency}, "
+              f"duplicates {args.duplicates:.0%}")
+        print(f"{'size':>6} {'loop q/s':>10} {'batch q/s':>10} {'speedup':>8} {'llm calls':>10} {'dedup':>6}")
+        for size in args.sizes:
+            cache.clear()
+            loop_time = await run_loop(client, make_queries(size, 0.0, f"loop{size}"))
+            cache.clear()
+            batch_time, summary = await run_batch(client, make_queries(size, args.duplicates, f"batch{size}"),
+                                                  args.concurrency)
+            llm_calls = summary["unique"] - summary["cached"] - summary["errors"]
+            print(f"{size:>6} {size / loop_time:>10.1f} {size / batch_time:>10.1f} "
+                  f"{loop_time / batch_time:>7.1f}x {llm_calls:>10} {summary['deduplicated']:>6}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Batch chat throughput with a stub LLM")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 10, 50, 200])
+    parser.add_argument("--latency", type=float, default=0.05, help="Stub LLM latency in seconds")
+    parser.add_argument("--concurrency", type=int, default=8, help="Batch max_concurrency")
+    parser.add_argument("--duplicates", type=float, default=0.25, help="Share of repeated queries in the batch")
+    args = parser.parse_args()
+    
+    # Let the batch's own limit be the bottleneck rather than the shared pool
+    os.environ.setdefault("LLM_MAX_CONCURRENCY", str(max(args.concurrency, 8)))
+    asyncio.run(main_async(args))
+
+if __name__ == "__main__":
+    main()
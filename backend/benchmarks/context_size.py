@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Prompt-size comparison: legacy full knowledge dump vs token-budgeted context
+
+Runs a fixed query set through KnowledgeBaseService and reports the estimated
+knowledge-base tokens per prompt for the old ``json.dumps(get_context_for_query(), indent=2)``
+and for ``build_context``, plus which sections were packed for each query.
+
+    python benchmarks/context_size.py --budget 1200 --sections
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from app.services.context_builder import estimate_tokens
+from app.services.knowledge_base import KnowledgeBaseService
+
+QUERIES = [
+    "What does the coherence score mean?",
+    "What are the top topics and their keywords?",
+    "Show me examples of spam comments",
+    "When is the best time to publish a video?",
+    "Which video durations get the most views?",
+    "How are engagement metrics correlated?",
+    "How did comment quality trend over 2024?",
+    "Which channels perform best?",
+    "What words should I use in my video titles?",
+    "What tech stack is the dashboard built with?",
+    "How accurate is the spam detection model?",
+    "Give me a marketing strategy for skincare content"
+]
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare prompt knowledge size before/after budgeting")
+    parser.add_argument("--budget", type=int, default=None, help="Token budget (default: KB_CONTEXT_TOKEN_BUDGET)")
+    parser.add_argument("--sections", action="store_true", help="Print per-section token usage")
+    args = parser.parse_args()
+    
+    kb = KnowledgeBaseService()
+    kb.load_frontend_data()
+    
+    total_legacy = total_new = 0
+    legacy_time = new_time = 0.0
+    print(f"{'query':<52} {'legacy':>8} {'budgeted':>9} {'saved':>7}")
+    
+    for query in QUERIES:
+        start = time.perf_counter()
+        legacy = json.dumps(kb.get_context_for_query(query), indent=2)
+        legacy_time += time.perf_counter() - start
+        
+        start = time.perf_counter()
+        assembled = kb.build_context(query, token_budget=args.budget)
+        new_time += time.perf_counter() - start
+        
+        legacy_tokens = estimate_tokens(legacy)
+        total_legacy += legacy_tokens
+        total_new += assembled.tokens_used
+        saved = 1 - assembled.tokens_used / legacy_tokens
+        print(f"{query[:50]:<52} {legacy_tokens:>8,} {assembled.tokens_used:>9,} {saved:>6.0%}")
+        
+        if args.sections:
+            for name, tokens in assembled.section_tokens.items():
+                print(f"    {name:<40} {tokens:>6,}")
+    
+    n = len(QUERIES)
+    print()
+    print(f"📊 Mean knowledge tokens per prompt: legacy {total_legacy / n:,.0f} -> budgeted {total_new / n:,.0f} "
+          f"({1 - total_new / total_legacy:.0%} smaller)")
+    print(f"⏱  Mean assembly time: legacy {legacy_time / n * 1000:.2f}ms, budgeted {new_time / n * 1000:.2f}ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Load test for the chat endpoints with a stubbed LLM
+
+Compares the legacy handler (sync process_query inside an async endpoint, which
+blocks the event loop) against the async agent path. The real FastAPI app runs
+under uvicorn in a background thread and is driven over HTTP. Requires httpx.
+
+    python benchmarks/load_test.py --requests 200 --concurrency 50 --latency 0.2 --pool-size 32
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import threading
+import time
+from typing import Dict, List
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+os.environ.setdefault("GOOGLE_API_KEY", "stub-key")
+
+import httpx
+import uvicorn
+
+from benchmarks.stub_llm import StubLLM
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of a list of latencies"""
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+def start_server(app, port: int) -> uvicorn.Server:
+    """Serve ``app`` from a daemon thread so the client loop stays independent"""
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+async def run_load(base_url: str, path: str, total: int, concurrency: int) -> Dict[str, float]:
+    """Fire ``total`` requests at ``path`` with ``concurrency`` in flight"""
+    latencies: List[float] = []
+    statuses: Dict[int, int] = {}
+    semaphore = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    
+    async with httpx.AsyncClient(base_url=base_url, timeout=None, limits=limits) as client:
+        async def one(i: int):
+            async with semaphore:
+                start = time.perf_counter()
+                response = await client.post(path, json={"query": f"What are the top topics? #{i}"})
+                latencies.append(time.perf_counter() - start)
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+        
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(total)))
+        elapsed = time.perf_counter() - start
+    
+    return {
+        "requests": total,
+        "rps": total / elapsed,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "ok": statuses.get(200, 0),
+        "rejected": statuses.get(503, 0)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Chat endpoint load test with a stub LLM")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.2, help="Stub LLM latency in seconds")
+    parser.add_argument("--pool-size", type=int, default=None, help="Override LLM_MAX_CONCURRENCY")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+    
+    if args.pool_size:
+        os.environ["LLM_MAX_CONCURRENCY"] = str(args.pool_size)
+        os.environ.setdefault("LLM_MAX_QUEUE", str(args.requests))
+    
+    import main as backend
+    
+    if not backend.AGENTS_AVAILABLE:
+        print("❌ Agents could not be initialized; check backend dependencies")
+        sys.exit(1)
+    
+    stub = StubLLM(latency=args.latency)
+    backend.business_agent.llm = stub
+    backend.dashboard_agent.llm = stub
+    
+    # The pre-async handler, kept here only as the "before" baseline
+    @backend.app.post("/bench/blocking")
+    async def blocking_chat(request: dict):
+        response = backend.business_agent.process_query(request.get("query", ""))
+        return {"response": response, "status": "success"}
+    
+    start_server(backend.app, args.port)
+    base_url = f"http://127.0.0.1:{args.port}"
+    pool = backend.get_llm_pool()
+    print(f"🚀 {args.requests} requests, {args.concurrency} concurrent, stub latency {args.latency * 1000:.0f}ms")
+    print(f"   LLM pool: max_concurrency={pool.max_concurrency}, max_queue={pool.max_queue}")
+    print()
+    print(f"{'mode':<10} {'req/s':>8} {'p50 ms':>9} {'p99 ms':>9} {'ok':>6} {'503':>6}")
+    
+    for mode, path in [("blocking", "/bench/blocking"), ("async", "/api/chat/business")]:
+        result = asyncio.run(run_load(base_url, path, args.requests, args.concurrency))
+        print(f"{mode:<10} {result['rps']:>8.1f} {result['p50_ms']:>9.0f} {result['p99_ms']:>9.0f} "
+              f"{result['ok']:>6} {result['rejected']:>6}")
+
+if __name__ == "__main__":
+    main()
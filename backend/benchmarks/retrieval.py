@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Retrieval benchmark for the knowledge-base vector index
+
+1. Quality: recall@k and MRR on labelled queries over the real knowledge chunks.
+2. Latency: per-query search time (embedding + scoring) on the real index.
+3. Maintenance: cold build, load from disk, and incremental upsert times.
+4. Scale: IVF vs exact search on a synthetic corpus built by jittering the
+   real chunk vectors, reporting latency and recall@k against exact search.
+
+    python benchmarks/retrieval.py --k 5 --scale 100000 --nprobe 8
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from typing import List
+
+import numpy as np
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from app.services.knowledge_base import KnowledgeBaseService
+from app.services.vector_index import HashingEmbedder, KnowledgeChunk, VectorIndex
+
+# (query, chunk ids that answer it)
+LABELLED_QUERIES = [
+    ("When is the best hour to publish a video?", {"benchmark:optimal_publishing_hours"}),
+    ("Which weekday has the best like to view ratio?", {"benchmark:like_to_view_ratio_by_day"}),
+    ("Show me examples of spam comments", {"comment:spam:spam_001", "comment:spam:spam_002", "comment:spam:spam_003",
+                                           "comment:spam:spam_004", "comment:spam:spam_005", "comment:spam:spam_006",
+                                           "comment:spam:779733"}),
+    ("What are the keywords of the skincare routines topic?", {"dashboard_topic:14", "topic:14"}),
+    ("Which topic covers lipstick colors and shades?", {"dashboard_topic:5", "topic:5"}),
+    ("Korean secret glowing skin mask video", {"video:top_by_views:14688"}),
+    ("How did the LDA coherence score change with the number of topics?", {"summary:coherence_optimization"}),
+    ("What is the tech stack of the dashboard?", {"summary:technical_architecture"}),
+    ("How strongly are likes correlated with views?", {"benchmark:engagement_correlations"}),
+    ("Which video durations have the highest median views?", {"benchmark:median_views_by_duration"}),
+    ("What tags are most common?", {"benchmark:most_common_tags"}),
+    ("Which channels are the top performers?", {"benchmark:top_channels"}),
+    ("Which languages get the most views?", {"benchmark:view_distribution_by_language"}),
+    ("What title words perform well?", {"benchmark:high_performing_title_words"}),
+    ("How many spam comments were there in December 2024?", {"trend:Dec 2024"}),
+    ("How accurate is the spam detection model?", {"summary:model_performance"}),
+    ("Hair care and styling topic", {"dashboard_topic:20", "topic:20"}),
+    ("Which videos are viral?", {"benchmark:viral_videos"})
+]
+
+def percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered) + 0.5)) - 1))]
+
+def quality_and_latency(index: VectorIndex, k: int, repeats: int):
+    hits_at = {1: 0, 3: 0, k: 0}
+    reciprocal_ranks = []
+    for query, relevant in LABELLED_QUERIES:
+        ids = [chunk.chunk_id for chunk, _ in index.search(query, max(k, 10))]
+        rank = next((i + 1 for i, cid in enumerate(ids) if cid in relevant), None)
+        reciprocal_ranks.append(1 / rank if rank else 0.0)
+        for cutoff in hits_at:
+            hits_at[cutoff] += bool(rank and rank <= cutoff)
+        if not rank or rank > k:
+            print(f"   miss: {query!r} -> {ids[:3]}")
+
+    n = len(LABELLED_QUERIES)
+    print(f"📊 Quality on {n} labelled queries over {len(index)} chunks:")
+    print("   " + "  ".join(f"recall@{c}={hits_at[c] / n:.2f}" for c in sorted(hits_at)) +
+          f"  MRR={sum(reciprocal_ranks) / n:.3f}")
+
+    latencies = []
+    for _ in range(repeats):
+        for query, _ in LABELLED_QUERIES:
+            start = time.perf_counter()
+            index.search(query, k)
+            latencies.append(time.perf_counter() - start)
+    print(f"⏱  Search latency (embed + score): p50 {percentile(latencies, 50) * 1000:.3f}ms, "
+          f"p99 {percentile(latencies, 99) * 1000:.3f}ms")
+
+def maintenance(chunks: List[KnowledgeChunk]):
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        index = VectorIndex(HashingEmbedder(), index_dir=tmp)
+        index.upsert(chunks)
+        index.save()
+        build = time.perf_counter() - start
+
+        start = time.perf_counter()
+        reloaded = VectorIndex(HashingEmbedder(), index_dir=tmp)
+        reloaded.load()
+        load = time.perf_counter() - start
+
+        changed = [KnowledgeChunk(c.chunk_id, c.text + " updated", c.metadata) for c in chunks[:5]]
+        start = time.perf_counter()
+        counts = reloaded.upsert(chunks[5:] + changed)
+        reloaded.save()
+        upsert = time.perf_counter() - start
+    print(f"🧱 Cold build + save {build * 1000:.1f}ms, load {load * 1000:.1f}ms, "
+          f"incremental upsert + save {upsert * 1000:.1f}ms ({counts})")
+
+def scale(index: VectorIndex, size: int, k: int, nprobe: int, queries: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    base = index.vectors
+    picks = rng.integers(0, len(base), size=size)
+    vectors = base[picks] + rng.normal(0, 0.02, size=(size, base.shape[1])).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    big = VectorIndex(index.embedder, nprobe=nprobe)
+    big.ids = [f"synthetic:{i}" for i in range(size)]
+    big.texts = [""] * size
+    big.metadata = [{}] * size
+    big.hashes = [""] * size
+    big.vectors = vectors.astype(np.float32)
+    big._positions = {cid: i for i, cid in enumerate(big.ids)}
+
+    start = time.perf_counter()
+    big._train_ivf()
+    train = time.perf_counter() - start
+
+    query_vectors = index.embedder.embed([q for q, _ in LABELLED_QUERIES])
+    query_vectors = query_vectors[rng.integers(0, len(query_vectors), size=queries)]
+    exact_times, ivf_times, recalls = [], [], []
+    for vector in query_vectors:
+        start = time.perf_counter()
+        exact = {c.chunk_id for c, _ in big.search_vector(vector, k, exact=True)}
+        exact_times.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        approx = {c.chunk_id for c, _ in big.search_vector(vector, k)}
+        ivf_times.append(time.perf_counter() - start)
+        recalls.append(len(exact & approx) / k)
+
+    print(f"📈 Scale test: {size:,} vectors, {len(big._centroids)} lists, nprobe={nprobe} (IVF train {train:.2f}s)")
+    print(f"   exact p50 {percentile(exact_times, 50) * 1000:.2f}ms | IVF p50 {percentile(ivf_times, 50) * 1000:.2f}ms "
+          f"| IVF recall@{k} vs exact {np.mean(recalls):.3f}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Vector index retrieval benchmark")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--repeats", type=int, default=50, help="Latency repetitions over the query set")
+    parser.add_argument("--scale", type=int, default=100000, help="Synthetic corpus size (0 to skip)")
+    parser.add_argument("--nprobe", type=int, default=8)
+    parser.add_argument("--scale-queries", type=int, default=200)
+    args = parser.parse_args()
+
+    kb = KnowledgeBaseService()
+    kb.load_frontend_data()
+    chunks = kb.get_knowledge_chunks()
+    index = VectorIndex(HashingEmbedder())
+    index.upsert(chunks)
+
+    print()
+    quality_and_latency(index, args.k, args.repeats)
+    maintenance(chunks)
+    if args.scale:
+        scale(index, args.scale, args.k, args.nprobe, args.scale_queries)
+
+if __name__ == "__main__":
+    main()
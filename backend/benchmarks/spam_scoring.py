@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Spam scoring latency and throughput
+
+Part 1 posts batches of 1-10k comments to POST /api/spam/score and reports
+latency and comments/sec per batch size. Part 2 fires N concurrent
+single-comment requests and compares them with the same requests sent one
+at a time, showing what micro-batching does under load. The app runs
+in-process behind httpx's ASGI transport. Comments come from the synthetic
+generator in pipeline/benchmarks. Requires httpx.
+
+    python benchmarks/spam_scoring.py --sizes 1 10 100 1000 10000 --concurrent 200
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+import warnings
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.append(os.path.dirname(BACKEND_DIR))
+os.environ.setdefault("GOOGLE_API_KEY", "stub-key")
+warnings.filterwarnings("ignore")
+
+import httpx
+
+from pipeline.benchmarks.sample_comments import make_comments
+
+def sample_comments(n: int, seed: int):
+    frame = make_comments(n, seed=seed)
+    # The API takes text for every comment; missing text scores the same as an empty string
+    frame["textOriginal"] = frame["textOriginal"].fillna("")
+    return [
+        {key: (None if value is None or value != value else value) for key, value in row.items()}
+        for row in frame[["textOriginal", "likeCount", "parentCommentId", "publishedAt"]].to_dict("records")
+    ]
+
+async def post(client: httpx.AsyncClient, payload):
+    response = await client.post("/api/spam/score", json=payload)
+    response.raise_for_status()
+    return response.json()
+
+async def main_async(args):
+    import main as backend
+    
+    transport = httpx.ASGITransport(app=backend.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        await post(client, {"comment": "warm up"})
+        
+        print("📦 Batch requests")
+        print(f"{'size':>6} {'p50 ms':>9} {'max ms':>9} {'comments/s':>11}")
+        for size in args.sizes:
+            comments = sample_comments(size, seed=size)
+            timings = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                await post(client, {"comments": comments})
+                timings.append(time.perf_counter() - start)
+            p50 = statistics.median(timings)
+            print(f"{size:>6} {p50 * 1000:>9.1f} {max(timings) * 1000:>9.1f} {size / p50:>11,.0f}")
+        
+        singles = sample_comments(args.concurrent, seed=7)
+        print(f"\n🔄 {args.concurrent} single-comment requests")
+        start = time.perf_counter()
+        for comment in singles:
+            await post(client, {"comment": comment})
+        sequential = time.perf_counter() - start
+        
+        before = backend.load_scorer().stats()
+        
+        async def timed(comment):
+            t = time.perf_counter()
+            await post(client, {"comment": comment})
+            return time.perf_counter() - t
+        
+        start = time.perf_counter()
+        latencies = await asyncio.gather(*(timed(c) for c in singles))
+        concurrent = time.perf_counter() - start
+        after = backend.load_scorer().stats()
+        passes = after["micro_batches"] - before["micro_batches"]
+        
+        print(f"  one at a time: {args.concurrent / sequential:>9,.0f} req/s")
+        print(f"  concurrent:    {args.concurrent / concurrent:>9,.0f} req/s, p50 "
+              f"{statistics.median(latencies) * 1000:.1f}ms, {passes} scoring passes "
+              f"(avg {args.concurrent / max(passes, 1):.1f} comments each)")
+
+def main():
+    parser = argparse.ArgumentParser(description="Spam scoring latency and throughput")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 10, 100, 1000, 10000])
+    parser.add_argument("--repeat", type=int, default=5, help="Requests per batch size")
+    parser.add_argument("--concurrent", type=int, default=200, help="Concurrent single-comment requests")
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+import asyncio
+import time
+from typing import Optional
+
+class StubMessage:
+    """Mimics the AIMessage returned by ChatGoogleGenerativeAI"""
+    
+    def __init__(self, content: str):
+        self.content = content
+
+class StubLLM:
+    """Stand-in for ChatGoogleGenerativeAI with a fixed, configurable latency.
+    
+    ``invoke`` blocks the calling thread like the real client's sync path;
+    ``ainvoke`` and ``astream`` yield to the event loop like its async path.
+    """
+    
+    def __init__(self, latency: float = 0.2, reply: Optional[str] = None):
+        self.latency = latency
+        self.reply = reply or (
+            "Hair Care & Styling leads with **23.1%** of videos. "
+            "Makeup Tutorials follow at 17.0%. Would you like the keyword breakdown?"
+        )
+        self.calls = 0
+    
+    def invoke(self, prompt) -> StubMessage:
+        self.calls += 1
+        time.sleep(self.latency)
+        return StubMessage(self.reply)
+    
+    async def ainvoke(self, prompt) -> StubMessage:
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        return StubMessage(self.reply)
+    
+    async def astream(self, prompt, chunk_size: int = 8):
+        """Yield the reply in small pieces, spreading the latency across them"""
+        self.calls += 1
+        pieces = [self.reply[i:i + chunk_size] for i in range(0, len(self.reply), chunk_size)]
+        for piece in pieces:
+            await asyncio.sleep(self.latency / len(pieces))
+            yield StubMessage(piece)
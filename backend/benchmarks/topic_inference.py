@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Topic inference latency per document
+
+Trains an LDA model with the stm.ipynb settings on synthetic pooled
+documents and saves it as stm.ipynb does (lda_model_gensim +
+lda_dictionary.dict). Then, for new documents at batch sizes 1, 100 and
+10k, it reports milliseconds per document for:
+- the notebook path: ``simple_preprocess`` + ``doc2bow`` +
+  ``get_document_topics`` per document, as in ``get_dominant_topic``
+- ``TopicInferencer.infer`` (pipeline/topic_inference.py), one batched
+  E-step
+- POST /api/topics/infer, in-process behind httpx's ASGI transport
+
+Both paths start from the same random state. The benchmark reports the
+largest difference in the dominant topic's probability and the share of
+documents whose dominant topic agrees, over documents with dictionary
+words (the others get topic -1 rather than gensim's prior-driven
+topic, and are counted separately). Requires httpx.
+
+    python benchmarks/topic_inference.py --sizes 1 100 10000 --topics 26
+"""
+
+import argparse
+import asyncio
+import copy
+import os
+import statistics
+import sys
+import tempfile
+import time
+import warnings
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.append(os.path.dirname(BACKEND_DIR))
+os.environ.setdefault("GOOGLE_API_KEY", "stub-key")
+warnings.filterwarnings("ignore")
+
+import httpx
+import numpy as np
+from gensim import models
+from gensim.utils import simple_preprocess
+
+from pipeline.benchmarks.sample_comments import make_pooled_documents
+from pipeline.topic_inference import TopicInferencer
+from pipeline.topic_selection import LDA_PARAMS, build_corpus
+
+def notebook_topics(ldamodel, dictionary, documents):
+    """(dominant topic, probability) per document, one get_document_topics call each"""
+    results = []
+    for document in documents:
+        doc = dictionary.doc2bow(simple_preprocess(document, deacc=True, min_len=2, max_len=15))
+        topic_distribution = ldamodel.get_document_topics(doc)
+        if topic_distribution:
+            results.append(max(topic_distribution, key=lambda x: x[1]))
+        else:
+            results.append((-1, 0.0))
+    return results
+
+def median_seconds(run, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+async def api_seconds(client: httpx.AsyncClient, documents, repeat: int) -> float:
+    payload = {"document": documents[0]} if len(documents) == 1 else {"documents": documents}
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        response = await client.post("/api/topics/infer", json=payload)
+        response.raise_for_status()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+async def main_async(args, model_path: str):
+    os.environ["TOPIC_MODEL_PATH"] = model_path
+    import main as backend
+    
+    inferencer = TopicInferencer.load(model_path)
+    model, dictionary = inferencer.model, inferencer.dictionary
+    transport = httpx.ASGITransport(app=backend.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        await api_seconds(client, ["warm up"], 1)
+        
+        print(f"{'batch':>6} {'notebook':>12} {'batched':>12} {'API':>12} {'speedup':>8} {'agree':>7} {'max diff':>9} {'empty':>6}")
+        for size in args.sizes:
+            documents = make_pooled_documents(size, seed=size + 1)
+            repeat = max(1, min(args.repeat, 1000 // size))
+            state = copy.deepcopy(model.random_state)
+            reference = notebook_topics(model, dictionary, documents)
+            model.random_state = copy.deepcopy(state)
+            batched = inferencer.infer(documents)
+            pairs = [(r, b) for r, b in zip(reference, batched) if b["known_tokens"]]
+            agree = np.mean([r[0] == b["dominant_topic"] for r, b in pairs])
+            diff = max(abs(float(r[1]) - b["probability"]) for r, b in pairs)
+            
+            notebook = median_seconds(lambda: notebook_topics(model, dictionary, documents), repeat)
+            batch = median_seconds(lambda: inferencer.infer(documents), repeat)
+            api = await api_seconds(client, documents, repeat)
+            print(f"{size:>6} {notebook * 1000 / size:>9.3f} ms {batch * 1000 / size:>9.3f} ms "
+                  f"{api * 1000 / size:>9.3f} ms {notebook / batch:>7.1f}x {agree:>7.1%} {diff:>9.1e} {size - len(pairs):>6}")
+        print(f"📊 {backend.load_topic_inference().stats()}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Topic inference latency per document")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 100, 10000])
+    parser.add_argument("--topics", type=int, default=26, help="Topics in the trained model")
+    parser.add_argument("--train", type=int, default=1000, help="Training documents")
+    parser.add_argument("--passes", type=int, default=2, help="LDA passes (latency does not depend on it)")
+    parser.add_argument("--repeat", type=int, default=20, help="Timed runs per batch size (fewer for big batches)")
+    args = parser.parse_args()
+    
+    _, dictionary, corpus = build_corpus(make_pooled_documents(args.train))
+    model = models.LdaModel(corpus=corpus, id2word=dictionary, num_topics=args.topics,
+                            **dict(LDA_PARAMS, passes=args.passes))
+    with tempfile.TemporaryDirectory() as model_dir:
+        model_path = os.path.join(model_dir, "lda_model_gensim")
+        model.save(model_path)
+        dictionary.save(os.path.join(model_dir, "lda_dictionary.dict"))
+        print(f"🧠 {args.topics} topics, {len(dictionary):,} words, trained on {args.train:,} documents")
+        asyncio.run(main_async(args, model_path))
+
+if __name__ == "__main__":
+    main()
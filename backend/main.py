@@ -1,6 +1,7 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
+import logging
 import os
 import sys
 
@@ -10,6 +11,17 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 # Load environment variables
 load_dotenv()
 
+from app.services.llm_pool import AgentOverloadedError, get_llm_pool
+from app.services.response_cache import get_response_cache
+from app.services.knowledge_base import get_knowledge_base
+from app.services.session_store import get_session_store
+from app.services.stage_timings import get_stage_timings
+from app.routes.sse import stream_agent_response, stream_static_response
+from app.routes.batch import validate_batch, run_batch
+from app.routes.instrumentation import instrument_app
+from app.routes.spam import load_scorer, score_request
+from app.routes.topics import infer_request, load_topic_inference
+
 # Import agents after setting up path
 try:
     from app.agents.business_agent import BusinessIntelligenceAgent
@@ -32,8 +44,13 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[os.getenv("REQUEST_ID_HEADER", "X-Request-ID")],
 )
 
+# Request trace ids, latency/error metrics and the Prometheus /metrics endpoint
+instrument_app(app)
+logger = logging.getLogger("loreai")
+
 @app.get("/")
 async def root():
     return {"message": "LOreAi Backend API is running!"}
@@ -42,6 +59,68 @@ async def root():
 async def health_check():
     return {"status": "healthy", "service": "LOreAi Backend"}
 
+@app.get("/api/agents/pool")
+async def llm_pool_status():
+    """Occupancy of the shared LLM worker pool"""
+    return get_llm_pool().stats()
+
+@app.get("/api/agents/timings")
+async def agent_stage_timings():
+    """Per-stage latency of agent requests (cache, context, serialize, render, llm, format)"""
+    return get_stage_timings().stats()
+
+@app.get("/api/cache/stats")
+async def response_cache_stats():
+    """Hit/miss counters of the shared agent response cache"""
+    return get_response_cache().stats()
+
+@app.post("/api/cache/clear")
+async def clear_response_cache():
+    """Drop every cached agent response"""
+    get_response_cache().clear()
+    return {"message": "Response cache cleared", "status": "success"}
+
+@app.get("/api/knowledge/stats")
+async def knowledge_base_stats():
+    """Version, load time and memory footprint of the shared knowledge base"""
+    return get_knowledge_base().metrics()
+
+@app.get("/api/sessions/stats")
+async def session_stats():
+    """Session counts and memory held by the conversation store"""
+    return get_session_store().stats()
+
+@app.delete("/api/sessions/{session_id}")
+async def clear_session(session_id: str):
+    """Forget one session's conversation memory"""
+    get_session_store().clear(session_id)
+    return {"message": f"Memory cleared for session {session_id}", "status": "success"}
+
+@app.post("/api/spam/score")
+async def spam_score(request: dict):
+    """Label one comment ({"comment": ...}) or a batch ({"comments": [...]}) as spam, quality or uncertain"""
+    return await score_request(request)
+
+@app.get("/api/spam/stats")
+async def spam_stats():
+    """Loaded spam model and scoring/micro-batching counters"""
+    return load_scorer().stats()
+
+@app.post("/api/topics/infer")
+async def topics_infer(request: dict):
+    """Dominant LDA topic and its keywords for one document ({"document": ...}) or a batch ({"documents": [...]})"""
+    return await infer_request(request)
+
+@app.get("/api/topics/keywords")
+async def topic_keywords(top_keywords: int = Query(10, ge=0)):
+    """Top keywords of every topic in the loaded LDA model"""
+    return {"topics": load_topic_inference().topics(top_keywords), "status": "success"}
+
+@app.get("/api/topics/stats")
+async def topics_stats():
+    """Loaded LDA model and inference counters"""
+    return load_topic_inference().stats()
+
 @app.get("/test")
 async def test_endpoint():
     return {
@@ -57,11 +136,33 @@ if AGENTS_AVAILABLE:
         dashboard_agent = DashboardExplanationAgent()
         print("AI Agents initialized successfully!")
     except Exception as e:
-        print(f"Error initializing agents: {e}")
+        logger.exception("Error initializing agents")
         AGENTS_AVAILABLE = False
 else:
     print("AI Agents not available - using fallback responses")
 
+# Load the spam model at startup rather than on the first request
+try:
+    load_scorer()
+    print("Spam model loaded successfully!")
+except HTTPException as e:
+    print(f"Spam scoring not available: {e.detail}")
+
+# Likewise the LDA model and dictionary for topic inference
+try:
+    load_topic_inference()
+    print("Topic model loaded successfully!")
+except HTTPException as e:
+    print(f"Topic inference not available: {e.detail}")
+
+def overloaded(e: AgentOverloadedError) -> HTTPException:
+    """503 telling the client to back off when the LLM queue is saturated"""
+    return HTTPException(
+        status_code=503,
+        detail=str(e),
+        headers={"Retry-After": str(int(max(1, e.retry_after)))}
+    )
+
 # Real AI Chat endpoints using actual agents
 @app.post("/api/chat/dashboard")
 async def dashboard_chat(request: dict):
@@ -69,9 +170,12 @@ async def dashboard_chat(request: dict):
     
     if AGENTS_AVAILABLE:
         try:
-            response = dashboard_agent.process_query(query)
+            response = await dashboard_agent.aprocess_query(query, session_id=request.get("session_id"))
             return {"response": response, "status": "success"}
+        except AgentOverloadedError as e:
+            raise overloaded(e)
         except Exception as e:
+            logger.exception("Dashboard chat failed")
             return {"response": f"Error processing query: {str(e)}", "status": "error"}
     
     # Intelligent fallback responses based on query content
@@ -105,12 +209,15 @@ async def business_chat(request: dict):
         if not query:
             return {"response": "Please provide a query.", "status": "error"}
         
-        response = business_agent.process_query(query)
+        response = await business_agent.aprocess_query(query, session_id=request.get("session_id"))
         return {
             "response": response,
             "status": "success"
         }
+    except AgentOverloadedError as e:
+        raise overloaded(e)
     except Exception as e:
+        logger.exception("Business chat failed")
         return {
             "response": f"Error processing business query: {str(e)}",
             "status": "error"
@@ -130,17 +237,75 @@ async def general_chat(request: dict):
             return {"response": "Please provide a query.", "status": "error"}
         
         # Use business agent for general queries
-        response = business_agent.process_query(query)
+        response = await business_agent.aprocess_query(query, session_id=request.get("session_id"))
         return {
             "response": response,
             "status": "success"
         }
+    except AgentOverloadedError as e:
+        raise overloaded(e)
     except Exception as e:
+        logger.exception("General chat failed")
         return {
             "response": f"Error processing general query: {str(e)}",
             "status": "error"
         }
 
+@app.post("/api/chat/batch")
+async def batch_chat(request: dict):
+    """Answer a list of queries in one call; results keep input order with per-item timing"""
+    if not AGENTS_AVAILABLE:
+        return {
+            "results": [],
+            "response": "AI agents are not available. Please check backend configuration.",
+            "status": "error"
+        }
+    
+    items = request.get("items", [])
+    max_concurrency = validate_batch(items, request.get("max_concurrency"))
+    # Same routing as the single-query endpoints: general queries go to the business agent
+    if request.get("agent_type") == "dashboard":
+        route = lambda query: (dashboard_agent, "dashboard")
+    else:
+        route = lambda query: (business_agent, "business")
+    return await run_batch(items, route, max_concurrency)
+
+# Streaming variants: Server-Sent Events with incremental "delta" events and a final "done"
+@app.post("/api/chat/dashboard/stream")
+async def dashboard_chat_stream(request: dict):
+    if not AGENTS_AVAILABLE:
+        # Reuse the canned fallback answers
+        return stream_static_response(await dashboard_chat(request))
+    
+    try:
+        query = request.get("query", "").lower()
+        return await stream_agent_response(dashboard_agent, query, session_id=request.get("session_id"))
+    except AgentOverloadedError as e:
+        raise overloaded(e)
+
+@app.post("/api/chat/business/stream")
+async def business_chat_stream(request: dict):
+    query = request.get("query", "")
+    if not AGENTS_AVAILABLE or not query:
+        return stream_static_response(await business_chat(request))
+    
+    try:
+        return await stream_agent_response(business_agent, query, session_id=request.get("session_id"))
+    except AgentOverloadedError as e:
+        raise overloaded(e)
+
+@app.post("/api/chat/general/stream")
+async def general_chat_stream(request: dict):
+    query = request.get("query", "")
+    if not AGENTS_AVAILABLE or not query:
+        return stream_static_response(await general_chat(request))
+    
+    try:
+        # Use business agent for general queries
+        return await stream_agent_response(business_agent, query, session_id=request.get("session_id"))
+    except AgentOverloadedError as e:
+        raise overloaded(e)
+
 if __name__ == "__main__":
     import uvicorn
     port = int(os.getenv("PORT", 8000))
@@ -6,43 +6,46 @@ This script reads the complete comments dataset and extracts 100 spam comments
 for analysis and review purposes.
 """
 
-import pandas as pd
 import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from pipeline.feature_store import PARQUET_AVAILABLE, read_feature_table
+
+def input_path():
+    """The Parquet feature table in the parent directory if present, else the CSV"""
+    parquet_dir = '../complete_comments_top20_features.parquet'
+    if PARQUET_AVAILABLE and os.path.isdir(parquet_dir):
+        return parquet_dir
+    return '../complete_comments_top20_features.csv'
 
 def extract_spam_comments():
     """Extract 100 spam comments from the complete dataset"""
     
     # File paths - Updated to use correct filename
-    input_file = '../complete_comments_top20_features.csv'  # Path to your processed file
+    input_file = input_path()  # Path to your processed file
     output_file = 'spam_comments_sample_100.csv'
     
     print("🔍 Extracting 100 spam comments...")
     print(f"📂 Reading from: {input_file}")
     
     try:
-        # Read the complete dataset
-        print("📊 Loading complete dataset...")
-        df = pd.read_csv(input_file)
+        # Only the label column is needed for the distribution
+        print("📊 Loading spam labels...")
+        labels = read_feature_table(input_file, columns=['spam_classification'])
         
-        print(f"✅ Dataset loaded successfully!")
-        print(f"   📈 Total rows: {len(df):,}")
-        print(f"   📋 Total columns: {len(df.columns)}")
-        
-        # Check if spam_classification column exists
-        if 'spam_classification' not in df.columns:
-            print("❌ Error: 'spam_classification' column not found!")
-            print(f"Available columns: {list(df.columns)}")
-            return
+        print(f"✅ Labels loaded successfully!")
+        print(f"   📈 Total rows: {len(labels):,}")
         
         # Check spam distribution
-        spam_distribution = df['spam_classification'].value_counts()
+        spam_distribution = labels['spam_classification'].value_counts()
         print(f"\n📊 Spam Classification Distribution:")
         for label, count in spam_distribution.items():
-            percentage = count / len(df) * 100
+            percentage = count / len(labels) * 100
             print(f"   {label}: {count:,} ({percentage:.1f}%)")
         
-        # Filter spam comments
-        spam_comments = df[df['spam_classification'] == 'spam'].copy()
+        # Read only the spam rows (filtered during the scan)
+        spam_comments = read_feature_table(input_file, filters=[('spam_classification', '==', 'spam')])
         
         if len(spam_comments) == 0:
             print("❌ No spam comments found in the dataset!")
@@ -85,11 +88,15 @@ def extract_spam_comments():
         print(f"   📊 Successfully extracted {sample_size} spam comments")
         print(f"   📁 Saved to: {output_file}")
         print(f"   ✅ Ready for analysis!")
-        
+    
+    except ValueError as e:
+        # usecols / parquet column projection fails when the label column is missing
+        print(f"❌ Error: 'spam_classification' column not found! ({e})")
+    
     except FileNotFoundError:
         print(f"❌ Error: File '{input_file}' not found!")
         print("Please make sure the file exists in the current directory.")
-        
+    
     except Exception as e:
         print(f"❌ Error occurred: {str(e)}")
         print("Please check the file format and try again.")
@@ -99,10 +106,10 @@ if __name__ == "__main__":
     print("=" * 50)
     
     # Check if input file exists
-    input_file = '../complete_comments_top20_features.csv'  # Updated path
+    input_file = input_path()  # Updated path
     if not os.path.exists(input_file):
         print(f"❌ Input file '{input_file}' not found!")
-        print("Please make sure the complete_comments_top20_features.csv file exists in the parent directory.")
+        print("Please make sure the complete_comments_top20_features.csv file (or .parquet dataset) exists in the parent directory.")
     else:
         extract_spam_comments()
     
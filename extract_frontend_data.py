@@ -1,64 +1,72 @@
 #!/usr/bin/env python3
 """
 Extract comprehensive data from analysis notebooks for frontend dashboard
+
+Each input is read once, in chunks, and reduced as it streams past:
+leaderboards and totals are grouped sums, and every "top N" list (samples,
+top videos per topic, top videos overall) is a bounded heap. Memory
+depends on the size of the output, not of the 3.3M-row comment table.
 """
 
 import pandas as pd
 import numpy as np
 import json
 import os
+import time
 from pathlib import Path
 import warnings
 warnings.filterwarnings('ignore')
 
-def extract_spam_quality_samples():
+from pipeline.feature_store import iter_feature_table
+from pipeline.streaming_aggregates import FirstRows, GroupTotals, TopK
+
+SAMPLE_COLUMNS = ['commentId', 'textOriginal', 'classification_confidence',
+                  'caps_ratio', 'repetition_ratio', 'emoji_ratio', 'likes_per_char']
+VIDEO_TOPICS_FILE = 'video_topics_assignment.csv'
+TOPIC_KEYWORDS_FILE = 'topic_keywords_frequencies.csv'
+TOTAL_TOPICS = 26
+CHUNKSIZE = 200_000
+
+def extract_spam_quality_samples(path=None, chunksize=CHUNKSIZE):
     """Extract top 5 samples each of spam, quality, and uncertain comments"""
     print("📊 Extracting comment samples...")
     
     try:
-        # Try to read the complete dataset
-        df = pd.read_csv('complete_comments_top20_features.csv')
-        
-        # Get spam classification column (try different possible names)
-        spam_col = None
-        for col in df.columns:
-            if 'spam' in col.lower() and 'classification' in col.lower():
-                spam_col = col
-                break
+        # Read only the sample columns of spam and quality rows. Equal confidences keep the earliest row
+        # streamed: file order for the CSV, partition order for Parquet, so tied samples can differ between them
+        spam_col = 'spam_classification'
+        most_confident = TopK(5, 'classification_confidence', SAMPLE_COLUMNS, by=spam_col)
+        least_confident = TopK(3, 'classification_confidence', SAMPLE_COLUMNS, largest=False, by=spam_col)
+        for chunk in iter_feature_table(path, columns=SAMPLE_COLUMNS + [spam_col],
+                                        filters=[(spam_col, 'in', ['spam', 'quality'])], chunksize=chunksize):
+            most_confident.update(chunk)
+            least_confident.update(chunk)
         
-        if spam_col is None:
-            print("❌ Could not find spam classification column")
-            return None
-            
         # Extract samples
-        spam_samples = df[df[spam_col] == 'spam'].nlargest(5, 'classification_confidence')
-        quality_samples = df[df[spam_col] == 'quality'].nlargest(5, 'classification_confidence')
+        spam_samples = most_confident.result('spam')
+        quality_samples = most_confident.result('quality')
         
         # Handle uncertain comments (might be low confidence quality or spam)
         uncertain_samples = pd.concat([
-            df[df[spam_col] == 'quality'].nsmallest(3, 'classification_confidence'),
-            df[df[spam_col] == 'spam'].nsmallest(2, 'classification_confidence')
+            least_confident.result('quality'),
+            least_confident.result('spam').head(2)
         ])
         
         samples = {
-            'spam': spam_samples[['commentId', 'textOriginal', 'classification_confidence', 
-                               'caps_ratio', 'repetition_ratio', 'emoji_ratio', 'likes_per_char']].to_dict('records'),
-            'quality': quality_samples[['commentId', 'textOriginal', 'classification_confidence',
-                                     'caps_ratio', 'repetition_ratio', 'emoji_ratio', 'likes_per_char']].to_dict('records'),
-            'uncertain': uncertain_samples[['commentId', 'textOriginal', 'classification_confidence',
-                                          'caps_ratio', 'repetition_ratio', 'emoji_ratio', 'likes_per_char']].to_dict('records')
+            'spam': spam_samples[SAMPLE_COLUMNS].to_dict('records'),
+            'quality': quality_samples[SAMPLE_COLUMNS].to_dict('records'),
+            'uncertain': uncertain_samples[SAMPLE_COLUMNS].to_dict('records')
         }
         
         return samples
-        
+    
     except Exception as e:
         print(f"❌ Error reading complete dataset: {e}")
         # Fallback to example spam data
         try:
             spam_df = pd.read_csv('example_spam/spam_comments_sample_100.csv')
             samples = {
-                'spam': spam_df.head(5)[['commentId', 'textOriginal', 'classification_confidence',
-                                       'caps_ratio', 'repetition_ratio', 'emoji_ratio', 'likes_per_char']].to_dict('records'),
+                'spam': spam_df.head(5)[SAMPLE_COLUMNS].to_dict('records'),
                 'quality': [],  # Will need to be populated manually
                 'uncertain': []
             }
@@ -67,17 +75,41 @@ def extract_spam_quality_samples():
             print(f"❌ Error reading example spam: {e2}")
             return None
 
-def extract_topic_analysis():
+def aggregate_video_topics(path=VIDEO_TOPICS_FILE, chunksize=CHUNKSIZE):
+    """One pass over the topic assignments for both the topic analysis and the video statistics"""
+    print("📹 Aggregating video topic assignments...")
+    
+    try:
+        aggregates = {
+            'topics': GroupTotals(['videoId', 'topic_probability', 'num_comments', 'viewCount'], by='dominant_topic'),
+            'totals': GroupTotals(['num_comments', 'viewCount']),
+            'top_videos': TopK(3, 'topic_probability', ['videoId', 'video_title', 'topic_probability', 'viewCount', 'num_comments'],
+                               by='dominant_topic'),
+            'top_by_comments': TopK(10, 'num_comments', ['videoId', 'video_title', 'num_comments', 'viewCount', 'dominant_topic']),
+            'top_by_views': TopK(10, 'viewCount', ['videoId', 'video_title', 'viewCount', 'num_comments', 'dominant_topic']),
+            'top_engagement': TopK(10, 'comment_ratio', ['videoId', 'video_title', 'comment_ratio', 'viewCount', 'num_comments'])
+        }
+        for chunk in pd.read_csv(path, chunksize=chunksize):
+            # Comment to view ratios
+            chunk['comment_ratio'] = chunk['num_comments'] / chunk['viewCount'].fillna(1)
+            for accumulator in aggregates.values():
+                accumulator.update(chunk)
+        return aggregates
+    
+    except Exception as e:
+        print(f"❌ Error reading video topics: {e}")
+        return None
+
+def extract_topic_analysis(videos, keywords_path=TOPIC_KEYWORDS_FILE, chunksize=CHUNKSIZE):
     """Extract comprehensive topic analysis data"""
     print("🔍 Extracting topic analysis...")
     
+    if videos is None:
+        return None
+    
     try:
-        # Read topic assignments
-        video_topics = pd.read_csv('video_topics_assignment.csv')
-        topic_keywords = pd.read_csv('topic_keywords_frequencies.csv')
-        
         # Create topic leaderboard
-        topic_stats = video_topics.groupby('dominant_topic').agg({
+        topic_stats = videos['topics'].agg({
             'videoId': 'count',
             'topic_probability': 'mean',
             'num_comments': 'sum',
@@ -91,63 +123,50 @@ def extract_topic_analysis():
         # Sort by video count for leaderboard
         topic_leaderboard = topic_stats.sort_values('video_count', ascending=False).to_dict('records')
         
-        # Get top keywords for each topic
-        topic_keywords_dict = {}
-        for topic_id in range(26):
-            keywords = topic_keywords[topic_keywords['topic_id'] == topic_id].head(10)
-            topic_keywords_dict[topic_id] = keywords[['keyword', 'probability', 'frequency']].to_dict('records')
+        # Get top keywords for each topic (first 10 rows per topic, in file order)
+        keywords = FirstRows(10, 'topic_id', ['keyword', 'probability', 'frequency'])
+        for chunk in pd.read_csv(keywords_path, chunksize=chunksize):
+            keywords.update(chunk)
+        topic_keywords_dict = {topic_id: keywords.result(topic_id).to_dict('records')
+                               for topic_id in range(TOTAL_TOPICS)}
         
         # Get top videos for each topic (highest confidence)
-        top_videos_per_topic = {}
-        for topic_id in range(26):
-            topic_videos = video_topics[video_topics['dominant_topic'] == topic_id]
-            if len(topic_videos) > 0:
-                top_videos = topic_videos.nlargest(3, 'topic_probability')[['videoId', 'video_title', 'topic_probability', 'viewCount', 'num_comments']]
-                top_videos_per_topic[topic_id] = top_videos.to_dict('records')
-            else:
-                top_videos_per_topic[topic_id] = []
+        top_videos_per_topic = {topic_id: videos['top_videos'].result(topic_id).to_dict('records')
+                                for topic_id in range(TOTAL_TOPICS)}
         
         return {
             'leaderboard': topic_leaderboard,
             'keywords': topic_keywords_dict,
             'top_videos': top_videos_per_topic,
-            'total_topics': 26,
-            'total_videos': len(video_topics),
+            'total_topics': TOTAL_TOPICS,
+            'total_videos': videos['totals'].rows,
             'coherence_score': 0.531
         }
-        
+    
     except Exception as e:
         print(f"❌ Error extracting topic analysis: {e}")
         return None
 
-def extract_video_statistics():
+def extract_video_statistics(videos):
     """Extract video engagement and comment statistics"""
     print("📹 Extracting video statistics...")
     
+    if videos is None:
+        return None
+    
     try:
-        video_topics = pd.read_csv('video_topics_assignment.csv')
-        
-        # Top videos by comment count
-        top_by_comments = video_topics.nlargest(10, 'num_comments')[['videoId', 'video_title', 'num_comments', 'viewCount', 'dominant_topic']]
-        
-        # Top videos by views
-        top_by_views = video_topics.nlargest(10, 'viewCount')[['videoId', 'video_title', 'viewCount', 'num_comments', 'dominant_topic']]
-        
-        # Comment to view ratios
-        video_topics['comment_ratio'] = video_topics['num_comments'] / video_topics['viewCount'].fillna(1)
-        top_engagement = video_topics.nlargest(10, 'comment_ratio')[['videoId', 'video_title', 'comment_ratio', 'viewCount', 'num_comments']]
-        
+        totals = videos['totals']
         return {
-            'top_by_comments': top_by_comments.to_dict('records'),
-            'top_by_views': top_by_views.to_dict('records'),
-            'top_engagement': top_engagement.to_dict('records'),
-            'total_videos': len(video_topics),
-            'total_comments': video_topics['num_comments'].sum(),
-            'total_views': video_topics['viewCount'].sum(),
-            'avg_comments_per_video': video_topics['num_comments'].mean(),
-            'avg_views_per_video': video_topics['viewCount'].mean()
+            'top_by_comments': videos['top_by_comments'].result().to_dict('records'),
+            'top_by_views': videos['top_by_views'].result().to_dict('records'),
+            'top_engagement': videos['top_engagement'].result().to_dict('records'),
+            'total_videos': totals.rows,
+            'total_comments': totals.total('num_comments'),
+            'total_views': totals.total('viewCount'),
+            'avg_comments_per_video': totals.total('num_comments', 'mean'),
+            'avg_views_per_video': totals.total('viewCount', 'mean')
         }
-        
+    
     except Exception as e:
         print(f"❌ Error extracting video statistics: {e}")
         return None
@@ -177,13 +196,16 @@ def main():
     """Main extraction function"""
     print("🚀 Starting comprehensive data extraction for frontend...")
     
+    start_time = time.time()
+    
     # Create output directory
     os.makedirs('frontend_data', exist_ok=True)
     
-    # Extract all data
+    # Extract all data (one pass over each input file)
     comment_samples = extract_spam_quality_samples()
-    topic_analysis = extract_topic_analysis()
-    video_stats = extract_video_statistics()
+    videos = aggregate_video_topics()
+    topic_analysis = extract_topic_analysis(videos)
+    video_stats = extract_video_statistics(videos)
     coherence_data = create_coherence_data()
     
     # Compile comprehensive dataset
@@ -195,7 +217,7 @@ def main():
         'extraction_timestamp': pd.Timestamp.now().isoformat(),
         'summary': {
             'total_videos': video_stats['total_videos'] if video_stats else 34949,
-            'total_topics': 26,
+            'total_topics': TOTAL_TOPICS,
             'model_coherence': 0.531,
             'data_quality': 'High confidence spam detection with 93% accuracy'
         }
@@ -215,7 +237,7 @@ def main():
     
     pd.DataFrame(coherence_data).to_csv('frontend_data/topic_coherence_scores.csv', index=False)
     
-    print("✅ Data extraction completed!")
+    print(f"✅ Data extraction completed in {time.time() - start_time:.1f}s!")
     print(f"📁 Files saved in: frontend_data/")
     print(f"📊 Main file: comprehensive_analysis.json")
     
@@ -0,0 +1 @@
+"""Vectorized, importable versions of the notebook data pipeline"""
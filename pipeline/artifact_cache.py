@@ -0,0 +1,388 @@
+#!/usr/bin/env python3
+"""
+Content-addressed cache for topic modelling artifacts
+
+Every run of stm.ipynb tokenizes the pooled documents and builds the
+dictionary and bag-of-words corpus again. Every run of Loreal.ipynb refits
+the TF-IDF vectorizer over all quality comments. This module stores those
+artifacts once and reuses them from any notebook or script.
+
+Each artifact set lives in ``artifact_cache/<key>/``. The key is a hash of
+the stage name, its parameters and the keys of the stages it was built
+from. Input files are identified by a hash of their content, and in-memory
+texts by a hash of the texts themselves. Changing ``no_below`` therefore
+reuses the tokenized documents and only redoes the cheap filtering, while
+a new feature table or videos.csv gives new keys throughout.
+
+Stages:
+- ``pooled_counts`` / ``document_counts``: per-document token counts and
+  token sequences, from the feature table (``pooled_corpus``) or from
+  pooled strings (``document_corpus``)
+- ``corpus``: the filtered dictionary and bag-of-words matrix
+- ``tfidf``: the TF-IDF matrix, feature names and fitted vectorizer
+  (``tfidf_matrix``)
+
+Sparse matrices and token sequences are stored as plain ``.npy`` arrays
+and loaded memory-mapped, so they cost no reading time or private memory
+until used and are shared by concurrent processes. Writes go to a
+temporary directory that is renamed into place, so a cache entry is
+either complete or absent.
+
+    python pipeline/artifact_cache.py pooled --videos ../dataset/videos.csv --output pooled/stm
+    python pipeline/artifact_cache.py list
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import sys
+import time
+from typing import Any, Callable, Dict, Iterable, Optional, Sequence, Tuple
+
+if __package__ in (None, ""):
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sps
+
+from pipeline.document_pooling import (CHUNKSIZE, KEEP_N, LABEL_COLUMNS, MAX_LEN, MIN_LEN, NO_ABOVE, NO_BELOW,
+                                       VIDEOS_FILE, TokenSequences, count_documents, filter_corpus, load_videos,
+                                       pool_counts, save_pooled)
+from pipeline.feature_store import default_path
+
+try:
+    from gensim import corpora
+    GENSIM_AVAILABLE = True
+except ImportError:
+    print("Warning: gensim not installed; cached dictionaries unavailable")
+    GENSIM_AVAILABLE = False
+
+CACHE_DIR = 'artifact_cache'
+# Part of every key; bump it when a stage's output changes for the same inputs
+CACHE_VERSION = 1
+MANIFEST = 'manifest.json'
+FINGERPRINTS = 'fingerprints.json'
+HASH_BLOCK = 1 << 20
+TEXT_BATCH = 10_000
+# simple_preprocess settings of stm.ipynb, recorded in the token count keys
+TOKENIZER = {'deacc': True, 'min_len': MIN_LEN, 'max_len': MAX_LEN}
+# TfidfVectorizer settings of Loreal.ipynb
+TFIDF_PARAMS = {'max_df': 0.95, 'min_df': 2, 'stop_words': 'english'}
+
+def _hexdigest(data: bytes) -> str:
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+def texts_fingerprint(texts: Iterable[Any]) -> str:
+    """Hash of a sequence of texts (values are hashed as ``str``), independent of how it is stored"""
+    digest = hashlib.blake2b(digest_size=16)
+    batch, count = [], 0
+    for text in texts:
+        batch.append(str(text))
+        if len(batch) == TEXT_BATCH:
+            digest.update('\x1f'.join(batch).encode('utf-8', 'surrogatepass') + b'\x1e')
+            count += len(batch)
+            batch = []
+    if batch:
+        digest.update('\x1f'.join(batch).encode('utf-8', 'surrogatepass') + b'\x1e')
+        count += len(batch)
+    digest.update(str(count).encode())
+    return digest.hexdigest()
+
+def _file_digest(path: str) -> str:
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BLOCK), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _atomic_json(path: str, value: Any):
+    temporary = f"{path}.tmp-{os.getpid()}"
+    with open(temporary, 'w') as f:
+        json.dump(value, f, indent=1, sort_keys=True)
+    os.replace(temporary, path)
+
+class ArtifactCache:
+    """Artifact sets stored under content-derived keys in one directory"""
+    
+    def __init__(self, root: str = CACHE_DIR):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        self.stats = {'hits': 0, 'misses': 0}
+    
+    def fingerprint(self, path: str) -> str:
+        """Content hash of a file or directory (e.g. a Parquet dataset).
+
+        File hashes are remembered by path, size and modification time, so
+        an unchanged multi-GB input is read in full only once.
+        """
+        memo_path = os.path.join(self.root, FINGERPRINTS)
+        try:
+            with open(memo_path) as f:
+                memo = json.load(f)
+        except (OSError, ValueError):
+            memo = {}
+        if os.path.isdir(path):
+            files = sorted(os.path.join(directory, name) for directory, _, names in os.walk(path) for name in names)
+        else:
+            files = [path]
+        parts, changed = [], False
+        for file in files:
+            stat = os.stat(file)
+            absolute = os.path.abspath(file)
+            known = memo.get(absolute)
+            if known is None or known[:2] != [stat.st_size, stat.st_mtime_ns]:
+                known = memo[absolute] = [stat.st_size, stat.st_mtime_ns, _file_digest(file)]
+                changed = True
+            parts.append(f"{os.path.relpath(file, path) if file != path else ''}:{known[2]}")
+        if changed:
+            _atomic_json(memo_path, memo)
+        return _hexdigest('\n'.join(parts).encode())
+    
+    def key(self, stage: str, params: Dict[str, Any], parents: Sequence[str] = ()) -> str:
+        description = {'version': CACHE_VERSION, 'stage': stage, 'params': params, 'parents': list(parents)}
+        return _hexdigest(json.dumps(description, sort_keys=True, default=str).encode())
+    
+    def path(self, key: str) -> str:
+        return os.path.join(self.root, key)
+    
+    def __contains__(self, key: str) -> bool:
+        return os.path.exists(os.path.join(self.path(key), MANIFEST))
+    
+    def save(self, key: str, stage: str, params: Dict[str, Any], artifacts: Dict[str, Any],
+             parents: Sequence[str] = ()):
+        """Write an artifact set; sparse matrices, arrays and token sequences become ``.npy`` files"""
+        temporary = f"{self.path(key)}.tmp-{os.getpid()}"
+        shutil.rmtree(temporary, ignore_errors=True)
+        os.makedirs(temporary)
+        kinds, values = {}, {}
+        for name, value in artifacts.items():
+            base = os.path.join(temporary, name)
+            if sps.issparse(value):
+                matrix = value.tocsr()
+                if not matrix.has_canonical_format:
+                    # Loaded matrices are read-only, and scipy sorts indices in place on first use
+                    matrix = matrix.copy()
+                    matrix.sum_duplicates()
+                for part in ('data', 'indices', 'indptr'):
+                    np.save(f"{base}.{part}.npy", getattr(matrix, part))
+                kinds[name] = {'kind': 'csr', 'shape': list(matrix.shape)}
+            elif isinstance(value, TokenSequences):
+                lengths = np.array([len(sequence) for sequence in value.sequences], dtype=np.int64)
+                np.save(f"{base}.ids.npy", np.concatenate(value.sequences).astype(np.int32) if len(lengths)
+                        else np.zeros(0, dtype=np.int32))
+                np.save(f"{base}.bounds.npy", np.concatenate([[0], np.cumsum(lengths)]))
+                with open(f"{base}.vocabulary.json", 'w') as f:
+                    json.dump([str(token) for token in value.vocabulary], f)
+                kinds[name] = {'kind': 'texts'}
+            elif isinstance(value, np.ndarray) and value.dtype != object:
+                np.save(f"{base}.npy", value)
+                kinds[name] = {'kind': 'array'}
+            elif isinstance(value, np.ndarray):
+                with open(f"{base}.json", 'w') as f:
+                    json.dump([str(item) for item in value], f)
+                kinds[name] = {'kind': 'strings'}
+            elif isinstance(value, pd.DataFrame):
+                value.to_pickle(f"{base}.pkl")
+                kinds[name] = {'kind': 'frame'}
+            elif GENSIM_AVAILABLE and isinstance(value, corpora.Dictionary):
+                value.save(f"{base}.dict")
+                kinds[name] = {'kind': 'dictionary'}
+            elif value is None or isinstance(value, (bool, int, float, str)):
+                values[name] = value
+            else:
+                with open(f"{base}.pkl", 'wb') as f:
+                    pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+                kinds[name] = {'kind': 'pickle'}
+        _atomic_json(os.path.join(temporary, MANIFEST), {
+            'stage': stage, 'params': params, 'parents': list(parents), 'created': time.time(),
+            'artifacts': kinds, 'values': values
+        })
+        try:
+            os.replace(temporary, self.path(key))
+        except OSError:
+            # Another process stored the same key first; its entry is equivalent
+            shutil.rmtree(temporary, ignore_errors=True)
+    
+    def manifest(self, key: str) -> Dict[str, Any]:
+        with open(os.path.join(self.path(key), MANIFEST)) as f:
+            return json.load(f)
+    
+    def load(self, key: str, mmap: bool = True) -> Dict[str, Any]:
+        """Read an artifact set; with ``mmap`` its arrays are read-only memory maps of the cache files"""
+        manifest = self.manifest(key)
+        mode = 'r' if mmap else None
+        artifacts = dict(manifest['values'])
+        for name, entry in manifest['artifacts'].items():
+            base = os.path.join(self.path(key), name)
+            kind = entry['kind']
+            if kind == 'csr':
+                parts = [np.load(f"{base}.{part}.npy", mmap_mode=mode) for part in ('data', 'indices', 'indptr')]
+                artifacts[name] = sps.csr_matrix(tuple(parts), shape=tuple(entry['shape']), copy=False)
+            elif kind == 'texts':
+                ids = np.load(f"{base}.ids.npy", mmap_mode=mode)
+                bounds = np.load(f"{base}.bounds.npy")
+                with open(f"{base}.vocabulary.json") as f:
+                    vocabulary = np.array(json.load(f), dtype=object)
+                artifacts[name] = TokenSequences([ids[bounds[i]:bounds[i + 1]] for i in range(len(bounds) - 1)],
+                                                 vocabulary)
+            elif kind == 'array':
+                artifacts[name] = np.load(f"{base}.npy", mmap_mode=mode)
+            elif kind == 'strings':
+                with open(f"{base}.json") as f:
+                    artifacts[name] = np.array(json.load(f), dtype=object)
+            elif kind == 'frame':
+                artifacts[name] = pd.read_pickle(f"{base}.pkl")
+            elif kind == 'dictionary':
+                artifacts[name] = corpora.Dictionary.load(f"{base}.dict")
+            else:
+                with open(f"{base}.pkl", 'rb') as f:
+                    artifacts[name] = pickle.load(f)
+        return artifacts
+    
+    def get_or_build(self, stage: str, params: Dict[str, Any], build: Callable[[], Dict[str, Any]],
+                     parents: Sequence[str] = ()) -> Tuple[str, Dict[str, Any]]:
+        """(key, artifacts) of a stage, loaded from the cache or built by ``build()`` and stored"""
+        key = self.key(stage, params, parents)
+        if key in self:
+            self.stats['hits'] += 1
+            return key, self.load(key)
+        self.stats['misses'] += 1
+        self.save(key, stage, params, build(), parents)
+        # Reload, so a fresh build hands back the same memory-mapped arrays as a hit
+        return key, self.load(key)
+    
+    def entries(self) -> pd.DataFrame:
+        rows = []
+        for key in sorted(os.listdir(self.root)):
+            if key not in self:
+                continue
+            manifest = self.manifest(key)
+            size = sum(os.path.getsize(os.path.join(self.path(key), name)) for name in os.listdir(self.path(key)))
+            rows.append({'key': key, 'stage': manifest['stage'], 'created': pd.Timestamp(manifest['created'], unit='s'),
+                         'size_mb': size / 1e6, 'params': json.dumps(manifest['params'], sort_keys=True)})
+        return pd.DataFrame(rows, columns=['key', 'stage', 'created', 'size_mb', 'params'])
+    
+    def remove(self, key: str):
+        shutil.rmtree(self.path(key), ignore_errors=True)
+
+def _filtered(cache: ArtifactCache, counts_key: str, counts: Dict[str, Any], no_below: int, no_above: float,
+              keep_n: Optional[int]) -> Dict[str, Any]:
+    params = {'no_below': no_below, 'no_above': no_above, 'keep_n': keep_n}
+    
+    def build():
+        dictionary, corpus = filter_corpus(counts['counts'], np.asarray(counts['tokens']), no_below, no_above, keep_n)
+        return {'dictionary': dictionary, 'corpus': corpus}
+    
+    corpus_key, filtered = cache.get_or_build('corpus', params, build, [counts_key])
+    result = {name: value for name, value in counts.items() if name not in ('counts', 'tokens')}
+    result.update(filtered, keys={'counts': counts_key, 'corpus': corpus_key})
+    return result
+
+def pooled_corpus(videos_path: str = VIDEOS_FILE, feature_path: Optional[str] = None,
+                  cache: Optional[ArtifactCache] = None, chunksize: int = CHUNKSIZE, no_below: int = NO_BELOW,
+                  no_above: float = NO_ABOVE, keep_n: Optional[int] = KEEP_N) -> Dict[str, Any]:
+    """``pool_documents`` through the cache, keyed on the content of videos.csv and the feature table.
+
+    Returns ``dictionary``, ``corpus`` (memory-mapped CSR), ``videos``,
+    ``texts`` and the cache ``keys``.
+    """
+    cache = cache or ArtifactCache()
+    feature_path = feature_path or default_path()
+    params = {'videos': cache.fingerprint(videos_path), 'features': cache.fingerprint(feature_path),
+              'labels': list(LABEL_COLUMNS), 'tokenizer': TOKENIZER}
+    
+    def build():
+        result = pool_counts(load_videos(videos_path), feature_path, chunksize, keep_texts=True)
+        result.pop('seconds')
+        return result
+    
+    counts_key, counts = cache.get_or_build('pooled_counts', params, build)
+    return _filtered(cache, counts_key, counts, no_below, no_above, keep_n)
+
+def document_corpus(documents: Sequence[str], cache: Optional[ArtifactCache] = None, no_below: int = NO_BELOW,
+                    no_above: float = NO_ABOVE, keep_n: Optional[int] = KEEP_N) -> Dict[str, Any]:
+    """stm.ipynb's processed_docs, dictionary and corpus for pooled strings, through the cache.
+
+    Keyed on a hash of the documents, so re-running the notebook on the
+    same data skips tokenization and the dictionary build. Returns
+    ``texts``, ``dictionary``, ``corpus`` (memory-mapped CSR) and ``keys``.
+    """
+    cache = cache or ArtifactCache()
+    params = {'documents': texts_fingerprint(documents), 'tokenizer': TOKENIZER}
+    counts_key, counts = cache.get_or_build('document_counts', params, lambda: count_documents(documents))
+    return _filtered(cache, counts_key, counts, no_below, no_above, keep_n)
+
+def tfidf_matrix(texts: Sequence[str], cache: Optional[ArtifactCache] = None,
+                 **params) -> Tuple[sps.csr_matrix, np.ndarray, Any]:
+    """(matrix, feature names, fitted vectorizer) of ``TfidfVectorizer(**params).fit_transform(texts)``, cached.
+
+    Keyed on a hash of the texts, the parameters (Loreal.ipynb's by
+    default) and the scikit-learn version. The vectorizer is stored without
+    its ``stop_words_`` set, which only lists the pruned terms.
+    """
+    import sklearn
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    
+    cache = cache or ArtifactCache()
+    params = dict(TFIDF_PARAMS, **params)
+    key_params = {'texts': texts_fingerprint(texts), 'vectorizer': params, 'sklearn': sklearn.__version__}
+    
+    def build():
+        vectorizer = TfidfVectorizer(**params)
+        matrix = vectorizer.fit_transform(texts)
+        if hasattr(vectorizer, 'stop_words_'):
+            del vectorizer.stop_words_
+        return {'matrix': matrix, 'feature_names': vectorizer.get_feature_names_out(), 'vectorizer': vectorizer}
+    
+    _, artifacts = cache.get_or_build('tfidf', key_params, build)
+    return artifacts['matrix'], artifacts['feature_names'], artifacts['vectorizer']
+
+def main():
+    parser = argparse.ArgumentParser(description="Content-addressed cache of corpora, dictionaries and TF-IDF matrices")
+    parser.add_argument("--cache", default=CACHE_DIR, help="Cache directory")
+    commands = parser.add_subparsers(dest="command", required=True)
+    pooled = commands.add_parser("pooled", help="Build (or reuse) the stm.ipynb pooled corpus and write it out")
+    pooled.add_argument("--input", help="Feature table (default: the Parquet dataset if present, else the CSV)")
+    pooled.add_argument("--videos", default=VIDEOS_FILE, help="videos.csv")
+    pooled.add_argument("--output", help="Also write <output>.mm, .dict and _videos.csv")
+    pooled.add_argument("--no-below", type=int, default=NO_BELOW)
+    pooled.add_argument("--no-above", type=float, default=NO_ABOVE)
+    pooled.add_argument("--keep-n", type=int, default=KEEP_N)
+    commands.add_parser("list", help="Show the cached artifact sets")
+    clear = commands.add_parser("clear", help="Remove cached artifact sets")
+    clear.add_argument("--stage", help="Only this stage")
+    args = parser.parse_args()
+    
+    cache = ArtifactCache(args.cache)
+    if args.command == "pooled":
+        start_time = time.time()
+        result = pooled_corpus(args.videos, args.input, cache, no_below=args.no_below, no_above=args.no_above,
+                               keep_n=args.keep_n)
+        print(f"✅ {len(result['videos']):,} documents, {len(result['dictionary']):,} tokens "
+              f"({time.time() - start_time:.1f}s, {cache.stats['hits']} cached stages reused)")
+        for stage, key in result['keys'].items():
+            print(f"🔑 {stage}: {cache.path(key)}")
+        if args.output:
+            for name, path in save_pooled(result, args.output).items():
+                print(f"💾 {name}: {path}")
+    elif args.command == "list":
+        entries = cache.entries()
+        if entries.empty:
+            print(f"📭 {args.cache} is empty")
+        else:
+            print(entries.to_string(index=False))
+            print(f"📦 {len(entries)} artifact sets, {entries['size_mb'].sum():.1f}MB")
+    else:
+        entries = cache.entries()
+        if args.stage:
+            entries = entries[entries['stage'] == args.stage]
+        for key in entries['key']:
+            cache.remove(key)
+        print(f"🗑️ Removed {len(entries)} artifact sets")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Preprocessing re-runs: stm.ipynb / Loreal.ipynb cells vs pipeline/artifact_cache.py
+
+On synthetic data, runs each step in fresh processes, as a notebook
+restart would:
+- stm.ipynb cell 3 (tokens, dictionary, corpus; kept verbatim below) and
+  ``document_corpus``: cold cache, warm cache, and warm with a different
+  ``no_below`` (only the filtering stage is rebuilt)
+- Loreal.ipynb cell 2 (TF-IDF) and ``tfidf_matrix``: cold and warm
+- ``pooled_corpus`` from the feature table and videos.csv: cold and warm
+
+Reports wall time, cache hits and whether the output equals the
+notebook's.
+
+    python pipeline/benchmarks/artifact_cache.py --videos 2000 --rows 200000
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import warnings
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, REPO_DIR)
+warnings.filterwarnings('ignore')
+
+import numpy as np
+import pandas as pd
+from gensim import corpora
+from gensim.utils import simple_preprocess
+
+def notebook_corpus(pooled_documents):
+    # stm.ipynb cell 3 before the artifact cache, verbatim
+    # Convert pooled documents to simple token lists (removes punctuation, lowercases, filters length)
+    processed_docs = [simple_preprocess(doc, deacc=True, min_len=2, max_len=15) for doc in pooled_documents]
+    
+    # Remove empty documents
+    processed_docs = [doc for doc in processed_docs if len(doc) > 0]
+    
+    # Create dictionary and corpus for Gensim
+    dictionary = corpora.Dictionary(processed_docs)
+    
+    # Filter extreme cases
+    dictionary.filter_extremes(
+        no_below=2,      # Remove words that appear in less than 2 documents
+        no_above=0.8,    # Remove words that appear in more than 80% of documents
+        keep_n=10000     # Keep only top 10000 most frequent words
+    )
+    
+    # Create corpus (bag of words representation)
+    corpus = [dictionary.doc2bow(doc) for doc in processed_docs]
+    return processed_docs, dictionary, corpus
+
+def notebook_tfidf(df):
+    # Loreal.ipynb cell 2 before the artifact cache, verbatim
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    
+    # Initialize the TF-IDF Vectorizer
+    # max_df=0.95 ignores terms that appear in more than 95% of the documents (corpus-specific stop words)
+    # min_df=2 ignores terms that appear in less than 2 documents
+    vectorizer = TfidfVectorizer(max_df=0.95, min_df=2, stop_words='english')
+    
+    # Fit and transform the cleaned text to create the document-term matrix
+    tfidf_matrix = vectorizer.fit_transform(df['cleaned_text'])
+    
+    # Get the feature names (the words in our vocabulary)
+    feature_names = vectorizer.get_feature_names_out()
+    return tfidf_matrix, feature_names
+
+def sha(value) -> str:
+    return hashlib.sha1(json.dumps(value, sort_keys=True).encode()).hexdigest()[:12]
+
+def corpus_digest(texts, dictionary, corpus) -> str:
+    return sha([[list(doc) for doc in texts], list(dictionary.token2id.items()), sorted(dictionary.dfs.items()),
+                [[(int(i), int(c)) for i, c in doc] for doc in corpus]])
+
+def tfidf_digest(matrix, feature_names) -> str:
+    matrix = matrix.tocsr().copy()
+    matrix.sort_indices()
+    return sha([matrix.indptr.tolist(), matrix.indices.tolist(), np.round(matrix.data, 12).tolist(),
+                [str(name) for name in feature_names]])
+
+def child(mode: str, work: str, no_below: int):
+    from pipeline.artifact_cache import ArtifactCache, document_corpus, pooled_corpus, tfidf_matrix
+    from pipeline.document_pooling import bow_documents
+    
+    cache = ArtifactCache(os.path.join(work, "cache"))
+    documents = pd.read_csv(os.path.join(work, "documents.csv"))['pooled_text'].fillna('').tolist()
+    start = time.perf_counter()
+    if mode == "notebook-corpus":
+        digest = corpus_digest(*notebook_corpus(documents))
+    elif mode == "cached-corpus":
+        cached = document_corpus(documents, cache, no_below=no_below)
+        digest = corpus_digest(list(cached['texts']), cached['dictionary'], list(bow_documents(cached['corpus'])))
+    elif mode == "notebook-tfidf":
+        digest = tfidf_digest(*notebook_tfidf(pd.DataFrame({'cleaned_text': documents})))
+    elif mode == "cached-tfidf":
+        matrix, feature_names, _ = tfidf_matrix(documents, cache)
+        digest = tfidf_digest(matrix, feature_names)
+    else:
+        cached = pooled_corpus(os.path.join(work, "videos.csv"), os.path.join(work, "features.csv"), cache)
+        digest = corpus_digest(cached['texts'], cached['dictionary'], bow_documents(cached['corpus']))
+    elapsed = time.perf_counter() - start
+    print(json.dumps({'seconds': elapsed, 'digest': digest, 'hits': cache.stats['hits'],
+                      'stages': cache.stats['hits'] + cache.stats['misses']}))
+
+def measure(mode: str, work: str, no_below: int = 2) -> dict:
+    result = subprocess.run([sys.executable, __file__, "--child", mode, "--work", work, "--no-below", str(no_below)],
+                            capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description="Notebook preprocessing vs the artifact cache, cold and warm")
+    parser.add_argument("--videos", type=int, default=2_000, help="Pooled documents")
+    parser.add_argument("--rows", type=int, default=200_000, help="Comments in the feature table")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--work", help=argparse.SUPPRESS)
+    parser.add_argument("--no-below", type=int, default=2, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    
+    if args.child:
+        child(args.child, args.work, args.no_below)
+        return
+    
+    from pipeline.benchmarks.sample_comments import make_comments, make_pooled_documents, make_videos
+    
+    with tempfile.TemporaryDirectory() as work:
+        pd.DataFrame({'pooled_text': make_pooled_documents(args.videos)}).to_csv(
+            os.path.join(work, "documents.csv"), index=False)
+        comments = make_comments(args.rows, n_videos=args.videos)
+        comments['spam_classification'] = np.random.default_rng(0).choice(['quality', 'spam'], size=len(comments))
+        comments[['videoId', 'textOriginal', 'spam_classification']].to_csv(
+            os.path.join(work, "features.csv"), index=False)
+        make_videos(args.videos).to_csv(os.path.join(work, "videos.csv"), index=False)
+        print(f"📊 {args.videos:,} pooled documents; {args.rows:,} comments for the feature-table path")
+        
+        runs = [("stm.ipynb cell 3", "notebook-corpus", 2, None),
+                ("document_corpus cold", "cached-corpus", 2, "notebook-corpus"),
+                ("document_corpus warm", "cached-corpus", 2, "notebook-corpus"),
+                ("  no_below=5", "cached-corpus", 5, None),
+                ("Loreal.ipynb cell 2", "notebook-tfidf", 2, None),
+                ("tfidf_matrix cold", "cached-tfidf", 2, "notebook-tfidf"),
+                ("tfidf_matrix warm", "cached-tfidf", 2, "notebook-tfidf"),
+                ("pooled_corpus cold", "pooled", 2, None),
+                ("pooled_corpus warm", "pooled", 2, "pooled")]
+        results = {}
+        print(f"   {'':<22} {'time':>8}  {'cached stages':>13}")
+        for name, mode, no_below, reference in runs:
+            result = measure(mode, work, no_below)
+            check = ""
+            if reference:
+                same = result['digest'] == results[reference]['digest']
+                check = f"{'✅' if same else '❌'} {'same output' if same else 'differs'}"
+            results.setdefault(mode, result)
+            print(f"   {name:<22} {result['seconds']:>7.2f}s  {result['hits']:>6}/{result['stages']:<6} {check}")
+        size = sum(os.path.getsize(os.path.join(directory, file))
+                   for directory, _, files in os.walk(os.path.join(work, "cache")) for file in files)
+        print(f"📦 Cache: {size / 1e6:.1f}MB")
+
+if __name__ == "__main__":
+    main()
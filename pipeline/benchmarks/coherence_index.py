@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Topic coherence: gensim CoherenceModel vs pipeline/coherence_index.py
+
+On synthetic pooled documents, trains LDA models for a few K and scores
+each with ``CoherenceModel`` (c_v and u_mass) and with a ``CoherenceIndex``
+built once for the corpus. Reports the index's build time, size and load
+time, the scoring time per model, and the largest difference from gensim's
+score, which must be within floating-point rounding.
+
+    python pipeline/benchmarks/coherence_index.py --videos 300 --k 4 10 20 30
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+import warnings
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, REPO_DIR)
+warnings.filterwarnings('ignore')
+
+TOLERANCE = 1e-9
+
+def main():
+    parser = argparse.ArgumentParser(description="CoherenceModel vs the precomputed co-occurrence index")
+    parser.add_argument("--videos", type=int, default=300, help="Pooled documents")
+    parser.add_argument("--k", type=int, nargs="+", default=[4, 10, 20, 30], help="Topic counts to train")
+    parser.add_argument("--passes", type=int, default=2, help="LDA passes (the scores compared do not depend on it)")
+    args = parser.parse_args()
+    
+    from gensim import models
+    from gensim.models.coherencemodel import CoherenceModel
+    from pipeline.benchmarks.sample_comments import make_pooled_documents
+    from pipeline.coherence_index import CoherenceIndex
+    from pipeline.topic_selection import LDA_PARAMS, build_corpus
+    
+    texts, dictionary, corpus = build_corpus(make_pooled_documents(args.videos))
+    print(f"📦 {len(texts):,} documents, {sum(map(len, texts)):,} tokens, {len(dictionary):,} in the dictionary")
+    
+    start = time.perf_counter()
+    index = CoherenceIndex.build(texts, dictionary)
+    build_seconds = time.perf_counter() - start
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "coherence_index.npz")
+        index.save(path)
+        size = os.path.getsize(path) / 1e6
+        start = time.perf_counter()
+        index = CoherenceIndex.load(path)
+        load_seconds = time.perf_counter() - start
+    print(f"🔍 Index: built in {build_seconds:.2f}s, {size:.1f}MB on disk, loaded in {load_seconds * 1000:.0f}ms")
+    
+    print(f"{'K':>5} {'measure':>8} {'gensim':>9} {'index':>9} {'speedup':>8} {'max diff':>9}")
+    totals = {'gensim': 0.0, 'index': 0.0}
+    lda_params = dict(LDA_PARAMS, passes=args.passes)
+    for num_topics in args.k:
+        model = models.LdaModel(corpus=corpus, id2word=dictionary, num_topics=num_topics, **lda_params)
+        for measure in ('c_v', 'u_mass'):
+            start = time.perf_counter()
+            reference = CoherenceModel(model=model, texts=texts, dictionary=dictionary, coherence=measure,
+                                       processes=1).get_coherence_per_topic()
+            gensim_seconds = time.perf_counter() - start
+            start = time.perf_counter()
+            scores = index.coherence_per_topic(
+                CoherenceModel._get_topics_from_model(model, 20), measure)
+            index_seconds = time.perf_counter() - start
+            totals['gensim'] += gensim_seconds
+            totals['index'] += index_seconds
+            diff = max(abs(a - b) for a, b in zip(reference, scores))
+            print(f"{'✅' if diff <= TOLERANCE else '❌'} {num_topics:>3} {measure:>8} {gensim_seconds:>8.2f}s "
+                  f"{index_seconds * 1000:>7.1f}ms {gensim_seconds / index_seconds:>7.0f}x {diff:>9.1e}")
+    print(f"⏱ Scoring total: gensim {totals['gensim']:.1f}s, index {totals['index'] * 1000:.0f}ms "
+          f"(+{build_seconds:.1f}s to build it once)")
+
+if __name__ == "__main__":
+    main()
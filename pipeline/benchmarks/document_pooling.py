@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""
+Per-video document pooling: stm.ipynb cells vs pipeline/document_pooling.py
+
+Writes a synthetic feature table (with spam labels) and videos.csv, then
+runs in fresh processes:
+- stm.ipynb's merge, pooling loop and corpus cells (kept verbatim below,
+  with the file paths as arguments)
+- ``pool_documents`` followed by writing the Matrix Market corpus
+
+Reports wall time and the growth of peak resident memory (imports
+excluded). The dictionary, corpus and video metadata must be identical.
+
+    python pipeline/benchmarks/document_pooling.py --rows 200000 --videos 2000
+"""
+
+import argparse
+import contextlib
+import hashlib
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import warnings
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, REPO_DIR)
+warnings.filterwarnings('ignore')
+
+import numpy as np
+import pandas as pd
+from gensim import corpora
+from gensim.utils import simple_preprocess
+
+FEATURE_COLUMNS = ['commentId', 'channelId', 'videoId', 'textOriginal', 'likeCount', 'publishedAt',
+                   'spam_classification']
+
+def notebook_pooling(feature_path: str, videos_path: str):
+    from pipeline.feature_store import read_feature_table
+    
+    # stm.ipynb cell 0 (up to the merge), verbatim apart from the paths
+    comments_df = read_feature_table(feature_path, columns=['commentId', 'channelId', 'videoId', 'textOriginal',
+                                              'likeCount', 'publishedAt', 'spam_classification'])
+    print(f"Loaded comments: {len(comments_df):,} rows")
+    
+    # Load original videos dataset
+    videos_df = pd.read_csv(videos_path)
+    print(f"Loaded videos: {len(videos_df):,} rows")
+    
+    # Perform the merge - keeping all comments that have matching videos
+    merged_df = comments_df.merge(videos_df, on='videoId', how='inner', suffixes=('_comment', '_video'))
+    
+    # stm.ipynb cell 1, verbatim
+    # Filter for quality comments only (remove spam for clean topic modeling)
+    spam_col = None
+    if 'spam_classification' in merged_df.columns:
+        spam_col = 'spam_classification'
+    elif 'final_labels' in merged_df.columns:
+        spam_col = 'final_labels'
+    
+    if spam_col:
+        # Check what values are in the spam classification column
+        print(f"Found spam classification column: '{spam_col}'")
+        unique_values = merged_df[spam_col].value_counts()
+        print(f"Unique values in {spam_col}: {dict(unique_values)}")
+        
+        # Filter for quality comments only
+        quality_comments = merged_df[merged_df[spam_col] == 'quality'].copy()
+        print(f"Using {len(quality_comments):,} quality comments from {quality_comments['videoId'].nunique():,} videos")
+    else:
+        # No spam classification available - use all comments
+        print("⚠️  No spam classification found. Using ALL comments for topic modeling.")
+        print("   Run the spam detection pipeline first for better results.")
+        quality_comments = merged_df.copy()
+        print(f"Using {len(quality_comments):,} total comments from {quality_comments['videoId'].nunique():,} videos")
+    
+    # Group by videoId and create pooled documents
+    pooled_documents = []
+    video_metadata = []
+    
+    for video_id, group in quality_comments.groupby('videoId'):
+        # Get video metadata (first row since all rows have same video info)
+        video_info = group.iloc[0]
+        
+        # Collect all comment texts for this video
+        comment_texts = group['textOriginal'].fillna('').tolist()
+        
+        # Create the pooled document: video title + description + all comments
+        video_title = str(video_info.get('title', '')).strip()
+        video_description = str(video_info.get('description', '')).strip()
+        
+        # Combine all text for this video
+        pooled_text_parts = []
+        
+        if video_title:
+            pooled_text_parts.append(f"TITLE: {video_title}")
+        
+        if video_description:
+            pooled_text_parts.append(f"DESCRIPTION: {video_description}")
+        
+        # Add all quality comments
+        if comment_texts:
+            comment_text = " ".join([str(text).strip() for text in comment_texts if str(text).strip()])
+            if comment_text:
+                pooled_text_parts.append(f"COMMENTS: {comment_text}")
+        
+        # Create final pooled document
+        pooled_document = " ".join(pooled_text_parts)
+        
+        if pooled_document.strip():  # Only add if document has content
+            pooled_documents.append(pooled_document)
+            
+            # Store metadata for this video-document
+            video_metadata.append({
+                'videoId': video_id,
+                'title': video_title,
+                'description': video_description,
+                'num_comments': len(comment_texts),
+                'viewCount': video_info.get('viewCount', 0),
+                'likeCount_video': video_info.get('likeCount_video', 0),
+                'document_length': len(pooled_document),
+                'publishedAt_video': video_info.get('publishedAt_video', '')
+            })
+    
+    # stm.ipynb cell 3 before the artifact cache, verbatim
+    # Convert pooled documents to simple token lists (removes punctuation, lowercases, filters length)
+    processed_docs = [simple_preprocess(doc, deacc=True, min_len=2, max_len=15) for doc in pooled_documents]
+    
+    # Remove empty documents
+    processed_docs = [doc for doc in processed_docs if len(doc) > 0]
+    
+    # Create dictionary and corpus for Gensim
+    dictionary = corpora.Dictionary(processed_docs)
+    
+    # Filter extreme cases
+    dictionary.filter_extremes(
+        no_below=2,      # Remove words that appear in less than 2 documents
+        no_above=0.8,    # Remove words that appear in more than 80% of documents
+        keep_n=10000     # Keep only top 10000 most frequent words
+    )
+    
+    # Create corpus (bag of words representation)
+    corpus = [dictionary.doc2bow(doc) for doc in processed_docs]
+    return dictionary, corpus, pd.DataFrame(video_metadata), processed_docs
+
+def peak_rss_mb() -> float:
+    with open("/proc/self/status") as status:
+        for line in status:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) / 1024
+    return float('nan')
+
+def digest(dictionary, corpus, metadata: pd.DataFrame, texts) -> dict:
+    """Hashes of the dictionary, corpus, metadata and token sequences, for comparison across processes"""
+    def sha(value) -> str:
+        return hashlib.sha1(json.dumps(value, sort_keys=True).encode()).hexdigest()[:12]
+    
+    return {
+        'dictionary': sha([list(dictionary.token2id.items()), sorted(dictionary.dfs.items()),
+                           sorted(dictionary.cfs.items()),
+                           [dictionary.num_docs, dictionary.num_pos, dictionary.num_nnz]]),
+        'corpus': sha([[(int(i), int(c)) for i, c in doc] for doc in corpus]),
+        'videos': sha(metadata.to_csv(index=False)),
+        'texts': sha([list(doc) for doc in texts]),
+        'documents': len(metadata),
+        'tokens': len(dictionary)
+    }
+
+def child(mode: str, feature_path: str, videos_path: str, chunksize: int):
+    from pipeline.document_pooling import load_videos, pool_documents, save_pooled
+    
+    baseline = peak_rss_mb()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()), tempfile.TemporaryDirectory() as tmp:
+        if mode == "notebook":
+            dictionary, corpus, metadata, texts = notebook_pooling(feature_path, videos_path)
+            elapsed, peak = time.perf_counter() - start, peak_rss_mb() - baseline
+        else:
+            result = pool_documents(load_videos(videos_path), feature_path, chunksize, keep_texts=True)
+            paths = save_pooled(result, os.path.join(tmp, "stm"))
+            elapsed, peak = time.perf_counter() - start, peak_rss_mb() - baseline
+            dictionary = corpora.Dictionary.load(paths['dictionary'])
+            corpus, metadata, texts = corpora.MmCorpus(paths['corpus']), pd.read_csv(paths['videos']), result['texts']
+            size = os.path.getsize(paths['corpus']) / 1e6
+        if mode == "notebook":
+            # Round-trip the metadata through CSV like the streaming output
+            buffer = io.StringIO()
+            metadata.to_csv(buffer, index=False)
+            buffer.seek(0)
+            metadata = pd.read_csv(buffer)
+        summary = digest(dictionary, corpus, metadata, texts)
+    summary.update(seconds=elapsed, peak_mb=peak, mm_mb=size if mode != "notebook" else None)
+    print(json.dumps(summary))
+
+def measure(mode: str, feature_path: str, videos_path: str, chunksize: int) -> dict:
+    result = subprocess.run([sys.executable, __file__, "--child", mode, "--feature-path", feature_path,
+                             "--videos-path", videos_path, "--chunksize", str(chunksize)],
+                            capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description="stm.ipynb document pooling vs streaming pooling")
+    parser.add_argument("--rows", type=int, default=200_000, help="Comments in the feature table")
+    parser.add_argument("--videos", type=int, default=2_000)
+    parser.add_argument("--chunksize", type=int, default=50_000)
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--feature-path", help=argparse.SUPPRESS)
+    parser.add_argument("--videos-path", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    
+    if args.child:
+        child(args.child, args.feature_path, args.videos_path, args.chunksize)
+        return
+    
+    from pipeline.benchmarks.sample_comments import make_comments, make_videos
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        comments = make_comments(args.rows, n_videos=args.videos)
+        rng = np.random.default_rng(0)
+        comments['spam_classification'] = rng.choice(['quality', 'spam', 'uncertain'], size=len(comments),
+                                                     p=[0.6, 0.3, 0.1])
+        feature_path = os.path.join(tmp, "features.csv")
+        comments[FEATURE_COLUMNS].to_csv(feature_path, index=False)
+        videos_path = os.path.join(tmp, "videos.csv")
+        make_videos(args.videos).to_csv(videos_path, index=False)
+        print(f"📊 {args.rows:,} comments, {args.videos:,} videos, chunks of {args.chunksize:,}")
+        
+        reference = measure("notebook", feature_path, videos_path, args.chunksize)
+        streaming = measure("streaming", feature_path, videos_path, args.chunksize)
+        print(f"{'':>2} {'':>10} {'time':>8} {'peak':>8}  documents  tokens")
+        for name, result in (("notebook", reference), ("streaming", streaming)):
+            print(f"   {name:>10} {result['seconds']:>7.2f}s {result['peak_mb']:>6.0f}MB  "
+                  f"{result['documents']:>9,}  {result['tokens']:>6,}")
+        print(f"📦 Matrix Market corpus: {streaming['mm_mb']:.1f}MB")
+        print(f"⏱ {reference['seconds'] / streaming['seconds']:.1f}x faster, "
+              f"{reference['peak_mb'] / max(streaming['peak_mb'], 1):.1f}x less peak memory")
+        for key in ('dictionary', 'corpus', 'videos', 'texts'):
+            same = reference[key] == streaming[key]
+            print(f"{'✅' if same else '❌'} {key} {'identical' if same else 'differs'}")
+
+if __name__ == "__main__":
+    main()
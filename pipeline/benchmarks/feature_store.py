@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Feature table load time and memory: CSV vs partitioned Parquet
+
+Builds a feature table from synthetic comments with the streaming ingest.
+It is stored as the CSV and, when pyarrow works, as Parquet datasets
+partitioned by month and by video bucket. Each reader query then runs in a
+fresh process, reporting its time, the growth of peak resident memory
+during the read (imports excluded) and its row count:
+- the notebooks' full read
+- the label column only
+- spam rows only
+- quality text only
+- one video's comments
+
+Row counts must match the full read filtered in pandas.
+
+    python pipeline/benchmarks/feature_store.py --rows 40000
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, REPO_DIR)
+
+QUERIES = {
+    'full read': (None, []),
+    'labels only': (['spam_classification'], []),
+    'spam rows': (None, [('spam_classification', '==', 'spam')]),
+    'quality text': (['commentId', 'videoId', 'textOriginal'], [('spam_classification', '==', 'quality')]),
+    'one video': (['commentId', 'textOriginal'], [('videoId', '==', None)])
+}
+
+def peak_rss_mb() -> float:
+    # ru_maxrss survives exec, so a child would report the parent's peak; VmHWM does not
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+def size_mb(path: str) -> float:
+    if os.path.isfile(path):
+        return os.path.getsize(path) / 1e6
+    return sum(os.path.getsize(os.path.join(root, name))
+               for root, _, names in os.walk(path) for name in names) / 1e6
+
+def query_args(name: str, video):
+    columns, filters = QUERIES[name]
+    return columns, [(column, op, video if value is None else value) for column, op, value in filters]
+
+def child(query: str, path: str, video: str):
+    import pandas as pd
+    from pipeline.feature_store import read_feature_table
+    
+    baseline = peak_rss_mb()
+    start = time.perf_counter()
+    if query == 'notebook':
+        frame = pd.read_csv(path)
+    else:
+        with contextlib.redirect_stdout(io.StringIO()):
+            # read_csv infers numeric IDs; Parquet stores them as strings
+            video = str(json.loads(video)) if os.path.isdir(path) else json.loads(video)
+            columns, filters = query_args(query, video)
+            frame = read_feature_table(path, columns=columns, filters=filters)
+    print(f"{time.perf_counter() - start} {peak_rss_mb() - baseline} {len(frame)}")
+
+def measure(query: str, path: str, video):
+    result = subprocess.run([sys.executable, __file__, "--child", query, "--path", path, "--video", json.dumps(video)],
+                            capture_output=True, text=True, check=True)
+    elapsed, peak, rows = result.stdout.split()[-3:]
+    return float(elapsed), float(peak), int(rows)
+
+def expected_rows(csv_path: str, video):
+    """Row count of every query from the full CSV filtered in pandas"""
+    import pandas as pd
+    from pipeline.feature_store import _filter_mask
+    
+    full = pd.read_csv(csv_path)
+    return {name: int(_filter_mask(full, query_args(name, video)[1]).sum()) for name in QUERIES}
+
+def main():
+    parser = argparse.ArgumentParser(description="Feature table load time and memory, CSV vs Parquet")
+    parser.add_argument("--rows", type=int, default=40_000, help="Comments per file (5 files)")
+    parser.add_argument("--chunksize", type=int, default=50_000)
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--path", help=argparse.SUPPRESS)
+    parser.add_argument("--video", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    
+    if args.child:
+        child(args.child, args.path, args.video)
+        return
+    
+    import warnings
+    warnings.filterwarnings('ignore')
+    import pandas as pd
+    from pipeline.benchmarks.sample_comments import write_comment_files
+    from pipeline.feature_store import PARQUET_AVAILABLE, convert_csv
+    from pipeline.stream_ingest import ingest_comments
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        write_comment_files(tmp, args.rows)
+        csv_path = os.path.join(tmp, "features.csv")
+        with contextlib.redirect_stdout(io.StringIO()):
+            ingest_comments(tmp, csv_path, chunksize=args.chunksize, restart=True)
+        video = pd.read_csv(csv_path, usecols=['videoId'])['videoId'].value_counts().index[0].item()
+        expected = expected_rows(csv_path, video)
+        
+        stores = [("csv", csv_path)]
+        if PARQUET_AVAILABLE:
+            for partition_by in ("month", "video"):
+                root = os.path.join(tmp, f"features_{partition_by}.parquet")
+                with contextlib.redirect_stdout(io.StringIO()):
+                    convert_csv(csv_path, root, partition_by, args.chunksize)
+                stores.append((f"parquet/{partition_by}", root))
+        else:
+            print("⚠️ pyarrow unavailable; Parquet rows skipped")
+        
+        print(f"📊 {expected['full read']:,} rows; on disk: "
+              + ", ".join(f"{name} {size_mb(path):.1f}MB" for name, path in stores))
+        print(f"{'store':>15} {'query':>13} {'time':>8} {'read peak':>10} {'rows':>9}")
+        elapsed, peak, rows = measure('notebook', csv_path, video)
+        print(f"   {'csv':>13} {'pd.read_csv':>13} {elapsed:>7.2f}s {peak:>8.0f}MB {rows:>9,}")
+        for store, path in stores:
+            for name in QUERIES:
+                elapsed, peak, rows = measure(name, path, video)
+                mark = '✅' if rows == expected[name] else '❌'
+                print(f"{mark} {store:>13} {name:>13} {elapsed:>7.2f}s {peak:>8.0f}MB {rows:>9,}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""
+Frontend extraction: per-topic filtering and full reads vs the single pass
+
+Writes synthetic inputs for extract_frontend_data.py into a temporary
+directory:
+- the comment feature table, from the streaming ingest
+- video_topics_assignment.csv, with 26 topics, tied counts and missing views
+- topic_keywords_frequencies.csv
+
+It then runs the extractor as it was before the single-pass rewrite (kept
+verbatim below) and the current one. It reports their time and checks that
+both produce the same JSON.
+
+    python pipeline/benchmarks/frontend_extract.py --rows 40000 --videos 35000
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+import warnings
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, REPO_DIR)
+warnings.filterwarnings('ignore')
+
+import numpy as np
+import pandas as pd
+
+import extract_frontend_data
+from pipeline.benchmarks.sample_comments import write_comment_files
+from pipeline.stream_ingest import ingest_comments
+
+def write_topic_files(directory: str, videos: int, topics: int = 26, keywords: int = 30, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    views = rng.integers(0, 2_000_000, videos).astype(float)
+    views[rng.random(videos) < 0.02] = np.nan
+    pd.DataFrame({
+        'videoId': [f"vid{i}" for i in range(videos)],
+        'video_title': [f"Video {i}" for i in range(videos)],
+        'dominant_topic': rng.integers(0, topics, videos),
+        # Rounded so that ties are common, as in the real assignments
+        'topic_probability': rng.random(videos).round(2),
+        'num_comments': rng.integers(1, 500, videos),
+        'viewCount': views,
+        'likeCount': rng.integers(0, 10_000, videos)
+    }).to_csv(os.path.join(directory, 'video_topics_assignment.csv'), index=False)
+    rows = [(topic, f"word{topic}_{rank}", round(1 / (rank + 2), 4), int(rng.integers(1, 1000)))
+            for rank in range(keywords) for topic in range(topics)]
+    pd.DataFrame(rows, columns=['topic_id', 'keyword', 'probability', 'frequency']).to_csv(
+        os.path.join(directory, 'topic_keywords_frequencies.csv'), index=False)
+
+# extract_frontend_data.py before the single-pass rewrite, verbatim
+
+def extract_spam_quality_samples():
+    """Extract top 5 samples each of spam, quality, and uncertain comments"""
+    print("📊 Extracting comment samples...")
+    
+    try:
+        # Try to read the complete dataset
+        df = pd.read_csv('complete_comments_top20_features.csv')
+        
+        # Get spam classification column (try different possible names)
+        spam_col = None
+        for col in df.columns:
+            if 'spam' in col.lower() and 'classification' in col.lower():
+                spam_col = col
+                break
+        
+        if spam_col is None:
+            print("❌ Could not find spam classification column")
+            return None
+        
+        # Extract samples
+        spam_samples = df[df[spam_col] == 'spam'].nlargest(5, 'classification_confidence')
+        quality_samples = df[df[spam_col] == 'quality'].nlargest(5, 'classification_confidence')
+        
+        # Handle uncertain comments (might be low confidence quality or spam)
+        uncertain_samples = pd.concat([
+            df[df[spam_col] == 'quality'].nsmallest(3, 'classification_confidence'),
+            df[df[spam_col] == 'spam'].nsmallest(2, 'classification_confidence')
+        ])
+        
+        samples = {
+            'spam': spam_samples[['commentId', 'textOriginal', 'classification_confidence', 
+                               'caps_ratio', 'repetition_ratio', 'emoji_ratio', 'likes_per_char']].to_dict('records'),
+            'quality': quality_samples[['commentId', 'textOriginal', 'classification_confidence',
+                                     'caps_ratio', 'repetition_ratio', 'emoji_ratio', 'likes_per_char']].to_dict('records'),
+            'uncertain': uncertain_samples[['commentId', 'textOriginal', 'classification_confidence',
+                                          'caps_ratio', 'repetition_ratio', 'emoji_ratio', 'likes_per_char']].to_dict('records')
+        }
+        
+        return samples
+    
+    except Exception as e:
+        print(f"❌ Error reading complete dataset: {e}")
+        # Fallback to example spam data
+        try:
+            spam_df = pd.read_csv('example_spam/spam_comments_sample_100.csv')
+            samples = {
+                'spam': spam_df.head(5)[['commentId', 'textOriginal', 'classification_confidence',
+                                       'caps_ratio', 'repetition_ratio', 'emoji_ratio', 'likes_per_char']].to_dict('records'),
+                'quality': [],  # Will need to be populated manually
+                'uncertain': []
+            }
+            return samples
+        except Exception as e2:
+            print(f"❌ Error reading example spam: {e2}")
+            return None
+
+def extract_topic_analysis():
+    """Extract comprehensive topic analysis data"""
+    print("🔍 Extracting topic analysis...")
+    
+    try:
+        # Read topic assignments
+        video_topics = pd.read_csv('video_topics_assignment.csv')
+        topic_keywords = pd.read_csv('topic_keywords_frequencies.csv')
+        
+        # Create topic leaderboard
+        topic_stats = video_topics.groupby('dominant_topic').agg({
+            'videoId': 'count',
+            'topic_probability': 'mean',
+            'num_comments': 'sum',
+            'viewCount': 'sum'
+        }).round(3)
+        
+        topic_stats.columns = ['video_count', 'avg_confidence', 'total_comments', 'total_views']
+        topic_stats = topic_stats.reset_index()
+        topic_stats['percentage'] = (topic_stats['video_count'] / topic_stats['video_count'].sum() * 100).round(1)
+        
+        # Sort by video count for leaderboard
+        topic_leaderboard = topic_stats.sort_values('video_count', ascending=False).to_dict('records')
+        
+        # Get top keywords for each topic
+        topic_keywords_dict = {}
+        for topic_id in range(26):
+            keywords = topic_keywords[topic_keywords['topic_id'] == topic_id].head(10)
+            topic_keywords_dict[topic_id] = keywords[['keyword', 'probability', 'frequency']].to_dict('records')
+        
+        # Get top videos for each topic (highest confidence)
+        top_videos_per_topic = {}
+        for topic_id in range(26):
+            topic_videos = video_topics[video_topics['dominant_topic'] == topic_id]
+            if len(topic_videos) > 0:
+                top_videos = topic_videos.nlargest(3, 'topic_probability')[['videoId', 'video_title', 'topic_probability', 'viewCount', 'num_comments']]
+                top_videos_per_topic[topic_id] = top_videos.to_dict('records')
+            else:
+                top_videos_per_topic[topic_id] = []
+        
+        return {
+            'leaderboard': topic_leaderboard,
+            'keywords': topic_keywords_dict,
+            'top_videos': top_videos_per_topic,
+            'total_topics': 26,
+            'total_videos': len(video_topics),
+            'coherence_score': 0.531
+        }
+    
+    except Exception as e:
+        print(f"❌ Error extracting topic analysis: {e}")
+        return None
+
+def extract_video_statistics():
+    """Extract video engagement and comment statistics"""
+    print("📹 Extracting video statistics...")
+    
+    try:
+        video_topics = pd.read_csv('video_topics_assignment.csv')
+        
+        # Top videos by comment count
+        top_by_comments = video_topics.nlargest(10, 'num_comments')[['videoId', 'video_title', 'num_comments', 'viewCount', 'dominant_topic']]
+        
+        # Top videos by views
+        top_by_views = video_topics.nlargest(10, 'viewCount')[['videoId', 'video_title', 'viewCount', 'num_comments', 'dominant_topic']]
+        
+        # Comment to view ratios
+        video_topics['comment_ratio'] = video_topics['num_comments'] / video_topics['viewCount'].fillna(1)
+        top_engagement = video_topics.nlargest(10, 'comment_ratio')[['videoId', 'video_title', 'comment_ratio', 'viewCount', 'num_comments']]
+        
+        return {
+            'top_by_comments': top_by_comments.to_dict('records'),
+            'top_by_views': top_by_views.to_dict('records'),
+            'top_engagement': top_engagement.to_dict('records'),
+            'total_videos': len(video_topics),
+            'total_comments': video_topics['num_comments'].sum(),
+            'total_views': video_topics['viewCount'].sum(),
+            'avg_comments_per_video': video_topics['num_comments'].mean(),
+            'avg_views_per_video': video_topics['viewCount'].mean()
+        }
+    
+    except Exception as e:
+        print(f"❌ Error extracting video statistics: {e}")
+        return None
+
+def run_legacy() -> dict:
+    return {
+        'comment_samples': extract_spam_quality_samples(),
+        'topic_analysis': extract_topic_analysis(),
+        'video_statistics': extract_video_statistics()
+    }
+
+def run_single_pass(chunksize: int) -> dict:
+    videos = extract_frontend_data.aggregate_video_topics(chunksize=chunksize)
+    return {
+        'comment_samples': extract_frontend_data.extract_spam_quality_samples(chunksize=chunksize),
+        'topic_analysis': extract_frontend_data.extract_topic_analysis(videos, chunksize=chunksize),
+        'video_statistics': extract_frontend_data.extract_video_statistics(videos)
+    }
+
+def timed(function, *args):
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = function(*args)
+    return result, time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description="Legacy vs single-pass frontend data extraction")
+    parser.add_argument("--rows", type=int, default=40_000, help="Comments per file (5 files)")
+    parser.add_argument("--videos", type=int, default=35_000)
+    parser.add_argument("--chunksize", type=int, default=100_000)
+    args = parser.parse_args()
+    
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        write_comment_files(tmp, args.rows)
+        with contextlib.redirect_stdout(io.StringIO()):
+            ingest_comments(tmp, os.path.join(tmp, 'complete_comments_top20_features.csv'), restart=True)
+        write_topic_files(tmp, args.videos)
+        os.chdir(tmp)
+        try:
+            legacy, legacy_time = timed(run_legacy)
+            single, single_time = timed(run_single_pass, args.chunksize)
+        finally:
+            os.chdir(cwd)
+    
+    same = json.dumps(legacy, default=str, sort_keys=True) == json.dumps(single, default=str, sort_keys=True)
+    print(f"📊 {args.rows * 5:,} comments, {args.videos:,} videos")
+    print(f"⏱ legacy:      {legacy_time:6.2f}s")
+    print(f"⏱ single pass: {single_time:6.2f}s  ({legacy_time / single_time:.1f}x)")
+    print(f"{'✅' if same else '❌'} outputs {'identical' if same else 'DIFFERENT'}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Post-GMM labelling: notebook loops vs pipeline/spam_labels.py
+
+Uses GMM probabilities for --rows comments. Synthetic comments are tiled up
+to that size and scored with the saved model. The benchmark checks that the
+labels, cluster statistics and spam cluster match the notebook code, and
+reports time and label memory. It then times a threshold sweep done in one
+pass against relabelling once per threshold.
+
+    python pipeline/benchmarks/gmm_labelling.py --rows 1000000
+"""
+
+import argparse
+import os
+import sys
+import time
+import warnings
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, REPO_DIR)
+warnings.filterwarnings('ignore')
+
+import numpy as np
+import pandas as pd
+
+from pipeline import notebook_reference, spam_labels
+from pipeline.benchmarks.sample_comments import make_comments
+from pipeline.spam_features import CLUSTERING_FEATURES, add_features, clustering_matrix
+from pipeline.spam_model import load_model, predict_probabilities
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description="Notebook vs vectorized post-GMM labelling")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--sample", type=int, default=50_000, help="Distinct synthetic comments tiled to --rows")
+    parser.add_argument("--thresholds", type=float, nargs="+",
+                        default=[0.05, 0.1, 0.15, 0.2, 0.25, 0.3, 0.4, 0.5])
+    args = parser.parse_args()
+    
+    model = load_model()
+    X_sample = clustering_matrix(add_features(make_comments(args.sample)))
+    X = np.resize(X_sample, (args.rows, X_sample.shape[1]))
+    probabilities = predict_probabilities(model, X)
+    predicted = np.argmax(probabilities, axis=1)
+    spam_id = model['spam_cluster_id']
+    print(f"🧮 {args.rows:,} probability pairs")
+    
+    reference, ref_time = timed(notebook_reference.assign_final_labels_with_uncertainty,
+                                probabilities, predicted, spam_id, 0.2)
+    codes, vec_time = timed(spam_labels.assign_label_codes, probabilities, spam_id, 0.2)
+    same = np.array_equal(reference, spam_labels.label_strings(codes).astype(reference.dtype))
+    print(f"{'✅' if same else '❌'} labels {'identical' if same else 'DIFFERENT'}")
+    print(f"⏱ labelling   notebook {ref_time:7.2f}s   vectorized {vec_time:7.3f}s   ({ref_time / vec_time:,.0f}x)")
+    print(f"💾 labels     notebook {reference.nbytes / 1e6:7.1f}MB  int8 {codes.nbytes / 1e6:7.1f}MB")
+    
+    # The notebook computes cluster stats on the scaled feature frame
+    scaled = pd.DataFrame(model['scaler'].transform(pd.DataFrame(X, columns=CLUSTERING_FEATURES)),
+                          columns=CLUSTERING_FEATURES)
+    (ref_stats, ref_spam), ref_time = timed(notebook_reference.identify_spam_cluster, scaled, predicted)
+    stats, vec_time = timed(spam_labels.cluster_stats, scaled.to_numpy(), predicted, CLUSTERING_FEATURES)
+    close = all(np.isclose(float(ref_stats[c][k]), stats[c][k], rtol=1e-9, atol=1e-12)
+                for c in (0, 1) for k in stats[c])
+    same_id = spam_labels.identify_spam_cluster(stats) == ref_spam
+    print(f"{'✅' if close and same_id else '❌'} cluster stats {'match' if close else 'DIFFER'}, "
+          f"spam cluster {ref_spam} {'matches' if same_id else 'DIFFERS'}")
+    print(f"⏱ stats      notebook {ref_time:7.3f}s   one pass   {vec_time:7.3f}s")
+    
+    def per_threshold():
+        return [spam_labels.label_counts(spam_labels.assign_label_codes(probabilities, spam_id, t))
+                for t in args.thresholds]
+    
+    repeated, rep_time = timed(per_threshold)
+    sweep, sweep_time = timed(spam_labels.threshold_sweep, probabilities, spam_id, args.thresholds)
+    expected = pd.DataFrame(repeated)
+    same = (expected[list(spam_labels.LABELS)].to_numpy() ==
+            sweep.sort_values('threshold')[list(spam_labels.LABELS)].to_numpy()).all()
+    print(f"{'✅' if same else '❌'} sweep of {len(args.thresholds)} thresholds "
+          f"{'matches' if same else 'DIFFERS from'} per-threshold labelling")
+    print(f"⏱ sweep      per threshold {rep_time:7.3f}s   one pass {sweep_time:7.3f}s")
+    print(sweep.to_string(index=False))
+
+if __name__ == "__main__":
+    main()
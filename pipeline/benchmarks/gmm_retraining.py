@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Incremental retraining vs a full refit of the spam GMM
+
+The raw comments are not in the repository, so both models are fitted on
+synthetic comments. A base model is first fitted the notebook's way on
+--base rows. It is then updated on --new rows with
+pipeline/spam_retrain.py, and the result is compared with a notebook-style
+refit of all base + new rows. The benchmark reports fit times and how often
+the two models give the same label; for scale, it also shows how often two
+full refits with different seeds agree. It also checks that turning the
+saved production model into sufficient statistics and back keeps its
+probabilities.
+
+    python pipeline/benchmarks/gmm_retraining.py --base 200000 --new 50000 --passes 1 2
+"""
+
+import argparse
+import os
+import sys
+import warnings
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, REPO_DIR)
+warnings.filterwarnings('ignore')
+
+import numpy as np
+
+from pipeline.benchmarks.sample_comments import make_comments
+from pipeline.spam_features import add_features, clustering_matrix
+from pipeline.spam_model import load_model, predict_probabilities
+from pipeline.spam_retrain import GMMStatistics, array_chunks, fit_full, label_agreement, retrain_incremental
+
+def features(n: int, seed: int) -> np.ndarray:
+    return clustering_matrix(add_features(make_comments(n, seed=seed)))
+
+def print_agreement(name: str, report):
+    per_label = "  ".join(f"{label} {share:.2%}" for label, share in report.items() if label != 'overall')
+    print(f"   {name:<24} {report['overall']:.2%}  ({per_label})")
+
+def main():
+    parser = argparse.ArgumentParser(description="Incremental vs full retraining of the spam GMM")
+    parser.add_argument("--base", type=int, default=200_000, help="Comments the base model is fitted on")
+    parser.add_argument("--new", type=int, default=50_000, help="New comments to retrain on")
+    parser.add_argument("--chunksize", type=int, default=25_000)
+    parser.add_argument("--passes", type=int, nargs="+", default=[1, 2])
+    args = parser.parse_args()
+    
+    saved = load_model()
+    X_check = features(20_000, seed=3)
+    stats = GMMStatistics.from_model(saved['gmm_model'], saved['scaler'], saved['scaler'].n_samples_seen_)
+    rebuilt = dict(saved, gmm_model=stats.to_gmm(saved['scaler'], saved['gmm_model']))
+    error = np.abs(predict_probabilities(saved, X_check) - predict_probabilities(rebuilt, X_check)).max()
+    print(f"{'✅' if error < 1e-6 else '❌'} Saved model -> statistics -> GMM: max probability difference {error:.1e}")
+    
+    print(f"📦 Generating {args.base:,} base and {args.new:,} new comments")
+    X_base = features(args.base, seed=1)
+    X_new = features(args.new, seed=2)
+    X_all = np.vstack([X_base, X_new])
+    
+    base = fit_full(X_base)
+    print(f"⏱ Base fit (notebook settings, {args.base:,} rows): {base['metrics']['processing_time']:.1f}s")
+    full = fit_full(X_all)
+    full_time = full['metrics']['processing_time']
+    print(f"⏱ Full refit ({len(X_all):,} rows): {full_time:.1f}s")
+    
+    print("\n📊 Label agreement on all rows (vs the full refit unless noted)")
+    print_agreement("base model (no update)", label_agreement(base, full, X_all))
+    print_agreement("full refit, other seed", label_agreement(fit_full(X_all, random_state=0), full, X_all))
+    for passes in args.passes:
+        for prior_weight, name in ((None, "base + new"), (0.0, "new only")):
+            model = retrain_incremental(base, array_chunks(X_new, args.chunksize), prior_weight, passes,
+                                        verbose=False)
+            fit_time = model['metrics']['processing_time']
+            print(f"⏱ Incremental, {name}, {passes} pass(es): {fit_time:.2f}s ({full_time / fit_time:,.0f}x faster)")
+            print_agreement("vs full refit", label_agreement(model, full, X_all))
+            print_agreement("vs base model", label_agreement(model, base, X_all))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Peak memory of the comment ingest: load-everything (run.ipynb) vs streaming
+
+Generates synthetic comment files at several sizes and runs each ingest in a
+fresh process, reporting its peak resident memory and throughput. The
+streaming peak should stay flat as the input grows.
+
+    python pipeline/benchmarks/ingest_memory.py --rows 10000 40000 --chunksize 10000
+"""
+
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, REPO_DIR)
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+def run_full(data_path: str, output: str):
+    """The notebook flow: load and concatenate every file, then process and write once"""
+    import pandas as pd
+    from pipeline.spam_features import clustering_matrix, create_feature_pipeline
+    from pipeline.spam_model import classify, load_model
+    from pipeline.stream_ingest import COMMENT_FILES
+    
+    comments = pd.concat([pd.read_csv(os.path.join(data_path, name), low_memory=False, dtype=str)
+                          for name in COMMENT_FILES], ignore_index=True)
+    processed = create_feature_pipeline(comments, verbose=False)
+    labels, confidence = classify(load_model(), clustering_matrix(processed['original_data']))
+    output_df = processed['full_data'].copy()
+    output_df['spam_classification'] = labels
+    output_df['classification_confidence'] = confidence
+    output_df.to_csv(output, index=False, encoding='utf-8')
+
+def run_stream(data_path: str, output: str, chunksize: int):
+    import contextlib
+    import io
+    from pipeline.stream_ingest import ingest_comments
+    
+    with contextlib.redirect_stdout(io.StringIO()):
+        ingest_comments(data_path, output, chunksize=chunksize, restart=True)
+
+def child(mode: str, data_path: str, output: str, chunksize: int):
+    import warnings
+    warnings.filterwarnings('ignore')
+    start = time.perf_counter()
+    if mode == "full":
+        run_full(data_path, output)
+    else:
+        run_stream(data_path, output, chunksize)
+    print(f"{time.perf_counter() - start} {peak_rss_mb()}")
+
+def measure(mode: str, data_path: str, output: str, chunksize: int):
+    result = subprocess.run([sys.executable, __file__, "--child", mode, "--data-path", data_path,
+                             "--output", output, "--chunksize", str(chunksize)],
+                            capture_output=True, text=True, check=True)
+    elapsed, peak = map(float, result.stdout.split()[-2:])
+    return elapsed, peak
+
+def main():
+    parser = argparse.ArgumentParser(description="Peak memory of full vs streaming comment ingest")
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000, 40000], help="Comments per file")
+    parser.add_argument("--chunksize", type=int, default=10000)
+    parser.add_argument("--child", choices=["full", "stream"], help=argparse.SUPPRESS)
+    parser.add_argument("--data-path", help=argparse.SUPPRESS)
+    parser.add_argument("--output", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    
+    if args.child:
+        child(args.child, args.data_path, args.output, args.chunksize)
+        return
+    
+    from pipeline.benchmarks.sample_comments import write_comment_files
+    
+    print(f"{'comments':>10} {'mode':>8} {'peak RSS':>10} {'comments/sec':>13}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for rows in args.rows:
+            data_path = os.path.join(tmp, str(rows))
+            write_comment_files(data_path, rows)
+            total = rows * 5
+            outputs = {}
+            for mode in ("full", "stream"):
+                outputs[mode] = os.path.join(data_path, f"{mode}.csv")
+                elapsed, peak = measure(mode, data_path, outputs[mode], args.chunksize)
+                print(f"{total:>10,} {mode:>8} {peak:>8.0f}MB {total / elapsed:>13,.0f}")
+            with open(outputs["full"], "rb") as a, open(outputs["stream"], "rb") as b:
+                same = a.read() == b.read()
+            print(f"{'✅' if same else '❌'} outputs {'identical' if same else 'DIFFERENT'}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Language detection: notebook per-row path vs pipeline/language_detection.py
+
+Runs ``detect_language_safe`` on every synthetic comment, as run.ipynb
+would, and then the cached detector three ways: a cold run with an empty
+cache, a warm run against the cache the cold run left (a pipeline rerun),
+and cold runs with a process pool. Every run must return exactly the
+notebook's languages. Reports the pre-filter share, cache hit rate and
+speedup over the per-row path.
+
+    python pipeline/benchmarks/language_detection.py --rows 20000 --workers 2 4
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, REPO_DIR)
+
+from pipeline import notebook_reference
+from pipeline.benchmarks.sample_comments import make_comments
+from pipeline.language_detection import LanguageDetector
+
+def run(texts, cache_path, workers=1):
+    detector = LanguageDetector(cache_path, workers)
+    start = time.perf_counter()
+    languages = detector.detect(texts)
+    elapsed = time.perf_counter() - start
+    detector.close()
+    return languages, elapsed, detector
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-row vs cached language detection")
+    parser.add_argument("--rows", type=int, default=20_000)
+    parser.add_argument("--workers", type=int, nargs="*", default=[2, 4])
+    args = parser.parse_args()
+    
+    texts = make_comments(args.rows)["textOriginal"]
+    print(f"🖥 {os.cpu_count()} cores, {args.rows:,} comments")
+    
+    start = time.perf_counter()
+    reference = texts.apply(notebook_reference.detect_language_safe)
+    naive = time.perf_counter() - start
+    print(f"⏱ notebook per row:  {naive:8.2f}s  {args.rows / naive:10,.0f} comments/sec")
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        cache_path = os.path.join(tmp, "language_cache.sqlite")
+        runs = [("cold cache", cache_path, 1), ("warm cache", cache_path, 1)]
+        runs += [(f"cold, {workers} workers", os.path.join(tmp, f"cold{workers}.sqlite"), workers)
+                 for workers in args.workers]
+        for name, path, workers in runs:
+            languages, elapsed, detector = run(texts, path, workers)
+            same = languages.equals(reference.rename('language'))
+            stats = detector.stats
+            print(f"{'✅' if same else '❌'} {name:<17} {elapsed:8.2f}s  {args.rows / elapsed:10,.0f} comments/sec"
+                  f"  speedup {naive / elapsed:7.1f}x  hit rate {detector.hit_rate:6.1%}"
+                  f"  detected {stats['detected']:,}")
+        
+        print(f"\n📊 {stats['unique_texts']:,} distinct texts, {stats['unique_keys']:,} distinct detection keys, "
+              f"{stats['prefiltered_rows'] / args.rows:.1%} of rows pre-filtered")
+
+if __name__ == "__main__":
+    main()
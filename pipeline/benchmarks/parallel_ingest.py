@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Streaming ingest throughput with 1/2/4/8 worker processes
+
+Runs pipeline/stream_ingest.py on synthetic comment files with each worker
+count, checks that every output is byte-identical to the single-process
+run, and reports comments/sec and speedup. Speedup is bounded by the cores
+available (printed first).
+
+    python pipeline/benchmarks/parallel_ingest.py --rows 20000 --chunksize 5000
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+import warnings
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, REPO_DIR)
+
+from pipeline.benchmarks.sample_comments import write_comment_files
+from pipeline.stream_ingest import ingest_comments
+
+def main():
+    parser = argparse.ArgumentParser(description="Streaming ingest speedup by worker count")
+    parser.add_argument("--rows", type=int, default=20000, help="Comments per file (5 files)")
+    parser.add_argument("--chunksize", type=int, default=5000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    args = parser.parse_args()
+    warnings.filterwarnings('ignore')
+    
+    cores = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count()
+    print(f"🖥 {cores} usable cores, {args.rows * 5:,} comments, chunks of {args.chunksize:,}")
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        write_comment_files(tmp, args.rows)
+        baseline = None
+        base_time = None
+        for workers in args.workers:
+            output = os.path.join(tmp, f"out_{workers}.csv")
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                checkpoint = ingest_comments(tmp, output, chunksize=args.chunksize, restart=True, workers=workers)
+            elapsed = time.perf_counter() - start
+            with open(output, "rb") as f:
+                data = f.read()
+            if baseline is None:
+                baseline, base_time = data, elapsed
+            same = data == baseline
+            print(f"{'✅' if same else '❌'} {workers} workers: {elapsed:7.2f}s "
+                  f"{checkpoint['rows'] / elapsed:>10,.0f} comments/sec  speedup {base_time / elapsed:.2f}x"
+                  f"{'' if same else '  OUTPUT DIFFERS'}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+"""
+Deterministic synthetic comments in the layout of comments1.csv ... comments5.csv
+
+The raw comment exports are not in the repository, so the pipeline
+benchmarks and equivalence checks run on generated data. The generator mixes
+the real samples from frontend_data/comprehensive_analysis.json with
+templated comments and deliberately awkward inputs: heavy duplication of
+short spam ("❤", "Nice!", "first"), ZWJ and skin-tone emoji, keycaps,
+unusual whitespace, URLs, shouting, missing text and malformed numbers and
+dates.
+
+``make_videos`` generates the matching videos.csv, and
+``make_pooled_documents`` per-video pooled documents (the topic modelling
+input in stm.ipynb) with a known topic structure.
+"""
+
+import json
+import os
+import random
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+ANALYSIS_FILE = os.path.join(REPO_DIR, "frontend_data", "comprehensive_analysis.json")
+
+COMMENT_COLUMNS = [
+    "kind", "commentId", "channelId", "videoId", "authorId", "textOriginal",
+    "parentCommentId", "likeCount", "publishedAt", "updatedAt"
+]
+
+SPAM = ["❤", "❤️", "Nice!", "Nice", "nice", "first", "First!", "1st", "wow", "WOW!!!!!", "omg", "lol",
+        "haha", "love it", "Love this!!", "thanks", "Thank you", "cool", "amazing", "🔥🔥🔥", "😍😍😍😍",
+        "❤❤❤❤❤❤❤❤❤❤", "🤣🤣🤣🤣🤣🤣🤣🤣🤣🤣🤣", "💜💜💜💜💜💜💜💜💜💜💜", "🎉🎉😂🎉😅🎉❤", "first first first",
+        "SUBSCRIBE TO MY CHANNEL", "check my channel http://spam.example.com/x?y=1", "👍", "🙏🙏", "💯"]
+
+TEMPLATES = [
+    "How do you get your {thing} so {adj}? {emoji}",
+    "I tried this {thing} routine and my skin feels {adj} {emoji}{emoji}",
+    "Which {thing} are you using in this video? Link please!!!!",
+    "This is the {adj}est {thing} tutorial I've seen... ever....",
+    "{THING} IS SO {ADJ} 😂😂",
+    "Can you do a {thing} tutorial for beginners???? {emoji}",
+    "My daughter loves your {thing} videos, thank you for sharing {emoji}",
+    "Link: https://www.example.com/products/{thing}?ref=yt&id=42 ({adj})",
+    "El {thing} se ve {adj} 😍 me encanta",
+    "Il serait plus intéressant de te sublimer en tant que femme ",
+    "Aiiiiiiya best rahega ab😂",
+    "{thing} {thing} {thing} {adj} {adj}",
+]
+
+THINGS = ["makeup", "skincare", "hair", "lipstick", "foundation", "mascara", "serum", "eyeliner", "curls", "nails"]
+ADJECTIVES = ["beautiful", "glowy", "smooth", "amazing", "natural", "bold", "soft", "shiny", "long", "cute"]
+EMOJI = ["😍", "✨", "💄", "💅", "🥰", "👩‍👩‍👧", "👍🏽", "1️⃣", "#️⃣", "🏳️‍🌈", "❤️‍🔥", "🧴", "🪞", "🎵", "🍓",
+         "😭", "💀", "🙄", "☺️", "☺", "©", "🇫🇷", "🤷‍♀️", "👨🏿‍🦱", "🫶"]
+ODD = ["  spaced\tout\ncomment  ", " non breaking ", "line sep", "MIXED case Ünïcödé ÀÉÎ",
+       "ǅemo title-case", "ﬁ ligature", "!!!!!!", "??????", "......", "", " ", "😀" * 40, "a‍b",
+       "1️", "5⃣", "#️⃣", "Ⅻ roman", "ＦＵＬＬＷＩＤＴＨ", "ß straße"]
+
+def _real_samples() -> List[str]:
+    try:
+        with open(ANALYSIS_FILE, "r", encoding="utf-8") as f:
+            samples = json.load(f).get("comment_samples", {})
+        return [s["textOriginal"] for group in samples.values() for s in group if s.get("textOriginal")]
+    except (OSError, ValueError):
+        return []
+
+def _fill(template: str, rng: random.Random) -> str:
+    thing, adj = rng.choice(THINGS), rng.choice(ADJECTIVES)
+    text = template.replace("{THING}", thing.upper()).replace("{ADJ}", adj.upper())
+    text = text.replace("{thing}", thing).replace("{adj}", adj)
+    while "{emoji}" in text:
+        text = text.replace("{emoji}", rng.choice(EMOJI), 1)
+    return text
+
+def make_comment_text(rng: random.Random, real: List[str]) -> object:
+    roll = rng.random()
+    if roll < 0.35:
+        return rng.choice(SPAM)
+    if roll < 0.40 and real:
+        return rng.choice(real)
+    if roll < 0.45:
+        return rng.choice(ODD)
+    if roll < 0.46:
+        return None
+    return _fill(rng.choice(TEMPLATES), rng)
+
+def make_comments(n: int, seed: int = 0, n_videos: int = 500) -> pd.DataFrame:
+    """``n`` comments with every column read as text, like ``pd.read_csv(..., dtype=str)``"""
+    rng = random.Random(seed)
+    real = _real_samples()
+    rows = []
+    for i in range(n):
+        video = rng.randrange(n_videos)
+        month = rng.randint(1, 12)
+        published = f"2024-{month:02d}-{rng.randint(1, 28):02d}T{rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}:00Z"
+        roll = rng.random()
+        likes = str(int(rng.paretovariate(1.2)) - 1) if roll < 0.97 else rng.choice([None, "n/a", "1e3"])
+        rows.append({
+            "kind": "youtube#comment",
+            "commentId": str(seed * 10_000_000 + i),
+            "channelId": str(video % 37),
+            "videoId": str(video),
+            "authorId": str(rng.randrange(n // 3 + 1)),
+            "textOriginal": make_comment_text(rng, real),
+            "parentCommentId": str(rng.randrange(max(i, 1))) if rng.random() < 0.1 else None,
+            "likeCount": likes,
+            "publishedAt": published if rng.random() < 0.995 else "not a date",
+            "updatedAt": published
+        })
+    return pd.DataFrame(rows, columns=COMMENT_COLUMNS).astype(object)
+
+def write_comment_files(directory: str, rows_per_file: int, files: int = 5, seed: int = 0) -> List[str]:
+    """Write comments1.csv ... comments{files}.csv and return their paths"""
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for i in range(1, files + 1):
+        path = os.path.join(directory, f"comments{i}.csv")
+        make_comments(rows_per_file, seed=seed + i).to_csv(path, index=False)
+        paths.append(path)
+    return paths
+
+def make_videos(n_videos: int = 500, seed: int = 0) -> pd.DataFrame:
+    """videos.csv rows for the videoIds of ``make_comments``; about 5% are missing, some titles blank or missing"""
+    rng = random.Random(seed)
+    rows = []
+    for video in range(n_videos):
+        if rng.random() < 0.05:
+            continue
+        roll = rng.random()
+        title = _fill(rng.choice(TEMPLATES), rng) if roll < 0.9 else rng.choice(ODD) if roll < 0.97 else None
+        description = " ".join(_fill(rng.choice(TEMPLATES), rng) for _ in range(rng.randint(1, 4)))
+        rows.append({
+            "videoId": str(video),
+            "channelId": str(video % 37),
+            "title": title,
+            "description": description if rng.random() < 0.9 else None,
+            "tags": "|".join(rng.sample(THINGS, 3)),
+            "viewCount": rng.randrange(10_000_000),
+            "likeCount": rng.randrange(100_000),
+            "publishedAt": f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}T12:00:00Z"
+        })
+    return pd.DataFrame(rows)
+
+def _vocabulary(size: int, rng: random.Random) -> List[str]:
+    """Distinct alphabetic pseudo-words (gensim's tokenizer drops digits)"""
+    syllables = [c + v for c in "bcdfghklmnprstvz" for v in "aeiou"]
+    words = set(THINGS + ADJECTIVES)
+    while len(words) < size:
+        words.add("".join(rng.choice(syllables) for _ in range(rng.randint(2, 4))))
+    return sorted(words)
+
+def make_pooled_documents(n_videos: int, topics: int = 20, vocabulary: int = 3000, words: int = 300,
+                          seed: int = 0) -> List[str]:
+    """``n_videos`` documents, each drawn from a mix of 1-3 of ``topics`` word distributions"""
+    rng = random.Random(seed)
+    np_rng = np.random.default_rng(seed)
+    vocab = np.array(_vocabulary(vocabulary, rng))
+    topic_words = np_rng.dirichlet(np.full(len(vocab), 0.02), size=topics)
+    background = np_rng.dirichlet(np.ones(len(vocab)))
+    documents = []
+    for _ in range(n_videos):
+        mix = np_rng.dirichlet(np.ones(rng.randint(1, 3)))
+        chosen = np_rng.choice(topics, size=len(mix), replace=False)
+        distribution = 0.9 * mix @ topic_words[chosen] + 0.1 * background
+        length = max(5, int(np_rng.lognormal(np.log(words), 0.8)))
+        documents.append(" ".join(np_rng.choice(vocab, size=length, p=distribution)))
+    return documents
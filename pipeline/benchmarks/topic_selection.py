@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+LDA K-sweep: notebook loop vs pipeline/topic_selection.py
+
+On synthetic pooled documents with a known topic structure, runs in fresh
+processes:
+- stm.ipynb's ``compute_coherence_values`` (kept verbatim below), which
+  holds every model in a list
+- ``select_num_topics`` without early stopping, with 1 and N workers
+- ``select_num_topics`` with early stopping
+
+Reports wall time, peak resident memory of the largest process and the
+chosen K. Without early stopping the coherence scores must equal the
+notebook's exactly.
+
+    python pipeline/benchmarks/topic_selection.py --videos 150 --workers 4
+"""
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+import warnings
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, REPO_DIR)
+warnings.filterwarnings('ignore')
+
+import numpy as np
+from gensim import models
+from gensim.models.coherencemodel import CoherenceModel
+
+# stm.ipynb cell "Step 3: LDA Model Training with K Optimization", verbatim
+
+def compute_coherence_values(dictionary, corpus, texts, limit, start=2, step=3):
+    """Compute coherence values for different numbers of topics."""
+    
+    coherence_values = []
+    model_list = []
+    
+    for num_topics in range(start, limit, step):
+        print(f"Training LDA model with {num_topics} topics...")
+        
+        # Train LDA model
+        model = models.LdaModel(
+            corpus=corpus,
+            id2word=dictionary,
+            num_topics=num_topics,
+            random_state=42,
+            update_every=1,
+            chunksize=100,
+            passes=10,
+            alpha='auto',
+            per_word_topics=True
+        )
+        
+        model_list.append(model)
+        
+        # Calculate coherence
+        coherencemodel = CoherenceModel(
+            model=model,
+            texts=texts,
+            dictionary=dictionary,
+            coherence='c_v'
+        )
+        
+        coherence_values.append(coherencemodel.get_coherence())
+        print(f"Coherence score for {num_topics} topics: {coherence_values[-1]:.4f}")
+    
+    return model_list, coherence_values
+
+def child(mode: str, videos: int, workers: int):
+    import contextlib
+    import io
+    from pipeline.benchmarks.sample_comments import make_pooled_documents
+    from pipeline.topic_selection import K_VALUES, _peak_rss_mb, build_corpus, select_num_topics
+    
+    texts, dictionary, corpus = build_corpus(make_pooled_documents(videos))
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        if mode == "notebook":
+            model_list, coherence_values = compute_coherence_values(dictionary, corpus, texts, start=4, limit=31, step=2)
+            best_k = K_VALUES[int(np.argmax(coherence_values))]
+        else:
+            selection = select_num_topics(dictionary, corpus, texts, workers=workers,
+                                          early_stopping=(mode == "early stopping"), verbose=False)
+            coherence_values = selection['scores']['coherence'].tolist()
+            best_k = selection['best_k']
+    # Largest single process: this one or any worker
+    workers_peak = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+    print(json.dumps({'seconds': time.perf_counter() - start, 'peak_mb': max(_peak_rss_mb(), workers_peak), 'best_k': best_k,
+                      'coherence': [None if np.isnan(c) else c for c in coherence_values]}))
+
+def measure(mode: str, videos: int, workers: int) -> dict:
+    result = subprocess.run([sys.executable, __file__, "--child", mode, "--videos", str(videos),
+                             "--workers", str(workers)], capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description="Notebook vs parallel LDA topic-count sweep")
+    parser.add_argument("--videos", type=int, default=150, help="Pooled documents")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    
+    if args.child:
+        child(args.child, args.videos, args.workers)
+        return
+    
+    print(f"🖥 {os.cpu_count()} cores, {args.videos:,} pooled documents, K=4..30 step 2")
+    runs = [("notebook", 1), ("all K", 1), ("all K", args.workers), ("early stopping", args.workers)]
+    reference = None
+    for mode, workers in runs:
+        result = measure(mode, args.videos, workers)
+        if reference is None:
+            reference = result
+        line = (f"{mode:>15} {workers:>2} workers {result['seconds']:8.1f}s  "
+                f"{reference['seconds'] / result['seconds']:5.1f}x  peak {result['peak_mb']:6.0f}MB  best K={result['best_k']}")
+        if mode == "early stopping":
+            dropped = sum(c is None for c in result['coherence'])
+            print(f"{'✅' if result['best_k'] == reference['best_k'] else '⚠️'} {line}  ({dropped} K dropped)")
+        else:
+            same = result['coherence'] == reference['coherence']
+            print(f"{'✅' if same else '❌'} {line}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+"""
+Precomputed co-occurrence index for c_v and u_mass topic coherence
+
+``CoherenceModel(coherence='c_v')`` re-scans every text with 110-token
+sliding windows each time it is called, so the stm.ipynb K sweep recounts
+the same word co-occurrences once per K. ``CoherenceIndex`` counts them
+once, for every word in the dictionary:
+- sliding-window occurrence and co-occurrence counts (c_v), as a sparse
+  upper-triangular matrix
+- the documents each word occurs in (u_mass), as a sparse posting matrix
+
+Scoring a model then only looks up its top words. Scores equal gensim's up
+to floating-point summation order. The window counts reproduce gensim's
+accumulator, including that a word leaving a window's left edge is dropped
+even when it occurs again inside the window.
+
+An index is tied to the dictionary it was built with. It is saved as one
+``.npz`` file and scores any model trained on that dictionary, so it can be
+reused across K sweeps and retraining runs.
+
+    python pipeline/coherence_index.py --input pooled_documents.csv --output coherence_index.npz
+"""
+
+import argparse
+import os
+import sys
+import time
+from typing import Any, Iterable, List, Sequence
+
+if __package__ in (None, ""):
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sps
+
+try:
+    from gensim import matutils
+    GENSIM_AVAILABLE = True
+except ImportError:
+    print("Warning: gensim not installed; scoring models directly unavailable")
+    GENSIM_AVAILABLE = False
+
+# gensim's c_v window and the EPSILON of gensim.topic_coherence.direct_confirmation_measure
+WINDOW_SIZE = 110
+EPSILON = 1e-12
+MEASURES = ('c_v', 'u_mass')
+# Tokens per batch while building, and overlapping word pairs counted per block
+BATCH_TOKENS = 2_000_000
+PAIR_BLOCK = 4_000_000
+
+def _vocabulary(dictionary) -> np.ndarray:
+    """Tokens in id order"""
+    token2id = dictionary.token2id
+    tokens = np.full(max(token2id.values(), default=-1) + 1, '', dtype=object)
+    for token, token_id in token2id.items():
+        tokens[token_id] = token
+    return tokens.astype(str)
+
+def _window_runs(documents: List[np.ndarray], window_size: int):
+    """The windows each word is present in, as (word, first, last) runs of window numbers.
+
+    Windows are numbered across the batch. Like gensim's accumulator, a
+    word is present from the window its occurrence enters until the window
+    after that occurrence leaves the left edge, even if the word occurs
+    again in between (it is re-added only if it enters at that very window).
+    """
+    lengths = np.array([len(doc) for doc in documents], dtype=np.int64)
+    windows = np.maximum(lengths - window_size + 1, 1)
+    offsets = np.concatenate([[0], np.cumsum(windows)[:-1]])
+    doc = np.repeat(np.arange(len(documents)), lengths)
+    position = np.arange(lengths.sum()) - np.repeat(np.concatenate([[0], np.cumsum(lengths)[:-1]]), lengths)
+    word = np.concatenate(documents) if documents else np.zeros(0, dtype=np.int64)
+    known = word >= 0
+    doc, position, word = doc[known], position[known], word[known]
+    
+    # An occurrence is added when it enters a window and removed one window after it leaves;
+    # removals come first when both happen at the same window
+    removed = position + 1 < windows[doc]
+    event_word = np.concatenate([word, word[removed]])
+    event_doc = np.concatenate([doc, doc[removed]])
+    event_time = offsets[event_doc] + np.concatenate([np.maximum(position - window_size + 1, 0),
+                                                      position[removed] + 1])
+    added = np.concatenate([np.ones(len(word), dtype=bool), np.zeros(int(removed.sum()), dtype=bool)])
+    order = np.lexsort((added, event_time, event_word))
+    event_word, event_doc, event_time, added = event_word[order], event_doc[order], event_time[order], added[order]
+    
+    # Each event's state lasts until the word's next event in the document, or the document's end
+    until = offsets[event_doc] + windows[event_doc]
+    same = (event_word[1:] == event_word[:-1]) & (event_doc[1:] == event_doc[:-1])
+    until[:-1][same] = event_time[1:][same]
+    present = added & (until > event_time)
+    return event_word[present], event_time[present], until[present] - 1, int(windows.sum())
+
+def _run_overlaps(words: np.ndarray, first: np.ndarray, last: np.ndarray, size: int) -> sps.csr_matrix:
+    """Windows shared by every pair of different words, upper triangle only"""
+    order = np.argsort(first, kind='stable')
+    words, first, last = words[order], first[order], last[order]
+    # Runs of one word never overlap, so each overlapping pair is two different words
+    following = np.searchsorted(first, last, side='right') - np.arange(len(first)) - 1
+    totals = np.concatenate([[0], np.cumsum(following)])
+    co_occurrences = sps.csr_matrix((size, size), dtype=np.int64)
+    start = 0
+    while start < len(first):
+        stop = max(start + 1, int(np.searchsorted(totals, totals[start] + PAIR_BLOCK, side='right')) - 1)
+        counts = following[start:stop]
+        left = np.repeat(np.arange(start, stop), counts)
+        right = left + 1 + np.arange(counts.sum()) - np.repeat(totals[start:stop] - totals[start], counts)
+        shared = np.minimum(last[left], last[right]) - first[right] + 1
+        a, b = words[left], words[right]
+        block = sps.coo_matrix((shared, (np.minimum(a, b), np.maximum(a, b))), shape=(size, size))
+        co_occurrences = co_occurrences + block.tocsr()
+        start = stop
+    return co_occurrences
+
+class CoherenceIndex:
+    """Word (co-)occurrence counts of a tokenized corpus, for scoring topics with c_v and u_mass"""
+    
+    def __init__(self, vocabulary: np.ndarray, window_size: int, num_windows: int, occurrences: np.ndarray,
+                 co_occurrences: sps.csr_matrix, postings: sps.csc_matrix):
+        self.vocabulary = vocabulary
+        self.token2id = {token: token_id for token_id, token in enumerate(vocabulary) if token}
+        self.window_size = window_size
+        self.num_windows = num_windows
+        self.occurrences = occurrences
+        self.co_occurrences = co_occurrences
+        self.postings = postings
+    
+    @property
+    def num_docs(self) -> int:
+        return self.postings.shape[0]
+    
+    @classmethod
+    def build(cls, texts: Iterable[Sequence[str]], dictionary, window_size: int = WINDOW_SIZE,
+              batch_tokens: int = BATCH_TOKENS) -> 'CoherenceIndex':
+        """Count over ``texts`` (the tokenized documents given to CoherenceModel) in one pass"""
+        vocabulary = _vocabulary(dictionary)
+        size = len(vocabulary)
+        token2id = dictionary.token2id
+        occurrences = np.zeros(size, dtype=np.int64)
+        co_occurrences = sps.csr_matrix((size, size), dtype=np.int64)
+        postings = []
+        num_windows = 0
+        
+        def flush(batch: List[np.ndarray]):
+            nonlocal co_occurrences, num_windows
+            words, first, last, windows = _window_runs(batch, window_size)
+            occurrences[:] += np.bincount(words, weights=last - first + 1, minlength=size).astype(np.int64)
+            co_occurrences = co_occurrences + _run_overlaps(words, first, last, size)
+            num_windows += windows
+            rows = np.repeat(np.arange(len(batch)), [len(doc) for doc in batch])
+            ids = np.concatenate(batch) if batch else np.zeros(0, dtype=np.int64)
+            known = ids >= 0
+            keys = np.unique(rows[known] * size + ids[known])
+            postings.append(sps.csr_matrix((np.ones(len(keys), dtype=np.int32), (keys // size, keys % size)),
+                                           shape=(len(batch), size)))
+        
+        batch, tokens = [], 0
+        for text in texts:
+            batch.append(np.fromiter((token2id.get(token, -1) for token in text), dtype=np.int64, count=len(text)))
+            tokens += len(text)
+            if tokens >= batch_tokens:
+                flush(batch)
+                batch, tokens = [], 0
+        if batch or not postings:
+            flush(batch)
+        return cls(vocabulary, window_size, num_windows, occurrences, co_occurrences,
+                   sps.vstack(postings, format='csc'))
+    
+    def save(self, path: str):
+        np.savez(path, vocabulary=self.vocabulary, window_size=self.window_size, num_windows=self.num_windows,
+                 occurrences=self.occurrences, co_data=self.co_occurrences.data,
+                 co_indices=self.co_occurrences.indices, co_indptr=self.co_occurrences.indptr,
+                 posting_indices=self.postings.indices, posting_indptr=self.postings.indptr,
+                 num_docs=self.num_docs)
+    
+    @classmethod
+    def load(cls, path: str) -> 'CoherenceIndex':
+        with np.load(path) as data:
+            size = len(data['vocabulary'])
+            co_occurrences = sps.csr_matrix((data['co_data'], data['co_indices'], data['co_indptr']),
+                                            shape=(size, size))
+            postings = sps.csc_matrix((np.ones(len(data['posting_indices']), dtype=np.int32),
+                                       data['posting_indices'], data['posting_indptr']),
+                                      shape=(int(data['num_docs']), size))
+            return cls(data['vocabulary'], int(data['window_size']), int(data['num_windows']),
+                       data['occurrences'], co_occurrences, postings)
+    
+    def check_dictionary(self, dictionary):
+        """Raise ValueError unless ``dictionary`` maps tokens to the ids this index was built with"""
+        if not np.array_equal(_vocabulary(dictionary), self.vocabulary):
+            raise ValueError("Dictionary differs from the one the coherence index was built with; rebuild the index")
+    
+    def topic_ids(self, topics: Sequence[Sequence[Any]]) -> List[np.ndarray]:
+        """Topics as arrays of word ids; words may be given as tokens or ids"""
+        result = []
+        for topic in topics:
+            ids = [self.token2id.get(word, -1) if isinstance(word, str) else int(word) for word in topic]
+            if any(word_id < 0 or word_id >= len(self.vocabulary) for word_id in ids):
+                raise ValueError(f"Topic has words outside the index vocabulary: {list(topic)}")
+            result.append(np.array(ids, dtype=np.int64))
+        return result
+    
+    def _window_counts(self, relevant: np.ndarray) -> np.ndarray:
+        upper = self.co_occurrences[relevant][:, relevant].toarray()
+        return upper + upper.T + np.diag(self.occurrences[relevant])
+    
+    def coherence_per_topic(self, topics: Sequence[Sequence[Any]], coherence: str = 'c_v') -> List[float]:
+        """gensim's ``CoherenceModel(topics=..., coherence=...).get_coherence_per_topic()``"""
+        if coherence not in MEASURES:
+            raise ValueError(f"Unsupported coherence {coherence!r}; expected one of {MEASURES}")
+        topics = self.topic_ids(topics)
+        relevant = np.unique(np.concatenate(topics))
+        if coherence == 'c_v':
+            counts = self._window_counts(relevant) / self.num_windows
+        else:
+            docs = self.postings[:, relevant]
+            counts = (docs.T @ docs).toarray() / self.num_docs
+        
+        scores = []
+        for topic in topics:
+            local = np.searchsorted(relevant, topic)
+            joint = counts[np.ix_(local, local)]
+            marginal = np.diag(joint)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                if coherence == 'c_v':
+                    # Indirect cosine of NPMI context vectors: each word against the whole topic
+                    npmi = np.log((joint + EPSILON) / np.outer(marginal, marginal)) / -np.log(joint + EPSILON)
+                    topic_vector = npmi.sum(axis=0)
+                    sims = npmi @ topic_vector / (np.linalg.norm(npmi, axis=1) * np.linalg.norm(topic_vector))
+                    scores.append(float(np.mean(sims)))
+                else:
+                    # log P(w_i | w_j) for each word and every word ranked above it
+                    later, earlier = np.tril_indices(len(topic), -1)
+                    prior = marginal[earlier]
+                    logs = np.log((joint[later, earlier] + EPSILON) / prior)
+                    scores.append(float(np.mean(np.where(prior > 0, logs, 0.0))))
+        return scores
+    
+    def coherence(self, topics: Sequence[Sequence[Any]], coherence: str = 'c_v') -> float:
+        """gensim's ``CoherenceModel(topics=..., coherence=...).get_coherence()``"""
+        return float(np.mean(self.coherence_per_topic(topics, coherence)))
+    
+    def model_coherence(self, model, coherence: str = 'c_v', topn: int = 20) -> float:
+        """Coherence of a trained gensim topic model's top ``topn`` words, as CoherenceModel(model=...) gives"""
+        if not GENSIM_AVAILABLE:
+            raise ImportError("gensim is required to read topics from a model")
+        if len(model.id2word) != len(self.vocabulary):
+            raise ValueError("Model vocabulary differs from the coherence index's; rebuild the index")
+        topics = [matutils.argsort(topic, topn=topn, reverse=True) for topic in model.get_topics()]
+        return self.coherence(topics, coherence)
+
+def load_or_build(path: str, texts: Iterable[Sequence[str]], dictionary,
+                  window_size: int = WINDOW_SIZE) -> CoherenceIndex:
+    """The index saved at ``path`` if it matches ``dictionary``, otherwise a new one (saved there)"""
+    if os.path.exists(path):
+        index = CoherenceIndex.load(path)
+        try:
+            index.check_dictionary(dictionary)
+            if index.window_size == window_size:
+                return index
+        except ValueError:
+            pass
+        print(f"⚠️ {path} was built for another dictionary or window; rebuilding")
+    index = CoherenceIndex.build(texts, dictionary, window_size)
+    index.save(path)
+    return index
+
+def main():
+    from pipeline.topic_selection import build_corpus
+    
+    parser = argparse.ArgumentParser(description="Build the co-occurrence index for c_v and u_mass coherence")
+    parser.add_argument("--input", required=True, help="CSV with one pooled document per row")
+    parser.add_argument("--column", default="pooled_text", help="Document text column")
+    parser.add_argument("--output", default="coherence_index.npz")
+    parser.add_argument("--window-size", type=int, default=WINDOW_SIZE, help="Sliding window for c_v")
+    args = parser.parse_args()
+    
+    documents = pd.read_csv(args.input)[args.column].fillna('').astype(str).tolist()
+    texts, dictionary, _ = build_corpus(documents)
+    start_time = time.time()
+    index = CoherenceIndex.build(texts, dictionary, args.window_size)
+    index.save(args.output)
+    print(f"✅ Indexed {index.num_docs:,} documents ({index.num_windows:,} windows, {len(index.vocabulary):,} tokens, "
+          f"{index.co_occurrences.nnz:,} co-occurring pairs) in {time.time() - start_time:.1f}s")
+    print(f"💾 Saved to {args.output} ({os.path.getsize(args.output) / 1e6:.1f}MB)")
+
+if __name__ == "__main__":
+    main()
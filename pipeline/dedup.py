@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+"""
+Exact and near-duplicate comment collapsing
+
+Spam is dominated by copies: "❤", "Nice!", "nice", "first first first".
+This module collapses them at three levels:
+
+- Raw text: the feature code in spam_features already computes text
+  statistics and emoji features once per distinct text.
+- Feature rows: ``unique_rows`` maps identical clustering rows to one
+  representative. spam_model scores each distinct row once and fans the
+  probabilities back out, giving the same result as scoring every row.
+- Normalized text: ``normalize_texts`` folds case, Unicode width and
+  punctuation, so "Nice!", "nice" and "ＮＩＣＥ" share a group.
+  ``DuplicateIndex`` counts each group's comments, videos and authors
+  chunk by chunk.
+
+For copy-paste campaigns whose copies differ slightly, ``DuplicateIndex``
+can also build a MinHash near-duplicate index over the groups. MinHash
+signatures over character 3-grams go into LSH band buckets, and texts with
+an estimated Jaccard similarity of at least ``threshold`` are linked. A
+connected set of groups that reaches enough authors and videos is reported
+as a campaign.
+
+    python pipeline/dedup.py --data-path dataset --output-dir dedup_report
+"""
+
+import argparse
+import os
+import string
+import sys
+import time
+import unicodedata
+from typing import Any, Dict, List, Optional, Tuple
+
+if __package__ in (None, ""):
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
+
+from pipeline.spam_features import WHITESPACE_PATTERN, _per_unique
+
+COMMENT_FILES = [f'comments{i}.csv' for i in range(1, 6)]
+
+# Punctuation and emoji presentation selectors are dropped when normalizing
+PUNCTUATION_TABLE = str.maketrans('', '', string.punctuation + '¡¿…“”‘’«»–—·•️')
+
+SHINGLE_NGRAM = 3
+MINHASH_PERMUTATIONS = 64
+MINHASH_BANDS = 16
+# Texts per MinHash batch; the permuted shingle matrix is the peak memory
+MINHASH_BATCH = 2_000
+
+def unique_rows(X: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """(codes, first row of each distinct row): ``X[first][codes]`` equals ``X`` exactly"""
+    X = np.ascontiguousarray(X)
+    if len(X) == 0:
+        return np.zeros(0, dtype=np.intp), np.zeros(0, dtype=np.intp)
+    rows = X.view(np.dtype((np.void, X.dtype.itemsize * X.shape[1]))).ravel()
+    codes, uniques = pd.factorize(rows)
+    first = np.full(len(uniques), len(X), dtype=np.intp)
+    np.minimum.at(first, codes, np.arange(len(X)))
+    return codes, first
+
+def _normalize_unique(text: Any) -> str:
+    if not isinstance(text, str):
+        return ''
+    folded = unicodedata.normalize('NFKC', text).casefold()
+    stripped = WHITESPACE_PATTERN.sub(' ', folded.translate(PUNCTUATION_TABLE)).strip()
+    # Text that is all punctuation ("!!!!") keeps it rather than collapsing to ''
+    return stripped or WHITESPACE_PATTERN.sub(' ', folded).strip()
+
+def normalize_texts(texts: pd.Series) -> pd.Series:
+    """Duplicate-detection key per comment: NFKC, casefolded, punctuation dropped, whitespace collapsed"""
+    normalized = _per_unique(texts, lambda values: pd.Series([_normalize_unique(text) for text in values], dtype=object))
+    return normalized.rename('normalized_text')
+
+def text_hashes(texts: pd.Series) -> np.ndarray:
+    """Stable 64-bit hashes (the same in every process and run); missing values hash like ''"""
+    return pd.util.hash_array(texts.fillna('').astype(str).to_numpy(dtype=object))
+
+def _mix64(h: np.ndarray) -> np.ndarray:
+    """splitmix64 finalizer, so every output bit depends on every input bit"""
+    h = (h ^ (h >> np.uint64(30))) * np.uint64(0xbf58476d1ce4e5b9)
+    h = (h ^ (h >> np.uint64(27))) * np.uint64(0x94d049bb133111eb)
+    return h ^ (h >> np.uint64(31))
+
+def _shingles(texts: List[str], ngram: int) -> Tuple[np.ndarray, np.ndarray]:
+    """64-bit hashes of every character n-gram of every text, and where each text's n-grams start"""
+    padded = [text.ljust(ngram, '\0') for text in texts]
+    lengths = np.fromiter(map(len, padded), dtype=np.int64, count=len(padded))
+    code_points = np.frombuffer(''.join(padded).encode('utf-32-le'), dtype=np.uint32).astype(np.uint64)
+    windows = lengths - ngram + 1
+    window_starts = np.cumsum(windows) - windows
+    positions = (np.arange(windows.sum()) - np.repeat(window_starts, windows)
+                 + np.repeat(np.cumsum(lengths) - lengths, windows))
+    shingles = np.zeros(len(positions), dtype=np.uint64)
+    with np.errstate(over='ignore'):
+        for offset in range(ngram):
+            shingles = (shingles ^ code_points[positions + offset]) * np.uint64(0x100000001b3)
+        return _mix64(shingles), window_starts
+
+def minhash(texts: List[str], permutations: int = MINHASH_PERMUTATIONS, ngram: int = SHINGLE_NGRAM,
+            seed: int = 1) -> np.ndarray:
+    """MinHash signature (texts x permutations) over each text's character n-grams"""
+    rng = np.random.default_rng(seed)
+    multipliers = rng.integers(1, 2 ** 63, permutations, dtype=np.uint64) | np.uint64(1)
+    offsets = rng.integers(0, 2 ** 63, permutations, dtype=np.uint64)
+    signatures = np.empty((len(texts), permutations), dtype=np.uint64)
+    for start in range(0, len(texts), MINHASH_BATCH):
+        shingles, window_starts = _shingles(texts[start:start + MINHASH_BATCH], ngram)
+        with np.errstate(over='ignore'):
+            # Shingle hashes are already mixed; an odd multiplier plus offset is a permutation of them
+            permuted = shingles[:, None] * multipliers + offsets
+        signatures[start:start + len(window_starts)] = np.minimum.reduceat(permuted, window_starts, axis=0)
+    return signatures
+
+def near_duplicate_pairs(signatures: np.ndarray, bands: int = MINHASH_BANDS, threshold: float = 0.5) -> np.ndarray:
+    """Pairs (i, j) of near-duplicate texts from their MinHash signatures.
+
+    Signatures are split into ``bands``; texts agreeing on a whole band land
+    in the same bucket. Within a bucket, each text is compared with the first
+    text of every component found so far and linked to all of them whose
+    estimated Jaccard similarity (share of equal signature values) is at
+    least ``threshold``. A text that matches none of them is compared with
+    every earlier text of the bucket, linked to the similar ones, and becomes
+    a component's first text itself. Most texts of a campaign match an
+    existing first text, so the work stays far below all pairs. A text that
+    matches a first text is not also checked against the rest, so a merge
+    of two components through such a text can still be missed; on
+    synthetic campaigns the components equal those of all similar pairs.
+    """
+    n, permutations = signatures.shape
+    rows = permutations // bands
+    members = np.arange(n)
+    pairs = []
+    for band in range(bands):
+        key = np.zeros(n, dtype=np.uint64)
+        with np.errstate(over='ignore'):
+            for column in range(band * rows, (band + 1) * rows):
+                key = _mix64(key ^ signatures[:, column])
+        codes, uniques = pd.factorize(key)
+        leaders = np.full(len(uniques), n, dtype=np.intp)
+        np.minimum.at(leaders, codes, members)
+        leader = leaders[codes]
+        linked = leader != members
+        similar = (signatures[members[linked]] == signatures[leader[linked]]).mean(axis=1) >= threshold
+        pairs.append(np.column_stack([leader[linked][similar], members[linked][similar]]))
+        
+        # Buckets where a text missed the leader may hold more components; most buckets are settled above
+        sizes = np.bincount(codes)
+        unsettled = np.unique(codes[linked][~similar])
+        unsettled = unsettled[sizes[unsettled] > 2]
+        if len(unsettled) == 0:
+            continue
+        order = np.argsort(codes, kind='stable')
+        bounds = np.concatenate([[0], np.cumsum(sizes)])
+        for code in unsettled:
+            bucket = order[bounds[code]:bounds[code + 1]]
+            representatives = [bucket[0]]
+            for position in range(1, len(bucket)):
+                member = bucket[position]
+                candidates = np.asarray(representatives)
+                matches = (signatures[candidates] == signatures[member]).mean(axis=1) >= threshold
+                if not matches.any():
+                    candidates = bucket[:position]
+                    matches = (signatures[candidates] == signatures[member]).mean(axis=1) >= threshold
+                    representatives.append(member)
+                pairs.append(np.column_stack([candidates[matches], np.full(int(matches.sum()), member)]))
+    if not pairs:
+        return np.zeros((0, 2), dtype=np.intp)
+    return np.unique(np.concatenate(pairs), axis=0)
+
+class DuplicateIndex:
+    """Normalized-text duplicate groups over any number of comment chunks.
+
+    Per comment only three 64-bit hashes (normalized text, video, author)
+    are kept, plus the normalized and raw text of each group's first
+    comment, so memory grows with the number of groups, not with the
+    comment text.
+    """
+    
+    def __init__(self):
+        self._keys: List[np.ndarray] = []
+        self._raw: List[np.ndarray] = []
+        self._videos: List[np.ndarray] = []
+        self._authors: List[np.ndarray] = []
+        self.examples: Dict[int, Tuple[str, str]] = {}
+        self.rows = 0
+    
+    def add(self, comments: pd.DataFrame):
+        texts = comments['textOriginal']
+        normalized = normalize_texts(texts)
+        keys = text_hashes(normalized)
+        self._keys.append(keys)
+        self._raw.append(text_hashes(texts))
+        self._videos.append(text_hashes(comments['videoId']) if 'videoId' in comments else np.zeros(len(keys), np.uint64))
+        self._authors.append(text_hashes(comments['authorId']) if 'authorId' in comments else np.zeros(len(keys), np.uint64))
+        _, first = np.unique(keys, return_index=True)
+        for i in first:
+            self.examples.setdefault(int(keys[i]), (normalized.iat[i], texts.iat[i]))
+        self.rows += len(comments)
+    
+    def _rows(self) -> pd.DataFrame:
+        return pd.DataFrame({
+            'key': np.concatenate(self._keys),
+            'raw': np.concatenate(self._raw),
+            'video': np.concatenate(self._videos),
+            'author': np.concatenate(self._authors)
+        })
+    
+    def groups(self) -> pd.DataFrame:
+        """One row per normalized text: comments, distinct raw texts, videos and authors, largest first"""
+        rows = self._rows()
+        grouped = rows.groupby('key', sort=False).agg(
+            comments=('raw', 'size'), distinct_texts=('raw', 'nunique'),
+            videos=('video', 'nunique'), authors=('author', 'nunique')
+        ).reset_index()
+        grouped['text'] = [self.examples[int(key)][0] for key in grouped['key']]
+        grouped['example'] = [self.examples[int(key)][1] for key in grouped['key']]
+        return grouped.sort_values('comments', ascending=False, kind='stable').reset_index(drop=True)
+    
+    def summary(self) -> Dict[str, Any]:
+        rows = self._rows()
+        unique_raw = int(rows['raw'].nunique())
+        unique_normalized = int(rows['key'].nunique())
+        return {
+            'rows': self.rows,
+            'unique_texts': unique_raw,
+            'normalized_groups': unique_normalized,
+            'text_reduction': 1 - unique_raw / max(self.rows, 1),
+            'normalized_reduction': 1 - unique_normalized / max(self.rows, 1)
+        }
+    
+    def campaigns(self, threshold: float = 0.5, min_chars: int = 20, min_authors: int = 3,
+                  min_videos: int = 2, groups: Optional[pd.DataFrame] = None) -> Tuple[pd.DataFrame, pd.Series]:
+        """Near-duplicate campaigns and the campaign id of each group (-1 for none).
+
+        Only groups whose normalized text has at least ``min_chars``
+        characters are indexed; shorter texts are too generic to say anything
+        about copy-paste.
+        """
+        groups = self.groups() if groups is None else groups
+        campaign_ids = pd.Series(-1, index=groups.index, name='campaign_id')
+        candidates = groups.index[groups['text'].str.len() >= min_chars]
+        columns = ['campaign_id', 'comments', 'groups', 'videos', 'authors', 'text']
+        if len(candidates) == 0:
+            return pd.DataFrame(columns=columns), campaign_ids
+        
+        signatures = minhash(groups.loc[candidates, 'text'].tolist())
+        pairs = near_duplicate_pairs(signatures, threshold=threshold)
+        graph = coo_matrix((np.ones(len(pairs)), (pairs[:, 0], pairs[:, 1])), shape=(len(candidates),) * 2)
+        _, components = connected_components(graph, directed=False)
+        component_of = pd.Series(components, index=groups.loc[candidates, 'key'].to_numpy())
+        
+        rows = self._rows()
+        rows = rows[rows['key'].isin(component_of.index)]
+        rows['component'] = component_of.reindex(rows['key']).to_numpy()
+        per_component = rows.groupby('component').agg(
+            comments=('key', 'size'), groups=('key', 'nunique'),
+            videos=('video', 'nunique'), authors=('author', 'nunique')
+        )
+        flagged = per_component[(per_component['authors'] >= min_authors) & (per_component['videos'] >= min_videos)]
+        flagged = flagged.sort_values('comments', ascending=False, kind='stable')
+        numbering = pd.Series(np.arange(len(flagged)), index=flagged.index)
+        
+        group_components = pd.Series(components, index=candidates)
+        campaign_ids.loc[candidates] = numbering.reindex(group_components.to_numpy()).fillna(-1).astype(int).to_numpy()
+        # The largest group of each campaign stands for its text (groups are sorted largest first)
+        texts = groups.loc[candidates, 'text'].groupby(group_components.to_numpy()).first()
+        campaigns = flagged.reset_index(drop=False)
+        campaigns['campaign_id'] = np.arange(len(campaigns))
+        campaigns['text'] = texts.reindex(campaigns['component']).to_numpy()
+        return campaigns[columns], campaign_ids
+
+def main():
+    parser = argparse.ArgumentParser(description="Duplicate groups and near-duplicate spam campaigns in comment CSVs")
+    parser.add_argument("--data-path", default=".", help="Directory holding the comment files")
+    parser.add_argument("--files", nargs="+", default=COMMENT_FILES, help="Comment files")
+    parser.add_argument("--output-dir", default="dedup_report")
+    parser.add_argument("--chunksize", type=int, default=200_000)
+    parser.add_argument("--threshold", type=float, default=0.5, help="Jaccard similarity of near-duplicates")
+    parser.add_argument("--min-chars", type=int, default=20, help="Shortest normalized text indexed for campaigns")
+    parser.add_argument("--min-authors", type=int, default=3)
+    parser.add_argument("--min-videos", type=int, default=2)
+    args = parser.parse_args()
+    
+    start_time = time.time()
+    index = DuplicateIndex()
+    for name in args.files:
+        for chunk in pd.read_csv(os.path.join(args.data_path, name), dtype=str, chunksize=args.chunksize,
+                                 usecols=lambda column: column in ('textOriginal', 'videoId', 'authorId')):
+            index.add(chunk)
+        print(f"✅ {name}: {index.rows:,} comments indexed")
+    
+    groups = index.groups()
+    campaigns, campaign_ids = index.campaigns(args.threshold, args.min_chars, args.min_authors, args.min_videos,
+                                              groups)
+    groups['campaign_id'] = campaign_ids
+    os.makedirs(args.output_dir, exist_ok=True)
+    groups.drop(columns=['key']).to_csv(os.path.join(args.output_dir, 'duplicate_groups.csv'), index=False)
+    campaigns.to_csv(os.path.join(args.output_dir, 'spam_campaigns.csv'), index=False)
+    
+    summary = index.summary()
+    print(f"\n📊 {summary['rows']:,} comments in {time.time() - start_time:.1f}s")
+    print(f"  Distinct texts:      {summary['unique_texts']:,} ({summary['text_reduction']:.1%} fewer rows to process)")
+    print(f"  Normalized groups:   {summary['normalized_groups']:,} ({summary['normalized_reduction']:.1%} fewer)")
+    print(f"  Campaigns:           {len(campaigns):,} covering {int(campaigns['comments'].sum()):,} comments")
+    print(f"✅ Saved {args.output_dir}/duplicate_groups.csv and spam_campaigns.csv")
+
+if __name__ == "__main__":
+    main()
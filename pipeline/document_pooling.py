@@ -0,0 +1,371 @@
+#!/usr/bin/env python3
+"""
+Streaming per-video document pooling for the stm.ipynb LDA
+
+stm.ipynb joins every comment with its video's row, then loops over
+``groupby('videoId')`` to build one "TITLE: ... DESCRIPTION: ... COMMENTS:
+..." string per video. It tokenizes those strings with ``simple_preprocess``
+and builds the dictionary and bag-of-words corpus from them. This module
+produces the same dictionary and corpus without the joined frame or the
+strings:
+
+1. Quality comments stream from the feature table in chunks. Only videoId
+   and textOriginal are read. Comments of videos missing from videos.csv
+   are dropped, as the inner merge drops them.
+2. Each chunk is tokenized in one regex pass and reduced to per-video token
+   counts.
+3. Title and description tokens are added per video at the end. The
+   dictionary gets the ids ``corpora.Dictionary(processed_docs)`` assigns,
+   then the notebook's ``filter_extremes``. gensim prunes a dictionary
+   that grows past 2M tokens while building it; this does not.
+4. The corpus is written in Matrix Market format (``<prefix>.mm``), along
+   with the dictionary (``<prefix>.dict``) and one row of video metadata
+   per document (``<prefix>_videos.csv``). ``corpora.MmCorpus`` streams the
+   corpus from disk straight into ``LdaModel``.
+
+With ``keep_texts`` the token order is kept as compact id arrays, so the c_v
+coherence index (pipeline/coherence_index.py) can be built too.
+
+``pool_counts`` and ``filter_corpus`` split the expensive pass from the
+cheap filtering step, so pipeline/artifact_cache.py can cache them
+separately. ``count_documents`` counts pooled strings that are already in
+memory, such as stm.ipynb's ``pooled_documents``.
+
+    python pipeline/document_pooling.py --videos ../dataset/videos.csv --output pooled/stm
+"""
+
+import argparse
+import os
+import re
+import sys
+import time
+import unicodedata
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+if __package__ in (None, ""):
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sps
+
+from pipeline.feature_store import iter_feature_table
+
+try:
+    from gensim import corpora
+    GENSIM_AVAILABLE = True
+except ImportError:
+    print("Warning: gensim not installed; pooled corpora cannot be written")
+    GENSIM_AVAILABLE = False
+
+VIDEOS_FILE = '../dataset/videos.csv'
+VIDEO_COLUMNS = ['videoId', 'title', 'description', 'viewCount', 'likeCount', 'publishedAt']
+# Label columns stm.ipynb looks for, in order; without either every comment is pooled
+LABEL_COLUMNS = ('spam_classification', 'final_labels')
+CHUNKSIZE = 200_000
+# simple_preprocess(doc, deacc=True, min_len=2, max_len=15) and filter_extremes as in stm.ipynb
+MIN_LEN = 2
+MAX_LEN = 15
+NO_BELOW = 2
+NO_ABOVE = 0.8
+KEEP_N = 10000
+# Already pooled documents tokenized per regex pass by count_documents
+DOCUMENT_BATCH = 2_000
+# gensim's PAT_ALPHABETIC (word characters except digits, written as a class, which
+# matches the same tokens faster than its lookahead), or the separator between texts
+SEPARATOR = '\x1f'
+TOKEN_PATTERN = re.compile(r'[^\W\d]+|\x1f')
+
+def _deaccent(text: str) -> str:
+    """gensim.utils.deaccent, removing the combining marks present with one regex instead of a per-character loop"""
+    norm = unicodedata.normalize('NFD', text)
+    marks = [ch for ch in set(norm) if unicodedata.category(ch) == 'Mn']
+    if marks:
+        norm = re.sub('[' + ''.join(re.escape(ch) for ch in marks) + ']', '', norm)
+    return unicodedata.normalize('NFC', norm)
+
+def tokenize_texts(texts: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """``simple_preprocess(text, deacc=True, min_len=2, max_len=15)`` of every text in one pass.
+    
+    Returns (text number, token) arrays in text order. The separator is
+    never part of a token, so tokenizing the texts together gives the same
+    tokens as tokenizing them one by one, or joined with spaces.
+    """
+    joined = SEPARATOR.join(text.replace(SEPARATOR, ' ') for text in texts)
+    matches = np.array(TOKEN_PATTERN.findall(_deaccent(joined.lower())), dtype=object)
+    separators = matches == SEPARATOR
+    text_number = np.cumsum(separators)[~separators]
+    # Length and underscore checks once per distinct token
+    codes, uniques = pd.factorize(matches[~separators])
+    allowed = np.array([MIN_LEN <= len(token) <= MAX_LEN and not token.startswith('_') for token in uniques], dtype=bool)
+    keep = allowed[codes]
+    return text_number[keep], np.asarray(uniques, dtype=object)[codes[keep]]
+
+class _Vocabulary:
+    """Provisional token ids, in order of first sight"""
+    
+    def __init__(self):
+        self.token2id: Dict[str, int] = {}
+    
+    def ids(self, tokens: np.ndarray) -> np.ndarray:
+        codes, uniques = pd.factorize(tokens)
+        mapped = np.array([self.token2id.setdefault(token, len(self.token2id)) for token in uniques], dtype=np.int64)
+        return mapped[codes]
+    
+    def tokens(self) -> np.ndarray:
+        return np.array(list(self.token2id), dtype=object)
+
+class TokenSequences:
+    """Tokens of each pooled document in order (``processed_docs``), decoded from id arrays on access"""
+    
+    def __init__(self, sequences: List[np.ndarray], vocabulary: np.ndarray):
+        self.sequences = sequences
+        self.vocabulary = vocabulary
+    
+    def __len__(self) -> int:
+        return len(self.sequences)
+    
+    def __getitem__(self, i: int) -> List[str]:
+        return self.vocabulary[self.sequences[i]].tolist()
+    
+    def __iter__(self) -> Iterator[List[str]]:
+        for i in range(len(self.sequences)):
+            yield self[i]
+
+def load_videos(path: str = VIDEOS_FILE) -> pd.DataFrame:
+    """The videos.csv columns pooling uses (those present), first row per videoId"""
+    videos = pd.read_csv(path, usecols=lambda column: column in VIDEO_COLUMNS)
+    return videos.drop_duplicates('videoId').reset_index(drop=True)
+
+def _comment_chunks(path: Optional[str], chunksize: int) -> Iterator[pd.DataFrame]:
+    """Quality comments (videoId, textOriginal) by the first label column present, else all comments"""
+    for label in LABEL_COLUMNS:
+        chunks = iter_feature_table(path, ['videoId', 'textOriginal'], [(label, '==', 'quality')], chunksize)
+        try:
+            first = next(chunks, None)
+        except (ValueError, KeyError):
+            continue
+        if first is not None:
+            yield first
+        yield from chunks
+        return
+    print("⚠️ No spam classification found; pooling all comments")
+    yield from iter_feature_table(path, ['videoId', 'textOriginal'], chunksize=chunksize)
+
+def _video_text(videos: pd.DataFrame, column: str) -> List[str]:
+    # str() as in the notebook, so a missing title becomes 'nan'
+    if column not in videos.columns:
+        return [''] * len(videos)
+    return [str(value).strip() for value in videos[column].tolist()]
+
+def filter_corpus(counts: sps.csr_matrix, tokens: np.ndarray, no_below: int = NO_BELOW,
+                  no_above: float = NO_ABOVE, keep_n: Optional[int] = KEEP_N):
+    """The filtered dictionary and the corpus matrix in its ids, from per-document token counts.
+
+    Ids follow ``Dictionary.doc2bow(allow_update=True)``: documents in
+    order, a document's new tokens in sorted order. ``filter_extremes``
+    keeps the ``keep_n`` highest document frequencies (ties by id) and
+    compacts ids in their original order.
+    """
+    coo = counts.tocoo()
+    columns, first_index = np.unique(coo.col, return_index=True)
+    first_doc = np.full(len(tokens), len(tokens) + counts.shape[0], dtype=np.int64)
+    first_doc[columns] = coo.row[first_index]
+    order = sorted(range(len(tokens)), key=lambda i: (first_doc[i], tokens[i]))
+    dfs = np.diff(counts.tocsc().indptr)
+    cfs = np.asarray(counts.sum(axis=0)).ravel()
+    
+    no_above_abs = int(no_above * counts.shape[0])
+    order = np.array(order, dtype=np.int64)
+    good = order[(dfs[order] >= no_below) & (dfs[order] <= no_above_abs)]
+    ranked = np.lexsort((np.arange(len(good)), -dfs[good]))
+    kept = good[np.sort(ranked[:keep_n] if keep_n is not None else ranked)]
+    
+    dictionary = corpora.Dictionary()
+    dictionary.token2id = {str(tokens[column]): new_id for new_id, column in enumerate(kept)}
+    dictionary.dfs = {new_id: int(dfs[column]) for new_id, column in enumerate(kept)}
+    dictionary.cfs = {new_id: int(cfs[column]) for new_id, column in enumerate(kept)}
+    dictionary.num_docs = int(counts.shape[0])
+    dictionary.num_pos = int(counts.sum())
+    dictionary.num_nnz = int(counts.nnz)
+    corpus = counts[:, kept].tocsr()
+    corpus.sort_indices()
+    return dictionary, corpus
+
+def pool_counts(videos: pd.DataFrame, path: Optional[str] = None, chunksize: int = CHUNKSIZE,
+                keep_texts: bool = False) -> Dict[str, Any]:
+    """Per-video token counts of the pooled documents, before any dictionary filtering.
+
+    Returns ``counts`` (a documents x tokens CSR matrix in provisional
+    ids), ``tokens`` (the provisional vocabulary), ``videos``, the
+    notebook's ``video_metadata`` as a DataFrame, and with ``keep_texts``
+    the ``texts`` (``processed_docs``) as TokenSequences.
+    """
+    start_time = time.time()
+    video_index = pd.Index(videos['videoId'])
+    vocabulary = _Vocabulary()
+    num_comments = np.zeros(len(videos), dtype=np.int64)
+    comment_chars = np.zeros(len(videos), dtype=np.int64)
+    nonempty_comments = np.zeros(len(videos), dtype=np.int64)
+    count_parts, sequence_parts = [], []
+    rows = 0
+    
+    for chunk in _comment_chunks(path, chunksize):
+        rows += len(chunk)
+        position = video_index.get_indexer(chunk['videoId'])
+        matched = position >= 0
+        position = position[matched]
+        texts = chunk['textOriginal'][matched].fillna('').astype(str).str.strip()
+        lengths = texts.str.len().to_numpy(dtype=np.int64)
+        num_comments += np.bincount(position, minlength=len(videos))
+        comment_chars += np.bincount(position, weights=lengths, minlength=len(videos)).astype(np.int64)
+        nonempty_comments += np.bincount(position[lengths > 0], minlength=len(videos))
+        
+        text_number, tokens = tokenize_texts(texts.tolist())
+        token_video = position[text_number]
+        token_ids = vocabulary.ids(tokens)
+        keys, counts = np.unique(token_video * (1 << 32) + token_ids, return_counts=True)
+        count_parts.append((keys >> 32, keys & 0xFFFFFFFF, counts))
+        if keep_texts:
+            sequence_parts.append((token_video.astype(np.int32), token_ids.astype(np.int32)))
+    
+    # Documents: videos with quality comments and some text, in groupby (sorted videoId) order
+    titles, descriptions = _video_text(videos, 'title'), _video_text(videos, 'description')
+    has_text = np.array([bool(t) or bool(d) for t, d in zip(titles, descriptions)]) | (nonempty_comments > 0)
+    candidates = np.flatnonzero((num_comments > 0) & has_text)
+    documents = candidates[np.argsort(video_index[candidates].to_numpy(), kind='stable')]
+    doc_of_video = np.full(len(videos), -1, dtype=np.int64)
+    doc_of_video[documents] = np.arange(len(documents))
+    
+    headers, lengths = [], []
+    for video in documents:
+        parts = []
+        if titles[video]:
+            parts.append(f"TITLE: {titles[video]}")
+        if descriptions[video]:
+            parts.append(f"DESCRIPTION: {descriptions[video]}")
+        header = " ".join(parts)
+        length = len(header)
+        if nonempty_comments[video]:
+            # "COMMENTS: " + the non-empty comments joined with spaces
+            header = f"{header} COMMENTS:" if header else "COMMENTS:"
+            length += (1 if parts else 0) + len("COMMENTS: ") + comment_chars[video] + nonempty_comments[video] - 1
+        headers.append(header)
+        lengths.append(length)
+    header_doc, header_tokens = tokenize_texts(headers)
+    header_ids = vocabulary.ids(header_tokens)
+    
+    size = len(vocabulary.token2id)
+    video_rows = np.concatenate([part[0] for part in count_parts]) if count_parts else np.zeros(0, dtype=np.int64)
+    counts = sps.coo_matrix(
+        (np.concatenate([np.ones(len(header_ids), dtype=np.int64)] + [part[2] for part in count_parts]),
+         (np.concatenate([header_doc, doc_of_video[video_rows]]),
+          np.concatenate([header_ids] + [part[1] for part in count_parts]))),
+        shape=(len(documents), size)).tocsr()
+    
+    metadata = pd.DataFrame({
+        'videoId': video_index[documents],
+        'title': [titles[video] for video in documents],
+        'description': [descriptions[video] for video in documents],
+        'num_comments': num_comments[documents],
+        'viewCount': videos['viewCount'].to_numpy()[documents] if 'viewCount' in videos else 0,
+        'likeCount_video': videos['likeCount'].to_numpy()[documents] if 'likeCount' in videos else 0,
+        'document_length': np.array(lengths, dtype=np.int64),
+        'publishedAt_video': videos['publishedAt'].to_numpy()[documents] if 'publishedAt' in videos else ''
+    })
+    result = {'counts': counts, 'tokens': vocabulary.tokens(), 'videos': metadata, 'comments': rows,
+              'seconds': time.time() - start_time}
+    
+    if keep_texts:
+        # Header tokens, then the comment tokens in table order
+        token_doc = [header_doc] + [doc_of_video[part[0]] for part in sequence_parts]
+        token_ids = [header_ids] + [part[1] for part in sequence_parts]
+        token_doc, token_ids = np.concatenate(token_doc), np.concatenate(token_ids)
+        order = np.argsort(token_doc, kind='stable')
+        bounds = np.searchsorted(token_doc[order], np.arange(len(documents) + 1))
+        sorted_ids = token_ids[order].astype(np.int32)
+        result['texts'] = TokenSequences([sorted_ids[bounds[i]:bounds[i + 1]] for i in range(len(documents))],
+                                         vocabulary.tokens())
+    return result
+
+def pool_documents(videos: pd.DataFrame, path: Optional[str] = None, chunksize: int = CHUNKSIZE,
+                   keep_texts: bool = False, no_below: int = NO_BELOW, no_above: float = NO_ABOVE,
+                   keep_n: Optional[int] = KEEP_N) -> Dict[str, Any]:
+    """Pool the quality comments of each video into one document, reading the feature table once.
+
+    Returns ``dictionary`` and ``corpus`` (a documents x tokens CSR matrix
+    of counts) equal to the notebook's after ``filter_extremes``, and the
+    rest of ``pool_counts``' result.
+    """
+    if not GENSIM_AVAILABLE:
+        raise ImportError("gensim is required for document pooling")
+    result = pool_counts(videos, path, chunksize, keep_texts)
+    start_time = time.time()
+    result['dictionary'], result['corpus'] = filter_corpus(result.pop('counts'), result.pop('tokens'),
+                                                           no_below, no_above, keep_n)
+    result['seconds'] += time.time() - start_time
+    return result
+
+def count_documents(documents: Sequence[str], batch: int = DOCUMENT_BATCH) -> Dict[str, Any]:
+    """``simple_preprocess`` token counts of already pooled documents, ``batch`` documents per regex pass.
+
+    Documents without tokens are dropped, as stm.ipynb drops them. Returns
+    ``counts`` and ``tokens`` as ``pool_counts`` does, and the ``texts``.
+    """
+    vocabulary = _Vocabulary()
+    doc_parts, id_parts = [], []
+    for offset in range(0, len(documents), batch):
+        text_number, tokens = tokenize_texts([str(doc) for doc in documents[offset:offset + batch]])
+        doc_parts.append(text_number + offset)
+        id_parts.append(vocabulary.ids(tokens).astype(np.int32))
+    token_doc = np.concatenate(doc_parts) if doc_parts else np.zeros(0, dtype=np.int64)
+    token_ids = np.concatenate(id_parts) if id_parts else np.zeros(0, dtype=np.int32)
+    # Renumber the documents that have tokens; token_doc is already in document order
+    kept, token_doc = np.unique(token_doc, return_inverse=True)
+    bounds = np.searchsorted(token_doc, np.arange(len(kept) + 1))
+    counts = sps.coo_matrix((np.ones(len(token_ids), dtype=np.int64), (token_doc, token_ids)),
+                            shape=(len(kept), len(vocabulary.token2id))).tocsr()
+    texts = TokenSequences([token_ids[bounds[i]:bounds[i + 1]] for i in range(len(kept))], vocabulary.tokens())
+    return {'counts': counts, 'tokens': vocabulary.tokens(), 'texts': texts}
+
+def bow_documents(corpus: sps.csr_matrix) -> Iterator[List[Tuple[int, int]]]:
+    """Rows of the corpus matrix as gensim bag-of-words documents"""
+    for i in range(corpus.shape[0]):
+        start, stop = corpus.indptr[i], corpus.indptr[i + 1]
+        yield list(zip(corpus.indices[start:stop].tolist(), corpus.data[start:stop].tolist()))
+
+def save_pooled(result: Dict[str, Any], prefix: str) -> Dict[str, str]:
+    """Write <prefix>.mm (+ .mm.index), <prefix>.dict and <prefix>_videos.csv; returns the paths"""
+    directory = os.path.dirname(prefix)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    paths = {'corpus': f"{prefix}.mm", 'dictionary': f"{prefix}.dict", 'videos': f"{prefix}_videos.csv"}
+    corpora.MmCorpus.serialize(paths['corpus'], bow_documents(result['corpus']), id2word=result['dictionary'])
+    result['dictionary'].save(paths['dictionary'])
+    result['videos'].to_csv(paths['videos'], index=False)
+    return paths
+
+def main():
+    parser = argparse.ArgumentParser(description="Pool quality comments per video into an LDA corpus")
+    parser.add_argument("--input", help="Feature table (default: the Parquet dataset if present, else the CSV)")
+    parser.add_argument("--videos", default=VIDEOS_FILE, help="videos.csv")
+    parser.add_argument("--output", default="pooled/stm", help="Prefix of the files written")
+    parser.add_argument("--chunksize", type=int, default=CHUNKSIZE, help="Comments per chunk")
+    parser.add_argument("--coherence-index", help="Also build the c_v/u_mass coherence index here (.npz)")
+    args = parser.parse_args()
+    
+    videos = load_videos(args.videos)
+    print(f"🚀 Pooling comments of {len(videos):,} videos")
+    result = pool_documents(videos, args.input, args.chunksize, keep_texts=bool(args.coherence_index))
+    paths = save_pooled(result, args.output)
+    print(f"✅ {result['comments']:,} quality comments -> {len(result['videos']):,} documents, "
+          f"{len(result['dictionary']):,} tokens after filtering ({result['seconds']:.1f}s)")
+    for name, path in paths.items():
+        print(f"💾 {name}: {path}")
+    if args.coherence_index:
+        from pipeline.coherence_index import CoherenceIndex
+        CoherenceIndex.build(result['texts'], result['dictionary']).save(args.coherence_index)
+        print(f"💾 coherence index: {args.coherence_index}")
+
+if __name__ == "__main__":
+    main()
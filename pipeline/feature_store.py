@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+"""
+Columnar storage for the comment feature table
+
+complete_comments_top20_features.csv is the hand-off between the spam
+stage and everything downstream (stm.ipynb, Loreal.ipynb,
+extract_frontend_data.py, example_spam/extract_spam_comments.py). Each of
+them reads the whole file as text and re-parses it, even when it needs only
+a few columns or only spam or quality rows.
+
+This module stores the same table as a partitioned Parquet dataset
+(complete_comments_top20_features.parquet/) with real dtypes:
+- categories for kind and spam_classification
+- timestamps for publishedAt and updatedAt
+- int8/int32 for flags and counts
+
+It is partitioned by publish month, or by a hash bucket of videoId.
+``read_feature_table`` (and ``iter_feature_table``, its chunked form) is
+the one reader for both formats. It takes ``columns`` (projection) and
+``filters`` (a list of (column, op, value) conditions, all of which must
+hold). On Parquet both are pushed into the scan: partitions and row groups
+that cannot match are skipped. A videoId filter also prunes video buckets.
+On CSV, the same arguments read only the needed columns, chunk by chunk,
+and filter each chunk before keeping it. CSV values are inferred as by
+``pd.read_csv``; Parquet keeps IDs as strings. Rows come in file order from
+the CSV and partition by partition from Parquet.
+
+pyarrow is optional. Without it everything falls back to the CSV.
+
+    python pipeline/feature_store.py convert --input complete_comments_top20_features.csv --partition month
+"""
+
+import argparse
+import glob
+import os
+import sys
+import time
+from typing import Any, Iterator, List, Optional, Sequence, Tuple
+
+if __package__ in (None, ""):
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+    PARQUET_AVAILABLE = True
+except ImportError as e:
+    print(f"Warning: Parquet storage unavailable ({e}); using CSV")
+    PARQUET_AVAILABLE = False
+
+from pipeline.spam_labels import LABELS
+
+CSV_FILE = 'complete_comments_top20_features.csv'
+PARQUET_DIR = 'complete_comments_top20_features.parquet'
+PARTITIONS = ('month', 'video')
+VIDEO_BUCKETS = 64
+
+TEXT_COLUMNS = ['commentId', 'channelId', 'videoId', 'authorId', 'textOriginal', 'parentCommentId']
+TIMESTAMP_COLUMNS = ['publishedAt', 'updatedAt']
+STORAGE_DTYPES = {
+    'likeCount': 'float64',
+    'char_count': 'int32',
+    'word_count': 'int32',
+    'caps_ratio': 'float64',
+    'repetition_ratio': 'float64',
+    'emoji_ratio': 'float64',
+    'emoji_diversity': 'float64',
+    'likes_per_char': 'float64',
+    'is_reply': 'int8',
+    'url_count': 'int32',
+    'is_generic': 'int8',
+    'classification_confidence': 'float64'
+}
+# Partition columns added on write; readers drop them unless asked for
+PARTITION_COLUMNS = {'month': 'month', 'video': 'video_bucket'}
+
+OPERATORS = ('==', '!=', '<', '<=', '>', '>=', 'in', 'not in')
+
+Filters = List[Tuple[str, str, Any]]
+
+def video_buckets(video_ids: pd.Series) -> np.ndarray:
+    """Stable bucket (0 .. VIDEO_BUCKETS - 1) of each videoId"""
+    hashes = pd.util.hash_array(video_ids.fillna('').astype(str).to_numpy(dtype=object))
+    return (hashes % np.uint64(VIDEO_BUCKETS)).astype(np.int16)
+
+def to_storage_types(frame: pd.DataFrame) -> pd.DataFrame:
+    """The feature table with the dtypes it is stored with (input: a chunk_output frame or a CSV read)"""
+    typed = frame.copy()
+    for col in TEXT_COLUMNS:
+        if col in typed:
+            typed[col] = typed[col].astype(object).where(typed[col].notna(), None)
+    if 'kind' in typed:
+        typed['kind'] = typed['kind'].astype('category')
+    for col in TIMESTAMP_COLUMNS:
+        if col in typed:
+            typed[col] = pd.to_datetime(typed[col], errors='coerce', utc=True)
+    for col, dtype in STORAGE_DTYPES.items():
+        if col in typed:
+            typed[col] = pd.to_numeric(typed[col], errors='coerce').astype(dtype)
+    if 'spam_classification' in typed:
+        typed['spam_classification'] = pd.Categorical(typed['spam_classification'], categories=list(LABELS))
+    return typed
+
+def add_partition_column(frame: pd.DataFrame, partition_by: str) -> pd.DataFrame:
+    if partition_by == 'month':
+        months = frame['publishedAt'].dt.strftime('%Y-%m')
+        frame['month'] = months.fillna('unknown').astype(object)
+    elif partition_by == 'video':
+        frame['video_bucket'] = video_buckets(frame['videoId'])
+    else:
+        raise ValueError(f"Unknown partitioning {partition_by!r}; expected one of {PARTITIONS}")
+    return frame
+
+class ParquetDatasetWriter:
+    """Appends chunks to a partitioned Parquet dataset as numbered parts.
+
+    Part ``n`` of every partition is named part-<n>-*.parquet, so a
+    resumed run can delete whatever was written after its checkpoint
+    (``discard_from``) and continue numbering from there.
+    """
+    
+    def __init__(self, root: str, partition_by: str = 'month', parts: int = 0):
+        if not PARQUET_AVAILABLE:
+            raise ImportError("pyarrow is required to write Parquet")
+        if partition_by not in PARTITIONS:
+            raise ValueError(f"Unknown partitioning {partition_by!r}; expected one of {PARTITIONS}")
+        self.root = root
+        self.partition_by = partition_by
+        self.parts = parts
+        os.makedirs(root, exist_ok=True)
+        self.discard_from(parts)
+    
+    def discard_from(self, part: int):
+        for path in glob.glob(os.path.join(self.root, '**', 'part-*.parquet'), recursive=True):
+            if int(os.path.basename(path).split('-')[1]) >= part:
+                os.remove(path)
+    
+    def write(self, frame: pd.DataFrame):
+        typed = add_partition_column(to_storage_types(frame), self.partition_by)
+        table = pa.Table.from_pandas(typed, preserve_index=False)
+        pq.write_to_dataset(table, self.root, partition_cols=[PARTITION_COLUMNS[self.partition_by]],
+                            basename_template=f"part-{self.parts:06d}-{{i}}.parquet",
+                            existing_data_behavior='overwrite_or_ignore')
+        self.parts += 1
+
+def default_path() -> str:
+    """The Parquet dataset when it exists and pyarrow works, else the CSV"""
+    if PARQUET_AVAILABLE and os.path.isdir(PARQUET_DIR):
+        return PARQUET_DIR
+    return CSV_FILE
+
+def _partitioning(root: str) -> Optional[str]:
+    for partition_by, column in PARTITION_COLUMNS.items():
+        if glob.glob(os.path.join(root, f"{column}=*")):
+            return partition_by
+    return None
+
+def _with_partition_pruning(filters: Filters, partition_by: Optional[str]) -> Filters:
+    """Add a video_bucket condition for videoId equality filters, so only matching buckets are read"""
+    if partition_by != 'video':
+        return filters
+    pruned = list(filters)
+    for column, op, value in filters:
+        if column == 'videoId' and op in ('==', 'in'):
+            values = [value] if op == '==' else list(value)
+            pruned.append(('video_bucket', 'in', sorted(set(video_buckets(pd.Series(values)).tolist()))))
+    return pruned
+
+def _filter_mask(frame: pd.DataFrame, filters: Filters) -> pd.Series:
+    mask = pd.Series(True, index=frame.index)
+    for column, op, value in filters:
+        values = frame[column]
+        if op == '==':
+            mask &= values == value
+        elif op == '!=':
+            mask &= values != value
+        elif op == '<':
+            mask &= values < value
+        elif op == '<=':
+            mask &= values <= value
+        elif op == '>':
+            mask &= values > value
+        elif op == '>=':
+            mask &= values >= value
+        elif op == 'in':
+            mask &= values.isin(list(value))
+        elif op == 'not in':
+            mask &= ~values.isin(list(value))
+        else:
+            raise ValueError(f"Unsupported filter operator {op!r}; expected one of {OPERATORS}")
+    return mask
+
+def _csv_columns(columns: Optional[Sequence[str]], filters: Filters) -> Optional[List[str]]:
+    if columns is None:
+        return None
+    return list(dict.fromkeys(list(columns) + [column for column, _, _ in filters]))
+
+def _iter_csv(path: str, columns: Optional[Sequence[str]], filters: Filters, chunksize: int) -> Iterator[pd.DataFrame]:
+    for chunk in pd.read_csv(path, usecols=_csv_columns(columns, filters), chunksize=chunksize):
+        if filters:
+            chunk = chunk[_filter_mask(chunk, filters)]
+        yield chunk if columns is None else chunk[list(columns)]
+
+def _read_csv(path: str, columns: Optional[Sequence[str]], filters: Filters, chunksize: int) -> pd.DataFrame:
+    if not filters:
+        return pd.read_csv(path, usecols=_csv_columns(columns, filters))
+    kept = list(_iter_csv(path, columns, filters, chunksize))
+    return pd.concat(kept, ignore_index=True) if kept else pd.DataFrame(columns=_csv_columns(columns, filters))
+
+def _check_filters(filters: Filters):
+    for _, op, _ in filters:
+        if op not in OPERATORS:
+            raise ValueError(f"Unsupported filter operator {op!r}; expected one of {OPERATORS}")
+
+def read_feature_table(path: Optional[str] = None, columns: Optional[Sequence[str]] = None,
+                       filters: Optional[Filters] = None, chunksize: int = 500_000) -> pd.DataFrame:
+    """Rows of the feature table matching every filter, with only ``columns`` (default: all).
+
+    ``path`` is a Parquet dataset directory or a CSV file; by default the
+    Parquet dataset if it exists and pyarrow works, else the CSV.
+    """
+    path = path or default_path()
+    filters = list(filters or [])
+    _check_filters(filters)
+    if not os.path.isdir(path):
+        return _read_csv(path, columns, filters, chunksize)
+    if not PARQUET_AVAILABLE:
+        raise ImportError(f"{path} is a Parquet dataset but pyarrow is not available")
+    
+    partition_by = _partitioning(path)
+    table = pq.read_table(path, columns=list(columns) if columns is not None else None,
+                          filters=_with_partition_pruning(filters, partition_by) or None)
+    frame = table.to_pandas()
+    if columns is None:
+        frame = frame.drop(columns=[col for col in PARTITION_COLUMNS.values() if col in frame.columns])
+    return frame
+
+def iter_feature_table(path: Optional[str] = None, columns: Optional[Sequence[str]] = None,
+                       filters: Optional[Filters] = None, chunksize: int = 500_000) -> Iterator[pd.DataFrame]:
+    """``read_feature_table`` as a stream of frames of at most ``chunksize`` rows.
+
+    A CSV streams in file order. A Parquet dataset streams partition by
+    partition (in path order: month, or video bucket), and in ingest order
+    within each partition, so consumers that break ties by stream position
+    can pick different rows for the two formats.
+    """
+    path = path or default_path()
+    filters = list(filters or [])
+    _check_filters(filters)
+    if not os.path.isdir(path):
+        yield from _iter_csv(path, columns, filters, chunksize)
+        return
+    if not PARQUET_AVAILABLE:
+        raise ImportError(f"{path} is a Parquet dataset but pyarrow is not available")
+    
+    pruned = _with_partition_pruning(filters, _partitioning(path))
+    dataset = ds.dataset(path, format='parquet', partitioning='hive')
+    batches = dataset.to_batches(columns=list(columns) if columns is not None else None,
+                                 filter=pq.filters_to_expression(pruned) if pruned else None,
+                                 batch_size=chunksize)
+    for batch in batches:
+        frame = batch.to_pandas()
+        if columns is None:
+            frame = frame.drop(columns=[col for col in PARTITION_COLUMNS.values() if col in frame.columns])
+        yield frame
+
+def convert_csv(csv_path: str, root: str, partition_by: str = 'month', chunksize: int = 500_000) -> int:
+    """Write the CSV feature table to a new Parquet dataset chunk by chunk; returns the row count"""
+    writer = ParquetDatasetWriter(root, partition_by)
+    rows = 0
+    for chunk in pd.read_csv(csv_path, dtype=str, chunksize=chunksize):
+        writer.write(chunk)
+        rows += len(chunk)
+        print(f"✅ {rows:,} rows written")
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description="Parquet storage for the comment feature table")
+    commands = parser.add_subparsers(dest="command", required=True)
+    convert = commands.add_parser("convert", help="Convert the feature CSV to a partitioned Parquet dataset")
+    convert.add_argument("--input", default=CSV_FILE)
+    convert.add_argument("--output", default=PARQUET_DIR)
+    convert.add_argument("--partition", choices=PARTITIONS, default="month")
+    convert.add_argument("--chunksize", type=int, default=500_000)
+    args = parser.parse_args()
+    
+    if not PARQUET_AVAILABLE:
+        print("❌ pyarrow is not available; install a pyarrow build that matches your NumPy")
+        sys.exit(1)
+    start_time = time.time()
+    rows = convert_csv(args.input, args.output, args.partition, args.chunksize)
+    print(f"📦 {rows:,} rows in {time.time() - start_time:.1f}s -> {args.output} (partitioned by {args.partition})")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Cached, batched language detection for comments
+
+Gives the same result as ``detect_language_safe`` in run.ipynb
+(``langdetect.detect`` on the demojized text, 'unknown' for short text or
+when detection fails), but does far fewer detections:
+
+1. Rows are deduplicated, and so are the demojized texts langdetect
+   actually sees, so "Nice!" or "❤❤❤" is detected once per batch.
+2. A pre-filter answers without langdetect where the answer is fixed:
+   text shorter than 3 characters after stripping, and ASCII text without
+   letters (langdetect finds no features in it and the notebook returns
+   'unknown').
+3. The rest is looked up in a persistent SQLite cache keyed on a hash of
+   the detected text. The cache survives between runs and is cleared
+   automatically if the langdetect version changes.
+4. Remaining texts are detected, optionally in a process pool.
+
+    python pipeline/language_detection.py --input complete_comments_top20_features.csv --workers 4
+"""
+
+import argparse
+import hashlib
+import os
+import sqlite3
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from importlib import metadata
+from typing import Any, Dict, Iterable, List, Optional
+
+if __package__ in (None, ""):
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import emoji
+import numpy as np
+import pandas as pd
+
+try:
+    from langdetect import DetectorFactory, detect
+    DetectorFactory.seed = 0
+    LANGDETECT_AVAILABLE = True
+except ImportError:
+    print("Warning: langdetect not installed; language detection unavailable")
+    LANGDETECT_AVAILABLE = False
+
+UNKNOWN = 'unknown'
+CACHE_FILE = 'language_cache.sqlite'
+# Cached results are only valid for the detector that produced them
+DETECTOR_VERSION = f"langdetect {metadata.version('langdetect')} seed 0" if LANGDETECT_AVAILABLE else None
+# SQLite's default limit on query parameters is 999
+LOOKUP_BATCH = 900
+
+def _detect_one(text: str) -> str:
+    try:
+        return detect(text)
+    except Exception:
+        return UNKNOWN
+
+def _init_worker():
+    DetectorFactory.seed = 0
+
+def detection_key(text: Any) -> Optional[str]:
+    """The text langdetect would see for ``text``, or None when the pre-filter already knows it is 'unknown'"""
+    text = str(text)
+    if len(text.strip()) < 3:
+        return None
+    if text.isascii():
+        # No ASCII letters means no langdetect features; ASCII text has no emoji to demojize
+        if not any(c.isalpha() for c in text):
+            return None
+        return text
+    return emoji.demojize(text)
+
+def text_hash(text: str) -> bytes:
+    return hashlib.blake2b(text.encode('utf-8', 'surrogatepass'), digest_size=16).digest()
+
+class LanguageCache:
+    """Persistent text hash -> language map in a SQLite file"""
+    
+    def __init__(self, path: str = CACHE_FILE):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self.connection.execute("CREATE TABLE IF NOT EXISTS languages (hash BLOB PRIMARY KEY, language TEXT)")
+        row = self.connection.execute("SELECT value FROM meta WHERE key = 'detector'").fetchone()
+        if row is None or row[0] != DETECTOR_VERSION:
+            self.connection.execute("DELETE FROM languages")
+            self.connection.execute("INSERT OR REPLACE INTO meta VALUES ('detector', ?)", (DETECTOR_VERSION,))
+        self.connection.commit()
+    
+    def get_many(self, hashes: List[bytes]) -> Dict[bytes, str]:
+        found = {}
+        for start in range(0, len(hashes), LOOKUP_BATCH):
+            batch = hashes[start:start + LOOKUP_BATCH]
+            query = f"SELECT hash, language FROM languages WHERE hash IN ({','.join('?' * len(batch))})"
+            found.update(self.connection.execute(query, batch).fetchall())
+        return found
+    
+    def put_many(self, items: Iterable[tuple]):
+        self.connection.executemany("INSERT OR REPLACE INTO languages VALUES (?, ?)", items)
+        self.connection.commit()
+    
+    def __len__(self) -> int:
+        return self.connection.execute("SELECT COUNT(*) FROM languages").fetchone()[0]
+    
+    def close(self):
+        self.connection.close()
+
+class LanguageDetector:
+    """Detects languages for batches of texts, sharing work across duplicates, runs and processes.
+
+    ``stats`` counts, over every ``detect`` call: rows, distinct texts,
+    distinct detection keys, rows answered by the pre-filter, keys found in
+    the cache and keys that had to be detected.
+    """
+    
+    def __init__(self, cache_path: Optional[str] = CACHE_FILE, workers: int = 1):
+        if not LANGDETECT_AVAILABLE:
+            raise ImportError("langdetect is required for language detection")
+        self.cache = LanguageCache(cache_path) if cache_path else None
+        self.workers = workers
+        self.memory: Dict[bytes, str] = {}
+        self.stats = {'rows': 0, 'unique_texts': 0, 'unique_keys': 0, 'prefiltered_rows': 0,
+                      'cache_hits': 0, 'detected': 0}
+    
+    def _detect_many(self, texts: List[str]) -> List[str]:
+        if self.workers <= 1 or len(texts) < 2 * self.workers:
+            return [_detect_one(text) for text in texts]
+        with ProcessPoolExecutor(self.workers, initializer=_init_worker) as pool:
+            return list(pool.map(_detect_one, texts, chunksize=max(1, len(texts) // (8 * self.workers))))
+    
+    def detect(self, texts: pd.Series) -> pd.Series:
+        """Language per row, equal to ``texts.apply(detect_language_safe)``"""
+        codes, uniques = pd.factorize(texts, use_na_sentinel=False)
+        keys = [detection_key(text) for text in uniques]
+        key_hashes = {key: text_hash(key) for key in set(keys) if key is not None}
+        
+        known = {h: self.memory[h] for h in key_hashes.values() if h in self.memory}
+        missing = [h for h in key_hashes.values() if h not in known]
+        if self.cache is not None and missing:
+            cached = self.cache.get_many(missing)
+            known.update(cached)
+            self.memory.update(cached)
+        self.stats['cache_hits'] += len(known)
+        
+        to_detect = [key for key, h in key_hashes.items() if h not in known]
+        if to_detect:
+            detected = self._detect_many(to_detect)
+            new = [(key_hashes[key], language) for key, language in zip(to_detect, detected)]
+            known.update(new)
+            self.memory.update(new)
+            if self.cache is not None:
+                self.cache.put_many(new)
+        
+        unique_languages = np.array([UNKNOWN if key is None else known[key_hashes[key]] for key in keys],
+                                    dtype=object)
+        self.stats['rows'] += len(texts)
+        self.stats['unique_texts'] += len(uniques)
+        self.stats['unique_keys'] += len(key_hashes)
+        self.stats['prefiltered_rows'] += int(np.array([key is None for key in keys], dtype=bool)[codes].sum())
+        self.stats['detected'] += len(to_detect)
+        return pd.Series(unique_languages[codes], index=texts.index, name='language')
+    
+    @property
+    def hit_rate(self) -> float:
+        """Share of distinct detection keys served from the cache instead of langdetect"""
+        lookups = self.stats['cache_hits'] + self.stats['detected']
+        return self.stats['cache_hits'] / lookups if lookups else 0.0
+    
+    def close(self):
+        if self.cache is not None:
+            self.cache.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Add a language column to a comment CSV")
+    parser.add_argument("--input", required=True, help="CSV with a text column")
+    parser.add_argument("--output", help="Output CSV (default: <input>_language.csv)")
+    parser.add_argument("--column", default="textOriginal", help="Text column")
+    parser.add_argument("--cache", default=CACHE_FILE, help="Persistent cache file")
+    parser.add_argument("--no-cache", action="store_true", help="Do not read or write the cache")
+    parser.add_argument("--workers", type=int, default=1, help="Processes running langdetect")
+    parser.add_argument("--chunksize", type=int, default=100_000, help="Rows per chunk")
+    args = parser.parse_args()
+    
+    output = args.output or os.path.splitext(args.input)[0] + '_language.csv'
+    detector = LanguageDetector(None if args.no_cache else args.cache, args.workers)
+    start_time = time.time()
+    try:
+        reader = pd.read_csv(args.input, dtype=str, chunksize=args.chunksize)
+        for index, chunk in enumerate(reader):
+            chunk['language'] = detector.detect(chunk[args.column])
+            chunk.to_csv(output, mode='w' if index == 0 else 'a', header=index == 0, index=False)
+            rate = detector.stats['rows'] / max(time.time() - start_time, 1e-9)
+            print(f"✅ Chunk {index + 1}: {detector.stats['rows']:,} comments ({rate:,.0f}/sec)")
+    finally:
+        detector.close()
+    
+    stats = detector.stats
+    print(f"\n📊 {stats['rows']:,} comments, {stats['unique_texts']:,} distinct texts, "
+          f"{stats['prefiltered_rows']:,} rows pre-filtered")
+    print(f"  Cache hit rate: {detector.hit_rate:.1%} ({stats['cache_hits']:,} hits, {stats['detected']:,} detected)")
+    print(f"✅ Saved {output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,281 @@
+"""
+Reference implementations copied verbatim from run.ipynb
+
+These are the per-row functions the notebook uses. They are kept unchanged as
+the golden reference that the optimized pipeline modules are checked against,
+and as the baseline in the pipeline benchmarks. Do not optimize them.
+"""
+
+import re
+import string
+import time
+from collections import Counter
+
+import emoji
+import numpy as np
+import pandas as pd
+
+# Language detection is optional here; only detect_language_safe needs it
+try:
+    from langdetect import detect, DetectorFactory
+    DetectorFactory.seed = 0
+except ImportError:
+    detect = None
+
+def clean_text(text):
+    """Clean text while preserving meaningful content."""
+    if pd.isna(text) or text == '':
+        return ''
+    
+    text = str(text)
+    text = re.sub(r'\s+', ' ', text)
+    text = re.sub(r'[!]{4,}', '!!!', text)
+    text = re.sub(r'[?]{4,}', '???', text)
+    text = re.sub(r'[.]{4,}', '...', text)
+    text = text.strip()
+    
+    return text
+
+def detect_language_safe(text, confidence_threshold=0.8):
+    """Safely detect language with confidence scoring."""
+    try:
+        if len(str(text).strip()) < 3:
+            return 'unknown'
+        text_no_emoji = emoji.demojize(str(text))
+        detected_lang = detect(text_no_emoji)
+        return detected_lang
+    except:
+        return 'unknown'
+
+def calculate_text_stats(text):
+    """Calculate comprehensive text statistics for spam detection."""
+    text = str(text)
+    
+    char_count = len(text)
+    word_count = len(text.split())
+    avg_word_length = np.mean([len(word) for word in text.split()]) if word_count > 0 else 0
+    
+    upper_count = sum(1 for c in text if c.isupper())
+    caps_ratio = upper_count / max(char_count, 1)
+    
+    special_chars = sum(1 for c in text if c in string.punctuation)
+    special_ratio = special_chars / max(char_count, 1)
+    
+    url_count = len(re.findall(r'http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\(\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+', text))
+    
+    words = text.lower().split()
+    word_freq = Counter(words)
+    max_word_freq = max(word_freq.values()) if words else 0
+    repetition_ratio = max_word_freq / max(word_count, 1)
+    
+    return {
+        'char_count': char_count,
+        'word_count': word_count,
+        'avg_word_length': avg_word_length,
+        'caps_ratio': caps_ratio,
+        'special_ratio': special_ratio,
+        'url_count': url_count,
+        'repetition_ratio': repetition_ratio,
+        'has_url': 1 if url_count > 0 else 0
+    }
+
+def extract_emoji_features(text):
+    """Extract comprehensive emoji features for spam detection."""
+    text = str(text)
+    
+    emojis = emoji.emoji_list(text)
+    emoji_chars = [item['emoji'] for item in emojis]
+    
+    emoji_count = len(emoji_chars)
+    unique_emojis = len(set(emoji_chars))
+    text_length = len(text)
+    
+    emoji_ratio = emoji_count / max(text_length, 1)
+    emoji_diversity = unique_emojis / max(emoji_count, 1)
+    
+    positive_emojis = ['😍', '💕', '❤️', '✨', '🌟', '😊', '👍', '🔥', '💯', '🥰', '😘',
+                       '🤩', '😎', '🥳', '🤗', '😇', '🙌', '👏', '💪', '🎉', '🙏', '☺️', 
+                       '😀', '😁', '😂', '🤣', '😃', '😄', '😆', '🥲', '💖', '💗', '💝']
+    
+    negative_emojis = ['😒', '😕', '👎', '😞', '😠', '😡', '💔', '😢', '😭', '🙄', 
+                       '😤', '😩', '🤮', '🤢', '😵', '🥺', '😖', '😓', '😰', '😨',
+                       '😱', '🤬', '😈', '💀', '😷', '🤒', '🤕']
+    
+    positive_count = sum([emoji_chars.count(e) for e in positive_emojis])
+    negative_count = sum([emoji_chars.count(e) for e in negative_emojis])
+    
+    known_emojis = set(positive_emojis + negative_emojis)
+    unknown_emoji_count = len([e for e in emoji_chars if e not in known_emojis])
+    
+    music_emojis = ['🎵', '🎤', '🎸', '🎼', '🎶', '🎧', '🎹', '🥁', '🎺', '🎻']
+    food_emojis = ['🍕', '🍔', '🥗', '🍰', '🍜', '🍎', '🍌', '🥑', '🍓', '🍉', '🧁']
+    beauty_emojis = ['💄', '💋', '👄', '💅', '🧴', '🪞', '✨', '💎', '👗', '👠']
+    
+    music_count = sum([emoji_chars.count(e) for e in music_emojis])
+    food_count = sum([emoji_chars.count(e) for e in food_emojis])
+    beauty_count = sum([emoji_chars.count(e) for e in beauty_emojis])
+    
+    sentiment_score = positive_count - negative_count + (unknown_emoji_count * 0.1)
+    
+    return {
+        'emoji_count': emoji_count,
+        'emoji_ratio': emoji_ratio,
+        'emoji_diversity': emoji_diversity,
+        'positive_emoji_count': positive_count,
+        'negative_emoji_count': negative_count,
+        'unknown_emoji_count': unknown_emoji_count,
+        'emoji_sentiment_score': sentiment_score,
+        'music_emoji_count': music_count,
+        'food_emoji_count': food_count,
+        'beauty_emoji_count': beauty_count,
+        'spam_emoji_indicator': 1 if emoji_ratio > 0.3 and emoji_diversity < 0.5 else 0
+    }
+
+def create_feature_pipeline(comments_df, videos_df=None):
+    """Feature engineering pipeline for spam detection."""
+    
+    start_time = time.time()
+    features_df = comments_df.copy()
+    
+    # 1. Text processing
+    features_df['cleaned_text'] = features_df['textOriginal'].apply(clean_text)
+    
+    text_stats = features_df['cleaned_text'].apply(calculate_text_stats)
+    text_stats_df = pd.DataFrame(text_stats.tolist())
+    features_df = pd.concat([features_df, text_stats_df], axis=1)
+    
+    # 2. Emoji analysis
+    emoji_features = features_df['textOriginal'].apply(extract_emoji_features)
+    emoji_features_df = pd.DataFrame(emoji_features.tolist())
+    features_df = pd.concat([features_df, emoji_features_df], axis=1)
+    
+    # 3. Engagement features
+    features_df['likeCount'] = pd.to_numeric(features_df['likeCount'], errors='coerce').fillna(0)
+    features_df['likes_per_char'] = features_df['likeCount'] / (features_df['char_count'] + 1)
+    features_df['is_reply'] = (~features_df['parentCommentId'].isna()).astype(int)
+    
+    # 4. Temporal patterns
+    features_df['publishedAt'] = pd.to_datetime(features_df['publishedAt'], errors='coerce')
+    features_df['hour_of_day'] = features_df['publishedAt'].dt.hour
+    features_df['day_of_week'] = features_df['publishedAt'].dt.dayofweek
+    
+    # 5. Spam behavior detection
+    generic_patterns = [
+        r'^(first|1st)!?$',
+        r'^(nice|good|great|awesome|amazing|cool)!*$',
+        r'^(love it|love this|loved it)!*$',
+        r'^(thanks|thank you)!*$',
+        r'^(wow|omg|lol|haha)!*$'
+    ]
+    
+    features_df['is_generic'] = 0
+    for pattern in generic_patterns:
+        mask = features_df['cleaned_text'].str.lower().str.match(pattern, na=False)
+        features_df.loc[mask, 'is_generic'] = 1
+    
+    features_df['suspicious_engagement'] = (
+        (features_df['char_count'] < 10) & 
+        (features_df['likeCount'] > 5)
+    ).astype(int)
+    
+    features_df['excessive_caps'] = (features_df['caps_ratio'] > 0.5).astype(int)
+    features_df['excessive_repetition'] = (features_df['repetition_ratio'] > 0.7).astype(int)
+    
+    # 6. Quality indicators
+    features_df['sufficient_length'] = (features_df['char_count'] >= 10).astype(int)
+    features_df['balanced_punctuation'] = (
+        (features_df['special_ratio'] > 0.01) & 
+        (features_df['special_ratio'] < 0.3)
+    ).astype(int)
+    
+    features_df['meaningful_emoji_usage'] = (
+        (features_df['emoji_count'] > 0) & 
+        (features_df['emoji_ratio'] < 0.3) & 
+        (features_df['emoji_diversity'] > 0.5)
+    ).astype(int)
+    
+    features_df['authentic_engagement'] = (
+        (features_df['char_count'] >= 15) &
+        (features_df['caps_ratio'] < 0.4) &
+        (features_df['repetition_ratio'] < 0.5) &
+        (features_df['special_ratio'] < 0.25)
+    ).astype(int)
+    
+    # 7. Feature selection (Top 20)
+    base_features = [
+        'kind', 'commentId', 'channelId', 'videoId', 'authorId', 
+        'textOriginal', 'parentCommentId', 'likeCount', 'publishedAt', 'updatedAt'
+    ]
+    
+    engineered_features = [
+        'char_count', 'word_count', 'caps_ratio', 'repetition_ratio', 
+        'emoji_ratio', 'emoji_diversity', 'likes_per_char', 'is_reply', 
+        'url_count', 'is_generic'
+    ]
+    
+    feature_columns = base_features + engineered_features
+    
+    for col in engineered_features:
+        if col in features_df.columns:
+            features_df[col] = features_df[col].fillna(0)
+    
+    available_features = [col for col in feature_columns if col in features_df.columns]
+    ml_features = [col for col in engineered_features if col in features_df.columns]
+    X = features_df[ml_features].copy()
+    
+    total_time = time.time() - start_time
+    print(f"Feature engineering completed in {total_time:.2f} seconds")
+    print(f"Generated {len(ml_features)} ML features from {len(features_df):,} comments")
+    
+    return {
+        'features': X,
+        'full_data': features_df[available_features],
+        'text': features_df['cleaned_text'],
+        'original_data': features_df,
+        'feature_names': ml_features,
+        'all_feature_names': available_features
+    }
+
+# run.ipynb cell 6
+
+def assign_final_labels_with_uncertainty(probabilities, predicted_clusters, spam_cluster_id, uncertainty_threshold=0.2):
+    final_labels = []
+    
+    for i, (prob_pair, cluster) in enumerate(zip(probabilities, predicted_clusters)):
+        # Calculate absolute difference between the two probabilities
+        prob_diff = abs(prob_pair[0] - prob_pair[1])
+        
+        # If probabilities are close (difference < threshold), mark as uncertain
+        if prob_diff < uncertainty_threshold:
+            final_labels.append('uncertain')
+        else:
+            final_labels.append('spam' if cluster == spam_cluster_id else 'quality')
+    
+    return np.array(final_labels)
+
+def identify_spam_cluster(X_clustering, primary_labels):
+    """The inline cluster-stat and spam-cluster step of cell 6, wrapped in a function."""
+    # Determine spam vs quality clusters
+    cluster_stats = {}
+    for cluster_id in [0, 1]:
+        mask = primary_labels == cluster_id
+        cluster_data = X_clustering[mask]
+        
+        stats = {
+            'size': mask.sum(),
+            'avg_char_count': cluster_data['char_count'].mean(),
+            'generic_percentage': cluster_data['is_generic'].mean() * 100,
+            'avg_caps_ratio': cluster_data['caps_ratio'].mean(),
+        }
+        cluster_stats[cluster_id] = stats
+    
+    # Identify spam cluster
+    spam_score_0 = (cluster_stats[0]['generic_percentage'] + 
+                    cluster_stats[0]['avg_caps_ratio'] * 100 - 
+                    cluster_stats[0]['avg_char_count'] / 10)
+    spam_score_1 = (cluster_stats[1]['generic_percentage'] + 
+                    cluster_stats[1]['avg_caps_ratio'] * 100 - 
+                    cluster_stats[1]['avg_char_count'] / 10)
+    
+    spam_cluster_id = 0 if spam_score_0 > spam_score_1 else 1
+    return cluster_stats, spam_cluster_id
@@ -0,0 +1,324 @@
+"""
+Vectorized spam feature extraction
+
+Computes the same columns as ``create_feature_pipeline`` in run.ipynb
+(see pipeline/notebook_reference.py) without per-row Python functions:
+text cleaning and counting run as pandas string operations with
+precompiled patterns, word repetition is a grouped count over the exploded
+words, and emoji parsing is skipped for ASCII-only text. Every per-text
+step runs once per distinct text and is broadcast back to its duplicates.
+The output is identical to the notebook's, column for column and value for
+value.
+"""
+
+import re
+import string
+import sys
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+import emoji
+import numpy as np
+import pandas as pd
+
+TEXT_STAT_COLUMNS = [
+    'char_count', 'word_count', 'avg_word_length', 'caps_ratio',
+    'special_ratio', 'url_count', 'repetition_ratio', 'has_url'
+]
+
+EMOJI_COLUMNS = [
+    'emoji_count', 'emoji_ratio', 'emoji_diversity', 'positive_emoji_count',
+    'negative_emoji_count', 'unknown_emoji_count', 'emoji_sentiment_score',
+    'music_emoji_count', 'food_emoji_count', 'beauty_emoji_count', 'spam_emoji_indicator'
+]
+
+BASE_FEATURES = [
+    'kind', 'commentId', 'channelId', 'videoId', 'authorId',
+    'textOriginal', 'parentCommentId', 'likeCount', 'publishedAt', 'updatedAt'
+]
+
+ENGINEERED_FEATURES = [
+    'char_count', 'word_count', 'caps_ratio', 'repetition_ratio',
+    'emoji_ratio', 'emoji_diversity', 'likes_per_char', 'is_reply',
+    'url_count', 'is_generic'
+]
+
+# Column order the saved GMM and scaler were fitted on
+CLUSTERING_FEATURES = [
+    'char_count', 'caps_ratio', 'repetition_ratio', 'emoji_ratio', 'emoji_diversity',
+    'likes_per_char', 'is_reply', 'url_count', 'word_count', 'is_generic'
+]
+
+POSITIVE_EMOJIS = ['😍', '💕', '❤️', '✨', '🌟', '😊', '👍', '🔥', '💯', '🥰', '😘',
+                   '🤩', '😎', '🥳', '🤗', '😇', '🙌', '👏', '💪', '🎉', '🙏', '☺️',
+                   '😀', '😁', '😂', '🤣', '😃', '😄', '😆', '🥲', '💖', '💗', '💝']
+
+NEGATIVE_EMOJIS = ['😒', '😕', '👎', '😞', '😠', '😡', '💔', '😢', '😭', '🙄',
+                   '😤', '😩', '🤮', '🤢', '😵', '🥺', '😖', '😓', '😰', '😨',
+                   '😱', '🤬', '😈', '💀', '😷', '🤒', '🤕']
+
+MUSIC_EMOJIS = ['🎵', '🎤', '🎸', '🎼', '🎶', '🎧', '🎹', '🥁', '🎺', '🎻']
+FOOD_EMOJIS = ['🍕', '🍔', '🥗', '🍰', '🍜', '🍎', '🍌', '🥑', '🍓', '🍉', '🧁']
+BEAUTY_EMOJIS = ['💄', '💋', '👄', '💅', '🧴', '🪞', '✨', '💎', '👗', '👠']
+
+KNOWN_EMOJIS = set(POSITIVE_EMOJIS + NEGATIVE_EMOJIS)
+
+# The notebook sums list.count over each list, so an emoji listed twice counts twice
+EMOJI_WEIGHTS = [Counter(group) for group in (POSITIVE_EMOJIS, NEGATIVE_EMOJIS, MUSIC_EMOJIS,
+                                              FOOD_EMOJIS, BEAUTY_EMOJIS)]
+
+GENERIC_PATTERNS = [
+    r'^(first|1st)!?$',
+    r'^(nice|good|great|awesome|amazing|cool)!*$',
+    r'^(love it|love this|loved it)!*$',
+    r'^(thanks|thank you)!*$',
+    r'^(wow|omg|lol|haha)!*$'
+]
+
+WHITESPACE_PATTERN = re.compile(r'\s+')
+EXCLAMATION_PATTERN = re.compile(r'[!]{4,}')
+QUESTION_PATTERN = re.compile(r'[?]{4,}')
+ELLIPSIS_PATTERN = re.compile(r'[.]{4,}')
+URL_PATTERN = re.compile(r'http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\(\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+')
+PUNCTUATION_PATTERN = re.compile('[' + re.escape(string.punctuation) + ']')
+# Each alternative keeps its own anchors, so this matches exactly when one of the patterns does
+GENERIC_PATTERN = re.compile('|'.join(f'(?:{pattern})' for pattern in GENERIC_PATTERNS))
+
+def _char_class(predicate) -> str:
+    """Regex character class of every code point satisfying ``predicate``, as ranges"""
+    ranges = []
+    start = None
+    for code in range(sys.maxunicode + 2):
+        inside = code <= sys.maxunicode and predicate(chr(code))
+        if inside and start is None:
+            start = code
+        elif not inside and start is not None:
+            ranges.append((start, code - 1))
+            start = None
+    parts = [re.escape(chr(a)) if a == b else f'{re.escape(chr(a))}-{re.escape(chr(b))}' for a, b in ranges]
+    return '[' + ''.join(parts) + ']'
+
+# Same test as str.isupper() on a single character
+UPPERCASE_PATTERN = re.compile(_char_class(str.isupper))
+
+def _per_unique(values: pd.Series, compute) -> pd.DataFrame:
+    """Run a column-wise ``compute`` once per distinct value and broadcast the rows back.
+
+    Comment data is dominated by repeats ("❤", "Nice!", "first", ...), so the
+    string work shrinks to the number of distinct texts. NaN is kept as its
+    own value.
+    """
+    codes, uniques = pd.factorize(values.to_numpy(dtype=object), use_na_sentinel=False)
+    per_unique = compute(pd.Series(uniques, dtype=object))
+    result = per_unique.iloc[codes]
+    result.index = values.index
+    return result
+
+def _clean_unique(texts: pd.Series) -> pd.DataFrame:
+    present = texts.notna() & (texts != '')
+    cleaned = texts[present].astype(str)
+    cleaned = cleaned.str.replace(WHITESPACE_PATTERN, ' ', regex=True)
+    cleaned = cleaned.str.replace(EXCLAMATION_PATTERN, '!!!', regex=True)
+    cleaned = cleaned.str.replace(QUESTION_PATTERN, '???', regex=True)
+    cleaned = cleaned.str.replace(ELLIPSIS_PATTERN, '...', regex=True)
+    cleaned = cleaned.str.strip()
+    result = pd.Series('', index=texts.index, dtype=object)
+    result[present] = cleaned
+    return result.to_frame('cleaned_text')
+
+def clean_text_series(texts: pd.Series) -> pd.Series:
+    """``clean_text`` over a column: collapse whitespace and runs of !, ? and ."""
+    cleaned = _per_unique(texts, _clean_unique)['cleaned_text']
+    return pd.Series(cleaned.to_numpy(), index=texts.index, name=texts.name)
+
+def _max_word_frequency(lowered: pd.Series, word_count: np.ndarray) -> np.ndarray:
+    """Count of the most frequent word per text (texts are cleaned, so words are split by single spaces)"""
+    max_freq = np.minimum(word_count, 1)
+    multi = np.flatnonzero(word_count > 1)
+    if len(multi):
+        words = pd.Series(lowered.to_numpy()[multi], index=multi).str.split(' ').explode()
+        counts = words.groupby([words.index, words.to_numpy()], sort=False).size()
+        per_text = counts.groupby(level=0, sort=False).max()
+        max_freq[per_text.index.to_numpy()] = per_text.to_numpy()
+    return max_freq
+
+def _text_stats_unique(cleaned: pd.Series) -> pd.DataFrame:
+    cleaned = cleaned.astype(str)
+    char_count = cleaned.str.len().to_numpy(dtype=np.int64)
+    # Cleaned text has single spaces between words and none at the ends
+    word_count = np.where(char_count > 0, cleaned.str.count(' ').to_numpy(dtype=np.int64) + 1, 0)
+    upper_count = cleaned.str.count(UPPERCASE_PATTERN).to_numpy(dtype=np.int64)
+    special_chars = cleaned.str.count(PUNCTUATION_PATTERN).to_numpy(dtype=np.int64)
+    url_count = cleaned.str.count(URL_PATTERN).to_numpy(dtype=np.int64)
+    max_word_freq = _max_word_frequency(cleaned.str.lower(), word_count)
+    
+    safe_chars = np.maximum(char_count, 1)
+    avg_word_length = np.where(word_count > 0, (char_count - (word_count - 1)) / np.maximum(word_count, 1), 0.0)
+    return pd.DataFrame({
+        'char_count': char_count,
+        'word_count': word_count,
+        'avg_word_length': avg_word_length,
+        'caps_ratio': upper_count / safe_chars,
+        'special_ratio': special_chars / safe_chars,
+        'url_count': url_count,
+        'repetition_ratio': max_word_freq / np.maximum(word_count, 1),
+        'has_url': (url_count > 0).astype(np.int64)
+    }, index=cleaned.index)
+
+def text_stats(cleaned: pd.Series) -> pd.DataFrame:
+    """``calculate_text_stats`` over a column of cleaned text"""
+    return _per_unique(cleaned, _text_stats_unique)
+
+def _emoji_counts(text: str) -> tuple:
+    """Emoji count, distinct, positive, negative, music, food, beauty and unknown counts of one text"""
+    emoji_chars = [item['emoji'] for item in emoji.emoji_list(text)]
+    weighted = [sum(weights.get(e, 0) for e in emoji_chars) for weights in EMOJI_WEIGHTS]
+    unknown = sum(1 for e in emoji_chars if e not in KNOWN_EMOJIS)
+    return (len(emoji_chars), len(set(emoji_chars)), *weighted, unknown)
+
+def _emoji_features_unique(raw_texts: pd.Series) -> pd.DataFrame:
+    texts = [str(text) for text in raw_texts]
+    counts = np.zeros((len(texts), 8), dtype=np.int64)
+    # Every emoji contains a non-ASCII code point, so ASCII-only texts are skipped
+    for i, text in enumerate(texts):
+        if not text.isascii():
+            counts[i] = _emoji_counts(text)
+    
+    emoji_count, unique_emojis, positive, negative, music, food, beauty, unknown = counts.T
+    emoji_ratio = emoji_count / np.maximum(np.array([len(text) for text in texts], dtype=np.int64), 1)
+    emoji_diversity = unique_emojis / np.maximum(emoji_count, 1)
+    return pd.DataFrame({
+        'emoji_count': emoji_count,
+        'emoji_ratio': emoji_ratio,
+        'emoji_diversity': emoji_diversity,
+        'positive_emoji_count': positive,
+        'negative_emoji_count': negative,
+        'unknown_emoji_count': unknown,
+        'emoji_sentiment_score': (positive - negative) + (unknown * 0.1),
+        'music_emoji_count': music,
+        'food_emoji_count': food,
+        'beauty_emoji_count': beauty,
+        'spam_emoji_indicator': ((emoji_ratio > 0.3) & (emoji_diversity < 0.5)).astype(np.int64)
+    }, index=raw_texts.index)
+
+def emoji_features(raw_texts: pd.Series) -> pd.DataFrame:
+    """``extract_emoji_features`` over a column of original (uncleaned) text"""
+    return _per_unique(raw_texts, _emoji_features_unique)
+
+def add_features(comments_df: pd.DataFrame) -> pd.DataFrame:
+    """Every column the notebook's pipeline derives, appended to a copy of the comments"""
+    features_df = comments_df.copy()
+    
+    # 1. Text processing
+    features_df['cleaned_text'] = clean_text_series(features_df['textOriginal'])
+    features_df = pd.concat([features_df, text_stats(features_df['cleaned_text'])], axis=1)
+    
+    # 2. Emoji analysis
+    features_df = pd.concat([features_df, emoji_features(features_df['textOriginal'])], axis=1)
+    
+    # 3. Engagement features
+    features_df['likeCount'] = pd.to_numeric(features_df['likeCount'], errors='coerce').fillna(0)
+    features_df['likes_per_char'] = features_df['likeCount'] / (features_df['char_count'] + 1)
+    features_df['is_reply'] = (~features_df['parentCommentId'].isna()).astype(int)
+    
+    # 4. Temporal patterns
+    features_df['publishedAt'] = pd.to_datetime(features_df['publishedAt'], errors='coerce')
+    features_df['hour_of_day'] = features_df['publishedAt'].dt.hour
+    features_df['day_of_week'] = features_df['publishedAt'].dt.dayofweek
+    
+    # 5. Spam behavior detection
+    generic = features_df['cleaned_text'].str.lower().str.match(GENERIC_PATTERN, na=False)
+    features_df['is_generic'] = generic.astype(np.int64)
+    features_df['suspicious_engagement'] = (
+        (features_df['char_count'] < 10) &
+        (features_df['likeCount'] > 5)
+    ).astype(int)
+    features_df['excessive_caps'] = (features_df['caps_ratio'] > 0.5).astype(int)
+    features_df['excessive_repetition'] = (features_df['repetition_ratio'] > 0.7).astype(int)
+    
+    # 6. Quality indicators
+    features_df['sufficient_length'] = (features_df['char_count'] >= 10).astype(int)
+    features_df['balanced_punctuation'] = (
+        (features_df['special_ratio'] > 0.01) &
+        (features_df['special_ratio'] < 0.3)
+    ).astype(int)
+    features_df['meaningful_emoji_usage'] = (
+        (features_df['emoji_count'] > 0) &
+        (features_df['emoji_ratio'] < 0.3) &
+        (features_df['emoji_diversity'] > 0.5)
+    ).astype(int)
+    features_df['authentic_engagement'] = (
+        (features_df['char_count'] >= 15) &
+        (features_df['caps_ratio'] < 0.4) &
+        (features_df['repetition_ratio'] < 0.5) &
+        (features_df['special_ratio'] < 0.25)
+    ).astype(int)
+    
+    for col in ENGINEERED_FEATURES:
+        features_df[col] = features_df[col].fillna(0)
+    return features_df
+
+def create_feature_pipeline(comments_df: pd.DataFrame, videos_df: Optional[pd.DataFrame] = None,
+                            verbose: bool = True) -> Dict[str, Any]:
+    """Drop-in replacement for the notebook's create_feature_pipeline (same return value)"""
+    start_time = time.time()
+    features_df = add_features(comments_df)
+    
+    feature_columns = BASE_FEATURES + ENGINEERED_FEATURES
+    available_features = [col for col in feature_columns if col in features_df.columns]
+    ml_features = [col for col in ENGINEERED_FEATURES if col in features_df.columns]
+    
+    if verbose:
+        print(f"Feature engineering completed in {time.time() - start_time:.2f} seconds")
+        print(f"Generated {len(ml_features)} ML features from {len(features_df):,} comments")
+    
+    return {
+        'features': features_df[ml_features].copy(),
+        'full_data': features_df[available_features],
+        'text': features_df['cleaned_text'],
+        'original_data': features_df,
+        'feature_names': ml_features,
+        'all_feature_names': available_features
+    }
+
+def clustering_matrix(features_df: pd.DataFrame, columns: List[str] = None) -> np.ndarray:
+    """Float64 matrix of the clustering features in model order, with the notebook's NaN/inf handling"""
+    X = features_df[columns or CLUSTERING_FEATURES].to_numpy(dtype=np.float64, copy=True)
+    np.nan_to_num(X, copy=False, nan=0.0, posinf=1e6, neginf=-1e6)
+    return X
+
+def clustering_row(text: Any, like_count: Any = None, parent_comment_id: Any = None) -> List[float]:
+    """CLUSTERING_FEATURES of one comment without pandas, for low-latency scoring of a few comments.
+
+    Follows the notebook's per-row functions and gives the same values as
+    ``clustering_matrix(add_features(...))`` for that comment.
+    """
+    raw = str(text)
+    cleaned = '' if pd.isna(text) or text == '' else raw
+    cleaned = WHITESPACE_PATTERN.sub(' ', cleaned)
+    cleaned = EXCLAMATION_PATTERN.sub('!!!', cleaned)
+    cleaned = QUESTION_PATTERN.sub('???', cleaned)
+    cleaned = ELLIPSIS_PATTERN.sub('...', cleaned).strip()
+    
+    char_count = len(cleaned)
+    words = cleaned.lower().split()
+    word_count = len(words)
+    caps_ratio = sum(1 for c in cleaned if c.isupper()) / max(char_count, 1)
+    repetition_ratio = (max(Counter(words).values()) if words else 0) / max(word_count, 1)
+    url_count = len(URL_PATTERN.findall(cleaned))
+    is_generic = 1 if GENERIC_PATTERN.match(cleaned.lower()) else 0
+    
+    emoji_count, unique_emojis = _emoji_counts(raw)[:2] if not raw.isascii() else (0, 0)
+    emoji_ratio = emoji_count / max(len(raw), 1)
+    emoji_diversity = unique_emojis / max(emoji_count, 1)
+    
+    likes = pd.to_numeric(like_count, errors='coerce')
+    likes = 0 if pd.isna(likes) else likes
+    is_reply = 0 if pd.isna(parent_comment_id) else 1
+    values = {
+        'char_count': char_count, 'caps_ratio': caps_ratio, 'repetition_ratio': repetition_ratio,
+        'emoji_ratio': emoji_ratio, 'emoji_diversity': emoji_diversity, 'likes_per_char': likes / (char_count + 1),
+        'is_reply': is_reply, 'url_count': url_count, 'word_count': word_count, 'is_generic': is_generic
+    }
+    return [float(values[name]) for name in CLUSTERING_FEATURES]
@@ -0,0 +1,155 @@
+"""
+Post-GMM labelling: uncertainty labels, cluster statistics and threshold sweeps
+
+Vectorized replacements for the labelling stage of run.ipynb. There,
+``assign_final_labels_with_uncertainty`` loops over every probability pair
+building a list of strings, and the spam cluster is found by masking the
+whole feature frame once per cluster. Here labels are int8 codes (see
+LABELS), computed chunk by chunk so temporaries stay small. Per-cluster
+sums are accumulated in one pass with ``np.bincount``, and any number of
+uncertainty thresholds can be evaluated in a single pass over the
+probabilities.
+"""
+
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+# Same order as spam_model.LABELS
+LABELS = ('spam', 'quality', 'uncertain')
+SPAM, QUALITY, UNCERTAIN = 0, 1, 2
+
+DEFAULT_CHUNK_SIZE = 1_000_000
+
+# Columns the notebook's spam-cluster score is based on
+STAT_FEATURES = ('char_count', 'is_generic', 'caps_ratio')
+
+def assign_label_codes(probabilities: np.ndarray, spam_cluster_id: int, threshold: float = 0.2,
+                       chunk_size: int = DEFAULT_CHUNK_SIZE, out: Optional[np.ndarray] = None) -> np.ndarray:
+    """int8 label codes, equal to ``assign_final_labels_with_uncertainty`` in run.ipynb.
+
+    UNCERTAIN where |P0 - P1| < ``threshold``, otherwise SPAM or QUALITY by
+    the most probable cluster.
+    """
+    n = len(probabilities)
+    codes = np.empty(n, dtype=np.int8) if out is None else out
+    for start in range(0, n, chunk_size):
+        block = probabilities[start:start + chunk_size]
+        spam = np.argmax(block, axis=1) == spam_cluster_id
+        chunk = np.where(spam, SPAM, QUALITY).astype(np.int8)
+        chunk[np.abs(block[:, 0] - block[:, 1]) < threshold] = UNCERTAIN
+        codes[start:start + chunk_size] = chunk
+    return codes
+
+def label_categorical(codes: np.ndarray) -> pd.Categorical:
+    """Codes as a pandas Categorical ('spam', 'quality', 'uncertain'), one byte per row"""
+    return pd.Categorical.from_codes(codes, categories=list(LABELS))
+
+def label_strings(codes: np.ndarray) -> np.ndarray:
+    """Codes as an object array of label strings, for callers that need the notebook's representation"""
+    return np.array(LABELS, dtype=object)[codes]
+
+def label_counts(codes: np.ndarray) -> Dict[str, int]:
+    counts = np.bincount(codes, minlength=len(LABELS))
+    return {label: int(count) for label, count in zip(LABELS, counts)}
+
+class ClusterStats:
+    """Per-cluster size and feature means accumulated over chunks in one pass.
+
+    ``update`` takes a block of rows and their cluster ids; ``stats`` returns
+    the notebook's dict (size, avg_char_count, generic_percentage,
+    avg_caps_ratio) per cluster.
+    """
+    
+    def __init__(self, feature_names: Sequence[str], n_clusters: int = 2, features: Iterable[str] = STAT_FEATURES):
+        self.n_clusters = n_clusters
+        self.features = list(features)
+        self.columns = [list(feature_names).index(name) for name in self.features]
+        self.sizes = np.zeros(n_clusters, dtype=np.int64)
+        self.sums = np.zeros((len(self.features), n_clusters))
+    
+    def update(self, X: np.ndarray, clusters: np.ndarray):
+        clusters = np.asarray(clusters, dtype=np.intp)
+        self.sizes += np.bincount(clusters, minlength=self.n_clusters)
+        for row, column in enumerate(self.columns):
+            self.sums[row] += np.bincount(clusters, weights=X[:, column], minlength=self.n_clusters)
+    
+    def standardized(self, mean: np.ndarray, scale: np.ndarray) -> "ClusterStats":
+        """The same statistics for rows standardized with ``mean`` and ``scale`` (indexed like feature_names)"""
+        result = ClusterStats([], self.n_clusters, [])
+        result.features, result.columns = list(self.features), list(self.columns)
+        result.sizes = self.sizes.copy()
+        result.sums = (self.sums - np.outer(mean[self.columns], self.sizes)) / np.asarray(scale)[self.columns][:, None]
+        return result
+    
+    def means(self) -> Dict[str, np.ndarray]:
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return {name: self.sums[row] / self.sizes for row, name in enumerate(self.features)}
+    
+    def stats(self) -> Dict[int, Dict[str, Any]]:
+        means = self.means()
+        return {
+            cluster: {
+                'size': int(self.sizes[cluster]),
+                'avg_char_count': float(means['char_count'][cluster]),
+                'generic_percentage': float(means['is_generic'][cluster] * 100),
+                'avg_caps_ratio': float(means['caps_ratio'][cluster]),
+            }
+            for cluster in range(self.n_clusters)
+        }
+
+def cluster_stats(X: np.ndarray, clusters: np.ndarray, feature_names: Sequence[str],
+                  chunk_size: int = DEFAULT_CHUNK_SIZE) -> Dict[int, Dict[str, Any]]:
+    """The notebook's per-cluster statistics, from a feature matrix in one chunked pass"""
+    accumulator = ClusterStats(feature_names)
+    for start in range(0, len(X), chunk_size):
+        accumulator.update(X[start:start + chunk_size], clusters[start:start + chunk_size])
+    return accumulator.stats()
+
+def spam_cluster_score(stats: Dict[str, Any]) -> float:
+    """Higher for the cluster that looks like spam: generic, shouty and short"""
+    return stats['generic_percentage'] + stats['avg_caps_ratio'] * 100 - stats['avg_char_count'] / 10
+
+def identify_spam_cluster(stats: Dict[int, Dict[str, Any]]) -> int:
+    """Cluster id with the higher spam score (cluster 0 wins only if strictly higher, as in the notebook)"""
+    return 0 if spam_cluster_score(stats[0]) > spam_cluster_score(stats[1]) else 1
+
+def threshold_sweep(probabilities: np.ndarray, spam_cluster_id: int, thresholds: Sequence[float],
+                    chunk_size: int = DEFAULT_CHUNK_SIZE) -> pd.DataFrame:
+    """Label counts for every uncertainty threshold, in one pass over the probabilities.
+
+    Each row is counted once: its |P0 - P1| is located among the sorted
+    thresholds, which tells for which of them it is uncertain. The counts are
+    the same as running ``assign_label_codes`` once per threshold.
+    """
+    order = np.argsort(thresholds, kind='stable')
+    sorted_thresholds = np.asarray(thresholds, dtype=np.float64)[order]
+    n_thresholds = len(sorted_thresholds)
+    # histogram[g, k]: rows of group g (0 = spam cluster, 1 = other) with exactly k thresholds <= diff
+    histogram = np.zeros((2, n_thresholds + 1), dtype=np.int64)
+    for start in range(0, len(probabilities), chunk_size):
+        block = probabilities[start:start + chunk_size]
+        diff = np.abs(block[:, 0] - block[:, 1])
+        position = np.searchsorted(sorted_thresholds, diff, side='right')
+        group = (np.argmax(block, axis=1) != spam_cluster_id).astype(np.intp)
+        histogram += np.bincount(group * (n_thresholds + 1) + position,
+                                 minlength=2 * (n_thresholds + 1)).reshape(2, n_thresholds + 1)
+    
+    # A row is uncertain for threshold k when diff < threshold k, i.e. fewer than k + 1 thresholds are <= diff
+    uncertain_by_group = np.cumsum(histogram, axis=1)[:, :n_thresholds]
+    totals = histogram.sum(axis=1)
+    rows: List[Dict[str, Any]] = []
+    for k in range(n_thresholds):
+        spam = int(totals[0] - uncertain_by_group[0, k])
+        quality = int(totals[1] - uncertain_by_group[1, k])
+        uncertain = int(uncertain_by_group[:, k].sum())
+        total = spam + quality + uncertain
+        rows.append({
+            'threshold': float(sorted_thresholds[k]),
+            'spam': spam,
+            'quality': quality,
+            'uncertain': uncertain,
+            'uncertainty_rate': uncertain / total if total else 0.0
+        })
+    return pd.DataFrame(rows)
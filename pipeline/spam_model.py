@@ -0,0 +1,107 @@
+"""
+Saved spam model: loading, scoring and running scaler statistics
+
+The model artifact is the dict run.ipynb dumps to
+comment_spam_detection_model.pkl: a 2-component GaussianMixture fitted on
+standardized CLUSTERING_FEATURES, its StandardScaler, the id of the spam
+cluster and the uncertainty threshold on |P(spam) - P(quality)|.
+"""
+
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import StandardScaler
+
+from pipeline.dedup import unique_rows
+from pipeline.spam_features import CLUSTERING_FEATURES
+from pipeline.spam_labels import LABELS, assign_label_codes, label_strings
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODEL_PATH = os.path.join(REPO_DIR, "model", "comment_spam_detection_model.pkl")
+
+def load_model(path: str = MODEL_PATH) -> Dict[str, Any]:
+    """Load the model artifact and check it was fitted on the expected features"""
+    model = joblib.load(path)
+    if list(model['feature_names']) != CLUSTERING_FEATURES:
+        raise ValueError(f"Model features {model['feature_names']} do not match {CLUSTERING_FEATURES}")
+    return model
+
+def predict_probabilities(model: Dict[str, Any], X: np.ndarray, deduplicate: bool = True) -> np.ndarray:
+    """GMM component probabilities (n x 2) for raw feature rows.
+
+    Spam repeats the same feature row many times, so by default each
+    distinct row is scored once and the result fanned back out.
+    """
+    if deduplicate and len(X) > 1:
+        codes, first = unique_rows(X)
+        if len(first) < len(X):
+            return predict_probabilities(model, np.asarray(X)[first], deduplicate=False)[codes]
+    # Both estimators were fitted on DataFrames; pass names so sklearn can check the column order
+    scaled = model['scaler'].transform(pd.DataFrame(X, columns=CLUSTERING_FEATURES))
+    return model['gmm_model'].predict_proba(pd.DataFrame(scaled, columns=CLUSTERING_FEATURES))
+
+def assign_labels(model: Dict[str, Any], probabilities: np.ndarray) -> np.ndarray:
+    """'uncertain' where the two probabilities are closer than the threshold, else the argmax cluster's label"""
+    threshold = model['uncertainty_thresholds']['difference_threshold']
+    return label_strings(assign_label_codes(probabilities, model['spam_cluster_id'], threshold))
+
+def classify(model: Dict[str, Any], X: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Notebook labels ('spam', 'quality', 'uncertain') and max probability for raw feature rows"""
+    probabilities = predict_probabilities(model, X)
+    return assign_labels(model, probabilities), np.max(probabilities, axis=1)
+
+class RunningScaler:
+    """Mean and variance of feature rows seen so far, merged chunk by chunk.
+
+    Uses the pairwise update of Chan et al., so the result matches a
+    StandardScaler fitted on all rows at once (up to rounding) while only
+    three arrays are kept in memory.
+    """
+    
+    def __init__(self, n_features: int = len(CLUSTERING_FEATURES)):
+        self.n = 0
+        self.mean = np.zeros(n_features)
+        self.m2 = np.zeros(n_features)
+    
+    def update(self, X: np.ndarray):
+        if len(X) == 0:
+            return
+        n_b = len(X)
+        mean_b = X.mean(axis=0)
+        m2_b = ((X - mean_b) ** 2).sum(axis=0)
+        total = self.n + n_b
+        delta = mean_b - self.mean
+        self.mean = self.mean + delta * (n_b / total)
+        self.m2 = self.m2 + m2_b + delta ** 2 * (self.n * n_b / total)
+        self.n = total
+    
+    @property
+    def var(self) -> np.ndarray:
+        return self.m2 / max(self.n, 1)
+    
+    def to_scaler(self, feature_names: Optional[List[str]] = None) -> StandardScaler:
+        """A fitted StandardScaler with these statistics"""
+        scaler = StandardScaler()
+        scaler.mean_ = self.mean.copy()
+        scaler.var_ = self.var
+        scale = np.sqrt(scaler.var_)
+        scaler.scale_ = np.where(scale < 10 * np.finfo(scale.dtype).eps, 1.0, scale)
+        scaler.n_samples_seen_ = self.n
+        scaler.n_features_in_ = len(self.mean)
+        if feature_names is not None:
+            scaler.feature_names_in_ = np.asarray(feature_names, dtype=object)
+        return scaler
+    
+    def state(self) -> Dict[str, Any]:
+        return {'n': self.n, 'mean': self.mean.tolist(), 'm2': self.m2.tolist()}
+    
+    @classmethod
+    def from_state(cls, state: Dict[str, Any]) -> "RunningScaler":
+        scaler = cls(len(state['mean']))
+        scaler.n = state['n']
+        scaler.mean = np.asarray(state['mean'], dtype=np.float64)
+        scaler.m2 = np.asarray(state['m2'], dtype=np.float64)
+        return scaler
@@ -0,0 +1,361 @@
+#!/usr/bin/env python3
+"""
+Incremental retraining of the spam GMM on new comment batches
+
+run.ipynb refits the model from scratch: StandardScaler plus
+GaussianMixture(n_components=2, n_init=10, max_iter=200) over every comment.
+Here the saved model is the starting point instead, and new comments are
+streamed through it chunk by chunk.
+
+The model is kept as sufficient statistics in raw feature units: per
+component the responsibility mass, the weighted sum of rows and the
+weighted sum of outer products. The saved GMM is turned into such
+statistics with a weight of ``prior_weight`` comments (by default the
+number its scaler has seen), and every chunk adds its own. With more than
+one pass a chunk's earlier contribution is swapped for the new one
+(incremental EM), so the statistics never hold a chunk twice. The scaler is
+a RunningScaler seeded from the saved one. The component parameters do not
+depend on the scaling, so the scaler can change while the fit runs.
+
+The result is written as a new versioned artifact next to the parent
+(comment_spam_detection_model.v2.pkl, .v3.pkl, ...); the parent is never
+overwritten.
+
+    python pipeline/spam_retrain.py --data-path dataset --files comments6.csv --passes 2
+"""
+
+import argparse
+import os
+import re
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+if __package__ in (None, ""):
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import joblib
+import numpy as np
+import pandas as pd
+from scipy.special import logsumexp
+from sklearn.base import clone
+from sklearn.mixture import GaussianMixture
+from sklearn.preprocessing import StandardScaler
+
+from pipeline.spam_features import CLUSTERING_FEATURES, add_features, clustering_matrix
+from pipeline.spam_labels import (LABELS, UNCERTAIN, ClusterStats, assign_label_codes, cluster_stats,
+                                  identify_spam_cluster, label_counts)
+from pipeline.spam_model import MODEL_PATH, RunningScaler, load_model, predict_probabilities
+
+# The notebook's GaussianMixture settings, used for full refits
+GMM_PARAMS = {
+    'n_components': 2,
+    'covariance_type': 'full',
+    'init_params': 'kmeans',
+    'max_iter': 200,
+    'n_init': 10,
+    'random_state': 42
+}
+
+# comment_spam_detection_model.pkl -> stem; comment_spam_detection_model.v3.pkl -> same stem, version 3
+VERSION_SUFFIX = re.compile(r'(?:\.v(\d+))?\.pkl$')
+
+class GMMStatistics:
+    """Sufficient statistics of a full-covariance GMM in raw feature units"""
+    
+    def __init__(self, n_components: int, n_features: int):
+        self.counts = np.zeros(n_components)
+        self.sums = np.zeros((n_components, n_features))
+        self.outer = np.zeros((n_components, n_features, n_features))
+    
+    @classmethod
+    def from_batch(cls, X: np.ndarray, resp: np.ndarray) -> "GMMStatistics":
+        stats = cls(resp.shape[1], X.shape[1])
+        stats.counts = resp.sum(axis=0)
+        stats.sums = resp.T @ X
+        stats.outer = np.einsum('nk,ni,nj->kij', resp, X, X, optimize=True)
+        return stats
+    
+    @classmethod
+    def from_model(cls, gmm: GaussianMixture, scaler: StandardScaler, weight: float) -> "GMMStatistics":
+        """Statistics that reproduce ``gmm`` (fitted on ``scaler``-standardized rows) from ``weight`` rows"""
+        scale = np.asarray(scaler.scale_, dtype=np.float64)
+        means = gmm.means_ * scale + scaler.mean_
+        # covariances_ include reg_covar on the diagonal; to_gmm adds it back
+        n_features = gmm.means_.shape[1]
+        covariances = (gmm.covariances_ - gmm.reg_covar * np.eye(n_features)) * np.outer(scale, scale)
+        stats = cls(*gmm.means_.shape)
+        stats.counts = gmm.weights_ * weight
+        stats.sums = means * stats.counts[:, None]
+        stats.outer = (covariances + np.einsum('ki,kj->kij', means, means)) * stats.counts[:, None, None]
+        return stats
+    
+    def add(self, other: "GMMStatistics", sign: float = 1.0):
+        self.counts += sign * other.counts
+        self.sums += sign * other.sums
+        self.outer += sign * other.outer
+    
+    @property
+    def total(self) -> float:
+        return float(self.counts.sum())
+    
+    def to_gmm(self, scaler: StandardScaler, template: GaussianMixture) -> GaussianMixture:
+        """A fitted GaussianMixture (same settings as ``template``) for rows standardized by ``scaler``"""
+        counts = self.counts + 10 * np.finfo(np.float64).eps
+        means = self.sums / counts[:, None]
+        covariances = self.outer / counts[:, None, None] - np.einsum('ki,kj->kij', means, means)
+        scale = np.asarray(scaler.scale_, dtype=np.float64)
+        n_features = means.shape[1]
+        
+        gmm = clone(template)
+        gmm.weights_ = counts / counts.sum()
+        gmm.means_ = (means - scaler.mean_) / scale
+        gmm.covariances_ = covariances / np.outer(scale, scale) + template.reg_covar * np.eye(n_features)
+        gmm.precisions_cholesky_ = np.empty_like(gmm.covariances_)
+        for k, covariance in enumerate(gmm.covariances_):
+            cholesky = np.linalg.cholesky(covariance)
+            gmm.precisions_cholesky_[k] = np.linalg.solve(cholesky, np.eye(n_features)).T
+        gmm.precisions_ = np.einsum('kij,klj->kil', gmm.precisions_cholesky_, gmm.precisions_cholesky_)
+        gmm.converged_ = True
+        gmm.n_iter_ = 0
+        gmm.lower_bound_ = -np.inf
+        gmm.n_features_in_ = n_features
+        gmm.feature_names_in_ = np.asarray(CLUSTERING_FEATURES, dtype=object)
+        return gmm
+
+def _e_step(gmm: GaussianMixture, X_scaled: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Per-row log-likelihood and responsibilities, with the same formulas sklearn uses"""
+    n_features = X_scaled.shape[1]
+    log_prob = np.empty((len(X_scaled), len(gmm.weights_)))
+    for k, (mean, prec_chol) in enumerate(zip(gmm.means_, gmm.precisions_cholesky_)):
+        y = X_scaled @ prec_chol - mean @ prec_chol
+        log_det = np.log(np.diag(prec_chol)).sum()
+        log_prob[:, k] = -0.5 * (n_features * np.log(2 * np.pi) + (y * y).sum(axis=1)) + log_det
+    weighted = log_prob + np.log(gmm.weights_)
+    log_norm = logsumexp(weighted, axis=1)
+    return log_norm, np.exp(weighted - log_norm[:, None])
+
+def seeded_scaler(scaler: StandardScaler, weight: float) -> RunningScaler:
+    """RunningScaler holding ``scaler``'s mean and variance as if it had seen ``weight`` rows"""
+    running = RunningScaler(len(scaler.mean_))
+    if weight > 0:
+        running.n = weight
+        running.mean = np.asarray(scaler.mean_, dtype=np.float64).copy()
+        running.m2 = np.asarray(scaler.var_, dtype=np.float64) * weight
+    return running
+
+def comment_chunks(data_path: str, files: List[str], chunksize: int) -> Callable[[], Iterator[Tuple[Any, np.ndarray]]]:
+    """Callable yielding ((file, chunk index), clustering features) for every chunk of the comment files"""
+    def chunks():
+        for name in files:
+            reader = pd.read_csv(os.path.join(data_path, name), dtype=str, chunksize=chunksize)
+            for index, comments in enumerate(reader):
+                yield (name, index), clustering_matrix(add_features(comments))
+    return chunks
+
+def array_chunks(X: np.ndarray, chunksize: int) -> Callable[[], Iterator[Tuple[Any, np.ndarray]]]:
+    """The same for a feature matrix already in memory"""
+    def chunks():
+        for index, start in enumerate(range(0, len(X), chunksize)):
+            yield index, X[start:start + chunksize]
+    return chunks
+
+def score_chunks(gmm: GaussianMixture, scaler: StandardScaler, chunks: Callable[[], Iterable[Tuple[Any, np.ndarray]]],
+                 threshold: float) -> Tuple[ClusterStats, np.ndarray, int]:
+    """One pass of ``gmm`` over the chunks: cluster stats of the raw rows, confident rows per
+    component and the number of uncertain rows (which does not depend on the spam component)"""
+    accumulator = ClusterStats(CLUSTERING_FEATURES)
+    confident = np.zeros(len(gmm.weights_), dtype=np.int64)
+    uncertain = 0
+    for _, X in chunks():
+        _, resp = _e_step(gmm, (X - scaler.mean_) / scaler.scale_)
+        components = resp.argmax(axis=1)
+        accumulator.update(X, components)
+        codes = assign_label_codes(resp, 0, threshold)
+        uncertain += int((codes == UNCERTAIN).sum())
+        confident += np.bincount(components[codes != UNCERTAIN], minlength=len(confident))
+    return accumulator, confident, uncertain
+
+def retrain_incremental(model: Dict[str, Any], chunks: Callable[[], Iterable[Tuple[Any, np.ndarray]]],
+                        prior_weight: Optional[float] = None, passes: int = 1, tol: float = 1e-3,
+                        verbose: bool = True) -> Dict[str, Any]:
+    """Warm-start ``model`` and update it on the chunks ``chunks()`` yields; returns the new artifact.
+
+    ``prior_weight`` is how many comments the saved model counts for
+    (default: its scaler's n_samples_seen_); 0 fits the new comments only,
+    starting from the saved parameters. Later passes stop early once the mean
+    log-likelihood changes by less than ``tol``. A last pass labels the new
+    comments with the final model for the cluster stats and label counts.
+    """
+    start_time = time.time()
+    gmm, scaler = model['gmm_model'], model['scaler']
+    if prior_weight is None:
+        prior_weight = float(scaler.n_samples_seen_)
+    
+    totals = GMMStatistics.from_model(gmm, scaler, prior_weight)
+    running = seeded_scaler(scaler, prior_weight)
+    threshold = model['uncertainty_thresholds']['difference_threshold']
+    chunk_stats: Dict[Any, GMMStatistics] = {}
+    history: List[float] = []
+    
+    for pass_index in range(passes):
+        log_likelihood, rows = 0.0, 0
+        for key, X in chunks():
+            if pass_index == 0:
+                running.update(X)
+            current = running.to_scaler(CLUSTERING_FEATURES)
+            working = totals.to_gmm(current, gmm) if totals.total > 0 else gmm
+            if working is gmm:
+                current = scaler
+            log_norm, resp = _e_step(working, (X - current.mean_) / current.scale_)
+            
+            batch = GMMStatistics.from_batch(X, resp)
+            if key in chunk_stats:
+                totals.add(chunk_stats[key], -1.0)
+            totals.add(batch)
+            chunk_stats[key] = batch
+            
+            # In raw units, so passes stay comparable while the scaler moves
+            log_likelihood += float(log_norm.sum()) - len(X) * float(np.log(current.scale_).sum())
+            rows += len(X)
+        
+        if rows == 0:
+            raise ValueError("No comments to retrain on")
+        history.append(log_likelihood / rows)
+        if verbose:
+            print(f"🔄 Pass {pass_index + 1}: {rows:,} comments, mean log-likelihood {history[-1]:.4f}")
+        if pass_index > 0 and abs(history[-1] - history[-2]) < tol:
+            break
+    
+    final_scaler = running.to_scaler(CLUSTERING_FEATURES)
+    new_gmm = totals.to_gmm(final_scaler, gmm)
+    new_gmm.n_iter_ = len(history)
+    new_gmm.lower_bound_ = history[-1]
+    
+    # Cluster stats of the new comments under the final model, in its scaler's standardized units like the notebook's
+    accumulator, confident, uncertain = score_chunks(new_gmm, final_scaler, chunks, threshold)
+    stats = accumulator.standardized(final_scaler.mean_, final_scaler.scale_).stats()
+    spam_cluster_id = model['spam_cluster_id']
+    if all(stats[cluster]['size'] for cluster in stats):
+        spam_cluster_id = identify_spam_cluster(stats)
+    if spam_cluster_id != model['spam_cluster_id'] and verbose:
+        print(f"⚠️ Spam cluster moved from component {model['spam_cluster_id']} to {spam_cluster_id}")
+    
+    counts = {'spam': int(confident[spam_cluster_id]), 'quality': int(confident.sum() - confident[spam_cluster_id]),
+              'uncertain': uncertain}
+    return {
+        'gmm_model': new_gmm,
+        'scaler': final_scaler,
+        'feature_names': list(CLUSTERING_FEATURES),
+        'spam_cluster_id': spam_cluster_id,
+        'uncertainty_thresholds': dict(model['uncertainty_thresholds']),
+        'cluster_stats': stats,
+        'metrics': {
+            'uncertainty_rate': counts['uncertain'] / rows,
+            'processing_time': time.time() - start_time,
+            'total_comments': rows
+        },
+        'version': model.get('version', 1) + 1,
+        'training': {
+            'mode': 'incremental',
+            'parent_version': model.get('version', 1),
+            'prior_weight': prior_weight,
+            'new_comments': rows,
+            'passes': len(history),
+            'mean_log_likelihood': history,
+            'label_counts': counts,
+            'trained_at': datetime.now(timezone.utc).isoformat()
+        }
+    }
+
+def fit_full(X: np.ndarray, **gmm_params) -> Dict[str, Any]:
+    """The notebook's from-scratch fit (cell 5-7) on raw feature rows, as a model artifact"""
+    start_time = time.time()
+    frame = pd.DataFrame(X, columns=CLUSTERING_FEATURES)
+    scaler = StandardScaler()
+    X_scaled = pd.DataFrame(scaler.fit_transform(frame), columns=CLUSTERING_FEATURES)
+    gmm = GaussianMixture(**{**GMM_PARAMS, **gmm_params})
+    clusters = gmm.fit_predict(X_scaled)
+    stats = cluster_stats(X_scaled.to_numpy(), clusters, CLUSTERING_FEATURES)
+    spam_cluster_id = identify_spam_cluster(stats)
+    probabilities = gmm.predict_proba(X_scaled)
+    codes = assign_label_codes(probabilities, spam_cluster_id, 0.2)
+    return {
+        'gmm_model': gmm,
+        'scaler': scaler,
+        'feature_names': list(CLUSTERING_FEATURES),
+        'spam_cluster_id': spam_cluster_id,
+        'uncertainty_thresholds': {'difference_threshold': 0.2},
+        'cluster_stats': stats,
+        'metrics': {
+            'uncertainty_rate': float((codes == UNCERTAIN).mean()),
+            'processing_time': time.time() - start_time,
+            'total_comments': len(X)
+        },
+        'version': 1,
+        'training': {'mode': 'full', 'new_comments': len(X), 'label_counts': label_counts(codes)}
+    }
+
+def label_agreement(model_a: Dict[str, Any], model_b: Dict[str, Any], X: np.ndarray,
+                    chunk_size: int = 100_000) -> Dict[str, float]:
+    """Share of rows both models label the same ('spam' / 'quality' / 'uncertain'), overall and per label of ``model_b``"""
+    same = np.zeros(len(LABELS), dtype=np.int64)
+    totals = np.zeros(len(LABELS), dtype=np.int64)
+    for start in range(0, len(X), chunk_size):
+        block = X[start:start + chunk_size]
+        codes = []
+        for model in (model_a, model_b):
+            threshold = model['uncertainty_thresholds']['difference_threshold']
+            codes.append(assign_label_codes(predict_probabilities(model, block), model['spam_cluster_id'], threshold))
+        totals += np.bincount(codes[1], minlength=len(LABELS))
+        same += np.bincount(codes[1][codes[0] == codes[1]], minlength=len(LABELS))
+    report = {'overall': float(same.sum() / max(totals.sum(), 1))}
+    for label, agree, total in zip(LABELS, same, totals):
+        report[label] = float(agree / total) if total else float('nan')
+    return report
+
+def versioned_model_path(parent_path: str, version: int) -> str:
+    """<parent stem>.v<version>.pkl next to the parent, bumped past any file that already exists"""
+    directory, name = os.path.split(parent_path)
+    stem = VERSION_SUFFIX.sub('', name)
+    path = os.path.join(directory, f"{stem}.v{version}.pkl")
+    while os.path.exists(path):
+        version += 1
+        path = os.path.join(directory, f"{stem}.v{version}.pkl")
+    return path
+
+def save_model(artifact: Dict[str, Any], parent_path: str) -> str:
+    path = versioned_model_path(parent_path, artifact['version'])
+    artifact['version'] = int(VERSION_SUFFIX.search(path).group(1))
+    artifact['training']['parent'] = os.path.basename(parent_path)
+    joblib.dump(artifact, path)
+    return path
+
+def main():
+    parser = argparse.ArgumentParser(description="Warm-start the saved spam GMM and update it on new comment files")
+    parser.add_argument("--data-path", default=".", help="Directory holding the new comment files")
+    parser.add_argument("--files", nargs="+", required=True, help="New comment CSVs (comments1.csv layout)")
+    parser.add_argument("--model", default=MODEL_PATH, help="Model to start from")
+    parser.add_argument("--chunksize", type=int, default=100_000, help="Comments per chunk")
+    parser.add_argument("--prior-weight", type=float,
+                        help="Comments the saved model counts for (default: all it was fitted on; 0 = new data only)")
+    parser.add_argument("--passes", type=int, default=1, help="Passes over the new comments")
+    parser.add_argument("--tol", type=float, default=1e-3, help="Stop when the mean log-likelihood changes less")
+    args = parser.parse_args()
+    
+    model = load_model(args.model)
+    print(f"🚀 Retraining {os.path.basename(args.model)} (version {model.get('version', 1)})")
+    artifact = retrain_incremental(model, comment_chunks(args.data_path, args.files, args.chunksize),
+                                   args.prior_weight, args.passes, args.tol)
+    path = save_model(artifact, args.model)
+    
+    training = artifact['training']
+    print(f"\n⏱ Fit in {artifact['metrics']['processing_time']:.1f}s over {training['new_comments']:,} new comments")
+    for label, count in training['label_counts'].items():
+        print(f"  {label.title()}: {count:,} ({count / training['new_comments'] * 100:.1f}%)")
+    print(f"✅ Saved version {artifact['version']} to {path}")
+    print(f"   Serve it with SPAM_MODEL_PATH={path}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,346 @@
+#!/usr/bin/env python3
+"""
+Streaming comment ingest for the spam pipeline
+
+Replaces the load-everything flow of run.ipynb (read comments1..5.csv,
+concatenate, copy, write complete_comments_top20_features.csv at the end).
+Each comment file is read in fixed-size chunks. Every chunk gets its
+features and, with the saved model, its spam classification. The chunk is
+then appended to the output CSV and dropped. Only running state is kept:
+scaler statistics of the clustering features and label counts. Memory
+therefore depends on the chunk size, not on the number of comments.
+
+After every chunk a checkpoint records how far each file got, the output
+size and the running state. A rerun resumes from there: finished files are
+skipped, and a partly done file skips the chunks already written. Output
+written after the last checkpoint is truncated away.
+
+With --workers N, chunks are scored by a pool of N processes. A worker
+returns the numeric columns of a chunk (features, label code, confidence)
+as one float64 block in shared memory instead of pickling a DataFrame, and
+the parent rebuilds the rows and writes chunks in input order, so the output
+is the same as with one process.
+
+    python pipeline/stream_ingest.py --data-path dataset --chunksize 100000 --workers 4
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+if __package__ in (None, ""):
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+
+from pipeline.feature_store import PARQUET_DIR, PARTITIONS, ParquetDatasetWriter
+from pipeline.spam_features import BASE_FEATURES, ENGINEERED_FEATURES, add_features, clustering_matrix
+from pipeline.spam_model import LABELS, MODEL_PATH, RunningScaler, classify, load_model
+
+COMMENT_FILES = [f'comments{i}.csv' for i in range(1, 6)]
+OUTPUT_FILE = 'complete_comments_top20_features.csv'
+OUTPUT_COLUMNS = BASE_FEATURES + ENGINEERED_FEATURES
+CHECKPOINT_VERSION = 1
+
+# Engineered features that are integers; the shared-memory block carries them as float64 (exact below 2**53)
+INT_FEATURES = {'char_count', 'word_count', 'is_reply', 'url_count', 'is_generic'}
+LABEL_CODES = {label: code for code, label in enumerate(LABELS)}
+
+def checkpoint_path_for(output: str) -> str:
+    return output + '.checkpoint.json'
+
+def load_checkpoint(path: str) -> Optional[Dict[str, Any]]:
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def save_checkpoint(path: str, checkpoint: Dict[str, Any]):
+    """Write atomically, so a crash leaves either the old or the new checkpoint"""
+    tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(checkpoint, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+def chunk_output(comments: pd.DataFrame, model: Optional[Dict[str, Any]] = None):
+    """Output rows and the clustering feature matrix of one chunk of raw comments"""
+    features_df = add_features(comments)
+    output = features_df[[col for col in OUTPUT_COLUMNS if col in features_df.columns]].copy()
+    # A chunk without bad likeCount values would come out as integers; keep the column float like the full run
+    output['likeCount'] = output['likeCount'].astype(np.float64)
+    X = clustering_matrix(features_df)
+    if model is not None:
+        labels, confidence = classify(model, X)
+        output['spam_classification'] = labels
+        output['classification_confidence'] = confidence
+    return output, X
+
+_worker_model = None
+
+def _init_worker(model_path: Optional[str]):
+    global _worker_model
+    _worker_model = load_model(model_path) if model_path else None
+
+def _score_chunk_shared(comments: pd.DataFrame) -> Tuple[str, Tuple[int, int]]:
+    """Worker side: score a chunk and leave its numeric columns in a shared-memory block"""
+    output, _ = chunk_output(comments, _worker_model)
+    columns = [output['likeCount'].to_numpy(np.float64)]
+    columns += [output[col].to_numpy(np.float64) for col in ENGINEERED_FEATURES]
+    if _worker_model is not None:
+        columns.append(output['spam_classification'].map(LABEL_CODES).to_numpy(np.float64))
+        columns.append(output['classification_confidence'].to_numpy(np.float64))
+    shape = (len(output), len(columns))
+    shm = SharedMemory(create=True, size=max(shape[0] * shape[1] * 8, 1))
+    block = np.ndarray(shape, dtype=np.float64, buffer=shm.buf)
+    for j, column in enumerate(columns):
+        block[:, j] = column
+    del block
+    shm.close()
+    # The parent unlinks the block after reading it; stop this process's tracker from unlinking it again at exit
+    resource_tracker.unregister(shm._name, 'shared_memory')
+    return shm.name, shape
+
+def _unpack_chunk(comments: pd.DataFrame, shm_name: str, shape: Tuple[int, int], labelled: bool):
+    """Parent side: rebuild exactly what chunk_output returns from the raw chunk and a worker's block"""
+    shm = SharedMemory(name=shm_name)
+    try:
+        block = np.ndarray(shape, dtype=np.float64, buffer=shm.buf)
+        output = comments[[col for col in BASE_FEATURES if col in comments.columns]].copy()
+        output['likeCount'] = block[:, 0].copy()
+        output['publishedAt'] = pd.to_datetime(output['publishedAt'], errors='coerce')
+        for j, col in enumerate(ENGINEERED_FEATURES, start=1):
+            output[col] = block[:, j].astype(np.int64 if col in INT_FEATURES else np.float64)
+        if labelled:
+            output['spam_classification'] = np.array(LABELS, dtype=object)[block[:, -2].astype(np.int64)]
+            output['classification_confidence'] = block[:, -1].copy()
+        del block
+    finally:
+        shm.close()
+        shm.unlink()
+    return output, clustering_matrix(output)
+
+def _release(future):
+    """Free the shared block of a chunk that will not be written"""
+    if not future.cancel():
+        try:
+            name, _ = future.result()
+            SharedMemory(name=name).unlink()
+        except Exception:
+            pass
+
+def _pending_chunks(data_path: str, files: List[str], chunksize: int, checkpoint: Dict[str, Any],
+                    limit: Optional[int], stopped: Dict[str, bool]) -> Iterator[tuple]:
+    """(file, chunk index, comments) still to do, in order; (file, None, None) marks the end of a file"""
+    count = 0
+    for name in files:
+        state = checkpoint['files'].setdefault(name, {'chunks': 0, 'rows': 0, 'done': False})
+        if state['done']:
+            continue
+        reader = pd.read_csv(os.path.join(data_path, name), dtype=str, chunksize=chunksize)
+        for index, comments in enumerate(reader):
+            if index < state['chunks']:
+                continue
+            if limit is not None and count >= limit:
+                stopped['stopped'] = True
+                return
+            count += 1
+            yield name, index, comments
+        yield name, None, None
+
+def _scored_chunks(pending: Iterator[tuple], model: Optional[Dict[str, Any]], model_path: Optional[str],
+                   workers: int) -> Iterator[tuple]:
+    """(file, chunk index, comments, (output, X)) in input order, scored inline or by a process pool"""
+    if workers <= 1:
+        for name, index, comments in pending:
+            yield name, index, comments, None if comments is None else chunk_output(comments, model)
+        return
+    
+    queue = deque()
+    with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(model_path,)) as pool:
+        try:
+            for name, index, comments in pending:
+                future = None if comments is None else pool.submit(_score_chunk_shared, comments)
+                queue.append((name, index, comments, future))
+                # Keep a couple of chunks per worker in flight; results are taken strictly in order
+                while len(queue) > 2 * workers:
+                    yield _collect(queue.popleft(), model is not None)
+            while queue:
+                yield _collect(queue.popleft(), model is not None)
+        finally:
+            for _, _, _, future in queue:
+                if future is not None:
+                    _release(future)
+
+def _collect(item: tuple, labelled: bool) -> tuple:
+    name, index, comments, future = item
+    if future is None:
+        return name, index, comments, None
+    return name, index, comments, _unpack_chunk(comments, *future.result(), labelled)
+
+class CsvOutput:
+    """The output CSV, truncated back to what the checkpoint records; position is its size in bytes"""
+    
+    def __init__(self, path: str, position: int):
+        self.file = open(path, 'r+' if position else 'w', encoding='utf-8', newline='')
+        # Drop anything written after the last checkpoint
+        self.file.seek(position)
+        self.file.truncate()
+    
+    def write(self, frame: pd.DataFrame):
+        frame.to_csv(self.file, header=self.file.tell() == 0, index=False, lineterminator=os.linesep)
+        self.file.flush()
+        os.fsync(self.file.fileno())
+    
+    @property
+    def position(self) -> int:
+        return self.file.tell()
+    
+    def close(self):
+        self.file.close()
+
+class ParquetOutput(ParquetDatasetWriter):
+    """The output Parquet dataset; position is the number of parts written"""
+    
+    @property
+    def position(self) -> int:
+        return self.parts
+    
+    def close(self):
+        pass
+
+def ingest_comments(data_path: str, output: str = OUTPUT_FILE, files: Optional[List[str]] = None,
+                    chunksize: int = 100_000, model_path: Optional[str] = MODEL_PATH,
+                    restart: bool = False, max_chunks: Optional[int] = None, workers: int = 1,
+                    output_format: str = 'csv', partition_by: str = 'month') -> Dict[str, Any]:
+    """Stream the comment files into ``output``, resuming from its checkpoint if there is one.
+
+    ``model_path=None`` writes features only. ``max_chunks`` stops after that
+    many new chunks; the run can be continued later. ``workers`` > 1 scores
+    chunks in that many processes. ``output_format='parquet'`` writes a
+    Parquet dataset directory partitioned by ``partition_by`` (see
+    feature_store) instead of a CSV. Returns the checkpoint, which holds the
+    running scaler state and label counts.
+    """
+    files = files or COMMENT_FILES
+    model = load_model(model_path) if model_path else None
+    config = {
+        'files': files,
+        'chunksize': chunksize,
+        'model': os.path.basename(model_path) if model_path else None
+    }
+    if output_format == 'parquet':
+        # Only recorded for Parquet, so CSV checkpoints written before it still resume
+        config.update({'format': 'parquet', 'partition_by': partition_by})
+    elif output_format != 'csv':
+        raise ValueError(f"Unknown output format {output_format!r}; expected 'csv' or 'parquet'")
+    
+    ckpt_path = checkpoint_path_for(output)
+    checkpoint = None if restart else load_checkpoint(ckpt_path)
+    if checkpoint is not None:
+        if checkpoint.get('version') != CHECKPOINT_VERSION or checkpoint.get('config') != config:
+            raise ValueError(f"{ckpt_path} was written with different settings; rerun with --restart")
+        if output_format == 'parquet':
+            if not os.path.isdir(output):
+                raise ValueError(f"{output} is missing; rerun with --restart")
+        elif not os.path.exists(output) or os.path.getsize(output) < checkpoint['output_bytes']:
+            raise ValueError(f"{output} is shorter than its checkpoint records; rerun with --restart")
+        print(f"🔄 Resuming: {checkpoint['rows']:,} comments already written")
+    else:
+        checkpoint = {
+            'version': CHECKPOINT_VERSION,
+            'config': config,
+            'files': {},
+            'rows': 0,
+            'output_bytes': 0,
+            'label_counts': {},
+            'scaler': RunningScaler().state(),
+            'complete': False
+        }
+    
+    scaler = RunningScaler.from_state(checkpoint['scaler'])
+    label_counts = Counter(checkpoint['label_counts'])
+    stopped = {'stopped': False}
+    start_time = time.time()
+    rows_this_run = 0
+    
+    # output_bytes is the CSV size, or the number of Parquet parts written
+    if output_format == 'parquet':
+        out = ParquetOutput(output, partition_by, checkpoint['output_bytes'])
+    else:
+        out = CsvOutput(output, checkpoint['output_bytes'])
+    try:
+        pending = _pending_chunks(data_path, files, chunksize, checkpoint, max_chunks, stopped)
+        for name, index, comments, scored in _scored_chunks(pending, model, model_path, workers):
+            state = checkpoint['files'][name]
+            if scored is None:
+                state['done'] = True
+                save_checkpoint(ckpt_path, checkpoint)
+                continue
+            
+            result, X = scored
+            out.write(result)
+            
+            scaler.update(X)
+            if model is not None:
+                label_counts.update(result['spam_classification'].value_counts().to_dict())
+            state['chunks'] = index + 1
+            state['rows'] += len(comments)
+            checkpoint['rows'] += len(comments)
+            checkpoint['output_bytes'] = out.position
+            checkpoint['scaler'] = scaler.state()
+            checkpoint['label_counts'] = dict(label_counts)
+            save_checkpoint(ckpt_path, checkpoint)
+            rows_this_run += len(comments)
+            
+            rate = rows_this_run / max(time.time() - start_time, 1e-9)
+            print(f"✅ {name} chunk {index + 1}: {checkpoint['rows']:,} comments written ({rate:,.0f}/sec this run)")
+    finally:
+        out.close()
+    
+    if stopped['stopped']:
+        print(f"⏸ Stopped after {max_chunks} chunks; rerun to continue")
+        return checkpoint
+    
+    checkpoint['complete'] = True
+    save_checkpoint(ckpt_path, checkpoint)
+    return checkpoint
+
+def main():
+    parser = argparse.ArgumentParser(description="Stream comment CSVs through the spam feature pipeline")
+    parser.add_argument("--data-path", default=".", help="Directory holding the comment files")
+    parser.add_argument("--files", nargs="+", default=COMMENT_FILES, help="Comment files, in order")
+    parser.add_argument("--output", help=f"Output path (default: {OUTPUT_FILE}, or {PARQUET_DIR}/ with --format parquet)")
+    parser.add_argument("--chunksize", type=int, default=100_000, help="Comments per chunk")
+    parser.add_argument("--model", default=MODEL_PATH, help="Saved spam model used to label comments")
+    parser.add_argument("--no-model", action="store_true", help="Write features only")
+    parser.add_argument("--restart", action="store_true", help="Ignore an existing checkpoint")
+    parser.add_argument("--max-chunks", type=int, help="Stop after this many chunks (resume later)")
+    parser.add_argument("--workers", type=int, default=1, help="Processes scoring chunks in parallel")
+    parser.add_argument("--format", choices=["csv", "parquet"], default="csv", help="Output format")
+    parser.add_argument("--partition", choices=PARTITIONS, default="month", help="Parquet partitioning")
+    args = parser.parse_args()
+    
+    output = args.output or (PARQUET_DIR if args.format == 'parquet' else OUTPUT_FILE)
+    checkpoint = ingest_comments(args.data_path, output, args.files, args.chunksize,
+                                 None if args.no_model else args.model, args.restart, args.max_chunks,
+                                 args.workers, args.format, args.partition)
+    if not checkpoint['complete']:
+        return
+    
+    total = checkpoint['rows']
+    print(f"\n📊 {total:,} comments written to {output}")
+    for label, count in sorted(checkpoint['label_counts'].items()):
+        print(f"  {label.title()}: {count:,} ({count / max(total, 1) * 100:.1f}%)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""
+Streaming aggregation over a table read in chunks
+
+Building blocks for jobs that read a large table once, chunk by chunk, and
+keep only what they output:
+- ``TopK``: ``nlargest`` / ``nsmallest``, optionally per group, on
+  bounded heaps
+- ``GroupTotals``: per-group (or whole-table) counts and sums, which give
+  ``count``, ``sum`` and ``mean``
+- ``FirstRows``: ``groupby(...).head(n)`` in table order
+
+Memory is proportional to what they return, not to the table. Each gives
+what pandas gives on the concatenated table. NaN values are skipped, ties
+keep the earliest row, and result columns get the dtype they would have had
+in a single read (an int column with NaN in any chunk comes back as float).
+"""
+
+import heapq
+from typing import Any, Dict, Hashable, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+class _Schema:
+    """Common dtypes of some columns over every chunk seen"""
+    
+    def __init__(self, columns: Sequence[str]):
+        self.columns = list(columns)
+        self.empty: Optional[pd.DataFrame] = None
+    
+    def update(self, chunk: pd.DataFrame):
+        empty = chunk[self.columns].iloc[:0]
+        self.empty = empty if self.empty is None else pd.concat([self.empty, empty])
+    
+    def frame(self, rows: List[tuple]) -> pd.DataFrame:
+        frame = pd.DataFrame(rows, columns=self.columns)
+        if self.empty is None:
+            return frame
+        differing = {col: dtype for col, dtype in self.empty.dtypes.items() if frame[col].dtype != dtype}
+        return frame.astype(differing) if differing else frame
+
+class TopK:
+    """``DataFrame.nlargest(n, column)`` (or ``nsmallest``) over chunks, per ``by`` group if given.
+
+    Each chunk contributes at most ``n`` candidates per group; a size-``n``
+    heap per group keeps the best so far, keyed on (value, earlier row).
+    """
+    
+    def __init__(self, n: int, column: str, columns: Sequence[str], largest: bool = True,
+                 by: Optional[str] = None):
+        self.n = n
+        self.column = column
+        self.largest = largest
+        self.by = by
+        self.schema = _Schema(columns)
+        self.heaps: Dict[Hashable, list] = {}
+        self.rows = 0
+    
+    def update(self, chunk: pd.DataFrame):
+        self.schema.update(chunk)
+        chunk = chunk.reset_index(drop=True)
+        valid = chunk[chunk[self.column].notna()]
+        if self.by is None:
+            candidates = valid.nlargest(self.n, self.column) if self.largest else valid.nsmallest(self.n, self.column)
+            groups = np.zeros(len(candidates), dtype=np.int8)
+        else:
+            ordered = valid.sort_values(self.column, ascending=not self.largest, kind='stable')
+            candidates = ordered.groupby(self.by, sort=False, observed=True).head(self.n)
+            groups = candidates[self.by].to_numpy()
+        values = candidates[self.column].to_numpy(dtype=float)
+        positions = self.rows + candidates.index.to_numpy()
+        rows = candidates[self.schema.columns].itertuples(index=False, name=None)
+        sign = 1.0 if self.largest else -1.0
+        for group, value, position, row in zip(groups, values, positions, rows):
+            # The heap top is the worst kept row: smallest key, and the later row on ties
+            item = (sign * value, -int(position), row)
+            heap = self.heaps.setdefault(group if self.by is not None else None, [])
+            if len(heap) < self.n:
+                heapq.heappush(heap, item)
+            elif item[:2] > heap[0][:2]:
+                heapq.heapreplace(heap, item)
+        self.rows += len(chunk)
+    
+    def result(self, group: Any = None) -> pd.DataFrame:
+        """The kept rows of ``group`` (ignored without ``by``), best first"""
+        heap = self.heaps.get(group, [])
+        return self.schema.frame([row for _, _, row in sorted(heap, key=lambda item: item[:2], reverse=True)])
+    
+    def groups(self) -> List[Hashable]:
+        return sorted(self.heaps)
+
+def _add(total: Any, part: Any) -> Any:
+    """Add per-column totals, treating groups missing on one side as 0 without upcasting ints"""
+    if total is None:
+        return part
+    if isinstance(part, pd.Series):
+        index = total.index.union(part.index)
+        return total.reindex(index, fill_value=0) + part.reindex(index, fill_value=0)
+    return total + part
+
+class GroupTotals:
+    """Non-null counts and sums of ``columns`` per ``by`` group (or over the whole table).
+
+    Totals are kept per column, so an int column keeps int sums unless a
+    chunk turns it into float.
+    """
+    
+    def __init__(self, columns: Sequence[str], by: Optional[str] = None):
+        self.columns = list(columns)
+        self.by = by
+        self.counts: Dict[str, Any] = dict.fromkeys(self.columns)
+        self.sums: Dict[str, Any] = dict.fromkeys(self.columns)
+        self.rows = 0
+    
+    def update(self, chunk: pd.DataFrame):
+        source = chunk if self.by is None else chunk.groupby(self.by, observed=True)
+        for column in self.columns:
+            values = source[column]
+            self.counts[column] = _add(self.counts[column], values.count())
+            if pd.api.types.is_numeric_dtype(chunk[column]):
+                self.sums[column] = _add(self.sums[column], values.sum())
+        self.rows += len(chunk)
+    
+    def _value(self, column: str, how: str) -> Any:
+        if how == 'count':
+            return self.counts[column]
+        if how == 'sum':
+            return self.sums[column]
+        if how == 'mean':
+            return self.sums[column] / self.counts[column]
+        raise ValueError(f"Unsupported aggregation {how!r}; expected 'count', 'sum' or 'mean'")
+    
+    def agg(self, spec: Dict[str, str]) -> pd.DataFrame:
+        """``groupby(by).agg(spec)`` with 'count', 'sum' or 'mean' per column, sorted by group"""
+        frame = pd.DataFrame({column: self._value(column, how) for column, how in spec.items()}).sort_index()
+        frame.index.name = self.by
+        return frame
+    
+    def total(self, column: str, how: str = 'sum') -> Any:
+        """Whole-table 'count', 'sum' or 'mean' of ``column`` (``by=None`` only)"""
+        return self._value(column, how)
+
+class FirstRows:
+    """``groupby(by).head(n)[columns]`` over chunks: the first ``n`` rows of each group in table order"""
+    
+    def __init__(self, n: int, by: str, columns: Sequence[str]):
+        self.n = n
+        self.by = by
+        self.schema = _Schema(columns)
+        self.kept: Dict[Hashable, List[tuple]] = {}
+    
+    def update(self, chunk: pd.DataFrame):
+        self.schema.update(chunk)
+        head = chunk[chunk[self.by].notna()].groupby(self.by, sort=False, observed=True).head(self.n)
+        rows = head[self.schema.columns].itertuples(index=False, name=None)
+        for group, row in zip(head[self.by].to_numpy(), rows):
+            kept = self.kept.setdefault(group, [])
+            if len(kept) < self.n:
+                kept.append(row)
+    
+    def result(self, group: Any) -> pd.DataFrame:
+        return self.schema.frame(self.kept.get(group, []))
@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+Batch topic inference with the saved stm.ipynb LDA model
+
+stm.ipynb assigns topics with ``get_dominant_topic``, which calls
+``ldamodel.get_document_topics(doc)`` once per document. Each call runs
+gensim's variational E-step for that single document in Python.
+``TopicInferencer`` loads the model and dictionary once and runs the same
+E-step for a whole batch:
+
+1. Texts are tokenized as the training documents were
+   (``simple_preprocess(deacc=True, min_len=2, max_len=15)``, in one regex
+   pass for the batch) and counted against the dictionary into a sparse
+   documents x words matrix. Videos are pooled first, as the notebook
+   pools them: "TITLE: ... DESCRIPTION: ... COMMENTS: ...".
+2. Every document's gamma is updated together. Each iteration is one
+   sparse x dense product, plus one per-word normalizer over the matrix's
+   non-zeros. Documents stop updating as they converge, under gensim's
+   ``gamma_threshold`` and ``iterations`` limits. Blocks of at most
+   ``BLOCK_NNZ`` non-zeros keep the temporaries bounded.
+3. The dominant topic and its top keywords (precomputed per topic) are
+   returned per document.
+
+The arithmetic is gensim's, in the model's dtype, and the starting gamma
+is drawn from the model's ``random_state`` in the same order. The
+distributions therefore match calling ``get_document_topics`` on the same
+documents in order, up to floating-point summation order. As in gensim,
+the random start means a repeated call can differ by about
+``gamma_threshold``. Documents with no dictionary words get topic -1
+instead of the prior.
+
+    python pipeline/topic_inference.py --model model/lda_model_gensim --input pooled_documents.csv --output video_topics.csv
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+if __package__ in (None, ""):
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sps
+
+from pipeline.document_pooling import tokenize_texts
+
+try:
+    from gensim import corpora, matutils, models
+    GENSIM_AVAILABLE = True
+except ImportError:
+    print("Warning: gensim not installed; topic inference unavailable")
+    GENSIM_AVAILABLE = False
+
+MODEL_DIR = 'model'
+# Files cell 7 of stm.ipynb writes
+GENSIM_MODEL = 'lda_model_gensim'
+DICTIONARY_FILE = 'lda_dictionary.dict'
+ARTIFACTS_FILE = 'lda_topic_model.pkl'
+TOP_KEYWORDS = 10
+# Document-word pairs per E-step block; the block's temporaries hold this many x num_topics values
+BLOCK_NNZ = 250_000
+
+VideoInput = Union[str, Dict[str, Any]]
+
+def load_topic_model(path: str = os.path.join(MODEL_DIR, GENSIM_MODEL), dictionary_path: Optional[str] = None):
+    """(LdaModel, Dictionary) from ``lda_model_gensim`` (+ ``lda_dictionary.dict``) or the joblib artifacts"""
+    if path.endswith('.pkl'):
+        import joblib
+        artifacts = joblib.load(path)
+        return artifacts['lda_model'], artifacts['dictionary']
+    model = models.LdaModel.load(path)
+    dictionary_path = dictionary_path or os.path.join(os.path.dirname(path), DICTIONARY_FILE)
+    if os.path.exists(dictionary_path):
+        return model, corpora.Dictionary.load(dictionary_path)
+    return model, model.id2word
+
+def pooled_text(video: VideoInput) -> str:
+    """The notebook's pooled document for a video: title, description and its comments, or a text as is"""
+    if isinstance(video, str):
+        return video
+    title = str(video.get('title', '') or '').strip()
+    description = str(video.get('description', '') or '').strip()
+    parts = []
+    if title:
+        parts.append(f"TITLE: {title}")
+    if description:
+        parts.append(f"DESCRIPTION: {description}")
+    comments = [str(text).strip() for text in video.get('comments') or [] if text is not None]
+    comment_text = " ".join(text for text in comments if text)
+    if comment_text:
+        parts.append(f"COMMENTS: {comment_text}")
+    return " ".join(parts)
+
+class TopicInferencer:
+    """An LdaModel and its dictionary, loaded once, inferring topics for batches of documents"""
+    
+    def __init__(self, model, dictionary, top_keywords: int = TOP_KEYWORDS):
+        self.model = model
+        self.dictionary = dictionary
+        self.num_topics = model.num_topics
+        self.dtype = model.dtype
+        # V x K, so a document-word row gathers one contiguous K-vector
+        self.exp_elog_beta_t = np.ascontiguousarray(model.expElogbeta.T)
+        self.alpha = model.alpha.astype(self.dtype, copy=False)
+        self.epsilon = np.finfo(self.dtype).eps
+        self.word_index = pd.Index(self._vocabulary())
+        topics = model.get_topics()
+        self.topic_words = topics / topics.sum(axis=1, keepdims=True)
+        self.keyword_ids, self.keyword_probabilities = self._keywords(top_keywords)
+        # model.random_state is shared state; one inference at a time keeps the draws in order
+        self._lock = threading.Lock()
+    
+    @classmethod
+    def load(cls, path: str = os.path.join(MODEL_DIR, GENSIM_MODEL), dictionary_path: Optional[str] = None,
+             top_keywords: int = TOP_KEYWORDS) -> "TopicInferencer":
+        return cls(*load_topic_model(path, dictionary_path), top_keywords=top_keywords)
+    
+    def _vocabulary(self) -> np.ndarray:
+        tokens = np.full(self.exp_elog_beta_t.shape[0], '', dtype=object)
+        for token, token_id in self.dictionary.token2id.items():
+            if token_id < len(tokens):
+                tokens[token_id] = token
+        return tokens
+    
+    def _keywords(self, top_n: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Top word ids and probabilities per topic, as ``show_topic(topic, topn)``"""
+        ids = np.array([matutils.argsort(topic, top_n, reverse=True) for topic in self.topic_words], dtype=np.int64)
+        return ids, np.take_along_axis(self.topic_words, ids, axis=1)
+    
+    def keywords(self, topic: int, top_n: Optional[int] = None) -> List[Dict[str, Any]]:
+        """The topic's ``top_n`` most probable words; more than were precomputed are ranked on demand"""
+        top_n = self.keyword_ids.shape[1] if top_n is None else top_n
+        if top_n < 0:
+            raise ValueError(f"top_n must be non-negative, got {top_n}")
+        if top_n <= self.keyword_ids.shape[1]:
+            ids, probabilities = self.keyword_ids[topic, :top_n], self.keyword_probabilities[topic, :top_n]
+        else:
+            ids = np.asarray(matutils.argsort(self.topic_words[topic], top_n, reverse=True), dtype=np.int64)
+            probabilities = self.topic_words[topic, ids]
+        return [{"word": self.dictionary[int(word_id)], "probability": round(float(probability), 6)}
+                for word_id, probability in zip(ids, probabilities)]
+    
+    def bow_matrix(self, texts: Sequence[str]) -> sps.csr_matrix:
+        """Documents x words counts of the texts' dictionary words"""
+        text_number, tokens = tokenize_texts(texts)
+        word_ids = self.word_index.get_indexer(tokens)
+        known = word_ids >= 0
+        return sps.coo_matrix((np.ones(int(known.sum()), dtype=self.dtype), (text_number[known], word_ids[known])),
+                              shape=(len(texts), len(self.word_index))).tocsr()
+    
+    def _estep(self, counts: sps.csr_matrix, gamma: np.ndarray) -> np.ndarray:
+        """gensim's LdaModel.inference for every row of ``counts`` at once, starting from ``gamma``"""
+        exp_elog_theta = np.exp(matutils.dirichlet_expectation(gamma))
+        active = np.arange(counts.shape[0])
+        block = None
+        for _ in range(self.model.iterations):
+            if len(active) == 0:
+                break
+            if block is None or block.shape[0] != len(active):
+                # Converged documents drop out of the working set
+                block = counts if len(active) == counts.shape[0] else counts[active]
+                rows = np.repeat(np.arange(len(active)), np.diff(block.indptr))
+                beta = self.exp_elog_beta_t[block.indices]
+                # Same sparsity as block; only the counts / phinorm values change per iteration
+                weighted = block.copy()
+            theta = exp_elog_theta[active]
+            phinorm = np.einsum('ij,ij->i', theta[rows], beta) + self.epsilon
+            np.divide(block.data, phinorm, out=weighted.data)
+            new_gamma = self.alpha + theta * (weighted @ self.exp_elog_beta_t)
+            meanchange = np.abs(new_gamma - gamma[active]).mean(axis=1)
+            gamma[active] = new_gamma
+            exp_elog_theta[active] = np.exp(matutils.dirichlet_expectation(new_gamma))
+            active = active[meanchange >= self.model.gamma_threshold]
+        return gamma
+    
+    def infer_matrix(self, counts: sps.csr_matrix) -> np.ndarray:
+        """Documents x topics distributions (normalized gamma) for a counts matrix"""
+        counts = sps.csr_matrix(counts, dtype=self.dtype)
+        with self._lock:
+            gamma = self.model.random_state.gamma(100., 1. / 100., (counts.shape[0], self.num_topics))
+        gamma = gamma.astype(self.dtype, copy=False)
+        start = 0
+        while start < counts.shape[0]:
+            stop = int(np.searchsorted(counts.indptr, counts.indptr[start] + BLOCK_NNZ, side='right')) - 1
+            stop = min(max(stop, start + 1), counts.shape[0])
+            gamma[start:stop] = self._estep(counts[start:stop], gamma[start:stop])
+            start = stop
+        return gamma / gamma.sum(axis=1, keepdims=True)
+    
+    def infer(self, videos: Sequence[VideoInput], top_keywords: Optional[int] = None,
+              include_distribution: bool = False) -> List[Dict[str, Any]]:
+        """Dominant topic, its probability and top keywords for each text or video"""
+        counts = self.bow_matrix([pooled_text(video) for video in videos])
+        distributions = self.infer_matrix(counts)
+        known = np.asarray(counts.sum(axis=1)).ravel().astype(np.int64)
+        dominant = distributions.argmax(axis=1)
+        minimum = max(self.model.minimum_probability, 1e-8)
+        keywords: Dict[int, List[Dict[str, Any]]] = {}
+        results = []
+        for i in range(len(videos)):
+            if known[i] == 0:
+                result = {"dominant_topic": -1, "probability": 0.0, "keywords": [], "known_tokens": 0}
+            else:
+                topic = int(dominant[i])
+                if topic not in keywords:
+                    keywords[topic] = self.keywords(topic, top_keywords)
+                result = {"dominant_topic": topic, "probability": round(float(distributions[i, topic]), 6),
+                          "keywords": keywords[topic], "known_tokens": int(known[i])}
+                if include_distribution:
+                    order = np.argsort(-distributions[i], kind='stable')
+                    result["topics"] = [{"topic": int(k), "probability": round(float(distributions[i, k]), 6)}
+                                        for k in order if distributions[i, k] >= minimum]
+            if isinstance(videos[i], dict) and videos[i].get('videoId') is not None:
+                result = {"videoId": videos[i]['videoId'], **result}
+            results.append(result)
+        return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Assign LDA topics to pooled documents in batches")
+    parser.add_argument("--model", default=os.path.join(MODEL_DIR, GENSIM_MODEL),
+                        help="lda_model_gensim, or the lda_topic_model.pkl artifacts")
+    parser.add_argument("--dictionary", help="Dictionary file (default: lda_dictionary.dict next to the model)")
+    parser.add_argument("--input", required=True, help="CSV with one pooled document per row")
+    parser.add_argument("--column", default="pooled_text", help="Document text column")
+    parser.add_argument("--output", default="video_topics.csv")
+    parser.add_argument("--batch", type=int, default=10_000, help="Documents per inference batch")
+    parser.add_argument("--keywords", type=int, default=TOP_KEYWORDS, help="Top keywords per topic")
+    args = parser.parse_args()
+    
+    inferencer = TopicInferencer.load(args.model, args.dictionary, args.keywords)
+    frame = pd.read_csv(args.input)
+    texts = frame[args.column].fillna('').astype(str).tolist()
+    print(f"🚀 {len(texts):,} documents, {inferencer.num_topics} topics")
+    start_time = time.time()
+    rows = []
+    for offset in range(0, len(texts), args.batch):
+        for result in inferencer.infer(texts[offset:offset + args.batch]):
+            rows.append({'dominant_topic': result['dominant_topic'], 'topic_probability': result['probability'],
+                         'keywords': " ".join(keyword['word'] for keyword in result['keywords'])})
+    output = pd.concat([frame.drop(columns=[args.column]), pd.DataFrame(rows)], axis=1)
+    output.to_csv(args.output, index=False)
+    elapsed = time.time() - start_time
+    print(f"✅ {len(texts):,} documents in {elapsed:.1f}s ({elapsed / max(len(texts), 1) * 1000:.2f} ms/document)")
+    print(f"💾 {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""
+Parallel topic-count (K) selection for the stm.ipynb LDA sweep
+
+stm.ipynb trains one LdaModel per K (4..30 step 2), one after another,
+scores each with c_v coherence and keeps every model in ``model_list``.
+This module runs the same sweep with the same LDA settings:
+
+1. Candidates train in a process pool, largest K first (they take longest).
+   Each worker computes coherence right after training, so one K is scored
+   while others train.
+2. Workers save their model to a temporary directory. The parent keeps the
+   scores and only the best model; beaten models are deleted on arrival.
+3. Optional early stopping: every other K is trained first. A K in
+   between is dropped when both of its trained neighbours score more than
+   ``margin`` below the best so far; the rest are then trained too. No
+   model is trained twice, and the first round's scores are final.
+4. Each K reports its wall-clock time and the peak resident memory of its
+   worker while training and scoring it.
+5. Optionally, coherence is looked up in a ``CoherenceIndex``
+   (pipeline/coherence_index.py) built once for the corpus, instead of
+   re-scanning the texts for every K.
+
+Without early stopping, the scores and best model are the notebook's
+(same ``random_state``; with an index, up to floating-point rounding).
+
+    python pipeline/topic_selection.py --input pooled_documents.csv --workers 4 --coherence-index coherence_index.npz
+"""
+
+import argparse
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+if __package__ in (None, ""):
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+
+from pipeline.coherence_index import CoherenceIndex, load_or_build
+
+try:
+    from gensim import corpora, models
+    from gensim.models.coherencemodel import CoherenceModel
+    from gensim.utils import simple_preprocess
+    GENSIM_AVAILABLE = True
+except ImportError:
+    print("Warning: gensim not installed; topic model selection unavailable")
+    GENSIM_AVAILABLE = False
+
+# models.LdaModel arguments used by stm.ipynb
+LDA_PARAMS = {
+    'random_state': 42,
+    'update_every': 1,
+    'chunksize': 100,
+    'passes': 10,
+    'alpha': 'auto',
+    'per_word_topics': True
+}
+K_VALUES = list(range(4, 31, 2))
+COHERENCE = 'c_v'
+MARGIN = 0.03
+
+_worker: Dict[str, Any] = {}
+
+def build_corpus(documents: Sequence[str]) -> Tuple[List[List[str]], Any, List[list]]:
+    """Tokens, dictionary and bag-of-words corpus of the pooled documents, as in stm.ipynb"""
+    processed_docs = [simple_preprocess(doc, deacc=True, min_len=2, max_len=15) for doc in documents]
+    processed_docs = [doc for doc in processed_docs if len(doc) > 0]
+    dictionary = corpora.Dictionary(processed_docs)
+    dictionary.filter_extremes(no_below=2, no_above=0.8, keep_n=10000)
+    corpus = [dictionary.doc2bow(doc) for doc in processed_docs]
+    return processed_docs, dictionary, corpus
+
+def _reset_peak_rss() -> bool:
+    # Writing 5 to clear_refs resets VmHWM (Linux 4.0+)
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+def _peak_rss_mb() -> float:
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS (and is never reset)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+def train_and_score(num_topics: int, dictionary, corpus, texts, lda_params: Optional[Dict[str, Any]] = None,
+                    coherence_index: Optional[CoherenceIndex] = None):
+    """One iteration of the notebook's compute_coherence_values: the model and its coherence"""
+    model = models.LdaModel(corpus=corpus, id2word=dictionary, num_topics=num_topics,
+                            **(lda_params or LDA_PARAMS))
+    if coherence_index is not None:
+        return model, coherence_index.model_coherence(model, COHERENCE)
+    # processes=1: workers are already parallel (and the count does not change the score)
+    coherence = CoherenceModel(model=model, texts=texts, dictionary=dictionary,
+                               coherence=COHERENCE, processes=1).get_coherence()
+    return model, coherence
+
+def _init_worker(dictionary, corpus, texts, model_dir: str, coherence_index: Optional[CoherenceIndex]):
+    _worker.update(dictionary=dictionary, corpus=corpus, texts=texts, model_dir=model_dir,
+                   coherence_index=coherence_index)
+
+def _evaluate(num_topics: int, lda_params: Dict[str, Any], save: bool) -> Dict[str, Any]:
+    _reset_peak_rss()
+    start = time.perf_counter()
+    model, coherence = train_and_score(num_topics, _worker['dictionary'], _worker['corpus'],
+                                       _worker['texts'], lda_params, _worker['coherence_index'])
+    path = None
+    if save:
+        path = os.path.join(_worker['model_dir'], f"lda_k{num_topics}")
+        model.save(path)
+    return {'num_topics': num_topics, 'coherence': coherence, 'seconds': time.perf_counter() - start,
+            'peak_mb': _peak_rss_mb(), 'path': path}
+
+def _run(tasks: List[tuple], workers: int, init_args: tuple) -> Iterator[Dict[str, Any]]:
+    """Results of ``_evaluate`` for each task, as they finish"""
+    if workers <= 1:
+        _init_worker(*init_args)
+        for task in tasks:
+            yield _evaluate(*task)
+        return
+    with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=init_args) as pool:
+        futures = [pool.submit(_evaluate, *task) for task in tasks]
+        for future in as_completed(futures):
+            yield future.result()
+
+def _remove_model(path: str):
+    for name in os.listdir(os.path.dirname(path)):
+        if name == os.path.basename(path) or name.startswith(os.path.basename(path) + '.'):
+            os.remove(os.path.join(os.path.dirname(path), name))
+
+def select_num_topics(dictionary, corpus, texts, k_values: Sequence[int] = K_VALUES, workers: int = 1,
+                      early_stopping: bool = True, margin: float = MARGIN,
+                      lda_params: Optional[Dict[str, Any]] = None, coherence_index: Optional[CoherenceIndex] = None,
+                      verbose: bool = True) -> Dict[str, Any]:
+    """Train and score an LDA model per K and return the best one.
+
+    Returns ``best_model``, ``best_k``, ``best_coherence`` and ``scores``,
+    a DataFrame with one row per K: coherence (NaN when dropped), seconds,
+    peak_mb and status ('best', 'kept' or 'dropped'). Ties go to the
+    smaller K, as with the notebook's argmax. With ``coherence_index``
+    (built from ``texts`` and ``dictionary``) coherence is looked up in it.
+    """
+    if not GENSIM_AVAILABLE:
+        raise ImportError("gensim is required for topic model selection")
+    lda_params = dict(lda_params or LDA_PARAMS)
+    k_values = sorted(k_values)
+    rows = {k: {'num_topics': k, 'coherence': np.nan, 'seconds': np.nan, 'peak_mb': np.nan, 'status': 'dropped'}
+            for k in k_values}
+    model_dir = tempfile.mkdtemp(prefix="lda_sweep_")
+    if coherence_index is not None:
+        coherence_index.check_dictionary(dictionary)
+    init_args = (dictionary, corpus, texts, model_dir, coherence_index)
+    start_time = time.time()
+    best = None
+    
+    def evaluate(candidates: List[int]):
+        nonlocal best
+        tasks = [(k, lda_params, True) for k in reversed(candidates)]
+        for result in _run(tasks, workers, init_args):
+            k = result['num_topics']
+            rows[k].update(coherence=result['coherence'], seconds=result['seconds'], peak_mb=result['peak_mb'],
+                           status='kept')
+            if verbose:
+                print(f"✅ K={k}: coherence {result['coherence']:.4f} ({result['seconds']:.1f}s, "
+                      f"peak {result['peak_mb']:.0f}MB)")
+            if best is None or (result['coherence'], -k) > (best['coherence'], -best['num_topics']):
+                if best is not None:
+                    _remove_model(best['path'])
+                best = result
+            else:
+                _remove_model(result['path'])
+    
+    try:
+        if not early_stopping or len(k_values) < 3:
+            evaluate(k_values)
+        else:
+            evaluate(k_values[::2])
+            threshold = best['coherence'] - margin
+            remaining = []
+            for i in range(1, len(k_values), 2):
+                neighbours = [rows[k]['coherence'] for k in k_values[i - 1:i + 2:2]]
+                if max(neighbours) >= threshold:
+                    remaining.append(k_values[i])
+            if verbose:
+                dropped = [k for k in k_values[1::2] if k not in remaining]
+                print(f"✂️ Dropped K={dropped}: both neighbours more than {margin} below the best")
+            evaluate(remaining)
+        best_model = models.LdaModel.load(best['path'])
+    finally:
+        shutil.rmtree(model_dir, ignore_errors=True)
+    
+    rows[best['num_topics']]['status'] = 'best'
+    return {
+        'best_model': best_model,
+        'best_k': best['num_topics'],
+        'best_coherence': best['coherence'],
+        'scores': pd.DataFrame([rows[k] for k in k_values]),
+        'seconds': time.time() - start_time
+    }
+
+def print_report(selection: Dict[str, Any]):
+    print(f"\n📊 {'K':>4} {'c_v':>8} {'time':>8} {'peak RSS':>9}  status")
+    for _, row in selection['scores'].iterrows():
+        if row['status'] == 'dropped':
+            print(f"   {row['num_topics']:>4} {'-':>8} {'-':>8} {'-':>9}  dropped")
+        else:
+            print(f"   {row['num_topics']:>4} {row['coherence']:>8.4f} {row['seconds']:>7.1f}s "
+                  f"{row['peak_mb']:>7.0f}MB  {row['status']}")
+    print(f"⏱ Sweep took {selection['seconds']:.1f}s; best K={selection['best_k']} "
+          f"(coherence {selection['best_coherence']:.4f})")
+
+def main():
+    parser = argparse.ArgumentParser(description="Select the number of LDA topics by c_v coherence")
+    parser.add_argument("--input", required=True, help="CSV with one pooled document per row")
+    parser.add_argument("--column", default="pooled_text", help="Document text column")
+    parser.add_argument("--k-min", type=int, default=4)
+    parser.add_argument("--k-max", type=int, default=30)
+    parser.add_argument("--k-step", type=int, default=2)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Processes training models")
+    parser.add_argument("--no-early-stopping", action="store_true", help="Fully train every K, as the notebook does")
+    parser.add_argument("--margin", type=float, default=MARGIN,
+                        help="Drop K whose neighbours both score more than this below the best")
+    parser.add_argument("--coherence-index",
+                        help="Score with the co-occurrence index saved here (.npz; built first if missing)")
+    parser.add_argument("--save", help="Save the best model here (gensim format)")
+    parser.add_argument("--cache", help="Reuse tokens, dictionary and corpus from this artifact cache directory")
+    args = parser.parse_args()
+    
+    documents = pd.read_csv(args.input)[args.column].fillna('').astype(str).tolist()
+    if args.cache:
+        from pipeline.artifact_cache import ArtifactCache, document_corpus
+        from pipeline.document_pooling import bow_documents
+        cached = document_corpus(documents, ArtifactCache(args.cache))
+        texts, dictionary, corpus = list(cached['texts']), cached['dictionary'], list(bow_documents(cached['corpus']))
+    else:
+        texts, dictionary, corpus = build_corpus(documents)
+    print(f"📦 {len(corpus):,} documents, {len(dictionary):,} tokens")
+    coherence_index = None
+    if args.coherence_index:
+        coherence_index = load_or_build(args.coherence_index, texts, dictionary)
+    selection = select_num_topics(dictionary, corpus, texts, range(args.k_min, args.k_max + 1, args.k_step),
+                                  args.workers, not args.no_early_stopping, args.margin,
+                                  coherence_index=coherence_index)
+    print_report(selection)
+    if args.save:
+        selection['best_model'].save(args.save)
+        print(f"💾 Saved best model to {args.save}")
+
+if __name__ == "__main__":
+    main()